@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK PPO: Actor-Critic MLP (NumPy float32)
+
+METRICAS CLAVE:
+- Forward throughput: samples/s de inferencia (logits + valores) por batch size
+- Backward throughput: samples/s de forward + backward PPO (loss + gradientes)
+- Update throughput: samples/s del paso completo (clip grad norm + Adam)
+
+USO:
+    python intelligent_bot_ppo_benchmark.py
+    python intelligent_bot_ppo_benchmark.py --hidden 128 128 --batch-sizes 64 1024
+"""
+
+import argparse
+import time
+import numpy as np
+from intelligent_investment_bot import (
+    ActorCriticMLP,
+    AdamOptimizer,
+    PPO_CONFIG,
+    load_environment
+)
+
+
+class PPONetworkBenchmark:
+    """Microbenchmark forward/backward de la red actor-critic"""
+
+    def __init__(self, hidden_sizes=None, batch_sizes=(1, 32, 64, 256, 1024), min_time=0.5):
+        self.hidden_sizes = PPO_CONFIG["hidden_sizes"] if hidden_sizes is None else hidden_sizes
+        self.batch_sizes = list(batch_sizes)
+        self.min_time = min_time
+        self.network = ActorCriticMLP(PPO_CONFIG["state_dim"], PPO_CONFIG["action_dim"],
+                                      self.hidden_sizes, seed=0)
+        self.optimizer = AdamOptimizer(self.network.params, PPO_CONFIG["learning_rate"])
+        self.rng = np.random.default_rng(0)
+        self.results = {"forward": {}, "backward": {}, "update": {}}
+
+    def _throughput(self, fn, batch_size):
+        """Repite fn hasta min_time segundos; retorna samples/s"""
+        fn()  # warm-up
+        iterations = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            iterations += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.min_time:
+                return iterations * batch_size / elapsed
+
+    def _batch(self, batch_size):
+        states = self.rng.normal(size=(batch_size, PPO_CONFIG["state_dim"])).astype(np.float32)
+        actions = self.rng.integers(0, PPO_CONFIG["action_dim"], size=batch_size)
+        old_log_probs = np.full(batch_size, np.log(1 / PPO_CONFIG["action_dim"]), dtype=np.float32)
+        advantages = self.rng.normal(size=batch_size).astype(np.float32)
+        returns = self.rng.normal(size=batch_size).astype(np.float32)
+        return states, actions, old_log_probs, advantages, returns
+
+    def _loss_and_grads(self, batch):
+        return self.network.ppo_loss(
+            *batch,
+            clip_epsilon=PPO_CONFIG["clip_epsilon"],
+            value_coef=PPO_CONFIG["value_loss_coef"],
+            entropy_coef=PPO_CONFIG["entropy_coef"]
+        )
+
+    def benchmark_forward(self):
+        print("\n[1/3] Forward (inferencia)")
+        print("-" * 60)
+        for batch_size in self.batch_sizes:
+            states = self._batch(batch_size)[0]
+            rate = self._throughput(lambda: self.network.forward(states), batch_size)
+            self.results["forward"][batch_size] = rate
+            print(f"  batch={batch_size:5d}: {rate:14,.0f} samples/s")
+
+    def benchmark_backward(self):
+        print("\n[2/3] Forward + backward (loss PPO)")
+        print("-" * 60)
+        for batch_size in self.batch_sizes:
+            batch = self._batch(batch_size)
+            rate = self._throughput(lambda: self._loss_and_grads(batch), batch_size)
+            self.results["backward"][batch_size] = rate
+            print(f"  batch={batch_size:5d}: {rate:14,.0f} samples/s")
+
+    def benchmark_update(self):
+        print("\n[3/3] Paso completo (backward + clip + Adam)")
+        print("-" * 60)
+
+        def step(batch):
+            _, grads = self._loss_and_grads(batch)
+            self.network.clip_grad_norm(grads, PPO_CONFIG["max_grad_norm"])
+            self.optimizer.step(grads)
+
+        for batch_size in self.batch_sizes:
+            batch = self._batch(batch_size)
+            rate = self._throughput(lambda: step(batch), batch_size)
+            self.results["update"][batch_size] = rate
+            print(f"  batch={batch_size:5d}: {rate:14,.0f} samples/s")
+
+    def run_full_benchmark(self):
+        """Ejecuta los 3 benchmarks"""
+        print("\n" + "="*70)
+        print(f"BENCHMARK PPO MLP: state_dim={PPO_CONFIG['state_dim']}, "
+              f"hidden={self.hidden_sizes}, actions={PPO_CONFIG['action_dim']} (float32)")
+        print("="*70)
+
+        start_time = time.time()
+        self.benchmark_forward()
+        self.benchmark_backward()
+        self.benchmark_update()
+
+        print(f"\nBenchmark duration: {time.time() - start_time:.2f}s")
+        print("="*70 + "\n")
+        return self.results
+
+
+if __name__ == "__main__":
+    load_environment()
+    parser = argparse.ArgumentParser(description="Microbenchmark de la red PPO")
+    parser.add_argument("--hidden", type=int, nargs="*", default=None, help="Capas ocultas (default: PPO_CONFIG)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 64, 256, 1024])
+    parser.add_argument("--min-time", type=float, default=0.5, help="Segundos por medición")
+    args = parser.parse_args()
+
+    PPONetworkBenchmark(args.hidden, args.batch_sizes, args.min_time).run_full_benchmark()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK STARTUP: Import y arranque de intelligent_investment_bot
+
+METRICAS CLAVE:
+- Import profile (python -X importtime): tiempo acumulado del módulo y sus
+  dependencias directas más pesadas
+- Cold start: proceso nuevo sin bytecode cacheado (compila módulo, stdlib y
+  dependencias; la fila "interpreter" es la línea base)
+- Warm start: proceso nuevo con bytecode cacheado
+- Entradas: CLI (--help), suites de tests, runners de benchmark y PBT (solo import)
+- Budget: exit 1 si el import warm supera --budget-ms o si se cargan
+  dependencias que deben ser lazy (pandas, requests, dotenv)
+
+Cada medición corre en un subproceso con PYTHONPYCACHEPREFIX propio: el
+__pycache__ del repo no se toca.
+
+USO:
+    python intelligent_bot_startup_benchmark.py
+    python intelligent_bot_startup_benchmark.py --repeat 5 --budget-ms 250
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULE = "intelligent_investment_bot"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Dependencias que importar el bot no debe cargar
+LAZY_MODULES = ("pandas", "requests", "dotenv")
+
+# Entradas medidas: nombre → argumentos del intérprete
+ENTRY_POINTS = {
+    "interpreter": ["-c", "pass"],
+    "bot module": ["-c", f"import {MODULE}"],
+    "CLI --help": [f"{MODULE}.py", "--help"],
+    "tests (unittest)": ["-c", "import test_intelligent_bot"],
+    "tests (pytest)": ["-c", "import test_inquebrantable_6"],
+    "PPO benchmark": ["-c", "import intelligent_bot_ppo_benchmark"],
+    "tier1 benchmark": ["-c", "import intelligent_bot_tier1_benchmark"],
+    "population training": ["-c", "import population_training"],
+}
+
+
+class StartupBenchmark:
+    """Tiempos de import / arranque medidos en subprocesos"""
+
+    def __init__(self, repeat=3, budget_ms=250.0, entry_points=None):
+        self.repeat = repeat
+        self.budget_ms = budget_ms
+        self.entry_points = dict(ENTRY_POINTS if entry_points is None else entry_points)
+        self.results = {"import_profile": {}, "cold": {}, "warm": {}, "lazy_loaded": [], "within_budget": None}
+
+    def _env(self, cache_dir):
+        env = dict(os.environ)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        env["PYTHONPYCACHEPREFIX"] = cache_dir
+        return env
+
+    def _run(self, args, cache_dir):
+        """Ejecuta el intérprete con args; retorna (segundos de pared, stdout, stderr)"""
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, *args], cwd=REPO_DIR, env=self._env(cache_dir),
+                                   capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr[-2000:]}")
+        return elapsed, completed.stdout, completed.stderr
+
+    @staticmethod
+    def parse_importtime(stderr):
+        """Líneas de -X importtime → [(self_us, cumulative_us, profundidad, módulo)]"""
+        rows = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip(" "))) // 2
+            rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+        return rows
+
+    def benchmark_import_profile(self, top=8):
+        print("\n[1/3] Import profile (-X importtime, bytecode cacheado)")
+        print("-" * 60)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self._run(["-c", f"import {MODULE}"], cache_dir)  # Compilar una vez
+            _, _, stderr = self._run(["-X", "importtime", "-c", f"import {MODULE}"], cache_dir)
+            _, stdout, _ = self._run(["-c", f"import sys, {MODULE}; print(' '.join(sys.modules))"], cache_dir)
+
+        # importtime lista los hijos antes que el padre: deps directas = profundidad 1
+        # entre el import de nivel 0 anterior (p.ej. site) y el módulo
+        rows = self.parse_importtime(stderr)
+        end = next(i for i, row in enumerate(rows) if row[3] == MODULE and row[2] == 0)
+        begin = max((i for i in range(end) if rows[i][2] == 0), default=-1) + 1
+        module_row = rows[end]
+        children = sorted((row for row in rows[begin:end] if row[2] == 1), key=lambda row: -row[1])
+
+        self.results["import_profile"] = {
+            "total_ms": module_row[1] / 1000,
+            "self_ms": module_row[0] / 1000,
+            "dependencies_ms": {name: cumulative / 1000 for _, cumulative, _, name in children[:top]},
+        }
+        loaded = set(stdout.split())
+        self.results["lazy_loaded"] = [name for name in LAZY_MODULES if name in loaded]
+
+        print(f"  {MODULE}: {module_row[1] / 1000:8.1f} ms (self {module_row[0] / 1000:.1f} ms)")
+        for name, ms in self.results["import_profile"]["dependencies_ms"].items():
+            print(f"    {name:<28s} {ms:8.1f} ms")
+        print(f"  Lazy deps loaded at import: {', '.join(self.results['lazy_loaded']) or 'none'}")
+
+    def _benchmark_start(self, label, cold):
+        print(f"\n[{2 if cold else 3}/3] {label} start (median de {self.repeat}, proceso nuevo)")
+        print("-" * 60)
+        key = "cold" if cold else "warm"
+        for name, args in self.entry_points.items():
+            samples = []
+            with tempfile.TemporaryDirectory() as shared_cache:
+                if not cold:
+                    self._run(args, shared_cache)
+                for _ in range(self.repeat):
+                    if cold:
+                        with tempfile.TemporaryDirectory() as fresh_cache:
+                            samples.append(self._run(args, fresh_cache)[0])
+                    else:
+                        samples.append(self._run(args, shared_cache)[0])
+            samples.sort()
+            self.results[key][name] = samples[len(samples) // 2] * 1000
+            print(f"  {name:<24s} {self.results[key][name]:8.1f} ms")
+
+    def benchmark_cold_start(self):
+        self._benchmark_start("Cold", cold=True)
+
+    def benchmark_warm_start(self):
+        self._benchmark_start("Warm", cold=False)
+
+    def run_full_benchmark(self):
+        """Ejecuta los 3 benchmarks y verifica el budget"""
+        print("\n" + "=" * 70)
+        print(f"BENCHMARK STARTUP: {MODULE} (budget import warm {self.budget_ms:.0f} ms)")
+        print("=" * 70)
+
+        start_time = time.time()
+        self.benchmark_import_profile()
+        self.benchmark_cold_start()
+        self.benchmark_warm_start()
+
+        total_ms = self.results["import_profile"]["total_ms"]
+        self.results["within_budget"] = total_ms <= self.budget_ms and not self.results["lazy_loaded"]
+        status = "OK" if self.results["within_budget"] else "OVER BUDGET"
+        print(f"\nImport {MODULE}: {total_ms:.1f} ms / {self.budget_ms:.0f} ms → {status}")
+        print(f"Benchmark duration: {time.time() - start_time:.2f}s")
+        print("=" * 70 + "\n")
+        return self.results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de import y arranque")
+    parser.add_argument("--repeat", type=int, default=3, help="Mediciones por entrada (se reporta la mediana)")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="Máximo para el import warm del bot")
+    parser.add_argument("--only", nargs="+", choices=list(ENTRY_POINTS), help="Medir solo estas entradas")
+    args = parser.parse_args()
+
+    entry_points = {name: ENTRY_POINTS[name] for name in args.only} if args.only else None
+    results = StartupBenchmark(args.repeat, args.budget_ms, entry_points).run_full_benchmark()
+    sys.exit(0 if results["within_budget"] else 1)
@@ -26,8 +26,10 @@ from datetime import datetime, timedelta
 from intelligent_investment_bot import (
     RiskManager,
     MarketEnvironment,
+    SimulatedClock,
     TRADING_CONFIG,
-    RISK_CONFIG
+    RISK_CONFIG,
+    load_environment
 )
 
 class IntelligentBotBenchmark:
@@ -137,8 +139,10 @@ class IntelligentBotBenchmark:
         print("\n[3/6] Circuit Breaker Timing Benchmark")
         print("-" * 60)
         
-        env = MarketEnvironment()
-        risk_mgr = RiskManager()
+        # Reloj simulado: el cooldown se verifica avanzando el tiempo, sin esperar
+        clock = SimulatedClock()
+        env = MarketEnvironment(clock=clock)
+        risk_mgr = RiskManager(clock=clock)
         
         # Activar CRITICAL level
         initial = TRADING_CONFIG["initial_capital"]
@@ -147,19 +151,28 @@ class IntelligentBotBenchmark:
         env.price_history = [100]
         env.current_position = 0
         
-        activation_time = datetime.now()
+        activation_time = clock.now()
         risk_mgr.analyze_risk(env)
         
         # Verificar cooldown
-        expected_duration = 3600  # 1 hora
+        expected_duration = RISK_CONFIG["circuit_breaker_cooldown"]  # 1 hora
         actual_duration = (risk_mgr.circuit_breaker_until - activation_time).total_seconds()
         error = abs(actual_duration - expected_duration)
         
+        # Fast-forward: bloqueado 1s antes del vencimiento, liberado al vencer
+        clock.advance(expected_duration - 1)
+        blocked_before = not risk_mgr.should_allow_trade(env, 2)
+        clock.advance(1)
+        released_after = risk_mgr.should_allow_trade(env, 2)
+        release_ok = blocked_before and released_after
+        
         self.results["accuracy"]["circuit_breaker_timing_error"] = error
+        self.results["accuracy"]["circuit_breaker_release_ok"] = release_ok
         
-        status = "[OK]" if error <= 1 else "[FAIL]"
+        status = "[OK]" if error <= 1 and release_ok else "[FAIL]"
         print(f"{status} Circuit Breaker cooldown: {actual_duration:.1f}s (expected: {expected_duration}s)")
         print(f"     Timing error: {error:.2f}s")
+        print(f"     Blocked before expiry: {blocked_before} | Released at expiry: {released_after}")
     
     def benchmark_resource_usage(self):
         """
@@ -337,7 +350,8 @@ class IntelligentBotBenchmark:
             print(f"[WARN] MDD Accuracy: {accuracy_score}/100")
         
         # 3. Circuit Breaker (100 puntos)
-        if self.results["accuracy"]["circuit_breaker_timing_error"] <= 1:
+        if (self.results["accuracy"]["circuit_breaker_timing_error"] <= 1
+                and self.results["accuracy"]["circuit_breaker_release_ok"]):
             score += 100
             print("[OK] Circuit Breaker Timing: 100/100 (error <=1s)")
         else:
@@ -395,6 +409,7 @@ class IntelligentBotBenchmark:
         return percentage >= 95
 
 if __name__ == "__main__":
+    load_environment()
     benchmark = IntelligentBotBenchmark()
     success = benchmark.run_full_benchmark()
     
@@ -38,8 +38,10 @@ from intelligent_investment_bot import (
     CrossValidator,
     PPOTradingAgent,
     PortfolioManager,
+    SimulatedClock,
     TRADING_CONFIG,
-    RISK_CONFIG
+    RISK_CONFIG,
+    load_environment
 )
 
 # Silenciar stdout para evitar errores de emoji en Windows
@@ -97,14 +99,15 @@ class CompleteBenchmark:
         self.results["inquebrantable_1"]["latency_p99_ms"] = p99
         self.results["inquebrantable_1"]["latency_passed"] = p99 < 100
         
-        # Test Circuit Breaker timing
-        risk_mgr = RiskManager()
-        env = MarketEnvironment()
+        # Test Circuit Breaker timing (reloj simulado, determinista)
+        clock = SimulatedClock()
+        risk_mgr = RiskManager(clock=clock)
+        env = MarketEnvironment(clock=clock)
         env.portfolio_value = TRADING_CONFIG["initial_capital"] * 0.94
         env.peak_value = TRADING_CONFIG["initial_capital"]
         env.price_history = [100]
         
-        activation_time = datetime.now()
+        activation_time = clock.now()
         risk_mgr.activate_kill_switch(env, level="CRITICAL", trigger_value=0.06)  # 6% MDD
         
         expected_release = activation_time + timedelta(hours=1)
@@ -162,10 +165,11 @@ class CompleteBenchmark:
         print("INQUEBRANTABLE 2: Auto-retraining Semanal")
         print("="*70)
         
-        evolver = AutoEvolver()
+        clock = SimulatedClock()
+        evolver = AutoEvolver(clock=clock)
         
-        # Test 1: Scheduler timing
-        evolver.last_training_date = datetime.now() - timedelta(days=8)
+        # Test 1: Scheduler timing (fast-forward 8 días)
+        clock.advance(days=8)
         should_retrain = evolver.should_trigger_weekly_retraining()
         scheduler_passed = should_retrain == True
         
@@ -614,6 +618,7 @@ class CompleteBenchmark:
         return percentage >= 90
 
 if __name__ == "__main__":
+    load_environment()
     benchmark = CompleteBenchmark()
     success = benchmark.run_full_benchmark()
     
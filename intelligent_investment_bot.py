@@ -9,7 +9,7 @@ Bot de Trading Algorítmico con Arquitectura Grial 2.0
 ARQUITECTURA DE 4 PILARES:
 ━━━━━━━━━━━━━━━━━━━━━━━━
 AI 1: Risk Manager (Autonomía) - Maximum Drawdown & Kill Switch
-AI 2: Sentiment Analyzer (Visión de Futuro) - LLM News Analysis
+AI 2: Sentiment Analyzer (Visión de Futuro) - News Analysis (modelo local o keywords)
 AI 3: Trading Agent (Optimización) - PPO con Buy/Sell/Hold
 AI 4: Auto-Evolver (Auto-Mejora) - Re-entrena PPO tras failures
 
@@ -32,22 +32,21 @@ MÉTRICAS CLAVE:
 """
 
 import numpy as np
-import pandas as pd
-import requests
 import json
 import os
 import time
 import hmac
 import hashlib
 import base64
+import struct
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import repeat
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
-from dotenv import load_dotenv
-import warnings
-warnings.filterwarnings('ignore')
+from typing import Callable, List, Dict, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+# Sin efectos al importar: .env, warnings y directorios se preparan en main() /
+# load_environment() / al escribir. requests se importa al primer uso de red.
 
 # ============================================================================
 # CONFIGURACIÓN
@@ -91,6 +90,67 @@ SENTIMENT_CONFIG = {
     "twitter_keywords": ["#bitcoin", "#crypto", "#btc", "bitcoin"],
     "sentiment_weight": 0.3,  # Peso del sentimiento en la decisión
     "lookback_hours": 24,     # Analizar últimas 24 horas
+    "lexicon_path": os.getenv("SENTIMENT_LEXICON_PATH"),  # JSON {categoría: {keyword: peso}}
+    "news_feeds": [],         # [{"url": ..., "format": "rss"|"json"}] → NewsIngestor (vacío = simulado)
+    "news_half_life_hours": 6,  # Decaimiento del agregado de sentimiento
+    "news_cache_size": 10000,   # Artículos recordados (dedup + cache de scores)
+    "refresh_seconds": 60,      # Cadencia del SentimentRefresher (modo async)
+    "max_snapshot_age_seconds": 900,  # Snapshot más viejo → sentimiento neutral en el loop
+    "model_path": os.getenv("SENTIMENT_MODEL_PATH"),  # Clasificador local (.onnx / .pkl / .joblib); vacío = keywords
+    "model_batch_size": 256,    # Textos por llamada de inferencia
+    "model_cache_size": 20000,  # Scores del modelo recordados por hash de contenido
+    "history_size": 2048,       # Análisis retenidos en el ring buffer (SentimentHistory)
+    "history_half_lives": {"1h": 3600, "24h": 86400},  # Ventanas de los agregados con decaimiento
+}
+
+# Lexicon por defecto (keywords con pesos por categoría)
+SENTIMENT_LEXICON = {
+    "positive": {
+        "bullish": 1.0, "rally": 0.9, "surge": 0.8, "gain": 0.6,
+        "high": 0.5, "breakthrough": 1.0, "adoption": 0.7, "profit": 0.6
+    },
+    "negative": {
+        "crash": 1.0, "plunge": 0.9, "bearish": 1.0, "fear": 0.7,
+        "drop": 0.6, "panic": 1.0, "loss": 0.5, "ban": 0.8, "hack": 0.9
+    },
+    "volatility": {
+        "volatile": 1.0, "swing": 0.8, "uncertainty": 0.7,
+        "breaking": 0.9, "alert": 0.6
+    }
+}
+
+# Inflexiones reales por keyword (opt-in): el matcher solo reconoce formas
+# listadas, nunca concatena sufijos ("ban" no debe coincidir con "band")
+SENTIMENT_INFLECTIONS = {
+    "rally": ["rallies", "rallied", "rallying"],
+    "surge": ["surges", "surged", "surging"],
+    "gain": ["gains", "gained", "gaining"],
+    "high": ["highs"],
+    "profit": ["profits"],
+    "crash": ["crashes", "crashed", "crashing"],
+    "plunge": ["plunges", "plunged", "plunging"],
+    "fear": ["fears", "feared"],
+    "drop": ["drops", "dropped", "dropping"],
+    "panic": ["panics", "panicked", "panicking"],
+    "loss": ["losses"],
+    "ban": ["bans", "banned", "banning"],
+    "hack": ["hacks", "hacked", "hacking"],
+    "swing": ["swings", "swinging", "swung"],
+    "alert": ["alerts"],
+}
+
+# Diccionario de entidades por activo (ver AssetSentimentService)
+# Solo alias exactos de una palabra, sin inflexiones ("ripples" no es XRP);
+# se omiten los ambiguos ("link", "sol", "one")
+ASSET_ENTITIES = {
+    "BTC": ["bitcoin", "btc", "xbt"],
+    "ETH": ["ethereum", "eth", "ether"],
+    "SOL": ["solana"],
+    "DOGE": ["dogecoin", "doge"],
+    "XRP": ["xrp", "ripple"],
+    "ADA": ["cardano", "ada"],
+    "MATIC": ["polygon", "matic"],
+    "LINK": ["chainlink"],
 }
 
 # AI 3: PPO Trading Agent Config
@@ -106,6 +166,7 @@ PPO_CONFIG = {
     "batch_size": 64,
     "state_dim": 10,          # Dimensión del estado (precio, RSI, MA, etc.)
     "action_dim": 3,          # Buy, Sell, Hold
+    "hidden_sizes": [64, 64], # Capas ocultas del tronco compartido ([] = lineal)
 }
 
 # AI 4: Auto-Evolver Config
@@ -114,13 +175,694 @@ EVOLVER_CONFIG = {
     "mdd_penalty_multiplier": 10.0,  # Penalización 10x si causó Kill Switch
     "performance_threshold": 0.15,    # Re-entrenar si performance < 15% anual
     "min_trades_before_retrain": 100,
+    "validation_holdout": 0.25,       # Cola de velas del episodio reservada para validar (no se entrena en ella)
+}
+
+# INQUEBRANTABLE 2: Detector de régimen incremental (ver RegimeDetector)
+REGIME_CONFIG = {
+    "horizons": {"1d": 86400, "7d": 7 * 86400},  # Ventanas temporales en segundos
+    "primary_horizon": "7d",          # Horizonte que define el régimen
+    "min_samples": 7,                 # Muestras mínimas en el horizonte principal
+    "max_points": 4096,               # Muestras por horizonte (resolución = ventana / max_points)
+    "trend_threshold": 0.02,          # |Cambio neto| > 2% → trending
+    "volatility_threshold": 0.05,     # Volatilidad diaria > 5% → volatile
+    "probability_temperature": 0.25,  # Suavizado de probabilidades (fracción del umbral)
+    "max_transitions": 100,           # Eventos de transición retenidos
 }
 
 # Directorio para guardar datos
 DATA_DIR = "trading_data"
 MODELS_DIR = "trading_models"
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(MODELS_DIR, exist_ok=True)
+
+
+def load_environment(dotenv_path: Optional[str] = None):
+    """
+    Carga variables de .env (CLI y scripts; importar el módulo no lo hace)
+    
+    Re-lee las claves de configuración que vienen del entorno y descarta
+    el lexicon / scorer compilados con los valores anteriores.
+    """
+    
+    from dotenv import load_dotenv
+    
+    load_dotenv(dotenv_path)
+    SENTIMENT_CONFIG["lexicon_path"] = os.getenv("SENTIMENT_LEXICON_PATH")
+    SENTIMENT_CONFIG["model_path"] = os.getenv("SENTIMENT_MODEL_PATH")
+    default_keyword_matcher.cache_clear()
+    default_sentiment_scorer.cache_clear()
+
+# ============================================================================
+# CLOCK (Reloj inyectable: tiempo real o simulado)
+# ============================================================================
+
+class Clock:
+    """
+    Reloj de sistema (wall clock)
+
+    RiskManager, AutoEvolver y MarketEnvironment consultan el tiempo a
+    través de un Clock inyectable en lugar de llamar a datetime.now().
+    """
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock(Clock):
+    """
+    Reloj simulado determinista para backtests
+
+    El tiempo solo avanza con advance()/sleep(), así un replay de meses con
+    freezes de 24h y circuit breakers de 1h corre a velocidad de CPU.
+    """
+
+    def __init__(self, start: Optional[datetime] = None):
+        self.current = start or datetime(2025, 1, 1)
+
+    def now(self) -> datetime:
+        return self.current
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float = 0.0, **kwargs):
+        """Avanza el reloj (segundos o kwargs de timedelta: hours=24, days=7...)"""
+        self.current += timedelta(seconds=seconds, **kwargs)
+        return self.current
+
+    def set(self, moment: datetime):
+        """Fija el reloj en un instante (ej. timestamp de una vela histórica)"""
+        self.current = moment
+
+
+SYSTEM_CLOCK = Clock()
+
+# ============================================================================
+# P&L LEDGER (Acumulador diario incremental)
+# ============================================================================
+
+class DailyPnLLedger:
+    """
+    Ledger de P&L por día, actualizado incrementalmente
+
+    Cada fill y cada mark-to-market actualizan los acumuladores en O(1):
+    - Snapshot de equity al inicio de cada día (= último mark del día anterior)
+    - Snapshot de equity al inicio de cada semana ISO
+    - Ventana móvil de 24h (deque podada, O(1) amortizado)
+
+    Así el límite de pérdida diaria no recorre trades_history en cada step.
+    """
+
+    def __init__(self, initial_equity: float, rolling_window_hours: int = 24):
+        self.initial_equity = initial_equity
+        self.rolling_window = timedelta(hours=rolling_window_hours)
+
+        self.last_equity = initial_equity
+        self.last_timestamp = None
+
+        self.current_day = None
+        self.day_start_equity = initial_equity
+        self.current_week = None
+        self.week_start_equity = initial_equity
+
+        # Acumuladores del día actual
+        self.day_realized_pnl = 0.0
+        self.day_fees = 0.0
+        self.day_fills = 0
+
+        # Resumen de días cerrados {date: {...}}
+        self.daily_buckets = {}
+
+        # Marks dentro de la ventana móvil + baseline justo fuera de ella
+        self._window_marks = deque()
+        self._window_baseline = initial_equity
+
+    def _roll_to(self, timestamp: datetime):
+        """Abre un nuevo bucket diario/semanal si cambió la fecha"""
+
+        day = timestamp.date()
+        if day == self.current_day:
+            return
+
+        # Cerrar el día anterior
+        if self.current_day is not None:
+            self.daily_buckets[self.current_day] = {
+                "start_equity": self.day_start_equity,
+                "end_equity": self.last_equity,
+                "pnl": self.last_equity - self.day_start_equity,
+                "realized_pnl": self.day_realized_pnl,
+                "fees": self.day_fees,
+                "fills": self.day_fills
+            }
+
+        self.current_day = day
+        self.day_start_equity = self.last_equity
+        self.day_realized_pnl = 0.0
+        self.day_fees = 0.0
+        self.day_fills = 0
+
+        week = day.isocalendar()[:2]
+        if week != self.current_week:
+            self.current_week = week
+            self.week_start_equity = self.last_equity
+
+    def record_fill(self, timestamp: datetime, fee: float, realized_pnl: float = 0.0):
+        """Registra un fill (compra/venta ejecutada)"""
+
+        self._roll_to(timestamp)
+        self.day_fills += 1
+        self.day_fees += fee
+        self.day_realized_pnl += realized_pnl
+
+    def mark(self, timestamp: datetime, equity: float):
+        """Mark-to-market del portfolio"""
+
+        self._roll_to(timestamp)
+        self.last_equity = equity
+        self.last_timestamp = timestamp
+
+        self._window_marks.append((timestamp, equity))
+        cutoff = timestamp - self.rolling_window
+        while self._window_marks and self._window_marks[0][0] <= cutoff:
+            self._window_baseline = self._window_marks.popleft()[1]
+
+    def daily_pnl(self, equity: Optional[float] = None) -> float:
+        """P&L del día actual vs equity al inicio del día"""
+
+        if equity is None:
+            equity = self.last_equity
+        return float(equity - self.day_start_equity)
+
+    def weekly_pnl(self, equity: Optional[float] = None) -> float:
+        """P&L de la semana ISO actual vs equity al inicio de la semana"""
+
+        if equity is None:
+            equity = self.last_equity
+        return float(equity - self.week_start_equity)
+
+    def rolling_pnl(self, equity: Optional[float] = None) -> float:
+        """P&L de las últimas 24h (ventana móvil)"""
+
+        if equity is None:
+            equity = self.last_equity
+        return float(equity - self._window_baseline)
+
+    def daily_loss_fraction(self, equity: Optional[float] = None) -> float:
+        """Pérdida del día como fracción del equity de inicio (0 si hay ganancia)"""
+
+        pnl = self.daily_pnl(equity)
+        if pnl >= 0 or self.day_start_equity <= 0:
+            return 0.0
+        return -pnl / self.day_start_equity
+
+    def weekly_loss_fraction(self, equity: Optional[float] = None) -> float:
+        """Pérdida de la semana como fracción del equity de inicio"""
+
+        pnl = self.weekly_pnl(equity)
+        if pnl >= 0 or self.week_start_equity <= 0:
+            return 0.0
+        return -pnl / self.week_start_equity
+
+    def rolling_loss_fraction(self, equity: Optional[float] = None) -> float:
+        """Pérdida de las últimas 24h como fracción del equity baseline"""
+
+        pnl = self.rolling_pnl(equity)
+        if pnl >= 0 or self._window_baseline <= 0:
+            return 0.0
+        return -pnl / self._window_baseline
+
+# ============================================================================
+# PERFORMANCE METRICS (Motor incremental Sharpe/Sortino/Calmar)
+# ============================================================================
+
+class PerformanceMetrics:
+    """
+    Motor de métricas de performance en streaming
+
+    Mantiene momentos corridos de los returns por período (Welford):
+    - Media y varianza de returns
+    - Varianza downside (returns por debajo de target_return)
+    - Peak de equity y Maximum Drawdown
+    - Conteo de trades ganadores/perdedores
+
+    Cada update es O(1); Sharpe, Sortino, Calmar y Win Rate se leen en O(1).
+    Compartido por RiskManager, CrossValidator y analyze_history.
+    """
+
+    def __init__(self, initial_equity: Optional[float] = None,
+                 periods_per_year: int = 252,
+                 risk_free_rate: Optional[float] = None,
+                 target_return: float = 0.0):
+        self.periods_per_year = periods_per_year
+        self.risk_free_rate = RISK_CONFIG["risk_free_rate"] if risk_free_rate is None else risk_free_rate
+        self.target_return = target_return
+
+        self.initial_equity = initial_equity
+        self.last_equity = initial_equity
+        self.peak_equity = initial_equity
+        self.max_drawdown = 0.0
+
+        # Momentos de returns (Welford)
+        self.count = 0
+        self.mean_return = 0.0
+        self._m2 = 0.0
+        self._downside_sq_sum = 0.0
+        self.positive_periods = 0
+
+        # Trades cerrados
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+
+    def update(self, equity: float):
+        """Registra un nuevo valor de equity (un período)"""
+
+        if self.last_equity is None:
+            self.initial_equity = equity
+            self.last_equity = equity
+            self.peak_equity = equity
+            return
+
+        if self.last_equity > 0:
+            self.update_return((equity - self.last_equity) / self.last_equity)
+        self.last_equity = equity
+
+        if equity > self.peak_equity:
+            self.peak_equity = equity
+        elif self.peak_equity > 0:
+            drawdown = (self.peak_equity - equity) / self.peak_equity
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+
+    def update_return(self, period_return: float):
+        """Registra directamente un return por período"""
+
+        self.count += 1
+        delta = period_return - self.mean_return
+        self.mean_return += delta / self.count
+        self._m2 += delta * (period_return - self.mean_return)
+
+        shortfall = period_return - self.target_return
+        if shortfall < 0:
+            self._downside_sq_sum += shortfall * shortfall
+        if period_return > 0:
+            self.positive_periods += 1
+
+    def record_trade(self, pnl: float):
+        """Registra el P&L realizado de un trade cerrado"""
+
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losses += 1
+            self.gross_loss += -pnl
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def std_return(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def downside_deviation(self) -> float:
+        return float(np.sqrt(self._downside_sq_sum / self.count)) if self.count > 0 else 0.0
+
+    @property
+    def total_return(self) -> float:
+        if not self.initial_equity:
+            return 0.0
+        return (self.last_equity - self.initial_equity) / self.initial_equity
+
+    def sharpe_ratio(self) -> float:
+        """Sharpe anualizado sobre returns por período"""
+
+        std = self.std_return
+        if self.count < 2 or std == 0:
+            return 0.0
+        excess = self.mean_return - self.risk_free_rate / self.periods_per_year
+        return float(excess / std * np.sqrt(self.periods_per_year))
+
+    def sortino_ratio(self) -> float:
+        """Sortino anualizado (solo penaliza volatilidad downside)"""
+
+        downside = self.downside_deviation
+        if self.count < 2 or downside == 0:
+            return 0.0
+        excess = self.mean_return - self.risk_free_rate / self.periods_per_year
+        return float(excess / downside * np.sqrt(self.periods_per_year))
+
+    def annualized_return(self) -> float:
+        """Return compuesto anualizado"""
+
+        if self.count == 0 or not self.initial_equity or self.last_equity <= 0:
+            return 0.0
+        # En log-espacio para evitar overflow con pocos períodos
+        exponent = np.log(self.last_equity / self.initial_equity) * self.periods_per_year / self.count
+        return float(np.expm1(min(exponent, 700.0)))
+
+    def calmar_ratio(self) -> float:
+        """Calmar = return anualizado / Maximum Drawdown"""
+
+        if self.max_drawdown == 0:
+            return 0.0
+        return float(self.annualized_return() / self.max_drawdown)
+
+    def win_rate(self) -> float:
+        """% de trades ganadores (0-1)"""
+
+        closed = self.wins + self.losses
+        return self.wins / closed if closed > 0 else 0.0
+
+    def summary(self) -> Dict:
+        """Resumen de todas las métricas"""
+
+        return {
+            "periods": self.count,
+            "total_return": self.total_return,
+            "mean_return": self.mean_return,
+            "std_return": self.std_return,
+            "sharpe_ratio": self.sharpe_ratio(),
+            "sortino_ratio": self.sortino_ratio(),
+            "calmar_ratio": self.calmar_ratio(),
+            "max_drawdown": self.max_drawdown,
+            "win_rate": self.win_rate(),
+            "trades_closed": self.wins + self.losses
+        }
+
+# ============================================================================
+# FEATURE PIPELINE (Estado incremental para get_state)
+# ============================================================================
+
+@lru_cache(maxsize=None)
+def ema_weights(period: int, length: int) -> np.ndarray:
+    """
+    Pesos de la EMA sembrada con el primer valor sobre `length` valores
+    
+    weights @ prices == loop EMA de MarketEnvironment._calculate_ema
+    """
+    
+    multiplier = 2 / (period + 1)
+    weights = multiplier * (1 - multiplier) ** np.arange(length - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - multiplier) ** (length - 1)
+    weights.flags.writeable = False
+    return weights
+
+
+class _HistoryFollower:
+    """Sigue una lista append-only (price_history) consumiendo solo la cola nueva"""
+    
+    def reset(self):
+        self.count = 0
+        self._source = None
+        self._last = None
+    
+    def push(self, value: float):
+        raise NotImplementedError
+    
+    def sync(self, values: List[float]):
+        """O(nuevos valores); reconstruye si la lista se reemplazó o se editó"""
+        
+        if (values is not self._source or len(values) < self.count
+                or (self.count and values[self.count - 1] != self._last)):
+            self.reset()
+            self._source = values
+        
+        for value in values[self.count:]:
+            self.push(value)
+        if self.count:
+            self._last = values[self.count - 1]
+
+
+class RunningMinMax(_HistoryFollower):
+    """Normalizador max/min acumulado (O(1) por valor)"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        super().reset()
+        self.max = None
+        self.min = None
+    
+    def push(self, value: float):
+        self.count += 1
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+
+class IncrementalIndicators(_HistoryFollower):
+    """
+    RSI / MACD / SMA sobre closes = history[-window:] + [precio actual]
+    
+    - SMA y RSI: sumas móviles O(1) por precio (recalculadas cada `window`
+      precios para no acumular error de redondeo)
+    - EMA: producto punto con pesos cacheados sobre un ring contiguo
+    Mismos valores que calculate_technical_indicators (< 50 closes: neutrales).
+    """
+    
+    RSI_PERIOD = 14
+    
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._ring = np.zeros(2 * window)  # Doble ring: la ventana siempre es un slice contiguo
+        self.reset()
+    
+    def reset(self):
+        super().reset()
+        self._sums = {19: 0.0, 49: 0.0}  # Últimos n-1 precios (el actual completa SMA_20/50)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        self._gain_count = 0
+        self._loss_count = 0
+    
+    def _value(self, lag: int) -> float:
+        """Precio `lag` posiciones atrás (0 = último)"""
+        return self._ring[(self.count - 1 - lag) % self.window]
+    
+    def _add_delta(self, delta: float, sign: int):
+        if delta > 0:
+            self._gain_sum += sign * delta
+            self._gain_count += sign
+        elif delta < 0:
+            self._loss_sum -= sign * delta
+            self._loss_count += sign
+    
+    def push(self, value: float):
+        value = float(value)
+        
+        for n in self._sums:
+            if self.count >= n:
+                self._sums[n] -= self._value(n - 1)
+            self._sums[n] += value
+        
+        tracked = self.RSI_PERIOD - 1  # El delta del precio actual completa los 14
+        if self.count > tracked:
+            self._add_delta(self._value(tracked - 1) - self._value(tracked), -1)
+        if self.count > 0:
+            self._add_delta(value - self._value(0), +1)
+        
+        index = self.count % self.window
+        self._ring[index] = self._ring[index + self.window] = value
+        self.count += 1
+        
+        if self.count % self.window == 0:
+            self._recompute_sums()
+    
+    def _recompute_sums(self):
+        history = self.history_window()
+        for n in self._sums:
+            self._sums[n] = float(history[-n:].sum())
+        deltas = np.diff(history[-self.RSI_PERIOD:])
+        self._gain_sum = float(deltas[deltas > 0].sum())
+        self._loss_sum = float(-deltas[deltas < 0].sum())
+        self._gain_count = int((deltas > 0).sum())
+        self._loss_count = int((deltas < 0).sum())
+    
+    def history_window(self) -> np.ndarray:
+        """Últimos min(count, window) precios en orden cronológico (vista)"""
+        
+        length = min(self.count, self.window)
+        start = self.count % self.window if self.count >= self.window else 0
+        return self._ring[start:start + length]
+    
+    def compute(self, price: float) -> Dict:
+        length = min(self.count, self.window) + 1
+        if length < 50:
+            return {"rsi": 50.0, "macd": 0.0, "signal": 0.0, "sma_20": price, "sma_50": price}
+        
+        # RSI: 13 deltas acumulados + el delta del precio actual
+        delta = price - self._value(0)
+        gain_sum = (self._gain_sum if self._gain_count else 0.0) + max(delta, 0.0)
+        loss_sum = (self._loss_sum if self._loss_count else 0.0) + max(-delta, 0.0)
+        if not self._loss_count and delta >= 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + gain_sum / loss_sum)
+        
+        history = self.history_window()
+        weights_12, weights_26 = ema_weights(12, length), ema_weights(26, length)
+        ema_12 = history @ weights_12[:-1] + weights_12[-1] * price
+        ema_26 = history @ weights_26[:-1] + weights_26[-1] * price
+        macd = ema_12 - ema_26
+        
+        return {
+            "rsi": rsi,
+            "macd": macd,
+            "signal": macd * 0.9,
+            "sma_20": (self._sums[19] + price) / 20,
+            "sma_50": (self._sums[49] + price) / 50
+        }
+
+
+def window_indicators(closes, price: float) -> Dict:
+    """Indicadores del estado sobre una serie de closes externa (velas de API)"""
+    
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) < 50:
+        return {"rsi": 50.0, "macd": 0.0, "signal": 0.0, "sma_20": price, "sma_50": price}
+    
+    deltas = np.diff(closes[-IncrementalIndicators.RSI_PERIOD - 1:])
+    avg_gain = np.where(deltas > 0, deltas, 0).mean()
+    avg_loss = np.where(deltas < 0, -deltas, 0).mean()
+    rsi = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+    
+    macd = closes @ ema_weights(12, len(closes)) - closes @ ema_weights(26, len(closes))
+    return {
+        "rsi": rsi,
+        "macd": macd,
+        "signal": macd * 0.9,
+        "sma_20": np.mean(closes[-20:]),
+        "sma_50": np.mean(closes[-50:])
+    }
+
+
+class FeatureContext:
+    """Datos de un step para las funciones de feature (indicadores lazy)"""
+    
+    def __init__(self, pipeline: "FeaturePipeline", env, market_data: Dict, sentiment_factor: float):
+        self.env = env
+        self.market_data = market_data
+        self.sentiment_factor = sentiment_factor
+        self.price = market_data["price"]
+        self.volume = market_data["volume_24h"]
+        
+        # Normalizadores: máximo histórico (el precio actual si aún no hay historial)
+        self.max_price = pipeline.price_range.max if pipeline.price_range.count else self.price
+        self.max_volume = pipeline.volume_range.max if pipeline.volume_range.count else self.volume
+        
+        self._pipeline = pipeline
+        self._indicators = None
+        self._full_indicators = None
+    
+    @property
+    def indicators(self) -> Dict:
+        """RSI, MACD, signal, SMA_20, SMA_50 (incrementales si closes sale del historial)"""
+        
+        if self._indicators is None:
+            if self.market_data.get("closes_from_history"):
+                self._indicators = self._pipeline.indicators.compute(self.price)
+            else:
+                self._indicators = window_indicators(self.market_data["closes"], self.price)
+        return self._indicators
+    
+    @property
+    def full_indicators(self) -> Dict:
+        """Todos los indicadores (incluye MFI y VPVR) para features extendidas"""
+        
+        if self._full_indicators is None:
+            self._full_indicators = self.env.calculate_technical_indicators(self.market_data)
+        return self._full_indicators
+
+
+StateFeature = Callable[[FeatureContext], float]
+
+
+def _scaled_by_max_price(value: float, ctx: FeatureContext) -> float:
+    return value / ctx.max_price if ctx.max_price > 0 else 1.0
+
+
+# Estado de 10 dimensiones de la AI 3 (orden = índice en el vector)
+DEFAULT_STATE_FEATURES: List[Tuple[str, StateFeature]] = [
+    ("price_norm", lambda ctx: _scaled_by_max_price(ctx.price, ctx)),
+    ("volume_norm", lambda ctx: ctx.volume / ctx.max_volume if ctx.max_volume > 0 else 1.0),
+    ("rsi", lambda ctx: ctx.indicators["rsi"] / 100.0),
+    ("macd", lambda ctx: ctx.indicators["macd"] / 1000.0),
+    ("signal", lambda ctx: ctx.indicators["signal"] / 1000.0),
+    ("sma_20", lambda ctx: _scaled_by_max_price(ctx.indicators["sma_20"], ctx)),
+    ("sma_50", lambda ctx: _scaled_by_max_price(ctx.indicators["sma_50"], ctx)),
+    ("sentiment", lambda ctx: (ctx.sentiment_factor + 1) / 2.0),
+    ("portfolio_norm", lambda ctx: ctx.env.portfolio_value / TRADING_CONFIG["initial_capital"]),
+    ("position", lambda ctx: 1.0 if ctx.env.current_position > 0 else 0.0),
+]
+
+
+class FeaturePipeline:
+    """
+    Construye el vector de estado de MarketEnvironment sin recalcular desde cero
+    
+    - Normalizadores max/min acumulados (O(1) por step, no max() sobre el historial)
+    - Indicadores incrementales sobre price_history
+    - Estado escrito en un buffer float32 preasignado (se reutiliza cada step)
+    - Feature set declarativo: lista de (nombre, fn(ctx) -> float)
+    
+    USO:
+        pipeline = FeaturePipeline(DEFAULT_STATE_FEATURES + [
+            ("mfi", lambda ctx: ctx.full_indicators["mfi"] / 100.0)
+        ])
+        env = MarketEnvironment(feature_pipeline=pipeline)
+        agent = PPOTradingAgent(state_dim=pipeline.state_dim)
+    """
+    
+    def __init__(self, features: Optional[List[Tuple[str, StateFeature]]] = None, window: int = 100):
+        self.features = list(DEFAULT_STATE_FEATURES if features is None else features)
+        self.price_range = RunningMinMax()
+        self.volume_range = RunningMinMax()
+        self.indicators = IncrementalIndicators(window)
+        self.buffer = np.zeros(len(self.features), dtype=np.float32)
+    
+    @property
+    def state_dim(self) -> int:
+        return len(self.features)
+    
+    @property
+    def feature_names(self) -> List[str]:
+        return [name for name, _ in self.features]
+    
+    def add_feature(self, name: str, fn: StateFeature, index: Optional[int] = None):
+        """Agrega una feature (al final por defecto)"""
+        
+        if name in self.feature_names:
+            raise ValueError(f"Feature duplicada: {name}")
+        self.features.insert(len(self.features) if index is None else index, (name, fn))
+        self.buffer = np.zeros(len(self.features), dtype=np.float32)
+    
+    def reset(self):
+        self.price_range.reset()
+        self.volume_range.reset()
+        self.indicators.reset()
+    
+    def compute(self, env, market_data: Dict, sentiment_factor: float,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Escribe el estado en `out` (o en el buffer interno) y lo retorna"""
+        
+        self.price_range.sync(env.price_history)
+        self.volume_range.sync(env.volume_history)
+        if market_data.get("closes_from_history"):
+            self.indicators.sync(env.price_history)
+        
+        ctx = FeatureContext(self, env, market_data, sentiment_factor)
+        out = self.buffer if out is None else out
+        for i, (_, fn) in enumerate(self.features):
+            out[i] = fn(ctx)
+        return out
 
 # ============================================================================
 # MARKET ENVIRONMENT (Estado & Acciones)
@@ -147,8 +889,15 @@ class MarketEnvironment:
     - 2: Hold (no hacer nada)
     """
     
-    def __init__(self, exchange: str = "binance", symbol: str = "BTCUSDT"):
+    def __init__(self, exchange: str = "binance", symbol: str = "BTCUSDT",
+                 clock: Optional[Clock] = None, feature_pipeline: Optional[FeaturePipeline] = None,
+                 bar_seconds: float = TRADING_CONFIG["update_interval_seconds"]):
         self.exchange = exchange
+        self.clock = clock or SYSTEM_CLOCK
+        # Datos offline (replay / simulados): una vela cada bar_seconds de tiempo de datos
+        self.bar_seconds = bar_seconds
+        self._bar_time: Optional[datetime] = None
+        self.feature_pipeline = feature_pipeline or FeaturePipeline()
         # Ajustar simbolo segun exchange
         if exchange == "coinbase" and symbol == "BTCUSDT":
             self.symbol = "BTC-USD"
@@ -163,14 +912,66 @@ class MarketEnvironment:
         self.portfolio_value = self.cash
         self.peak_value = self.cash
         self.trades_history = []
+        self.position_cost = 0.0  # Costo base de la posición abierta
+        self.pnl_ledger = DailyPnLLedger(self.cash)
+        self.performance = PerformanceMetrics(self.cash)
+        
+        # Modo replay (velas grabadas, ver bind_candles)
+        self.candles: Optional[np.ndarray] = None
+        self.candle_cursor = 0
+        self.replay_seed: Optional[int] = None
+        self.replay_random_start = False
+        self.replay_rng = np.random.default_rng()
         
         # Coinbase API credentials (from environment)
         self.coinbase_api_key = os.getenv("COINBASE_API_KEY", "")
         self.coinbase_api_secret = os.getenv("COINBASE_API_SECRET", "")
         
+    def bind_candles(self, candles, seed: Optional[int] = None, random_start: bool = False):
+        """
+        Modo replay: get_market_data lee velas grabadas (sin red, reproducible)
+        
+        Args:
+            candles: closes (T,) o velas (T, 2) [close, volume]
+            seed: RNG del offset inicial de cada episodio (random_start)
+        """
+        
+        candles = np.asarray(candles, dtype=np.float64)
+        if candles.ndim == 1:
+            candles = np.column_stack([candles, np.ones_like(candles)])
+        self.candles = candles
+        self.replay_seed = seed
+        self.replay_random_start = random_start
+        self.replay_rng = np.random.default_rng(seed)
+        self.candle_cursor = self._replay_start()
+    
+    def _next_bar_timestamp(self) -> datetime:
+        """
+        Timestamp de la próxima vela offline (replay / simulada)
+        
+        Avanza bar_seconds por vela desde clock.now(): el tiempo de los datos
+        no depende de lo rápido que corra el loop. Monótono entre episodios
+        (el detector de régimen ignora ticks fuera de orden) y nunca detrás
+        del clock.
+        """
+        now = self.clock.now()
+        if self._bar_time is None:
+            self._bar_time = now
+        else:
+            self._bar_time = max(now, self._bar_time + timedelta(seconds=self.bar_seconds))
+        return self._bar_time
+    
+    def _replay_start(self) -> int:
+        if self.replay_random_start:
+            return int(self.replay_rng.integers(0, len(self.candles) - 1))
+        return 0
+    
     def get_market_data(self) -> Dict:
         """Obtiene datos del mercado en tiempo real con redundancia de 3 APIs"""
         
+        if self.candles is not None:
+            return self._get_replay_data()
+        
         # INQUEBRANTABLE 4: API Redundancy - Try all 3 sources
         if self.exchange in ["binance", "kraken", "coinbase", "coingecko"]:
             return self._get_market_data_with_redundancy()
@@ -247,6 +1048,8 @@ class MarketEnvironment:
     def _get_binance_data(self) -> Dict:
         """Obtiene datos de Binance API"""
         
+        import requests
+        
         try:
             # Ticker price
             ticker_url = f"{BINANCE_API_URL}/ticker/24hr"
@@ -277,7 +1080,7 @@ class MarketEnvironment:
                 "low_24h": float(data["lowPrice"]),
                 "closes": closes,
                 "volumes": volumes,
-                "timestamp": datetime.now()
+                "timestamp": self.clock.now()
             }
             
         except Exception as e:
@@ -287,6 +1090,8 @@ class MarketEnvironment:
     def _get_kraken_data(self) -> Dict:
         """Obtiene datos de Kraken API"""
         
+        import requests
+        
         try:
             ticker_url = f"{KRAKEN_API_URL}/Ticker"
             params = {"pair": "XBTUSD"}  # BTC/USD
@@ -306,7 +1111,7 @@ class MarketEnvironment:
                 "low_24h": float(result["l"][1]),
                 "closes": [float(result["c"][0])] * 100,  # Simplificado
                 "volumes": [float(result["v"][1])] * 100,
-                "timestamp": datetime.now()
+                "timestamp": self.clock.now()
             }
             
         except Exception as e:
@@ -316,6 +1121,8 @@ class MarketEnvironment:
     def _get_coinbase_data(self) -> Dict:
         """Obtiene datos de Coinbase Exchange API (publica)"""
         
+        import requests
+        
         try:
             # 1. Get current ticker (public endpoint - no auth needed)
             ticker_url = f"{COINBASE_API_URL}/products/{self.symbol}/ticker"
@@ -358,7 +1165,7 @@ class MarketEnvironment:
                 "low_24h": float(stats_data.get("low", current_price * 0.99)),
                 "closes": closes if closes else [current_price],
                 "volumes": volumes if volumes else [0.0],
-                "timestamp": datetime.now()
+                "timestamp": self.clock.now()
             }
             
         except Exception as e:
@@ -368,6 +1175,8 @@ class MarketEnvironment:
     def _get_coingecko_data(self) -> Dict:
         """Obtiene datos de CoinGecko API (publica, sin autenticacion)"""
         
+        import requests
+        
         try:
             # Map symbols to CoinGecko IDs
             symbol_map = {
@@ -434,7 +1243,7 @@ class MarketEnvironment:
                 "low_24h": low_24h,
                 "closes": closes if closes else [current_price],
                 "volumes": volumes if volumes else [0.0],
-                "timestamp": datetime.now()
+                "timestamp": self.clock.now()
             }
             
         except Exception as e:
@@ -463,6 +1272,28 @@ class MarketEnvironment:
             "Content-Type": "application/json"
         }
     
+    def _get_replay_data(self) -> Dict:
+        """Siguiente vela grabada (modo replay)"""
+        
+        if self.candle_cursor >= len(self.candles):
+            raise IndexError("Fin de las velas grabadas (reset() para un nuevo episodio)")
+        
+        price, volume = self.candles[self.candle_cursor]
+        previous = self.candles[self.candle_cursor - 1, 0] if self.candle_cursor > 0 else price
+        self.candle_cursor += 1
+        
+        return {
+            "price": price,
+            "volume_24h": volume,
+            "price_change_24h": (price / previous - 1) * 100,
+            "high_24h": price * 1.01,
+            "low_24h": price * 0.99,
+            "closes": self.price_history[-100:] + [price],
+            "volumes": self.volume_history[-100:] + [volume],
+            "closes_from_history": True,
+            "timestamp": self._next_bar_timestamp()
+        }
+    
     def _get_simulated_data(self) -> Dict:
         """Genera datos simulados para paper trading"""
         
@@ -486,7 +1317,8 @@ class MarketEnvironment:
             "low_24h": new_price * 0.99,
             "closes": self.price_history[-100:] + [new_price],
             "volumes": self.volume_history[-100:] + [volume],
-            "timestamp": datetime.now()
+            "closes_from_history": True,  # closes = price_history: indicadores incrementales
+            "timestamp": self._next_bar_timestamp()
         }
     
     def calculate_technical_indicators(self, market_data: Dict) -> Dict:
@@ -823,39 +1655,12 @@ class MarketEnvironment:
         [7] Sentiment Factor (-1 a +1)
         [8] Portfolio Value normalizado
         [9] Current Position (0=sin posición, 1=long)
-        """
         
-        indicators = self.calculate_technical_indicators(market_data)
-        
-        # Normalizar precio (por máximo histórico)
-        max_price = max(self.price_history) if self.price_history else market_data["price"]
-        price_norm = market_data["price"] / max_price if max_price > 0 else 1.0
-        
-        # Normalizar volumen
-        max_volume = max(self.volume_history) if self.volume_history else market_data["volume_24h"]
-        volume_norm = market_data["volume_24h"] / max_volume if max_volume > 0 else 1.0
-        
-        # Portfolio value normalizado
-        initial_capital = TRADING_CONFIG["initial_capital"]
-        portfolio_norm = self.portfolio_value / initial_capital
-        
-        # Position: 0 si no hay posición, 1 si long
-        position_indicator = 1.0 if self.current_position > 0 else 0.0
-        
-        state = np.array([
-            price_norm,
-            volume_norm,
-            indicators["rsi"] / 100.0,  # Normalizar a 0-1
-            indicators["macd"] / 1000.0,  # Escalar
-            indicators["signal"] / 1000.0,
-            indicators["sma_20"] / max_price if max_price > 0 else 1.0,
-            indicators["sma_50"] / max_price if max_price > 0 else 1.0,
-            (sentiment_factor + 1) / 2.0,  # Convertir -1,+1 a 0-1
-            portfolio_norm,
-            position_indicator
-        ], dtype=np.float32)
+        Features declaradas en self.feature_pipeline. El array retornado es el
+        buffer preasignado del pipeline: copiar si se guarda entre steps.
+        """
         
-        return state
+        return self.feature_pipeline.compute(self, market_data, sentiment_factor)
     
     def execute_action(self, action: int, market_data: Dict) -> Tuple[float, bool]:
         """
@@ -873,6 +1678,7 @@ class MarketEnvironment:
         
         price = market_data["price"]
         fee_rate = TRADING_CONFIG["trading_fee_percent"] / 100.0
+        timestamp = market_data.get("timestamp") or self.clock.now()
         
         portfolio_before = self.portfolio_value
         
@@ -886,41 +1692,32 @@ class MarketEnvironment:
                 
                 self.current_position += btc_bought
                 self.cash -= buy_amount
+                self.position_cost += buy_amount
                 
                 self.trades_history.append({
-                    "timestamp": datetime.now(),
+                    "timestamp": timestamp,
                     "action": "BUY",
                     "price": price,
                     "amount": btc_bought,
                     "cost": buy_amount,
                     "fee": fee
                 })
+                self.pnl_ledger.record_fill(timestamp, fee)
         
         elif action == 1:  # SELL
             if self.current_position > 0:
                 # Vender toda la posición
-                sell_value = self.current_position * price
-                fee = sell_value * fee_rate
-                proceeds = sell_value - fee
-                
-                self.cash += proceeds
-                
-                self.trades_history.append({
-                    "timestamp": datetime.now(),
-                    "action": "SELL",
-                    "price": price,
-                    "amount": self.current_position,
-                    "proceeds": proceeds,
-                    "fee": fee
-                })
-                
-                self.current_position = 0.0
+                self._sell_position(price, timestamp)
         
         # action == 2: HOLD (no hacer nada)
         
         # Actualizar portfolio value
         self.portfolio_value = self.cash + (self.current_position * price)
         
+        # Mark-to-market en el ledger diario y métricas de performance
+        self.pnl_ledger.mark(timestamp, self.portfolio_value)
+        self.performance.update(self.portfolio_value)
+        
         # Actualizar peak
         if self.portfolio_value > self.peak_value:
             self.peak_value = self.portfolio_value
@@ -948,6 +1745,57 @@ class MarketEnvironment:
         
         return reward, done
     
+    def _sell_position(self, price: float, timestamp: datetime) -> Dict:
+        """Fill de venta de toda la posición: cash, historial, ledger y métricas"""
+        
+        sell_value = self.current_position * price
+        fee = sell_value * (TRADING_CONFIG["trading_fee_percent"] / 100.0)
+        proceeds = sell_value - fee
+        realized_pnl = proceeds - self.position_cost
+        
+        self.cash += proceeds
+        
+        trade = {
+            "timestamp": timestamp,
+            "action": "SELL",
+            "price": price,
+            "amount": self.current_position,
+            "proceeds": proceeds,
+            "fee": fee,
+            "profit": realized_pnl
+        }
+        self.trades_history.append(trade)
+        self.pnl_ledger.record_fill(timestamp, fee, realized_pnl)
+        self.performance.record_trade(realized_pnl)
+        
+        self.current_position = 0.0
+        self.position_cost = 0.0
+        return trade
+    
+    def liquidate(self, price: Optional[float] = None) -> Optional[Dict]:
+        """
+        Vende toda la posición fuera del step (liquidación del Kill Switch)
+        
+        Mismo fill que la acción SELL de execute_action + mark-to-market del
+        ledger diario, con el último precio y timestamp del episodio (replay
+        incluido). No cuenta como step de PerformanceMetrics.
+        
+        Returns: el trade ejecutado o None si no había posición
+        """
+        
+        if self.current_position <= 0:
+            return None
+        if price is None:
+            if not self.price_history:
+                return None
+            price = self.price_history[-1]
+        timestamp = self.pnl_ledger.last_timestamp or self.clock.now()
+        
+        trade = self._sell_position(price, timestamp)
+        self.portfolio_value = self.cash
+        self.pnl_ledger.mark(timestamp, self.portfolio_value)
+        return trade
+    
     def reset(self):
         """Resetea el entorno para nuevo episodio"""
         self.current_position = 0.0
@@ -957,26 +1805,287 @@ class MarketEnvironment:
         self.trades_history = []
         self.price_history = []
         self.volume_history = []
+        self.feature_pipeline.reset()
+        if self.candles is not None:
+            self.candle_cursor = self._replay_start()
+        self.position_cost = 0.0
+        self.pnl_ledger = DailyPnLLedger(self.cash)
+        self.performance = PerformanceMetrics(self.cash)
     
     def get_daily_pnl(self) -> float:
-        """Calcula P&L del día actual"""
-        today_trades = [t for t in self.trades_history 
-                       if t["timestamp"].date() == datetime.now().date()]
-        
-        if not today_trades:
-            return 0.0
-        
-        # Calcular valor inicial del día (antes del primer trade)
-        initial_value_today = TRADING_CONFIG["initial_capital"]
-        
-        # Si hay trades, calcular el P&L real basado en cambio de portfolio
-        # P&L = portfolio_actual - portfolio_inicial_del_dia
-        daily_pnl = self.portfolio_value - initial_value_today
-        
-        return daily_pnl
+        """Calcula P&L del día actual (vs equity al inicio del día, O(1))"""
+        return self.pnl_ledger.daily_pnl(self.portfolio_value)
 
 # ============================================================================
-# AI 1: RISK MANAGER (Autonomía)
+# VECTORIZED MARKET ENVIRONMENT (N simulaciones en lockstep)
+# ============================================================================
+
+class VectorizedMarketEnv:
+    """
+    N MarketEnvironment independientes avanzando en lockstep (entrenamiento offline)
+    
+    - Estados apilados en un array (N, state_dim): mismas 10 features que
+      MarketEnvironment.get_state, calculadas con operaciones vectorizadas
+    - Datos: random walk simulado (igual que paper trading) o velas históricas
+      (cada env arranca en un offset aleatorio)
+    - Auto-reset: los envs que terminan (MDD, capital agotado, fin de datos o
+      max_episode_steps) se reinician en el mismo step
+    - Sin sleeps ni red: millones de transiciones en minutos
+    
+    No registra trades_history/ledger/métricas por env: está pensado para
+    recolectar transiciones PPO, no para reporting.
+    """
+    
+    WINDOW = 100  # Igual que closes = price_history[-100:] + [precio actual]
+    
+    def __init__(self, num_envs: int = 64, candles: Optional[np.ndarray] = None,
+                 max_episode_steps: int = 1000, sentiment=0.0, seed: Optional[int] = None,
+                 random_start: bool = True):
+        self.num_envs = num_envs
+        self.state_dim = PPO_CONFIG["state_dim"]
+        self.max_episode_steps = max_episode_steps
+        self.random_start = random_start
+        self.rng = np.random.default_rng(seed)
+        
+        self.initial_capital = TRADING_CONFIG["initial_capital"]
+        self.fee_rate = TRADING_CONFIG["trading_fee_percent"] / 100.0
+        self.position_size = TRADING_CONFIG["position_size_percent"]
+        
+        # Velas históricas: (T,) closes o (T, 2) closes + volúmenes
+        if candles is not None:
+            candles = np.asarray(candles, dtype=np.float64)
+            if candles.ndim == 1:
+                candles = np.column_stack([candles, np.ones_like(candles)])
+            if len(candles) < 2:
+                raise ValueError("Se necesitan al menos 2 velas")
+        self.candles = candles
+        
+        # Sentiment por env (-1 a +1)
+        self.sentiment = np.broadcast_to(np.asarray(sentiment, dtype=np.float64), (num_envs,)).copy()
+        
+        # Historial de precios ejecutados (alineado a la derecha) y tick actual
+        self.history = np.zeros((num_envs, self.WINDOW))
+        self.hist_len = np.zeros(num_envs, dtype=np.int64)
+        self.max_price = np.zeros(num_envs)
+        self.max_volume = np.zeros(num_envs)
+        self.price = np.zeros(num_envs)
+        self.volume = np.zeros(num_envs)
+        self.cursor = np.zeros(num_envs, dtype=np.int64)
+        
+        # Portfolio por env
+        self.cash = np.zeros(num_envs)
+        self.position = np.zeros(num_envs)
+        self.portfolio_value = np.zeros(num_envs)
+        self.peak_value = np.zeros(num_envs)
+        self.position_cost = np.zeros(num_envs)  # Costo base de la posición abierta
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self.total_steps = 0
+        self.episodes_completed = 0
+        self.rollout_buffer: Optional[RolloutBuffer] = None
+        
+        # Pesos EMA precalculados por longitud de ventana (EMA desde closes[0])
+        self._ema_12 = self._ema_weight_table(12, self.WINDOW + 1)
+        self._ema_26 = self._ema_weight_table(26, self.WINDOW + 1)
+        
+        self.states = self.reset()
+    
+    @staticmethod
+    def _ema_weight_table(period: int, size: int) -> np.ndarray:
+        """table[L-1] = pesos de la EMA sobre los últimos L valores de la ventana"""
+        
+        multiplier = 2 / (period + 1)
+        table = np.zeros((size, size))
+        for length in range(1, size + 1):
+            weights = multiplier * (1 - multiplier) ** np.arange(length - 1, -1, -1, dtype=np.float64)
+            weights[0] = (1 - multiplier) ** (length - 1)
+            table[length - 1, size - length:] = weights
+        return table
+    
+    def reset(self) -> np.ndarray:
+        """Resetea todos los envs y retorna estados (N, state_dim)"""
+        
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        self._next_tick()
+        self.states = self._observe()
+        return self.states
+    
+    def _reset_envs(self, mask: np.ndarray):
+        self.cash[mask] = self.initial_capital
+        self.position[mask] = 0.0
+        self.portfolio_value[mask] = self.initial_capital
+        self.peak_value[mask] = self.initial_capital
+        self.position_cost[mask] = 0.0
+        self.history[mask] = 0.0
+        self.hist_len[mask] = 0
+        self.max_price[mask] = 0.0
+        self.max_volume[mask] = 0.0
+        self.episode_steps[mask] = 0
+        
+        if self.candles is not None:
+            if self.random_start:
+                self.cursor[mask] = self.rng.integers(0, len(self.candles) - 1, size=int(mask.sum()))
+            else:
+                self.cursor[mask] = 0
+    
+    def _next_tick(self):
+        """Nuevo precio/volumen para todos los envs"""
+        
+        if self.candles is not None:
+            self.price = self.candles[self.cursor, 0].copy()
+            self.volume = self.candles[self.cursor, 1].copy()
+            self.cursor += 1
+        else:
+            # Random walk: ±2% por step (igual que _get_simulated_data)
+            base = np.where(self.hist_len > 0, self.history[:, -1], 50000.0)
+            self.price = base * (1 + self.rng.normal(0, 0.02, self.num_envs))
+            self.volume = self.rng.uniform(1000, 5000, self.num_envs)
+    
+    def _observe(self) -> np.ndarray:
+        """Estados (N, 10) equivalentes a MarketEnvironment.get_state"""
+        
+        price = self.price
+        window = np.concatenate([self.history, price[:, None]], axis=1)
+        length = np.minimum(self.hist_len, self.WINDOW) + 1
+        enough = length >= 50
+        
+        # RSI (últimos 14 deltas)
+        deltas = np.diff(window[:, -15:], axis=1)
+        avg_gain = np.where(deltas > 0, deltas, 0).mean(axis=1)
+        avg_loss = np.where(deltas < 0, -deltas, 0).mean(axis=1)
+        rs = np.divide(avg_gain, avg_loss, out=np.zeros_like(avg_gain), where=avg_loss > 0)
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + rs))
+        
+        # MACD (EMA 12 - EMA 26) y signal aproximada
+        ema_12 = np.einsum("nw,nw->n", self._ema_12[length - 1], window)
+        ema_26 = np.einsum("nw,nw->n", self._ema_26[length - 1], window)
+        macd = ema_12 - ema_26
+        
+        rsi = np.where(enough, rsi, 50.0)
+        macd = np.where(enough, macd, 0.0)
+        signal = macd * 0.9
+        sma_20 = np.where(enough, window[:, -20:].mean(axis=1), price)
+        sma_50 = np.where(enough, window[:, -50:].mean(axis=1), price)
+        
+        max_price = np.where(self.hist_len > 0, self.max_price, price)
+        max_volume = np.where(self.hist_len > 0, self.max_volume, self.volume)
+        safe_price = np.where(max_price > 0, max_price, 1.0)
+        safe_volume = np.where(max_volume > 0, max_volume, 1.0)
+        
+        states = np.empty((self.num_envs, self.state_dim), dtype=np.float32)
+        states[:, 0] = np.where(max_price > 0, price / safe_price, 1.0)
+        states[:, 1] = np.where(max_volume > 0, self.volume / safe_volume, 1.0)
+        states[:, 2] = rsi / 100.0
+        states[:, 3] = macd / 1000.0
+        states[:, 4] = signal / 1000.0
+        states[:, 5] = np.where(max_price > 0, sma_20 / safe_price, 1.0)
+        states[:, 6] = np.where(max_price > 0, sma_50 / safe_price, 1.0)
+        states[:, 7] = (self.sentiment + 1) / 2.0
+        states[:, 8] = self.portfolio_value / self.initial_capital
+        states[:, 9] = (self.position > 0).astype(np.float32)
+        
+        return states
+    
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ejecuta una acción por env al precio del tick actual
+        
+        Returns:
+            (next_states (N, state_dim), rewards (N,), dones (N,))
+        """
+        
+        actions = np.asarray(actions)
+        price = self.price
+        portfolio_before = self.portfolio_value
+        
+        # BUY: % del cash disponible
+        buy = (actions == 0) & (self.cash > 0)
+        buy_amount = np.where(buy, self.cash * self.position_size, 0.0)
+        self.position = self.position + (buy_amount - buy_amount * self.fee_rate) / price
+        self.cash = self.cash - buy_amount
+        self.position_cost = self.position_cost + buy_amount
+        
+        # SELL: toda la posición
+        sell = (actions == 1) & (self.position > 0)
+        proceeds = self.position * price * (1 - self.fee_rate)
+        self.cash = np.where(sell, self.cash + proceeds, self.cash)
+        self.position = np.where(sell, 0.0, self.position)
+        
+        # Trades cerrados en este step (P&L realizado, para win rate)
+        self.step_closed = sell
+        self.step_realized_pnl = np.where(sell, proceeds - self.position_cost, 0.0)
+        self.position_cost = np.where(sell, 0.0, self.position_cost)
+        
+        self.portfolio_value = self.cash + self.position * price
+        self.peak_value = np.maximum(self.peak_value, self.portfolio_value)
+        rewards = self.portfolio_value - portfolio_before
+        
+        # Terminación (mismas reglas que MarketEnvironment.execute_action)
+        drawdown = (self.peak_value - self.portfolio_value) / self.peak_value
+        mdd_hit = drawdown >= RISK_CONFIG["max_drawdown_threshold"]
+        broke = self.portfolio_value < self.initial_capital * 0.1
+        rewards = rewards - 1000.0 * mdd_hit - 500.0 * broke
+        
+        # Actualizar historial
+        self.history[:, :-1] = self.history[:, 1:]
+        self.history[:, -1] = price
+        self.hist_len += 1
+        self.max_price = np.maximum(self.max_price, price)
+        self.max_volume = np.maximum(self.max_volume, self.volume)
+        self.episode_steps += 1
+        self.total_steps += self.num_envs
+        
+        dones = mdd_hit | broke | (self.episode_steps >= self.max_episode_steps)
+        if self.candles is not None:
+            dones |= self.cursor >= len(self.candles)
+        
+        # Portfolio al cierre del step (antes del auto-reset) para backtests
+        self.step_portfolio_value = self.portfolio_value.copy()
+        
+        if dones.any():
+            self.episodes_completed += int(dones.sum())
+            self._reset_envs(dones)
+        
+        self._next_tick()
+        self.states = self._observe()
+        
+        return self.states, rewards, dones
+    
+    def collect_rollout(self, agent, num_steps: int) -> Dict:
+        """
+        Recolecta num_steps transiciones de cada env (layout (T, N))
+        
+        Returns:
+            dict con states, actions, rewards, log_probs, values, dones y
+            last_values (bootstrap) listo para PPOTradingAgent.train_rollout.
+            Los arrays son vistas de un RolloutBuffer reutilizado: válidos
+            hasta el siguiente collect_rollout.
+        """
+        
+        # Buffer preasignado reutilizado entre rollouts
+        if self.rollout_buffer is None or self.rollout_buffer.capacity != num_steps:
+            self.rollout_buffer = RolloutBuffer(capacity=num_steps, state_dim=self.state_dim,
+                                                num_envs=self.num_envs, overflow="error")
+        buffer = self.rollout_buffer
+        buffer.clear()
+        
+        for _ in range(num_steps):
+            states = self.states
+            actions, log_probs, values = agent.act(states, self.sentiment)
+            _, rewards, dones = self.step(actions)
+            buffer.add(states, actions, rewards, log_probs, values, dones)
+        
+        return {
+            "states": buffer.states,
+            "actions": buffer.actions,
+            "rewards": buffer.rewards,
+            "log_probs": buffer.log_probs,
+            "values": buffer.values,
+            "dones": buffer.dones,
+            "last_values": agent.get_value(self.states)
+        }
+
+# ============================================================================
+# AI 1: RISK MANAGER (Autonomía)
 # ============================================================================
 
 class RiskManager:
@@ -999,7 +2108,9 @@ class RiskManager:
     - Protección contra crashes, flash crashes, eventos extremos
     """
     
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None, regime_detector: Optional["RegimeDetector"] = None):
+        self.clock = clock or SYSTEM_CLOCK
+        self.regime_detector = regime_detector  # INQUEBRANTABLE 2: sizing según régimen (opcional)
         self.kill_switch_active = False
         self.circuit_breaker_until = None  # Timestamp de reactivación
         self.daily_losses = []
@@ -1070,13 +2181,14 @@ class RiskManager:
             print("="*70 + "\n")
             
             # Activar freeze de 24 horas
-            self.black_swan_freeze_until = datetime.now() + timedelta(hours=24)
+            self.black_swan_freeze_until = self.clock.now() + timedelta(hours=24)
             self.kill_switch_active = True
             
             # Registrar evento
             event = {
-                "timestamp": datetime.now(),
+                "timestamp": self.clock.now(),
                 "trigger": "BLACK_SWAN",
+                "trigger_value": current_volatility / self.historical_volatility_avg,
                 "volatility_ratio": current_volatility / self.historical_volatility_avg,
                 "current_volatility": current_volatility,
                 "freeze_duration_hours": 24,
@@ -1100,12 +2212,13 @@ class RiskManager:
                 print("FREEZE ACTIVATED - 24 hour trading pause")
                 print("="*70 + "\n")
                 
-                self.black_swan_freeze_until = datetime.now() + timedelta(hours=24)
+                self.black_swan_freeze_until = self.clock.now() + timedelta(hours=24)
                 self.kill_switch_active = True
                 
                 event = {
-                    "timestamp": datetime.now(),
+                    "timestamp": self.clock.now(),
                     "trigger": "FLASH_CRASH",
+                    "trigger_value": change_1h,
                     "1h_change": change_1h,
                     "freeze_duration_hours": 24,
                     "freeze_until": self.black_swan_freeze_until
@@ -1122,9 +2235,10 @@ class RiskManager:
         """
         
         # INQUEBRANTABLE 5: Check Black Swan Freeze
+        now = self.clock.now()
         if self.black_swan_freeze_until:
-            if datetime.now() < self.black_swan_freeze_until:
-                time_remaining = (self.black_swan_freeze_until - datetime.now()).total_seconds()
+            if now < self.black_swan_freeze_until:
+                time_remaining = (self.black_swan_freeze_until - now).total_seconds()
                 hours_remaining = time_remaining / 3600
                 return {
                     "diagnosis": "BLACK_SWAN_FREEZE",
@@ -1153,8 +2267,8 @@ class RiskManager:
         
         # Check Circuit Breaker
         if self.circuit_breaker_until:
-            if datetime.now() < self.circuit_breaker_until:
-                time_remaining = (self.circuit_breaker_until - datetime.now()).total_seconds()
+            if now < self.circuit_breaker_until:
+                time_remaining = (self.circuit_breaker_until - now).total_seconds()
                 return {
                     "diagnosis": "CIRCUIT_BREAKER",
                     "message": f"Circuit Breaker active - {time_remaining:.0f}s remaining",
@@ -1173,7 +2287,7 @@ class RiskManager:
         # Calcular Maximum Drawdown
         current_drawdown = (env.peak_value - env.portfolio_value) / env.peak_value
         self.drawdown_history.append({
-            "timestamp": datetime.now(),
+            "timestamp": now,
             "drawdown": current_drawdown,
             "portfolio_value": env.portfolio_value,
             "peak_value": env.peak_value
@@ -1206,12 +2320,13 @@ class RiskManager:
         else:
             self.current_risk_level = "OK"
         
-        # Check daily loss limit
-        if len(env.trades_history) > 0:
+        # Check daily loss limit (ledger incremental, O(1)). Si el MDD ya disparó
+        # el Kill Switch (y liquidó), no re-etiquetar el diagnóstico
+        if diagnosis not in ("EMERGENCY", "CRITICAL") and len(env.trades_history) > 0:
             daily_pnl = env.get_daily_pnl()
             
             if daily_pnl < 0:
-                daily_loss_percent = abs(daily_pnl) / TRADING_CONFIG["initial_capital"]
+                daily_loss_percent = env.pnl_ledger.daily_loss_fraction(env.portfolio_value)
                 
                 if daily_loss_percent >= RISK_CONFIG["daily_loss_limit"]:
                     diagnosis = "CRITICAL"
@@ -1251,11 +2366,11 @@ class RiskManager:
             
             # Activar Circuit Breaker
             cooldown = RISK_CONFIG["circuit_breaker_cooldown"]
-            self.circuit_breaker_until = datetime.now() + timedelta(seconds=cooldown)
+            self.circuit_breaker_until = self.clock.now() + timedelta(seconds=cooldown)
             
             # Registrar evento
             event = {
-                "timestamp": datetime.now(),
+                "timestamp": self.clock.now(),
                 "trigger": level,
                 "trigger_value": trigger_value,
                 "portfolio_value": env.portfolio_value,
@@ -1279,17 +2394,11 @@ class RiskManager:
             print(f"Circuit Breaker: {cooldown}s ({cooldown//60} minutes)")
             print("="*70)
             
-            # Liquidar posición si existe
-            if env.current_position > 0 and len(env.price_history) > 0:
-                current_price = env.price_history[-1]
-                proceeds = env.current_position * current_price
-                fee = proceeds * (TRADING_CONFIG["trading_fee_percent"] / 100)
-                env.cash += (proceeds - fee)
-                
-                print(f"[-] EMERGENCY LIQUIDATION: Sold {env.current_position:.6f} BTC at ${current_price:.2f}")
-                print(f"[CASH] Proceeds: ${proceeds:.2f} - Fee: ${fee:.2f}")
-                
-                env.current_position = 0.0
+            # Liquidar posición si existe (mismo fill + ledger que un SELL)
+            trade = env.liquidate()
+            if trade is not None:
+                print(f"[-] EMERGENCY LIQUIDATION: Sold {trade['amount']:.6f} BTC at ${trade['price']:.2f}")
+                print(f"[CASH] Proceeds: ${trade['proceeds'] + trade['fee']:.2f} - Fee: ${trade['fee']:.2f}")
             
             # Guardar evento para AI 4
             self._save_kill_switch_event(event)
@@ -1297,6 +2406,7 @@ class RiskManager:
     def _save_kill_switch_event(self, event: Dict):
         """Guarda evento de Kill Switch para análisis posterior"""
         
+        os.makedirs(DATA_DIR, exist_ok=True)
         events_file = os.path.join(DATA_DIR, "kill_switch_events.json")
         
         if os.path.exists(events_file):
@@ -1325,7 +2435,7 @@ class RiskManager:
         
         # Circuit Breaker - BLOQUEA TODO
         if self.circuit_breaker_until:
-            if datetime.now() < self.circuit_breaker_until:
+            if self.clock.now() < self.circuit_breaker_until:
                 return False
             else:
                 # Circuit breaker expirado, desactivar
@@ -1354,42 +2464,746 @@ class RiskManager:
             if self.current_risk_level == "WARNING":
                 max_position = max_position / 2
             
+            # INQUEBRANTABLE 2: Ajuste por régimen (lectura cacheada del detector).
+            # Solo puede ajustar el cap hacia abajo: trending_up (1.2x) no lo afloja
+            if self.regime_detector is not None:
+                max_position *= min(1.0, AutoEvolver.regime_adjustment(self.regime_detector.regime)["position_size"])
+            
             if position_value / env.portfolio_value > max_position:
                 return False
         
         return True
     
     def calculate_sharpe_ratio(self, env: MarketEnvironment) -> float:
-        """Calcula Sharpe Ratio del portfolio"""
+        """Calcula Sharpe Ratio del portfolio (motor incremental, O(1))"""
         
         if len(env.trades_history) < 2:
             return 0.0
         
-        # Calcular returns diarios
-        returns = []
-        portfolio_values = [TRADING_CONFIG["initial_capital"]]
+        return env.performance.sharpe_ratio()
+
+# ============================================================================
+# KEYWORD MATCHER (Lexicon compilado a tabla hash de palabras)
+# ============================================================================
+
+class KeywordMatcher:
+    """
+    Matcher multi-keyword compilado una sola vez (palabras completas)
+    
+    ARQUITECTURA:
+    - Compilación: cada keyword + sus inflexiones listadas (opt-in, ver
+      SENTIMENT_INFLECTIONS) en una tabla hash forma → keyword ("high" no
+      coincide con "highlight"; "highs" solo si está listada)
+    - score(): los textos se unen en un solo buffer de bytes, se tokenizan
+      con translate + split (C) y cada token se resuelve con un lookup O(1):
+      costo O(largo del texto), independiente del tamaño del lexicon
+    - Cada keyword suma su peso una vez por texto (presencia); hits cuenta
+      todas las ocurrencias
+    """
+    
+    INFLECTIONS_KEY = "_inflections"  # Clave opcional del lexicon JSON: {keyword: [formas]}
+    _SEPARATOR = b"\xff"  # Byte inválido en UTF-8: nunca aparece dentro de un texto
+    _SEPARATOR_ID = -2
+    # Bytes ASCII que no son [a-z0-9_] → espacio (bytes >= 128 son parte de palabras)
+    _TOKEN_TABLE = bytes(c if c >= 128 or chr(c).isalnum() or c == ord("_") else 32 for c in range(256))
+    
+    def __init__(self, lexicon: Dict[str, Dict[str, float]],
+                 inflections: Optional[Dict[str, List[str]]] = None):
+        self.categories = list(lexicon)
+        self.keywords: List[str] = []
+        categories, weights = [], []
+        for category_id, category in enumerate(self.categories):
+            for keyword, weight in lexicon[category].items():
+                keyword = keyword.lower().strip()
+                if keyword in self.keywords:
+                    raise ValueError(f"Keyword duplicada en el lexicon: {keyword}")
+                self._check_word(keyword)
+                self.keywords.append(keyword)
+                categories.append(category_id)
+                weights.append(float(weight))
+        
+        self.keyword_category = np.array(categories, dtype=np.int64)
+        self.keyword_weight = np.array(weights, dtype=np.float64)
+        
+        self.forms: Dict[bytes, int] = {self._SEPARATOR: self._SEPARATOR_ID}
+        for keyword_id, keyword in enumerate(self.keywords):
+            self.forms[keyword.encode("utf-8")] = keyword_id
+        for keyword, forms in (inflections or {}).items():
+            keyword = keyword.lower().strip()
+            if keyword not in self.keywords:
+                raise ValueError(f"Inflexiones de una keyword que no está en el lexicon: {keyword!r}")
+            keyword_id = self.keywords.index(keyword)
+            for form in forms:
+                form = form.lower().strip()
+                self._check_word(form)
+                if self.forms.setdefault(form.encode("utf-8"), keyword_id) != keyword_id:
+                    raise ValueError(f"Forma {form!r} ya pertenece a otra keyword")
+    
+    @classmethod
+    def _check_word(cls, word: str):
+        if word.encode("utf-8").translate(cls._TOKEN_TABLE).split() != [word.encode("utf-8")]:
+            raise ValueError(f"Keyword debe ser una sola palabra [a-z0-9_]: {word!r}")
+    
+    @classmethod
+    def from_file(cls, filepath: str) -> "KeywordMatcher":
+        """Carga un lexicon JSON: {categoría: {keyword: peso}, "_inflections": {keyword: [formas]}}"""
+        with open(filepath, "r", encoding="utf-8") as f:
+            lexicon = json.load(f)
+        inflections = lexicon.pop(cls.INFLECTIONS_KEY, None)
+        return cls(lexicon, inflections)
+    
+    def _token_ids(self, texts: List[str]) -> np.ndarray:
+        """Id de keyword por token (-1 = otra palabra, -2 = fin de texto)"""
         
-        for i, trade in enumerate(env.trades_history):
-            if i > 0:
-                prev_val = portfolio_values[-1]
-                # Simplificado: usar portfolio value actual
-                curr_val = env.portfolio_value
-                daily_return = (curr_val - prev_val) / prev_val
-                returns.append(daily_return)
-                portfolio_values.append(curr_val)
-        
-        if len(returns) == 0:
-            return 0.0
+        data = (b" " + self._SEPARATOR + b" ").join([text.lower().encode("utf-8") for text in texts])
+        tokens = data.translate(self._TOKEN_TABLE).split()
+        return np.fromiter(map(self.forms.get, tokens, repeat(-1)), dtype=np.int64, count=len(tokens))
+    
+    def _matches(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(índice de texto, id de keyword) por ocurrencia"""
         
-        returns_array = np.array(returns)
-        excess_returns = returns_array - (RISK_CONFIG["risk_free_rate"] / 252)  # Daily risk-free
+        token_ids = self._token_ids(texts)
+        matched = token_ids >= 0
+        return np.cumsum(token_ids == self._SEPARATOR_ID)[matched], token_ids[matched]
+    
+    def match(self, text: str) -> Dict[str, int]:
+        """Ocurrencias por keyword en un texto"""
+        return self.score([text])["hits"]
+    
+    def score_matrix(self, texts: List[str]) -> np.ndarray:
+        """Scores por texto: (len(texts), len(categories)), mismas reglas que score()"""
         
-        if np.std(excess_returns) == 0:
-            return 0.0
+        text_ids, keyword_ids = self._matches(texts)
+        pairs = np.unique(text_ids * len(self.keywords) + keyword_ids)
+        texts_of, keywords_of = np.divmod(pairs, len(self.keywords))
+        
+        matrix = np.zeros((len(texts), len(self.categories)))
+        np.add.at(matrix, (texts_of, self.keyword_category[keywords_of]), self.keyword_weight[keywords_of])
+        return matrix
+    
+    def score(self, texts: List[str]) -> Dict:
+        """
+        Puntúa un batch de textos
+        
+        Returns:
+            scores: {categoría: suma de pesos (una vez por keyword y texto)}
+            hits: {keyword: ocurrencias} (solo keywords encontradas)
+            texts_matched: textos con al menos una keyword
+        """
+        
+        text_ids, keyword_ids = self._matches(texts)
+        if len(keyword_ids) == 0:
+            return {"scores": {category: 0.0 for category in self.categories}, "hits": {}, "texts_matched": 0}
+        
+        # Presencia (texto, keyword) única → pesos por categoría
+        present = np.unique(text_ids * len(self.keywords) + keyword_ids) % len(self.keywords)
+        scores = np.bincount(self.keyword_category[present], weights=self.keyword_weight[present],
+                             minlength=len(self.categories))
+        counts = np.bincount(keyword_ids, minlength=len(self.keywords))
+        
+        return {
+            "scores": {category: float(scores[i]) for i, category in enumerate(self.categories)},
+            "hits": {self.keywords[i]: int(counts[i]) for i in np.flatnonzero(counts)},
+            "texts_matched": int(len(np.unique(text_ids)))
+        }
+
+
+@lru_cache(maxsize=1)
+def default_keyword_matcher() -> KeywordMatcher:
+    """Matcher del lexicon configurado (archivo o SENTIMENT_LEXICON), compilado una vez"""
+    
+    if SENTIMENT_CONFIG["lexicon_path"]:
+        return KeywordMatcher.from_file(SENTIMENT_CONFIG["lexicon_path"])
+    return KeywordMatcher(SENTIMENT_LEXICON, SENTIMENT_INFLECTIONS)
+
+# ============================================================================
+# ML SENTIMENT SCORER (Clasificador local CPU + batches + cache por hash)
+# ============================================================================
+
+# Clases del modelo → categoría del lexicon (clases no listadas se ignoran, p.ej. "neutral")
+MODEL_LABEL_MAP = {
+    "positive": "positive", "bullish": "positive", "pos": "positive",
+    "negative": "negative", "bearish": "negative", "neg": "negative",
+}
+
+
+class OnnxTextClassifier:
+    """
+    Backend ONNX (onnxruntime, CPU) con la interfaz predict_proba/classes_
+    
+    Espera un pipeline de texto exportado (p.ej. skl2onnx): entrada string
+    [N, 1], salidas (label, probabilidades) como tensor o lista de dicts.
+    """
+    
+    def __init__(self, path: str, classes: Optional[List[str]] = None):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("Modelo ONNX requiere onnxruntime (pip install onnxruntime)") from e
+        
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.classes_ = list(classes) if classes else None
+    
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        outputs = self.session.run(None, {self.input_name: np.array(texts, dtype=object).reshape(-1, 1)})
+        probabilities = outputs[-1]
+        if isinstance(probabilities, list):  # ZipMap: [{clase: prob}]
+            if self.classes_ is None:
+                self.classes_ = list(probabilities[0]) if probabilities else []
+            return np.array([[row[c] for c in self.classes_] for row in probabilities], dtype=np.float64)
+        if self.classes_ is None:
+            raise ValueError("Modelo ONNX sin ZipMap: indicar classes")
+        return np.asarray(probabilities, dtype=np.float64)
+
+
+def _load_text_classifier(path: str):
+    """Carga un clasificador de texto local (una vez, al arrancar)"""
+    
+    if path.endswith(".onnx"):
+        return OnnxTextClassifier(path)
+    if path.endswith(".joblib"):
+        import joblib
+        return joblib.load(path)
+    
+    # Pipeline scikit-learn serializado (vectorizer + clasificador con predict_proba)
+    import pickle
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class ModelSentimentScorer:
+    """
+    Scorer de sentimiento con un clasificador local (misma interfaz que KeywordMatcher:
+    categories + score_matrix)
+    
+    ARQUITECTURA:
+    - Modelo cargado una vez; cualquier objeto con predict_proba(textos) y classes_
+      (pipeline scikit-learn, OnnxTextClassifier)
+    - score_matrix(): cache LRU por hash de contenido; solo los textos no vistos
+      van al modelo, en batches de batch_size (nunca inferencia por artículo)
+    - Columnas: probabilidades del modelo para las categorías que predice
+      (MODEL_LABEL_MAP); el resto (p.ej. volatility) y cualquier fallo del
+      modelo usan el KeywordMatcher (fallback rápido)
+    - Fallback por batch: un batch fallido no descarta los demás; sus filas
+      no se cachean y score_rows() las marca para re-puntuar
+    """
+    
+    def __init__(self, model, fallback: Optional[KeywordMatcher] = None, batch_size: Optional[int] = None,
+                 cache_size: Optional[int] = None, label_map: Optional[Dict[str, str]] = None):
+        self.model = model
+        self.fallback = fallback or default_keyword_matcher()
+        self.categories = self.fallback.categories
+        self.batch_size = batch_size or SENTIMENT_CONFIG["model_batch_size"]
+        self.cache_size = cache_size or SENTIMENT_CONFIG["model_cache_size"]
+        self.label_map = label_map or MODEL_LABEL_MAP
+        
+        self.cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.stats = {"cache_hits": 0, "inferred": 0, "batches": 0, "fallbacks": 0}
+    
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ModelSentimentScorer":
+        return cls(_load_text_classifier(path), **kwargs)
+    
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+    
+    def _column_map(self) -> List[Tuple[int, int]]:
+        """(columna de predict_proba, columna de categoría) para clases mapeables"""
+        
+        columns = []
+        for model_column, label in enumerate(self.model.classes_):
+            category = self.label_map.get(str(label).lower())
+            if category in self.categories:
+                columns.append((model_column, self.categories.index(category)))
+        return columns
+    
+    def _infer(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores de textos no cacheados: keywords + probabilidades del modelo por batch (filas del modelo)"""
+        
+        matrix = self.fallback.score_matrix(texts)
+        from_model = np.zeros(len(texts), dtype=bool)
+        try:
+            columns = self._column_map()
+        except Exception as e:
+            self.stats["fallbacks"] += 1
+            print(f"[WARNING] Sentiment model failed, using keywords: {e}")
+            return matrix, from_model
+        
+        for start in range(0, len(texts), self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            try:
+                probabilities = np.asarray(self.model.predict_proba(texts[batch]))
+            except Exception as e:
+                self.stats["fallbacks"] += 1
+                print(f"[WARNING] Sentiment model failed, using keywords: {e}")
+                continue
+            for model_column, category in columns:
+                matrix[batch, category] = probabilities[:, model_column]
+            from_model[batch] = True
+            self.stats["batches"] += 1
+        
+        self.stats["inferred"] += int(from_model.sum())
+        return matrix, from_model
+    
+    def score_matrix(self, texts: List[str]) -> np.ndarray:
+        """Scores por texto: (len(texts), len(categories))"""
+        return self.score_rows(texts)[0]
+    
+    def score_rows(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores por texto + máscara de filas con fallback a keywords (a re-puntuar)"""
+        
+        digests = [self.text_hash(text) for text in texts]
+        matrix = np.zeros((len(texts), len(self.categories)))
+        fallback = np.zeros(len(texts), dtype=bool)
+        
+        missing: Dict[str, List[int]] = {}
+        for row, digest in enumerate(digests):
+            cached = self.cache.get(digest)
+            if cached is not None:
+                self.cache.move_to_end(digest)
+                matrix[row] = cached
+                self.stats["cache_hits"] += 1
+            else:
+                missing.setdefault(digest, []).append(row)
+        
+        if missing:
+            rows = [positions[0] for positions in missing.values()]
+            scores, from_model = self._infer([texts[row] for row in rows])
+            for (digest, positions), row_scores, ok in zip(missing.items(), scores, from_model):
+                matrix[positions] = row_scores
+                if ok:  # Fallback no se cachea: el modelo reintenta en el próximo tick
+                    self.cache[digest] = row_scores
+                else:
+                    fallback[positions] = True
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        
+        return matrix, fallback
+    
+    def score(self, texts: List[str]) -> Dict:
+        """Puntúa un batch de textos: {scores: {categoría: suma}, texts_matched}"""
         
-        sharpe = np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(252)
+        matrix = self.score_matrix(texts)
+        return {
+            "scores": dict(zip(self.categories, matrix.sum(axis=0).tolist())),
+            "texts_matched": int(np.count_nonzero(matrix.any(axis=1)))
+        }
+
+
+@lru_cache(maxsize=1)
+def default_sentiment_scorer():
+    """Scorer configurado: modelo local si hay model_path, si no el KeywordMatcher"""
+    
+    if SENTIMENT_CONFIG["model_path"]:
+        return ModelSentimentScorer.from_file(SENTIMENT_CONFIG["model_path"])
+    return default_keyword_matcher()
+
+# ============================================================================
+# NEWS INGESTION (Fuentes RSS/JSON + dedup + cache de scores)
+# ============================================================================
+
+def _parse_published(value) -> Optional[float]:
+    """Fecha de publicación (RFC 822, ISO 8601 o epoch) → segundos epoch"""
+    
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    
+    from email.utils import parsedate_to_datetime
+    
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(text).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rss(content: bytes) -> List[Dict]:
+    """Items de un feed RSS 2.0 o Atom → artículos normalizados"""
+    
+    import xml.etree.ElementTree as ET
+    
+    atom = "{http://www.w3.org/2005/Atom}"
+    root = ET.fromstring(content)
+    articles = []
+    
+    for item in root.iter("item"):
+        articles.append({
+            "title": (item.findtext("title") or "").strip(),
+            "description": (item.findtext("description") or "").strip(),
+            "url": (item.findtext("link") or "").strip(),
+            "published": _parse_published(item.findtext("pubDate"))
+        })
+    for entry in root.iter(f"{atom}entry"):
+        link = entry.find(f"{atom}link")
+        articles.append({
+            "title": (entry.findtext(f"{atom}title") or "").strip(),
+            "description": (entry.findtext(f"{atom}summary") or entry.findtext(f"{atom}content") or "").strip(),
+            "url": link.get("href", "") if link is not None else "",
+            "published": _parse_published(entry.findtext(f"{atom}published") or entry.findtext(f"{atom}updated"))
+        })
+    return articles
+
+
+def parse_json_articles(payload) -> List[Dict]:
+    """Lista JSON de artículos (NewsAPI, CryptoCompare, lista plana) → artículos normalizados"""
+    
+    items = payload
+    if isinstance(payload, dict):
+        items = next((payload[key] for key in ("articles", "items", "data", "Data", "results")
+                      if isinstance(payload.get(key), list)), [])
+    
+    articles = []
+    for item in items:
+        articles.append({
+            "title": (item.get("title") or "").strip(),
+            "description": (item.get("description") or item.get("body") or item.get("summary") or "").strip(),
+            "url": item.get("url") or item.get("link") or "",
+            "published": _parse_published(item.get("publishedAt") or item.get("published_on")
+                                          or item.get("published") or item.get("pubDate"))
+        })
+    return articles
+
+
+def parse_articles(content: bytes, fmt: str) -> List[Dict]:
+    return parse_rss(content) if fmt == "rss" else parse_json_articles(json.loads(content))
+
+
+class NewsSource:
+    """Fuente de noticias: fetch() retorna artículos normalizados ([] si no hay cambios)"""
+    
+    name = "news"
+    
+    def fetch(self) -> List[Dict]:
+        raise NotImplementedError
+
+
+class HttpNewsSource(NewsSource):
+    """
+    Feed RSS/JSON por HTTP con GET condicional
+    
+    Guarda ETag / Last-Modified de la última respuesta y los reenvía
+    (If-None-Match / If-Modified-Since): un 304 no descarga ni parsea nada.
+    """
+    
+    def __init__(self, url: str, format: Optional[str] = None, session=None, timeout: float = 5,
+                 headers: Optional[Dict[str, str]] = None, name: Optional[str] = None):
+        self.url = url
+        self.format = format
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.name = name or url
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.not_modified = 0
+    
+    def fetch(self) -> List[Dict]:
+        headers = dict(self.headers)
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self.not_modified += 1
+            return []
+        response.raise_for_status()
+        
+        self.etag = response.headers.get("ETag", self.etag)
+        self.last_modified = response.headers.get("Last-Modified", self.last_modified)
+        
+        fmt = self.format
+        if fmt is None:
+            content_type = response.headers.get("Content-Type", "")
+            fmt = "rss" if "xml" in content_type or "rss" in content_type else "json"
+        return parse_articles(response.content, fmt)
+
+
+class FileNewsSource(NewsSource):
+    """Stand-in local (tests/backtests): mismo parseo, condicional por mtime + tamaño"""
+    
+    def __init__(self, path: str, format: Optional[str] = None, name: Optional[str] = None):
+        self.path = path
+        self.format = format or ("rss" if path.endswith((".xml", ".rss", ".atom")) else "json")
+        self.name = name or os.path.basename(path)
+        self._signature = None
+    
+    def fetch(self) -> List[Dict]:
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return []
+        self._signature = signature
+        
+        with open(self.path, "rb") as f:
+            return parse_articles(f.read(), self.format)
+
+
+class NewsIngestor:
+    """
+    Pipeline de noticias con sentimiento incremental
+    
+    ARQUITECTURA:
+    - poll(): consulta todas las fuentes; dedup por hash de contenido
+      (título + descripción normalizados: la misma nota en dos fuentes cuenta una vez)
+    - Solo los artículos nuevos se puntúan (un batch por tick, con el scorer
+      configurado: keywords o modelo local); el score queda en un cache LRU
+      acotado junto al hash
+    - Filas puntuadas con el fallback de keywords (modelo caído) quedan
+      pendientes: cada poll() las re-puntúa y corrige el agregado con la
+      diferencia (rescored: [(artículo, scores anteriores)])
+    - Agregado con decaimiento exponencial (half-life): cada tick multiplica
+      las sumas por exp(-Δt/τ) y suma los nuevos ponderados por su antigüedad.
+      Costo O(artículos nuevos), sin recomputar el histórico
+    """
+    
+    def __init__(self, sources: List[NewsSource], keyword_matcher: Optional[KeywordMatcher] = None,
+                 clock: Optional[Clock] = None, half_life_hours: Optional[float] = None,
+                 lookback_hours: Optional[float] = None, cache_size: Optional[int] = None, scorer=None):
+        self.sources = list(sources)
+        self.keyword_matcher = keyword_matcher or default_keyword_matcher()
+        self.scorer = scorer or keyword_matcher or default_sentiment_scorer()
+        self.clock = clock or SYSTEM_CLOCK
+        half_life = (half_life_hours or SENTIMENT_CONFIG["news_half_life_hours"]) * 3600.0
+        self.tau = half_life / np.log(2)
+        self.lookback = (lookback_hours or SENTIMENT_CONFIG["lookback_hours"]) * 3600.0
+        self.cache_size = cache_size or SENTIMENT_CONFIG["news_cache_size"]
+        
+        self.score_cache: "OrderedDict[str, Optional[np.ndarray]]" = OrderedDict()
+        self.recent = deque(maxlen=100)  # Últimos artículos puntuados
+        self.pending: "OrderedDict[str, Dict]" = OrderedDict()  # Puntuados con fallback
+        self.rescored: List[Tuple[Dict, np.ndarray]] = []
+        self.weighted_scores = np.zeros(len(self.scorer.categories))
+        self.weight = 0.0  # Número efectivo de artículos (decaído)
+        self.last_update: Optional[float] = None
+        self.stats = {"fetched": 0, "duplicates": 0, "stale": 0, "scored": 0, "rescored": 0, "errors": 0}
+    
+    @staticmethod
+    def content_hash(article: Dict) -> str:
+        text = " ".join(f"{article.get('title', '')} {article.get('description', '')}".lower().split())
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+    
+    def _score(self, articles: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Matriz de scores + filas con fallback (solo scorers con modelo las producen)"""
         
-        return sharpe
+        texts = [f"{article['title']} {article['description']}" for article in articles]
+        if hasattr(self.scorer, "score_rows"):
+            return self.scorer.score_rows(texts)
+        return self.scorer.score_matrix(texts), np.zeros(len(texts), dtype=bool)
+    
+    def _rescore_pending(self, now: float) -> List[Tuple[Dict, np.ndarray]]:
+        """Re-puntúa artículos pendientes; corrige el agregado con (nuevo - anterior) decaído"""
+        
+        for digest, article in list(self.pending.items()):
+            if now - article["published"] > self.lookback:
+                del self.pending[digest]
+        if not self.pending:
+            return []
+        
+        articles = list(self.pending.values())
+        matrix, fallback = self._score(articles)
+        rescored = []
+        for article, scores, still_pending in zip(articles, matrix, fallback):
+            if still_pending:
+                continue
+            previous = np.array([article["scores"][category] for category in self.scorer.categories])
+            self.weighted_scores += np.exp(-(now - article["published"]) / self.tau) * (scores - previous)
+            if article["hash"] in self.score_cache:
+                self.score_cache[article["hash"]] = scores
+            article["scores"] = dict(zip(self.scorer.categories, scores.tolist()))
+            del self.pending[article["hash"]]
+            rescored.append((article, previous))
+        
+        self.stats["rescored"] += len(rescored)
+        return rescored
+    
+    def _remember(self, digest: str, scores: Optional[np.ndarray]):
+        self.score_cache[digest] = scores
+        if len(self.score_cache) > self.cache_size:
+            self.score_cache.popitem(last=False)
+    
+    def _decay_to(self, now: float):
+        if self.last_update is not None and now > self.last_update:
+            factor = np.exp(-(now - self.last_update) / self.tau)
+            self.weighted_scores *= factor
+            self.weight *= factor
+        if self.last_update is None or now > self.last_update:
+            self.last_update = now
+    
+    def poll(self) -> List[Dict]:
+        """Ingresa y puntúa los artículos nuevos; retorna la lista de nuevos"""
+        
+        now = self.clock.now().timestamp()
+        self._decay_to(now)
+        
+        new_articles = []
+        for source in self.sources:
+            try:
+                articles = source.fetch()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[WARNING] News source {source.name} failed: {e}")
+                continue
+            
+            self.stats["fetched"] += len(articles)
+            for article in articles:
+                digest = self.content_hash(article)
+                if digest in self.score_cache:
+                    self.score_cache.move_to_end(digest)
+                    self.stats["duplicates"] += 1
+                    continue
+                
+                published = min(article.get("published") or now, now)
+                if now - published > self.lookback:
+                    self._remember(digest, None)  # Recordado para dedup, sin puntuar
+                    self.stats["stale"] += 1
+                    continue
+                
+                new_articles.append({**article, "published": published, "source": source.name, "hash": digest})
+                self._remember(digest, None)  # Dedup dentro del mismo tick
+        
+        self.rescored = self._rescore_pending(now)
+        if not new_articles:
+            return []
+        
+        matrix, fallback = self._score(new_articles)
+        decay = np.exp(-(now - np.array([article["published"] for article in new_articles])) / self.tau)
+        self.weighted_scores += decay @ matrix
+        self.weight += float(decay.sum())
+        self.stats["scored"] += len(new_articles)
+        
+        for article, scores, pending in zip(new_articles, matrix, fallback):
+            self.score_cache[article["hash"]] = scores
+            article["scores"] = dict(zip(self.scorer.categories, scores.tolist()))
+            self.recent.append(article)
+            if pending:
+                self.pending[article["hash"]] = article
+        
+        return new_articles
+    
+    def aggregate(self) -> Dict:
+        """
+        Score medio por categoría (decaído a la última actualización)
+        
+        active=False si el peso efectivo es menor al de un solo artículo con
+        antigüedad = lookback (sin noticias recientes: sentimiento neutral)
+        """
+        
+        active = self.weight >= np.exp(-self.lookback / self.tau)
+        means = self.weighted_scores / self.weight if self.weight > 0 else self.weighted_scores
+        return {
+            "scores": dict(zip(self.scorer.categories, means.tolist())),
+            "weighted_scores": dict(zip(self.scorer.categories, self.weighted_scores.tolist())),
+            "weight": self.weight,
+            "active": bool(active)
+        }
+
+# ============================================================================
+# SENTIMENT HISTORY (Ring buffer + agregados con decaimiento temporal)
+# ============================================================================
+
+class SentimentHistory:
+    """
+    Historial acotado de análisis de sentimiento con agregados O(1)
+    
+    - Ring buffer (deque maxlen): memoria constante en corridas largas;
+      se comporta como lista para lectura (len, [-1], iteración)
+    - Por cada ventana (half-life en segundos), sumas con decaimiento:
+      S = S * 0.5^(dt/half_life) + x  →  media = S / W
+      para factor, |factor|, P+, P- y conteos por clase de volatilidad
+    - Totales de toda la corrida (count, suma de factor) sin recorrer el buffer
+    """
+    
+    VOLATILITY_CLASSES = ("LOW", "MEDIUM", "HIGH")
+    
+    def __init__(self, maxlen: Optional[int] = None, half_lives: Optional[Dict[str, float]] = None):
+        self.entries = deque(maxlen=maxlen or SENTIMENT_CONFIG["history_size"])
+        self.half_lives = dict(half_lives or SENTIMENT_CONFIG["history_half_lives"])
+        
+        self.count = 0
+        self.factor_sum = 0.0
+        self.last_timestamp: Optional[datetime] = None
+        
+        # Por ventana: [W, factor, |factor|, P+, P-, LOW, MEDIUM, HIGH] (sumas decaídas)
+        self._sums = {name: np.zeros(8) for name in self.half_lives}
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __getitem__(self, index):
+        return self.entries[index]
+    
+    def __iter__(self):
+        return iter(self.entries)
+    
+    def append(self, entry: Dict):
+        """Registra un análisis ({factor, timestamp, P+, P-, volatility, ...})"""
+        
+        timestamp = entry.get("timestamp") or self.last_timestamp
+        dt = 0.0
+        if self.last_timestamp is not None and timestamp is not None:
+            dt = max((timestamp - self.last_timestamp).total_seconds(), 0.0)
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        
+        factor = entry["factor"]
+        sample = np.zeros(8)
+        sample[:5] = (1.0, factor, abs(factor), entry.get("P+", 0.5), entry.get("P-", 0.5))
+        volatility = entry.get("volatility")
+        if volatility in self.VOLATILITY_CLASSES:
+            sample[5 + self.VOLATILITY_CLASSES.index(volatility)] = 1.0
+        
+        for name, half_life in self.half_lives.items():
+            sums = self._sums[name]
+            sums *= 0.5 ** (dt / half_life)
+            sums += sample
+        
+        self.entries.append(entry)
+        self.count += 1
+        self.factor_sum += factor
+    
+    @property
+    def mean_factor(self) -> float:
+        """Media del factor de toda la corrida (no solo del buffer)"""
+        return self.factor_sum / self.count if self.count else 0.0
+    
+    def summary(self, window: Optional[str] = None) -> Dict:
+        """Agregados decaídos de una ventana (default: la más corta)"""
+        
+        if window is None:
+            window = min(self.half_lives, key=self.half_lives.get)
+        sums = self._sums[window]
+        weight = sums[0]
+        if weight <= 0:
+            return {"weight": 0.0, "factor": 0.0, "intensity": 0.0, "P+": 0.5, "P-": 0.5,
+                    "volatility_counts": dict.fromkeys(self.VOLATILITY_CLASSES, 0.0)}
+        
+        return {
+            "weight": float(weight),
+            "factor": float(sums[1] / weight),
+            "intensity": float(sums[2] / weight),
+            "P+": float(sums[3] / weight),
+            "P-": float(sums[4] / weight),
+            "volatility_counts": dict(zip(self.VOLATILITY_CLASSES, sums[5:].tolist()))
+        }
+    
+    def summaries(self) -> Dict[str, Dict]:
+        return {name: self.summary(name) for name in self.half_lives}
+
 
 # ============================================================================
 # AI 2: SENTIMENT ANALYZER (Visión de Futuro)
@@ -1412,9 +3226,21 @@ class SentimentAnalyzer:
     - P+ y P- bajas: Mercado neutral, HOLD
     """
     
-    def __init__(self):
-        self.sentiment_history = []
-        self.news_cache = []
+    def __init__(self, keyword_matcher: Optional[KeywordMatcher] = None,
+                 news_ingestor: Optional[NewsIngestor] = None, clock: Optional[Clock] = None,
+                 scorer=None):
+        self.clock = clock or SYSTEM_CLOCK
+        self.sentiment_history = SentimentHistory()
+        self.keyword_matcher = keyword_matcher or default_keyword_matcher()
+        # Scorer de textos: modelo local (ModelSentimentScorer) o el KeywordMatcher
+        self.scorer = scorer or keyword_matcher or default_sentiment_scorer()
+        
+        # Noticias reales si hay feeds configurados; si no, simulación (_fetch_recent_news)
+        if news_ingestor is None and SENTIMENT_CONFIG["news_feeds"]:
+            news_ingestor = NewsIngestor([HttpNewsSource(**feed) for feed in SENTIMENT_CONFIG["news_feeds"]],
+                                         self.keyword_matcher, scorer=self.scorer)
+        self.news_ingestor = news_ingestor
+        self.news_cache = news_ingestor.recent if news_ingestor else []
     
     def analyze_market_sentiment(self) -> Dict:
         """
@@ -1430,52 +3256,54 @@ class SentimentAnalyzer:
         }
         """
         
-        news_items = self._fetch_recent_news()
-        
-        if not news_items:
-            return {
-                "P+": 0.5,
-                "P-": 0.5,
-                "volatility": "LOW",
-                "confidence": 0.0,
-                "signal_strength": 0.0
-            }
-        
-        # Keywords con pesos
-        positive_keywords = {
-            "bullish": 1.0, "rally": 0.9, "surge": 0.8, "gain": 0.6, 
-            "high": 0.5, "breakthrough": 1.0, "adoption": 0.7, "profit": 0.6
-        }
+        if self.news_ingestor is not None:
+            # Pipeline: solo artículos nuevos se puntúan; agregado con decaimiento temporal
+            new_articles = self.news_ingestor.poll()
+            aggregate = self.news_ingestor.aggregate()
+            if not aggregate["active"]:
+                return self._neutral_sentiment()
+            
+            scores = aggregate["weighted_scores"]
+            total_news = aggregate["weight"]  # Número efectivo de noticias
+            history_extra = {"new_articles": len(new_articles)}
+        else:
+            news_items = self._fetch_recent_news()
+            
+            if not news_items:
+                return self._neutral_sentiment()
+            
+            # Un batch con el scorer (keywords: un pase del lexicon; modelo: cache por hash)
+            matched = self.scorer.score([
+                item.get("title", "") + " " + item.get("description", "") for item in news_items
+            ])
+            scores = matched["scores"]
+            total_news = len(news_items)
+            history_extra = {"keyword_hits": matched["hits"]} if "hits" in matched else {}
         
-        negative_keywords = {
-            "crash": 1.0, "plunge": 0.9, "bearish": 1.0, "fear": 0.7,
-            "drop": 0.6, "panic": 1.0, "loss": 0.5, "ban": 0.8, "hack": 0.9
-        }
+        result = self.confidence_matrix(scores, total_news)
         
-        volatility_keywords = {
-            "volatile": 1.0, "swing": 0.8, "uncertainty": 0.7, 
-            "breaking": 0.9, "alert": 0.6
-        }
+        # Registrar
+        self.sentiment_history.append({
+            "timestamp": self.clock.now(),
+            "factor": result["signal_strength"],
+            "P+": result["P+"],
+            "P-": result["P-"],
+            "volatility": result["volatility"],
+            "positive_signals": scores.get("positive", 0.0),
+            "negative_signals": scores.get("negative", 0.0),
+            "news_count": total_news,
+            **history_extra
+        })
         
-        positive_score = 0.0
-        negative_score = 0.0
-        volatility_score = 0.0
-        total_news = len(news_items)
+        return result
+    
+    @staticmethod
+    def confidence_matrix(scores: Dict[str, float], total_news: float) -> Dict:
+        """Scores por categoría (suma de pesos) + número de noticias → matriz de confianza"""
         
-        for item in news_items:
-            text = (item.get("title", "") + " " + item.get("description", "")).lower()
-            
-            for keyword, weight in positive_keywords.items():
-                if keyword in text:
-                    positive_score += weight
-            
-            for keyword, weight in negative_keywords.items():
-                if keyword in text:
-                    negative_score += weight
-            
-            for keyword, weight in volatility_keywords.items():
-                if keyword in text:
-                    volatility_score += weight
+        positive_score = scores.get("positive", 0.0)
+        negative_score = scores.get("negative", 0.0)
+        volatility_score = scores.get("volatility", 0.0)
         
         # Normalizar scores (0-1)
         max_possible_score = total_news * 1.0  # Max weight
@@ -1501,24 +3329,23 @@ class SentimentAnalyzer:
         else:
             signal_strength = -P_negative * confidence  # Señal bajista
         
-        result = {
+        return {
             "P+": P_positive,
             "P-": P_negative,
             "volatility": volatility,
             "confidence": confidence,
             "signal_strength": signal_strength
         }
-        
-        # Registrar
-        self.sentiment_history.append({
-            "timestamp": datetime.now(),
-            "factor": signal_strength,
-            "positive_signals": positive_score,
-            "negative_signals": negative_score,
-            "news_count": len(news_items)
-        })
-        
-        return result
+    
+    @staticmethod
+    def _neutral_sentiment() -> Dict:
+        return {
+            "P+": 0.5,
+            "P-": 0.5,
+            "volatility": "LOW",
+            "confidence": 0.0,
+            "signal_strength": 0.0
+        }
     
     def _fetch_recent_news(self) -> List[Dict]:
         """Obtiene noticias recientes de crypto"""
@@ -1553,12 +3380,12 @@ class SentimentAnalyzer:
         return simulated_news
     
     def get_volatility_prediction(self) -> str:
-        """Predice volatilidad esperada basado en sentimiento"""
+        """Predice volatilidad esperada basado en sentimiento (intensidad reciente decaída, O(1))"""
         
         if not self.sentiment_history:
             return "MEDIUM"
         
-        recent_sentiment = self.sentiment_history[-1]["factor"]
+        recent_sentiment = self.sentiment_history.summary()["intensity"]
         
         # Sentimiento extremo = alta volatilidad
         if abs(recent_sentiment) > 0.7:
@@ -1568,6 +3395,701 @@ class SentimentAnalyzer:
         else:
             return "LOW"
 
+
+class BackgroundRefresh:
+    """
+    Thread daemon que llama refresh() cada interval segundos (start/stop/running)
+    
+    refresh() publica por asignación de referencia; un error se cuenta
+    (errors) y el thread sigue en el próximo intervalo.
+    """
+    
+    thread_name = "background-refresh"
+    
+    def __init__(self, interval: float):
+        import threading
+        
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional["threading.Thread"] = None
+        self.errors = 0
+    
+    def refresh(self):
+        raise NotImplementedError
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                print(f"[WARNING] Sentiment refresh failed: {e}")
+            self._stop.wait(self.interval)
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Arranca el thread (el primer refresco ocurre de inmediato)"""
+        
+        import threading
+        
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """Detiene el thread (espera a que termine el refresco en curso)"""
+        
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+class SentimentRefresher(BackgroundRefresh):
+    """
+    Refresco de sentimiento en background, desacoplado del tick de trading
+    
+    ARQUITECTURA:
+    - Thread daemon: analyze_market_sentiment() cada refresh_seconds
+      (fetch + scoring de noticias fuera del loop; I/O libera el GIL)
+    - Cada refresco publica un snapshot nuevo (dict que no se muta después)
+      con una sola asignación de referencia: latest() lee sin locks y
+      siempre ve un snapshot completo
+    - age() / snapshot["computed_at"]: el loop decide qué hacer con datos viejos
+    
+    Con SimulatedClock usar refresh() manualmente (el thread espera en tiempo real).
+    """
+    
+    thread_name = "sentiment-refresher"
+    
+    def __init__(self, analyzer: SentimentAnalyzer, interval: Optional[float] = None,
+                 clock: Optional[Clock] = None):
+        super().__init__(interval if interval is not None else SENTIMENT_CONFIG["refresh_seconds"])
+        self.analyzer = analyzer
+        self.clock = clock or SYSTEM_CLOCK
+        
+        # Snapshot inicial neutral (edad infinita hasta el primer refresco)
+        self._snapshot = {"matrix": SentimentAnalyzer._neutral_sentiment(), "computed_at": None, "sequence": 0}
+    
+    def refresh(self) -> Dict:
+        """Calcula y publica un snapshot (lo llama el thread; también usable sincrónicamente)"""
+        
+        matrix = self.analyzer.analyze_market_sentiment()
+        snapshot = {"matrix": matrix, "computed_at": self.clock.now(), "sequence": self._snapshot["sequence"] + 1}
+        self._snapshot = snapshot  # Publicación atómica (asignación de referencia)
+        return snapshot
+    
+    def latest(self) -> Dict:
+        """Último snapshot publicado: {matrix, computed_at, sequence} (no mutar)"""
+        return self._snapshot
+    
+    def age(self, snapshot: Optional[Dict] = None) -> float:
+        """Segundos desde el cálculo del snapshot (inf si nunca se calculó)"""
+        
+        snapshot = snapshot or self._snapshot
+        if snapshot["computed_at"] is None:
+            return float("inf")
+        return (self.clock.now() - snapshot["computed_at"]).total_seconds()
+
+# ============================================================================
+# MULTI-ASSET SENTIMENT (Entidades por activo + matriz de confianza por activo)
+# ============================================================================
+
+def asset_symbol(pair: str) -> str:
+    """Par de trading → símbolo del activo base ("DOGE-USD", "ETH/USDT" → "DOGE", "ETH")"""
+    return pair.replace("/", "-").split("-")[0].upper()
+
+
+class AssetSentimentService(BackgroundRefresh):
+    """
+    Sentimiento por activo sobre un solo pipeline de noticias
+    
+    ARQUITECTURA:
+    - Diccionario de entidades compilado una vez como KeywordMatcher
+      (categoría = activo, keywords = alias): etiquetar un batch de artículos
+      es un solo pase de tokens, igual que el scoring
+    - refresh(): NewsIngestor.poll() puntúa cada artículo nuevo una sola vez;
+      el mismo vector de scores se suma a cada activo mencionado
+      (matriz artículos × activos) con decaimiento half-life del ingestor;
+      artículos re-puntuados por el ingestor corrigen sus activos con la diferencia
+    - Publica {símbolo: matriz de confianza} por asignación de referencia:
+      sentiment(pair) es un lookup O(1) sin re-puntuar, seguro entre threads
+    - start(): refresh() en un thread daemon cada refresh_seconds (fetch de
+      noticias fuera del loop de trading); sin start(), refresh() manual
+    """
+    
+    thread_name = "asset-sentiment"
+    
+    def __init__(self, news_ingestor: NewsIngestor, entities: Optional[Dict[str, List[str]]] = None,
+                 interval: Optional[float] = None):
+        super().__init__(interval if interval is not None else SENTIMENT_CONFIG["refresh_seconds"])
+        self.news_ingestor = news_ingestor
+        entities = entities or ASSET_ENTITIES
+        self.entity_matcher = KeywordMatcher({asset.upper(): dict.fromkeys(aliases, 1.0)
+                                              for asset, aliases in entities.items()})
+        self.assets = self.entity_matcher.categories
+        
+        n_categories = len(news_ingestor.scorer.categories)
+        self.weighted_scores = np.zeros((len(self.assets), n_categories))
+        self.weights = np.zeros(len(self.assets))
+        self.last_update: Optional[float] = None
+        self.mentions = dict.fromkeys(self.assets, 0)
+        
+        self._matrices: Dict[str, Dict] = {}
+    
+    def tag(self, articles: List[Dict]) -> np.ndarray:
+        """Matriz booleana (artículos × activos): activos mencionados por artículo"""
+        return self.entity_matcher.score_matrix(
+            [f"{article.get('title', '')} {article.get('description', '')}" for article in articles]
+        ) > 0
+    
+    def _decay_to(self, now: float):
+        if self.last_update is not None and now > self.last_update:
+            factor = np.exp(-(now - self.last_update) / self.news_ingestor.tau)
+            self.weighted_scores *= factor
+            self.weights *= factor
+        if self.last_update is None or now > self.last_update:
+            self.last_update = now
+    
+    def refresh(self) -> List[Dict]:
+        """Ingresa noticias nuevas, etiqueta activos y publica las matrices; retorna los nuevos"""
+        
+        ingestor = self.news_ingestor
+        new_articles = ingestor.poll()
+        now = ingestor.last_update
+        self._decay_to(now)
+        
+        for article, previous in ingestor.rescored:
+            assets = [self.assets.index(asset) for asset in article.get("assets", [])]
+            scores = np.array([article["scores"][category] for category in ingestor.scorer.categories])
+            self.weighted_scores[assets] += np.exp(-(now - article["published"]) / ingestor.tau) * (scores - previous)
+        
+        if new_articles:
+            tags = self.tag(new_articles)
+            scores = np.array([ingestor.score_cache[article["hash"]] for article in new_articles])
+            decay = np.exp(-(now - np.array([article["published"] for article in new_articles])) / ingestor.tau)
+            self.weighted_scores += tags.T @ (decay[:, None] * scores)
+            self.weights += tags.T @ decay
+            
+            for article, row in zip(new_articles, tags):
+                article["assets"] = [self.assets[i] for i in np.flatnonzero(row)]
+                for asset in article["assets"]:
+                    self.mentions[asset] += 1
+        
+        # Activo sin peso efectivo de al menos un artículo de antigüedad = lookback → neutral
+        threshold = np.exp(-ingestor.lookback / ingestor.tau)
+        categories = ingestor.scorer.categories
+        matrices = {}
+        for i, asset in enumerate(self.assets):
+            if self.weights[i] >= threshold:
+                matrix = SentimentAnalyzer.confidence_matrix(dict(zip(categories, self.weighted_scores[i])),
+                                                             self.weights[i])
+            else:
+                matrix = SentimentAnalyzer._neutral_sentiment()
+            matrix["news_weight"] = float(self.weights[i])
+            matrices[asset] = matrix
+        self._matrices = matrices  # Publicación atómica
+        
+        return new_articles
+    
+    def sentiment(self, pair: str) -> Dict:
+        """Matriz de confianza del activo base del par (neutral si no hay noticias) - O(1)"""
+        
+        matrix = self._matrices.get(asset_symbol(pair))
+        return matrix if matrix is not None else {**SentimentAnalyzer._neutral_sentiment(), "news_weight": 0.0}
+    
+    def matrices(self) -> Dict[str, Dict]:
+        """Último snapshot {símbolo: matriz} (no mutar)"""
+        return self._matrices
+
+
+# ============================================================================
+# GAE VECTORIZADO (Scan inverso tipo lfilter)
+# ============================================================================
+
+def compute_gae(rewards: np.ndarray, values: np.ndarray, last_values=0.0,
+                dones: Optional[np.ndarray] = None, gamma: Optional[float] = None,
+                lam: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generalized Advantage Estimation sin loop Python sobre el tiempo
+    
+    La recurrencia A_t = δ_t + γλ(1 - done_t)·A_{t+1} es un filtro lineal
+    inverso con coeficiente variable. Se resuelve con un scan asociativo
+    (duplicación de pasos): log2(T) operaciones vectorizadas, exacto y estable
+    (los productos de descuento solo decrecen, nunca se divide).
+    
+    Args:
+        rewards, values: (T,) o (N, T) - N rollouts en una sola llamada
+        last_values: V(s_T) para bootstrap, escalar o (N,)
+        dones: (T,) o (N, T); done_t=1 corta el bootstrap y el advantage en t
+    
+    Returns:
+        (returns, advantages) con la misma forma que rewards
+    """
+    
+    gamma = PPO_CONFIG["gamma"] if gamma is None else gamma
+    lam = PPO_CONFIG["gae_lambda"] if lam is None else lam
+    
+    rewards = np.asarray(rewards, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    single = rewards.ndim == 1
+    if single:
+        rewards, values = rewards[None, :], values[None, :]
+        if dones is not None:
+            dones = np.asarray(dones)[None, :]
+    
+    n_envs, horizon = rewards.shape
+    not_done = np.ones_like(rewards) if dones is None else 1.0 - np.asarray(dones, dtype=np.float64)
+    
+    # V(s_{t+1}) con bootstrap al final del rollout
+    next_values = np.empty_like(values)
+    next_values[:, :-1] = values[:, 1:]
+    next_values[:, -1] = np.broadcast_to(np.asarray(last_values, dtype=np.float64), (n_envs,))
+    
+    deltas = rewards + gamma * next_values * not_done - values
+    
+    # Scan inverso: (c_t, a_t) ∘ (c_{t+s}, a_{t+s}) = (c_t·c_{t+s}, a_t + c_t·a_{t+s})
+    advantages = deltas.copy()
+    coef = gamma * lam * not_done
+    shift = 1
+    while shift < horizon:
+        advantages[:, :-shift] += coef[:, :-shift] * advantages[:, shift:]
+        coef[:, :-shift] *= coef[:, shift:]
+        shift *= 2
+    
+    returns = advantages + values
+    
+    if single:
+        return returns[0], advantages[0]
+    return returns, advantages
+
+# ============================================================================
+# ROLLOUT BUFFER (Transiciones PPO preasignadas)
+# ============================================================================
+
+class RolloutBuffer:
+    """
+    Buffer de transiciones PPO con arrays float32 preasignados
+    
+    - Layout (capacity, num_envs, ...): una fila por step, una columna por env
+    - Escritura por índice (sin append ni listas Python)
+    - Lectura con vistas sin copia: buffer.states[:buffer.steps]
+    
+    POLÍTICAS DE OVERFLOW (buffer lleno):
+    - "grow": duplica la capacidad (una realocación amortizada)
+    - "drop_oldest": ring buffer; descarta los steps más antiguos
+    - "error": lanza OverflowError
+    """
+    
+    OVERFLOW_POLICIES = ("grow", "drop_oldest", "error")
+    
+    def __init__(self, capacity: int = 2048, state_dim: int = 10, num_envs: int = 1,
+                 overflow: str = "grow"):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow debe ser uno de {self.OVERFLOW_POLICIES}")
+        
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.num_envs = num_envs
+        self.overflow = overflow
+        self._allocate(capacity)
+        self.clear()
+    
+    def _allocate(self, capacity: int):
+        self._states = np.zeros((capacity, self.num_envs, self.state_dim), dtype=np.float32)
+        self._actions = np.zeros((capacity, self.num_envs), dtype=np.int64)
+        self._rewards = np.zeros((capacity, self.num_envs), dtype=np.float32)
+        self._log_probs = np.zeros((capacity, self.num_envs), dtype=np.float32)
+        self._values = np.zeros((capacity, self.num_envs), dtype=np.float32)
+        self._dones = np.zeros((capacity, self.num_envs), dtype=np.float32)
+    
+    def _fields(self):
+        return (self._states, self._actions, self._rewards, self._log_probs, self._values, self._dones)
+    
+    def clear(self):
+        """Vacía el buffer (sin liberar memoria)"""
+        self.ptr = 0
+        self.steps = 0
+        self.dropped = 0
+    
+    def __len__(self) -> int:
+        """Número de transiciones almacenadas (steps × envs)"""
+        return self.steps * self.num_envs
+    
+    def add(self, state, action, reward, log_prob, value, done=False):
+        """Escribe un step (escalares con num_envs=1, o arrays (num_envs, ...))"""
+        
+        if self.steps == self.capacity:
+            if self.overflow == "error":
+                raise OverflowError(f"RolloutBuffer lleno ({self.capacity} steps)")
+            if self.overflow == "grow":
+                old_fields = self._fields()
+                self._allocate(self.capacity * 2)
+                for new, old in zip(self._fields(), old_fields):
+                    new[:self.capacity] = old
+                self.ptr = self.capacity
+                self.capacity *= 2
+            else:  # drop_oldest
+                self.steps -= 1
+                self.dropped += 1
+        
+        i = self.ptr
+        self._states[i] = np.reshape(state, (self.num_envs, self.state_dim))
+        self._actions[i] = action
+        self._rewards[i] = reward
+        self._log_probs[i] = log_prob
+        self._values[i] = value
+        self._dones[i] = done
+        
+        self.ptr = (i + 1) % self.capacity
+        self.steps += 1
+    
+    def _view(self, array: np.ndarray) -> np.ndarray:
+        """Steps almacenados en orden temporal (vista si no hubo wrap-around)"""
+        
+        start = (self.ptr - self.steps) % self.capacity
+        if start + self.steps <= self.capacity:
+            return array[start:start + self.steps]
+        return np.concatenate([array[start:], array[:self.ptr]])
+    
+    @property
+    def states(self) -> np.ndarray:
+        return self._view(self._states)
+    
+    @property
+    def actions(self) -> np.ndarray:
+        return self._view(self._actions)
+    
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._view(self._rewards)
+    
+    @property
+    def log_probs(self) -> np.ndarray:
+        return self._view(self._log_probs)
+    
+    @property
+    def values(self) -> np.ndarray:
+        return self._view(self._values)
+    
+    @property
+    def dones(self) -> np.ndarray:
+        return self._view(self._dones)
+
+# ============================================================================
+# MODEL CHECKPOINTS (Binario + mmap)
+# ============================================================================
+
+CHECKPOINT_MAGIC = b"IICKPT\x00\x01"
+CHECKPOINT_VERSION = 1
+CHECKPOINT_ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + CHECKPOINT_ALIGN - 1) // CHECKPOINT_ALIGN * CHECKPOINT_ALIGN
+
+
+def config_hash(config: Optional[Dict] = None) -> str:
+    """Hash corto de la configuración (detecta checkpoints de otra config)"""
+    payload = json.dumps(config if config is not None else PPO_CONFIG, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def save_checkpoint(filepath: str, arrays: Dict[str, np.ndarray], metadata: Optional[Dict] = None,
+                    durable: bool = False):
+    """
+    Guarda arrays en un checkpoint binario memory-mappable
+    
+    FORMATO:
+    - magic (8 bytes) + longitud del header (uint64 little-endian)
+    - header JSON: versión, config hash, metadata, {nombre: dtype/shape/offset}
+    - datos crudos de cada array alineados a 64 bytes
+    
+    Escritura atómica: archivo temporal + os.replace (nunca queda un
+    checkpoint a medias). durable=True añade fsync.
+    """
+    
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    
+    header = json.dumps({
+        "format_version": CHECKPOINT_VERSION,
+        "config_hash": config_hash(),
+        "metadata": metadata or {},
+        "arrays": layout
+    }, default=str).encode("utf-8")
+    data_start = _align(len(CHECKPOINT_MAGIC) + 8 + len(header))
+    
+    tmp_path = f"{filepath}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(CHECKPOINT_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.data)
+            f.truncate(data_start + offset)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def is_checkpoint(filepath: str) -> bool:
+    """True si el archivo es un checkpoint binario"""
+    with open(filepath, "rb") as f:
+        return f.read(len(CHECKPOINT_MAGIC)) == CHECKPOINT_MAGIC
+
+
+def load_checkpoint(filepath: str, mmap: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Carga un checkpoint binario
+    
+    mmap=True: arrays mapeados copy-on-write (carga lazy, modificables en
+    memoria sin tocar el archivo). mmap=False: lectura completa a memoria.
+    
+    Returns:
+        (header, arrays)
+    """
+    
+    with open(filepath, "rb") as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{filepath} no es un checkpoint binario")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        
+        if header.get("format_version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Versión de checkpoint no soportada: {header.get('format_version')}")
+        
+        data_start = _align(len(CHECKPOINT_MAGIC) + 8 + header_len)
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape))
+            offset = data_start + spec["offset"]
+            
+            if mmap and count > 0:
+                arrays[name] = np.memmap(filepath, dtype=dtype, mode="c", offset=offset, shape=shape)
+            else:
+                f.seek(offset)
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    
+    return header, arrays
+
+# ============================================================================
+# ACTOR-CRITIC MLP (Kernels NumPy forward/backward)
+# ============================================================================
+
+class AdamOptimizer:
+    """Adam sobre un dict de parámetros (actualización in-place)"""
+    
+    def __init__(self, params: Dict[str, np.ndarray], learning_rate: float = 1e-3,
+                 beta1: float = 0.9, beta2: float = 0.999, epsilon: float = 1e-8):
+        self.params = params
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.t = 0
+        self.m = {name: np.zeros_like(value) for name, value in params.items()}
+        self.v = {name: np.zeros_like(value) for name, value in params.items()}
+    
+    def step(self, grads: Dict[str, np.ndarray]):
+        self.t += 1
+        step_size = self.learning_rate * np.sqrt(1 - self.beta2 ** self.t) / (1 - self.beta1 ** self.t)
+        
+        for name, grad in grads.items():
+            m, v = self.m[name], self.v[name]
+            m *= self.beta1
+            m += (1 - self.beta1) * grad
+            v *= self.beta2
+            v += (1 - self.beta2) * grad * grad
+            self.params[name] -= step_size * m / (np.sqrt(v) + self.epsilon)
+    
+    def state_dict(self) -> Dict:
+        """Momentos + contador de pasos (copias; para checkpoints)"""
+        return {
+            "t": self.t,
+            "m": {name: value.copy() for name, value in self.m.items()},
+            "v": {name: value.copy() for name, value in self.v.items()}
+        }
+    
+    def load_state_dict(self, state: Dict):
+        """Restaura el estado guardado con state_dict() (mismos nombres de parámetros)"""
+        self.t = int(state["t"])
+        for name in self.params:
+            self.m[name][...] = state["m"][name]
+            self.v[name][...] = state["v"][name]
+
+
+class ActorCriticMLP:
+    """
+    Red actor-critic en NumPy puro
+    
+    ARQUITECTURA:
+    - Tronco compartido: capas densas + tanh (hidden_sizes configurable)
+    - Actor head: logits π(a|s)  → params["actor_params"], ["actor_bias"]
+    - Critic head: valor V(s)    → params["critic_params"], ["critic_bias"]
+    
+    Forward/backward batched en float32. ppo_loss() devuelve el gradiente
+    exacto de: clip surrogate + value_coef·MSE - entropy_coef·H(π).
+    """
+    
+    def __init__(self, state_dim: int = 10, action_dim: int = 3, hidden_sizes=(64, 64),
+                 seed: Optional[int] = None, dtype=np.float32):
+        rng = np.random.default_rng(seed)
+        self.state_dim = state_dim
+        self.action_dim = action_dim
+        self.hidden_sizes = list(hidden_sizes)
+        self.dtype = np.dtype(dtype)
+        
+        self.params: Dict[str, np.ndarray] = {}
+        sizes = [state_dim] + self.hidden_sizes
+        for i, (fan_in, fan_out) in enumerate(zip(sizes[:-1], sizes[1:])):
+            self.params[f"trunk_W{i}"] = (rng.standard_normal((fan_in, fan_out)) / np.sqrt(fan_in)).astype(self.dtype)
+            self.params[f"trunk_b{i}"] = np.zeros(fan_out, dtype=self.dtype)
+        
+        # Heads con init pequeña (política casi uniforme al inicio)
+        self.params["actor_params"] = (rng.standard_normal((sizes[-1], action_dim)) * 0.01).astype(self.dtype)
+        self.params["actor_bias"] = np.zeros(action_dim, dtype=self.dtype)
+        self.params["critic_params"] = (rng.standard_normal((sizes[-1], 1)) * 0.01).astype(self.dtype)
+        self.params["critic_bias"] = np.zeros(1, dtype=self.dtype)
+    
+    @classmethod
+    def from_params(cls, params: Dict[str, np.ndarray]) -> "ActorCriticMLP":
+        """Reconstruye la red desde un dict de parámetros (checkpoint)"""
+        
+        num_layers = sum(1 for name in params if name.startswith("trunk_W"))
+        hidden_sizes = [params[f"trunk_W{i}"].shape[1] for i in range(num_layers)]
+        state_dim = params["trunk_W0"].shape[0] if num_layers else params["actor_params"].shape[0]
+        action_dim = params["actor_params"].shape[1]
+        
+        network = cls(state_dim, action_dim, hidden_sizes, dtype=params["actor_params"].dtype)
+        network.params = dict(params)
+        return network
+    
+    @property
+    def num_layers(self) -> int:
+        return len(self.hidden_sizes)
+    
+    def forward(self, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+        """
+        Returns:
+            (logits (N, A), values (N,), cache de activaciones para backward)
+        """
+        
+        h = np.asarray(states, dtype=self.dtype)
+        cache = [h]
+        for i in range(self.num_layers):
+            h = np.tanh(h @ self.params[f"trunk_W{i}"] + self.params[f"trunk_b{i}"])
+            cache.append(h)
+        
+        logits = h @ self.params["actor_params"] + self.params["actor_bias"]
+        values = (h @ self.params["critic_params"] + self.params["critic_bias"])[:, 0]
+        return logits, values, cache
+    
+    def backward(self, cache: List[np.ndarray], grad_logits: np.ndarray,
+                 grad_values: np.ndarray) -> Dict[str, np.ndarray]:
+        """Backprop de dL/dlogits y dL/dvalues a todos los parámetros"""
+        
+        h = cache[-1]
+        grad_values = grad_values[:, None]
+        grads = {
+            "actor_params": h.T @ grad_logits,
+            "actor_bias": grad_logits.sum(axis=0),
+            "critic_params": h.T @ grad_values,
+            "critic_bias": grad_values.sum(axis=0)
+        }
+        
+        grad_h = grad_logits @ self.params["actor_params"].T + grad_values @ self.params["critic_params"].T
+        for i in reversed(range(self.num_layers)):
+            grad_z = grad_h * (1 - cache[i + 1] ** 2)  # tanh'
+            grads[f"trunk_W{i}"] = cache[i].T @ grad_z
+            grads[f"trunk_b{i}"] = grad_z.sum(axis=0)
+            if i > 0:
+                grad_h = grad_z @ self.params[f"trunk_W{i}"].T
+        
+        return grads
+    
+    def ppo_loss(self, states: np.ndarray, actions: np.ndarray, old_log_probs: np.ndarray,
+                 advantages: np.ndarray, returns: np.ndarray, clip_epsilon: float,
+                 value_coef: float, entropy_coef: float) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """
+        Loss PPO de un minibatch y su gradiente
+        
+        L = -mean(min(r·A, clip(r)·A)) + value_coef·mean((V - R)²) - entropy_coef·mean(H)
+        
+        Returns:
+            (stats, grads)
+        """
+        
+        n = len(states)
+        rows = np.arange(n)
+        advantages = np.asarray(advantages, dtype=self.dtype)
+        returns = np.asarray(returns, dtype=self.dtype)
+        
+        logits, values, cache = self.forward(states)
+        shifted = logits - logits.max(axis=1, keepdims=True)
+        log_probs_all = shifted - np.log(np.exp(shifted).sum(axis=1, keepdims=True))
+        probs = np.exp(log_probs_all)
+        
+        log_probs = log_probs_all[rows, actions]
+        ratio = np.exp(log_probs - old_log_probs).astype(self.dtype)
+        clipped_ratio = np.clip(ratio, 1 - clip_epsilon, 1 + clip_epsilon)
+        surrogate = np.minimum(ratio * advantages, clipped_ratio * advantages)
+        
+        # El gradiente del surrogate solo fluye donde el término sin clip es el mínimo
+        unclipped = ~(((advantages > 0) & (ratio > 1 + clip_epsilon)) |
+                      ((advantages < 0) & (ratio < 1 - clip_epsilon)))
+        
+        entropy = -(probs * log_probs_all).sum(axis=1)
+        value_error = values - returns
+        
+        # dL/dlogits: policy (d log π(a)/dz = onehot - π) + entropía (dH/dz = -π·(log π + H))
+        grad_logits = -probs * (ratio * advantages * unclipped)[:, None]
+        grad_logits[rows, actions] += ratio * advantages * unclipped
+        grad_logits = -grad_logits / n
+        grad_logits += entropy_coef * probs * (log_probs_all + entropy[:, None]) / n
+        
+        grad_values = value_coef * 2 * value_error / n
+        
+        grads = self.backward(cache, grad_logits.astype(self.dtype), grad_values.astype(self.dtype))
+        
+        stats = {
+            "policy_loss": float(-surrogate.mean()),
+            "value_loss": float((value_error ** 2).mean()),
+            "entropy": float(entropy.mean()),
+            "clip_fraction": float(1 - unclipped.mean())
+        }
+        return stats, grads
+    
+    @staticmethod
+    def clip_grad_norm(grads: Dict[str, np.ndarray], max_norm: float) -> float:
+        """Escala los gradientes si la norma global supera max_norm (in-place)"""
+        
+        total_norm = float(np.sqrt(sum(float(np.sum(g * g)) for g in grads.values())))
+        if total_norm > max_norm > 0:
+            scale = max_norm / (total_norm + 1e-6)
+            for grad in grads.values():
+                grad *= scale
+        return total_norm
+
 # ============================================================================
 # AI 3: PPO TRADING AGENT (Optimización)
 # ============================================================================
@@ -1579,6 +4101,7 @@ class PPOTradingAgent:
     ARQUITECTURA:
     - Actor Network: Política π(a|s) - Probabilidad de acción dado estado
     - Critic Network: Función de valor V(s) - Valor esperado del estado
+    - Ambas comparten tronco MLP (ActorCriticMLP) y se optimizan con Adam
     
     ACCIONES:
     0: Buy - Comprar BTC
@@ -1596,73 +4119,146 @@ class PPOTradingAgent:
     - Gestión de riesgo óptima
     """
     
-    def __init__(self, state_dim: int = 10, action_dim: int = 3):
+    def __init__(self, state_dim: int = 10, action_dim: int = 3, hidden_sizes=None,
+                 hyperparams: Optional[Dict] = None):
         self.state_dim = state_dim
         self.action_dim = action_dim
         
-        # Redes neuronales (simplificadas para MVP)
-        # En producción: usar PyTorch o TensorFlow
-        self.actor_params = np.random.randn(state_dim, action_dim) * 0.01
-        self.critic_params = np.random.randn(state_dim, 1) * 0.01
+        # Overrides por agente de PPO_CONFIG (population-based training)
+        self.hyperparams = dict(hyperparams or {})
+        
+        # Red actor-critic (tronco compartido) + Adam
+        hidden_sizes = PPO_CONFIG["hidden_sizes"] if hidden_sizes is None else hidden_sizes
+        self.network = ActorCriticMLP(state_dim, action_dim, hidden_sizes)
+        self.optimizer = AdamOptimizer(self.network.params, self.hp("learning_rate"))
         
-        # Buffers para training
-        self.states_buffer = []
-        self.actions_buffer = []
-        self.rewards_buffer = []
-        self.values_buffer = []
-        self.log_probs_buffer = []
+        # Buffer preasignado para training (float32, escritura por índice)
+        self.buffer = RolloutBuffer(capacity=2048, state_dim=state_dim)
         
         self.training_history = []
+        self._history_saved: Dict[str, int] = {}  # Sesiones ya escritas por archivo de historial
+    
+    def hp(self, name: str):
+        """Hiperparámetro efectivo: override del agente o PPO_CONFIG"""
+        return self.hyperparams.get(name, PPO_CONFIG[name])
+    
+    # Heads de la red (compatibilidad: AutoEvolver escala estos parámetros)
+    @property
+    def actor_params(self) -> np.ndarray:
+        return self.network.params["actor_params"]
+    
+    @actor_params.setter
+    def actor_params(self, value: np.ndarray):
+        self.network.params["actor_params"] = value
+    
+    @property
+    def critic_params(self) -> np.ndarray:
+        return self.network.params["critic_params"]
+    
+    @critic_params.setter
+    def critic_params(self, value: np.ndarray):
+        self.network.params["critic_params"] = value
+    
+    # Vistas del buffer (compatibilidad con el acceso por listas)
+    @property
+    def states_buffer(self) -> np.ndarray:
+        return self.buffer.states[:, 0]
     
-    def select_action(self, state: np.ndarray, sentiment_factor: float) -> Tuple[int, float]:
+    @property
+    def actions_buffer(self) -> np.ndarray:
+        return self.buffer.actions[:, 0]
+    
+    @property
+    def rewards_buffer(self) -> np.ndarray:
+        return self.buffer.rewards[:, 0]
+    
+    @property
+    def log_probs_buffer(self) -> np.ndarray:
+        return self.buffer.log_probs[:, 0]
+    
+    @property
+    def values_buffer(self) -> np.ndarray:
+        return self.buffer.values[:, 0]
+    
+    def select_action(self, state: np.ndarray, sentiment_factor) -> Tuple[int, float]:
         """
         Selecciona acción usando política actual
         
         INCORPORA SENTIMENT:
         - Si sentiment > 0.5: Aumenta probabilidad de BUY
         - Si sentiment < -0.5: Aumenta probabilidad de SELL
+        
+        BATCH: state (N, state_dim) + sentiment escalar o (N,) retorna
+        arrays (actions (N,), log_probs (N,)) en una sola llamada.
+        """
+        
+        action, log_prob, _ = self.act(state, sentiment_factor)
+        return action, log_prob
+    
+    def act(self, states: np.ndarray, sentiment_factor=0.0, deterministic: bool = False,
+            rng: Optional[np.random.Generator] = None):
         """
+        Inferencia batched: acciones, log-probs y valores en un solo pase
         
-        # Forward pass actor network
-        logits = np.dot(state, self.actor_params)
+        - Actor y critic en un único forward (tronco compartido)
+        - Ajuste de sentiment por fila (escalar o array (N,))
+        - Muestreo categórico vectorizado (CDF inversa sobre cumsum)
+        - deterministic=True: argmax (backtests reproducibles)
         
-        # Aplicar ajuste de sentiment
-        sentiment_weight = SENTIMENT_CONFIG["sentiment_weight"]
+        Sirve para rollouts vectorizados, backtests y decisiones multi-par.
+        
+        Args:
+            states: (state_dim,) o (N, state_dim)
         
-        if sentiment_factor > 0.5:
-            # Euforia: favorecer compra
-            logits[0] += sentiment_weight * sentiment_factor  # Buy
-        elif sentiment_factor < -0.5:
-            # Pánico: favorecer venta
-            logits[1] += sentiment_weight * abs(sentiment_factor)  # Sell
+        Returns:
+            (actions, log_probs, values): escalares para un estado, (N,) para un batch
+        """
         
-        # Softmax para probabilidades
-        exp_logits = np.exp(logits - np.max(logits))
-        probs = exp_logits / np.sum(exp_logits)
+        single = np.ndim(states) == 1
+        states = np.atleast_2d(np.asarray(states))
+        n = len(states)
         
-        # Sample acción
-        action = np.random.choice(self.action_dim, p=probs)
+        # Forward pass fusionado actor + critic (tronco compartido)
+        logits, values, _ = self.network.forward(states)
+        logits = logits.astype(np.float64)
         
-        # Log probability
-        log_prob = np.log(probs[action] + 1e-10)
+        # Aplicar ajuste de sentiment por fila
+        sentiment = np.broadcast_to(np.asarray(sentiment_factor, dtype=np.float64), (n,))
+        sentiment_weight = SENTIMENT_CONFIG["sentiment_weight"]
+        logits[:, 0] += np.where(sentiment > 0.5, sentiment_weight * sentiment, 0.0)  # Euforia: Buy
+        logits[:, 1] += np.where(sentiment < -0.5, sentiment_weight * np.abs(sentiment), 0.0)  # Pánico: Sell
         
-        return action, log_prob
+        # Softmax por fila
+        exp_logits = np.exp(logits - np.max(logits, axis=1, keepdims=True))
+        probs = exp_logits / np.sum(exp_logits, axis=1, keepdims=True)
+        
+        if deterministic:
+            actions = np.argmax(probs, axis=1)
+        else:
+            # Muestreo categórico por fila (CDF inversa)
+            cdf = np.cumsum(probs, axis=1)
+            uniform = rng.random((n, 1)) if rng is not None else np.random.random((n, 1))
+            actions = np.minimum((uniform * cdf[:, -1:] >= cdf).sum(axis=1), self.action_dim - 1)
+        
+        log_probs = np.log(probs[np.arange(n), actions] + 1e-10)
+        
+        if single:
+            return int(actions[0]), float(log_probs[0]), float(values[0])
+        return actions, log_probs, values
     
-    def get_value(self, state: np.ndarray) -> float:
-        """Estima valor del estado con critic network"""
+    def get_value(self, state: np.ndarray):
+        """Estima valor del estado con critic network (float, o (N,) para un batch)"""
         
-        value = np.dot(state, self.critic_params).item()
-        return value
+        _, values, _ = self.network.forward(np.atleast_2d(state))
+        if np.ndim(state) == 2:
+            return values
+        return float(values[0])
     
     def store_transition(self, state: np.ndarray, action: int, reward: float, 
-                        log_prob: float, value: float):
+                        log_prob: float, value: float, done: bool = False):
         """Almacena transición en buffer"""
         
-        self.states_buffer.append(state)
-        self.actions_buffer.append(action)
-        self.rewards_buffer.append(reward)
-        self.log_probs_buffer.append(log_prob)
-        self.values_buffer.append(value)
+        self.buffer.add(state, action, reward, log_prob, value, done)
     
     def train(self, final_value: float = 0.0) -> Dict:
         """
@@ -1673,31 +4269,62 @@ class PPOTradingAgent:
         2. Actualizar actor con PPO clip
         3. Actualizar critic con MSE loss
         4. Aplicar gradient clipping
+        
+        VECTORIZADO: cada minibatch se procesa con operaciones matriciales
+        (logits, ratio, clip y gradientes de todo el batch) y un único paso
+        de gradiente por batch.
         """
         
-        if len(self.states_buffer) < PPO_CONFIG["batch_size"]:
+        if len(self.buffer) < self.hp("batch_size"):
             return {"status": "not_enough_data"}
         
-        # Convertir a arrays
-        states = np.array(self.states_buffer)
-        actions = np.array(self.actions_buffer)
-        rewards = np.array(self.rewards_buffer)
-        old_log_probs = np.array(self.log_probs_buffer)
-        values = np.array(self.values_buffer)
+        # Vistas del buffer (sin copia)
+        states = self.states_buffer
+        actions = self.actions_buffer
+        rewards = self.rewards_buffer
+        old_log_probs = self.log_probs_buffer
+        values = self.values_buffer
+        
+        # Calcular returns y advantages (GAE, respetando fin de episodio)
+        returns, advantages = compute_gae(rewards, values, final_value, self.buffer.dones[:, 0],
+                                          gamma=self.hp("gamma"), lam=self.hp("gae_lambda"))
+        
+        self._update(states, actions, old_log_probs, returns, advantages)
         
-        # Calcular returns y advantages (GAE)
-        returns, advantages = self._calculate_gae(rewards, values, final_value)
+        # Limpiar buffer
+        avg_reward = float(np.mean(rewards))
+        self.buffer.clear()
+        
+        # Registrar
+        self.training_history.append({
+            "timestamp": datetime.now(),
+            "avg_reward": avg_reward,
+            "num_transitions": len(states)
+        })
+        
+        return {
+            "status": "success",
+            "avg_reward": avg_reward,
+            "num_transitions": len(states)
+        }
+    
+    def _update(self, states: np.ndarray, actions: np.ndarray, old_log_probs: np.ndarray,
+                returns: np.ndarray, advantages: np.ndarray):
+        """Epochs de PPO sobre minibatches (clip + value MSE + entropía, Adam)"""
         
         # Normalizar advantages
         advantages = (advantages - np.mean(advantages)) / (np.std(advantages) + 1e-8)
         
+        self.optimizer.learning_rate = self.hp("learning_rate")
+        batch_size = self.hp("batch_size")
+        
         # Training loop
-        for epoch in range(PPO_CONFIG["num_epochs"]):
+        for epoch in range(self.hp("num_epochs")):
             # Sample mini-batches
             indices = np.random.permutation(len(states))
             
-            for start in range(0, len(states), PPO_CONFIG["batch_size"]):
-                end = start + PPO_CONFIG["batch_size"]
+            for start in range(0, len(states), batch_size):
+                end = start + batch_size
                 batch_indices = indices[start:end]
                 
                 batch_states = states[batch_indices]
@@ -1706,111 +4333,436 @@ class PPOTradingAgent:
                 batch_advantages = advantages[batch_indices]
                 batch_old_log_probs = old_log_probs[batch_indices]
                 
-                # Update actor (simplified gradient ascent)
-                for i, state in enumerate(batch_states):
-                    # Recalcular log prob con parámetros actuales
-                    logits = np.dot(state, self.actor_params)
-                    exp_logits = np.exp(logits - np.max(logits))
-                    probs = exp_logits / np.sum(exp_logits)
-                    new_log_prob = np.log(probs[batch_actions[i]] + 1e-10)
-                    
-                    # Ratio
-                    ratio = np.exp(new_log_prob - batch_old_log_probs[i])
-                    
-                    # PPO clip
-                    clip_ratio = np.clip(ratio, 
-                                        1 - PPO_CONFIG["clip_epsilon"],
-                                        1 + PPO_CONFIG["clip_epsilon"])
-                    
-                    # Policy loss (simplified)
-                    policy_loss = -min(ratio * batch_advantages[i], 
-                                      clip_ratio * batch_advantages[i])
-                    
-                    # Gradient (simplified)
-                    grad = policy_loss * state.reshape(-1, 1)
-                    
-                    # Update
-                    self.actor_params -= PPO_CONFIG["learning_rate"] * grad
+                # Loss PPO + gradiente exacto (clip, value MSE, entropía)
+                _, grads = self.network.ppo_loss(
+                    batch_states, batch_actions, batch_old_log_probs,
+                    batch_advantages, batch_returns,
+                    clip_epsilon=self.hp("clip_epsilon"),
+                    value_coef=self.hp("value_loss_coef"),
+                    entropy_coef=self.hp("entropy_coef")
+                )
                 
-                # Update critic
-                for i, state in enumerate(batch_states):
-                    predicted_value = np.dot(state, self.critic_params).item()
-                    value_loss = (predicted_value - batch_returns[i]) ** 2
-                    
-                    # Gradient
-                    grad = 2 * (predicted_value - batch_returns[i]) * state.reshape(-1, 1)
-                    
-                    # Update
-                    self.critic_params -= PPO_CONFIG["learning_rate"] * PPO_CONFIG["value_loss_coef"] * grad
-        
-        # Limpiar buffers
-        avg_reward = np.mean(rewards)
-        self.states_buffer.clear()
-        self.actions_buffer.clear()
-        self.rewards_buffer.clear()
-        self.log_probs_buffer.clear()
-        self.values_buffer.clear()
+                # Gradient clipping (norma global) + un paso de Adam por batch
+                self.network.clip_grad_norm(grads, self.hp("max_grad_norm"))
+                self.optimizer.step(grads)
+    
+    def export_rollout(self, final_value: float = 0.0, clear: bool = True) -> Dict:
+        """
+        Copia del buffer con el layout (T, 1) de collect_rollout
         
-        # Registrar
+        Snapshot para entrenar en otro proceso (train_rollout) sin bloquear
+        el loop de trading.
+        """
+        
+        n = len(self.buffer)
+        rollout = {
+            "states": self.states_buffer.reshape(n, 1, self.state_dim).copy(),
+            "actions": self.actions_buffer.reshape(n, 1).copy(),
+            "rewards": self.rewards_buffer.reshape(n, 1).copy(),
+            "log_probs": self.log_probs_buffer.reshape(n, 1).copy(),
+            "values": self.values_buffer.reshape(n, 1).copy(),
+            "dones": self.buffer.dones[:, :1].copy(),
+            "last_values": np.array([final_value], dtype=np.float32)
+        }
+        if clear:
+            self.buffer.clear()
+        return rollout
+    
+    def train_rollout(self, rollout: Dict) -> Dict:
+        """
+        Entrena con un rollout multi-env de VectorizedMarketEnv.collect_rollout
+        
+        GAE se calcula por env (con done masks) en una sola llamada vectorizada
+        y luego se aplana a N*T transiciones para el update PPO.
+        """
+        
+        rewards = rollout["rewards"]
+        num_steps, num_envs = rewards.shape
+        
+        returns, advantages = compute_gae(rewards.T, rollout["values"].T,
+                                          rollout["last_values"], rollout["dones"].T,
+                                          gamma=self.hp("gamma"), lam=self.hp("gae_lambda"))
+        
+        # Aplanar en orden (T, N): los arrays del rollout se reutilizan como vistas
+        num_transitions = num_steps * num_envs
+        self._update(
+            rollout["states"].reshape(num_transitions, -1),
+            rollout["actions"].reshape(-1),
+            rollout["log_probs"].reshape(-1),
+            returns.T.reshape(-1),
+            advantages.T.reshape(-1)
+        )
+        
+        avg_reward = float(np.mean(rewards))
         self.training_history.append({
             "timestamp": datetime.now(),
             "avg_reward": avg_reward,
-            "num_transitions": len(states)
+            "num_transitions": num_transitions
         })
         
         return {
             "status": "success",
             "avg_reward": avg_reward,
-            "num_transitions": len(states)
+            "num_transitions": num_transitions
         }
     
     def _calculate_gae(self, rewards: np.ndarray, values: np.ndarray, 
                        final_value: float) -> Tuple[np.ndarray, np.ndarray]:
-        """Calcula Generalized Advantage Estimation"""
+        """Calcula Generalized Advantage Estimation (vectorizado, ver compute_gae)"""
         
-        gamma = PPO_CONFIG["gamma"]
-        lam = PPO_CONFIG["gae_lambda"]
+        return compute_gae(rewards, values, final_value, gamma=self.hp("gamma"), lam=self.hp("gae_lambda"))
+    
+    def save_model(self, filepath: str, durable: bool = False):
+        """
+        Guarda modelo entrenado
         
-        advantages = np.zeros_like(rewards)
-        last_advantage = 0
+        - .json: formato legado (parámetros + historial en JSON)
+        - cualquier otra extensión (.ckpt): checkpoint binario atómico;
+          el historial se agrega a un archivo append-only aparte
+        """
         
-        # Backward pass
-        for t in reversed(range(len(rewards))):
-            if t == len(rewards) - 1:
-                next_value = final_value
-            else:
-                next_value = values[t + 1]
+        if filepath.endswith(".json"):
+            model_data = {
+                "hidden_sizes": self.network.hidden_sizes,
+                "params": {name: value.tolist() for name, value in self.network.params.items()},
+                "training_history": [
+                    {**h, "timestamp": h["timestamp"].isoformat()} 
+                    for h in self.training_history
+                ]
+            }
             
-            delta = rewards[t] + gamma * next_value - values[t]
-            advantages[t] = last_advantage = delta + gamma * lam * last_advantage
+            with open(filepath, 'w') as f:
+                json.dump(model_data, f, indent=2)
+            return
+        
+        save_checkpoint(filepath, self.network.params, metadata={
+            "state_dim": self.state_dim,
+            "action_dim": self.action_dim,
+            "hidden_sizes": self.network.hidden_sizes,
+            "hyperparams": self.hyperparams,
+            "training_sessions": len(self.training_history)
+        }, durable=durable)
+        
+        self._append_training_history(self.history_path(filepath))
+    
+    @staticmethod
+    def history_path(filepath: str) -> str:
+        """Archivo append-only de historial (uno por checkpoint: <stem>.history.jsonl)"""
+        return os.path.splitext(filepath)[0] + ".history.jsonl"
+    
+    def _append_training_history(self, history_path: str):
+        """Agrega solo las sesiones nuevas (JSON lines)"""
+        
+        saved = self._history_saved.get(history_path, 0)
+        new_entries = self.training_history[saved:]
+        if not new_entries:
+            return
+        
+        with open(history_path, "a") as f:
+            for entry in new_entries:
+                f.write(json.dumps({**entry, "timestamp": entry["timestamp"].isoformat()}, default=float) + "\n")
+        self._history_saved[history_path] = len(self.training_history)
+    
+    def load_model(self, filepath: str, mmap: bool = False):
+        """
+        Carga modelo guardado (checkpoint binario o JSON legado)
+        
+        mmap=False por defecto: el agente suele volver a guardar sobre el mismo
+        checkpoint (ppo_agent_latest.ckpt) y un memmap vivo impide os.replace
+        en Windows. mmap=True solo para lecturas (inferencia, inspección).
+        """
         
-        returns = advantages + values
+        if is_checkpoint(filepath):
+            header, arrays = load_checkpoint(filepath, mmap=mmap)
+            if header["config_hash"] != config_hash():
+                print(f"[WARNING] Checkpoint guardado con otra PPO_CONFIG ({header['config_hash']})")
+            self.hyperparams.update(header["metadata"].get("hyperparams", {}))
+            self._set_network(ActorCriticMLP.from_params(arrays))
+            return
         
-        return returns, advantages
+        with open(filepath, 'r') as f:
+            model_data = json.load(f)
+        
+        if "params" in model_data:
+            params = {name: np.array(value, dtype=np.float32) for name, value in model_data["params"].items()}
+        else:
+            # JSON legado: modelo lineal (sin tronco ni bias)
+            actor_params = np.array(model_data["actor_params"], dtype=np.float32)
+            critic_params = np.array(model_data["critic_params"], dtype=np.float32)
+            params = {
+                "actor_params": actor_params,
+                "actor_bias": np.zeros(actor_params.shape[1], dtype=np.float32),
+                "critic_params": critic_params,
+                "critic_bias": np.zeros(1, dtype=np.float32)
+            }
+        self._set_network(ActorCriticMLP.from_params(params))
     
-    def save_model(self, filepath: str):
-        """Guarda modelo entrenado"""
+    def _set_network(self, network: ActorCriticMLP):
+        """Reemplaza la red y reinicia el estado de Adam"""
+        self.network = network
+        self.optimizer = AdamOptimizer(network.params, self.hp("learning_rate"))
+    
+    def swap_params(self, params: Dict[str, np.ndarray]) -> ActorCriticMLP:
+        """
+        Hot swap: instala una red nueva entre ticks y retorna la anterior
         
-        model_data = {
-            "actor_params": self.actor_params.tolist(),
-            "critic_params": self.critic_params.tolist(),
-            "training_history": [
-                {**h, "timestamp": h["timestamp"].isoformat()} 
-                for h in self.training_history
-            ]
+        Una sola asignación de referencia: act() ve la red vieja o la nueva
+        completa, nunca una mezcla.
+        """
+        
+        previous = self.network
+        self._set_network(ActorCriticMLP.from_params({name: np.array(value) for name, value in params.items()}))
+        return previous
+
+# ============================================================================
+# REGIME DETECTOR (Clasificador incremental multi-horizonte)
+# ============================================================================
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + np.exp(-min(max(x, -50.0), 50.0)))
+
+
+class RollingHorizon:
+    """
+    Tendencia, volatilidad y rango de una ventana temporal (O(1) amortizado)
+    
+    - Sumas móviles de returns y returns² (volatilidad sin recorrer la ventana)
+    - Deques monótonas para max/min (rango)
+    - Muestreo a resolución fija (ventana / max_points): memoria acotada
+      sin importar la frecuencia de ticks; la ventana avanza con el último tick
+    - Tick dentro de la resolución: reemplaza el precio de la última muestra
+      (la tendencia no se atrasa respecto del último precio); el rango
+      conserva los extremos intra-muestra
+    """
+    
+    def __init__(self, seconds: float, max_points: int = 4096):
+        self.seconds = float(seconds)
+        self.resolution = self.seconds / max_points
+        self.points = deque()   # (timestamp, price, return vs. muestra anterior)
+        self.max_queue = deque()
+        self.min_queue = deque()
+        self.ret_sum = 0.0
+        self.ret_sq_sum = 0.0
+    
+    def update(self, timestamp: float, price: float):
+        if self.points and timestamp - self.points[-1][0] < self.resolution:
+            self._overwrite_last(price)
+            self._evict(timestamp)
+            return
+        
+        if self.points:
+            ret = price / self.points[-1][1] - 1
+            self.ret_sum += ret
+            self.ret_sq_sum += ret * ret
+        else:
+            ret = 0.0
+        self.points.append((timestamp, price, ret))
+        self._push_extremes(timestamp, price)
+        self._evict(timestamp)
+    
+    def _overwrite_last(self, price: float):
+        """Reemplaza el precio de la última muestra (mismo timestamp de muestra)"""
+        
+        sample_time, _, old_ret = self.points[-1]
+        ret = old_ret
+        if len(self.points) > 1:
+            # La cabeza no cuenta en las sumas; las demás sí
+            ret = price / self.points[-2][1] - 1
+            self.ret_sum += ret - old_ret
+            self.ret_sq_sum += ret * ret - old_ret * old_ret
+        self.points[-1] = (sample_time, price, ret)
+        self._push_extremes(sample_time, price)
+    
+    def _push_extremes(self, timestamp: float, price: float):
+        while self.max_queue and self.max_queue[-1][1] <= price:
+            self.max_queue.pop()
+        self.max_queue.append((timestamp, price))
+        while self.min_queue and self.min_queue[-1][1] >= price:
+            self.min_queue.pop()
+        self.min_queue.append((timestamp, price))
+    
+    def _evict(self, now: float):
+        """Descarta muestras con timestamp <= now - ventana (siempre queda la última)"""
+        
+        cutoff = now - self.seconds
+        points = self.points
+        while len(points) > 1 and points[0][0] <= cutoff:
+            points.popleft()
+            # El return de la nueva cabeza apunta fuera de la ventana
+            head_ret = points[0][2]
+            self.ret_sum -= head_ret
+            self.ret_sq_sum -= head_ret * head_ret
+        if len(points) == 1:
+            self.ret_sum = self.ret_sq_sum = 0.0  # Sin drift de punto flotante
+        
+        while len(self.max_queue) > 1 and self.max_queue[0][0] <= cutoff:
+            self.max_queue.popleft()
+        while len(self.min_queue) > 1 and self.min_queue[0][0] <= cutoff:
+            self.min_queue.popleft()
+    
+    def stats(self) -> Dict:
+        """count, span (s), trend, volatility (diaria), range"""
+        
+        count = len(self.points)
+        if count == 0:
+            return {"count": 0, "span": 0.0, "trend": 0.0, "volatility": 0.0, "range": 0.0}
+        
+        first_time, first_price, _ = self.points[0]
+        last_time, last_price, _ = self.points[-1]
+        span = last_time - first_time
+        
+        volatility = 0.0
+        if count > 1:
+            n = count - 1
+            mean = self.ret_sum / n
+            volatility = np.sqrt(max(self.ret_sq_sum / n - mean * mean, 0.0))
+            if span > 0:
+                volatility *= np.sqrt(86400.0 * n / span)  # Escalar a volatilidad diaria
+        
+        low = self.min_queue[0][1]
+        return {
+            "count": count,
+            "span": span,
+            "trend": last_price / first_price - 1,
+            "volatility": float(volatility),
+            "range": (self.max_queue[0][1] - low) / low
         }
+
+
+class RegimeDetector:
+    """
+    INQUEBRANTABLE 2: Régimen de mercado en streaming
+    
+    ARQUITECTURA:
+    - update(price, timestamp) por tick: O(1) amortizado en cada horizonte
+      (REGIME_CONFIG["horizons"], ventanas en segundos: independiente de la
+      frecuencia de muestreo)
+    - regime: clasificación del horizonte principal (mismas reglas que
+      AutoEvolver.detect_market_regime: trending > volatile > lateral)
+    - probabilities(): versión suave de la misma regla (sigmoides sobre los umbrales)
+    - transitions: eventos {timestamp, from, to, probabilities} al cambiar de régimen
+    - snapshot(): cache por tick; RiskManager, AutoEvolver y sizing consultan
+      el mismo detector sin recalcular
+    """
+    
+    REGIMES = ("trending_up", "trending_down", "lateral", "volatile")
+    
+    def __init__(self, horizons: Optional[Dict[str, float]] = None,
+                 primary_horizon: Optional[str] = None, config: Optional[Dict] = None):
+        self.config = {**REGIME_CONFIG, **(config or {})}
+        horizons = horizons or self.config["horizons"]
+        self.horizons = {name: RollingHorizon(seconds, self.config["max_points"])
+                         for name, seconds in horizons.items()}
+        self.primary_horizon = primary_horizon or self.config["primary_horizon"]
+        if self.primary_horizon not in self.horizons:
+            raise ValueError(f"Horizonte principal desconocido: {self.primary_horizon}")
+        
+        self.regime = "unknown"
+        self.last_timestamp: Optional[float] = None
+        self.transitions = deque(maxlen=self.config["max_transitions"])
+        self.version = 0  # Ticks procesados (invalida el cache)
+        self._snapshot: Optional[Dict] = None
+        self._snapshot_version = -1
+    
+    @staticmethod
+    def classify(change: float, volatility: float, price_range: float,
+                 trend_threshold: Optional[float] = None,
+                 volatility_threshold: Optional[float] = None) -> str:
+        """Reglas del régimen (PRIORIDAD: trending > volatile > lateral)"""
+        
+        trend_threshold = REGIME_CONFIG["trend_threshold"] if trend_threshold is None else trend_threshold
+        volatility_threshold = REGIME_CONFIG["volatility_threshold"] if volatility_threshold is None else volatility_threshold
+        
+        if abs(change) > trend_threshold:
+            return "trending_up" if change > 0 else "trending_down"
+        elif volatility > volatility_threshold:
+            return "volatile"
+        return "lateral"
+    
+    def update(self, price: float, timestamp) -> Optional[Dict]:
+        """
+        Procesa un tick (timestamp: datetime o segundos epoch)
+        
+        Returns:
+            evento de transición si cambió el régimen, None si no.
+            Ticks fuera de orden se ignoran.
+        """
         
-        with open(filepath, 'w') as f:
-            json.dump(model_data, f, indent=2)
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return None
+        self.last_timestamp = timestamp
+        
+        for horizon in self.horizons.values():
+            horizon.update(timestamp, price)
+        self.version += 1
+        
+        regime = self._classify_primary()
+        if regime == self.regime:
+            return None
+        
+        event = {
+            "timestamp": timestamp,
+            "from": self.regime,
+            "to": regime,
+            "probabilities": self.probabilities()
+        }
+        self.regime = regime
+        self.transitions.append(event)
+        return event
+    
+    def _classify_primary(self) -> str:
+        stats = self.horizons[self.primary_horizon].stats()
+        if stats["count"] < self.config["min_samples"]:
+            return "unknown"
+        return self.classify(stats["trend"], stats["volatility"], stats["range"],
+                             self.config["trend_threshold"], self.config["volatility_threshold"])
+    
+    def stats(self, horizon: Optional[str] = None) -> Dict:
+        """Estadísticas de un horizonte (default: el principal)"""
+        return self.horizons[horizon or self.primary_horizon].stats()
     
-    def load_model(self, filepath: str):
-        """Carga modelo guardado"""
+    def probabilities(self) -> Dict[str, float]:
+        """
+        Probabilidad por régimen (suman 1; uniformes sin muestras suficientes)
         
-        with open(filepath, 'r') as f:
-            model_data = json.load(f)
+        P(trending) = σ((|cambio| - umbral) / (umbral·T)), repartida entre up/down
+        por el signo; P(volatile) = (1 - P(trending))·σ((vol - umbral) / (umbral·T));
+        P(lateral) = resto. T = probability_temperature.
+        """
+        
+        stats = self.stats()
+        if stats["count"] < self.config["min_samples"]:
+            return {regime: 1.0 / len(self.REGIMES) for regime in self.REGIMES}
+        
+        temperature = self.config["probability_temperature"]
+        trend_scale = self.config["trend_threshold"] * temperature
+        vol_scale = self.config["volatility_threshold"] * temperature
         
-        self.actor_params = np.array(model_data["actor_params"])
-        self.critic_params = np.array(model_data["critic_params"])
+        p_trend = _sigmoid((abs(stats["trend"]) - self.config["trend_threshold"]) / trend_scale)
+        p_up = _sigmoid(stats["trend"] / trend_scale)
+        p_volatile = (1 - p_trend) * _sigmoid((stats["volatility"] - self.config["volatility_threshold"]) / vol_scale)
+        
+        return {
+            "trending_up": p_trend * p_up,
+            "trending_down": p_trend * (1 - p_up),
+            "lateral": 1 - p_trend - p_volatile,
+            "volatile": p_volatile
+        }
+    
+    def snapshot(self) -> Dict:
+        """Régimen + probabilidades + stats por horizonte (cacheado hasta el próximo tick)"""
+        
+        if self._snapshot_version != self.version:
+            self._snapshot = {
+                "regime": self.regime,
+                "probabilities": self.probabilities(),
+                "horizons": {name: horizon.stats() for name, horizon in self.horizons.items()},
+                "timestamp": self.last_timestamp
+            }
+            self._snapshot_version = self.version
+        return self._snapshot
 
 # ============================================================================
 # AI 4: AUTO-EVOLVER (Auto-Mejora)
@@ -1839,12 +4791,29 @@ class AutoEvolver:
     4. Validar mejora antes de desplegar
     """
     
-    def __init__(self):
+    # INQUEBRANTABLE 2: Ajustes de estrategia según régimen
+    REGIME_ADJUSTMENTS = {
+        "trending_up": {"position_size": 1.2, "risk_tolerance": 1.1},  # Más agresivo
+        "trending_down": {"position_size": 0.5, "risk_tolerance": 0.7},  # Defensivo
+        "lateral": {"position_size": 0.8, "risk_tolerance": 0.9},  # Conservador
+        "volatile": {"position_size": 0.6, "risk_tolerance": 0.6},  # Muy conservador
+        "unknown": {"position_size": 1.0, "risk_tolerance": 1.0}
+    }
+    
+    def __init__(self, clock: Optional[Clock] = None):
+        self.clock = clock or SYSTEM_CLOCK
         self.evolution_history = []
         self.performance_metrics = []
-        self.last_training_date = datetime.now()
+        self.last_training_date = self.clock.now()
         self.training_interval_days = 7  # INQUEBRANTABLE 2: Cada semana
         self.market_regime = "unknown"  # trending, lateral, volatile
+        self.regime_detector = RegimeDetector()  # Alimentado por tick (ver IntelligentInvestmentBot)
+        
+        # Re-entrenamiento en background (ver start_background_worker)
+        self.retrainer: Optional["BackgroundRetrainer"] = None
+        self.previous_network: Optional[ActorCriticMLP] = None
+        self.min_validation_improvement = 0.0  # Candidato debe igualar o superar al modelo vivo
+        self._retrain_jobs = 0
     
     def detect_market_regime(self, price_history: List[float]) -> str:
         """
@@ -1855,49 +4824,29 @@ class AutoEvolver:
         - lateral: Rango definido, volatilidad < 5% en 7 días
         - volatile: Alta volatilidad > 10% en 7 días
         
+        Una entrada = un día. Para datos con timestamp a cualquier frecuencia
+        usar regime_detector (incremental, multi-horizonte).
+        
         Returns: "trending_up", "trending_down", "lateral", "volatile"
         """
         if len(price_history) < 7:
             return "unknown"
         
-        recent_prices = price_history[-7:]  # Últimos 7 días
-        
-        # Calcular cambio total
-        initial = recent_prices[0]
-        final = recent_prices[-1]
-        total_change = (final - initial) / initial
-        
-        # Calcular volatilidad (desviación estándar de returns)
-        returns = []
-        for i in range(1, len(recent_prices)):
-            ret = (recent_prices[i] - recent_prices[i-1]) / recent_prices[i-1]
-            returns.append(ret)
-        
-        volatility = np.std(returns) if returns else 0.0
+        recent_prices = np.asarray(price_history[-7:], dtype=np.float64)  # Últimos 7 días
         
-        # Calcular rango (max-min)
-        price_range = (max(recent_prices) - min(recent_prices)) / min(recent_prices)
+        total_change = recent_prices[-1] / recent_prices[0] - 1
+        volatility = np.std(recent_prices[1:] / recent_prices[:-1] - 1)
+        price_range = (recent_prices.max() - recent_prices.min()) / recent_prices.min()
         
         print(f"[OK] Régimen detectado: cambio={total_change*100:.2f}%, volatilidad={volatility*100:.2f}%, rango={price_range*100:.2f}%")
         
-        # Clasificar régimen (PRIORIDAD: trending > volatile > lateral)
-        if abs(total_change) > 0.02:  # ±2% cambio neto en 7 días
-            if total_change > 0:
-                return "trending_up"
-            else:
-                return "trending_down"
-        elif volatility > 0.05:  # 5% volatilidad diaria
-            return "volatile"
-        elif price_range < 0.05:  # Rango < 5%
-            return "lateral"
-        else:
-            return "lateral"  # Default
+        return RegimeDetector.classify(total_change, volatility, price_range)
     
     def should_trigger_weekly_retraining(self) -> bool:
         """
         INQUEBRANTABLE 2: Verifica si es momento de re-entrenar semanalmente
         """
-        days_since_training = (datetime.now() - self.last_training_date).days
+        days_since_training = (self.clock.now() - self.last_training_date).days
         
         if days_since_training >= self.training_interval_days:
             print(f"\n[INQUEBRANTABLE 2] {days_since_training} días desde último entrenamiento")
@@ -1921,6 +4870,9 @@ class AutoEvolver:
             if price_history:
                 self.market_regime = self.detect_market_regime(price_history)
                 print(f"[INQUEBRANTABLE 2] Régimen detectado: {self.market_regime}")
+            elif self.regime_detector.regime != "unknown":
+                self.market_regime = self.regime_detector.regime
+                print(f"[INQUEBRANTABLE 2] Régimen detectado (streaming): {self.market_regime}")
             return True
         
         # Trigger 1: Kill Switch activado
@@ -1967,15 +4919,7 @@ class AutoEvolver:
             })
         
         # INQUEBRANTABLE 2: Ajustar estrategia según régimen
-        regime_adjustments = {
-            "trending_up": {"position_size": 1.2, "risk_tolerance": 1.1},  # Más agresivo
-            "trending_down": {"position_size": 0.5, "risk_tolerance": 0.7},  # Defensivo
-            "lateral": {"position_size": 0.8, "risk_tolerance": 0.9},  # Conservador
-            "volatile": {"position_size": 0.6, "risk_tolerance": 0.6},  # Muy conservador
-            "unknown": {"position_size": 1.0, "risk_tolerance": 1.0}
-        }
-        
-        adjustment = regime_adjustments.get(self.market_regime, regime_adjustments["unknown"])
+        adjustment = self.regime_adjustment(self.market_regime)
         
         print(f"\n[INQUEBRANTABLE 2] Régimen de mercado: {self.market_regime}")
         print(f"  Position size ajustada: {adjustment['position_size']}x")
@@ -1985,14 +4929,13 @@ class AutoEvolver:
         penalty_factor = EVOLVER_CONFIG["mdd_penalty_multiplier"]
         
         # Reducir magnitud de parámetros (regularización)
-        ppo_agent.actor_params *= 0.8 * adjustment['risk_tolerance']
-        ppo_agent.critic_params *= 0.8
+        self.apply_regime_penalty(ppo_agent, self.market_regime)
         
         # Actualizar fecha de entrenamiento
-        self.last_training_date = datetime.now()
+        self.last_training_date = self.clock.now()
         
         evolution = {
-            "timestamp": datetime.now(),
+            "timestamp": self.clock.now(),
             "trigger": "weekly_auto" if not risk_events else "kill_switch",
             "market_regime": self.market_regime,
             "regime_adjustment": adjustment,
@@ -2009,6 +4952,112 @@ class AutoEvolver:
         
         return evolution
     
+    @classmethod
+    def regime_adjustment(cls, regime: str) -> Dict:
+        return cls.REGIME_ADJUSTMENTS.get(regime, cls.REGIME_ADJUSTMENTS["unknown"])
+    
+    @classmethod
+    def apply_regime_penalty(cls, ppo_agent: PPOTradingAgent, regime: str):
+        """Regularización de los heads según régimen (in-place)"""
+        
+        ppo_agent.actor_params *= 0.8 * cls.regime_adjustment(regime)["risk_tolerance"]
+        ppo_agent.critic_params *= 0.8
+    
+    def start_background_worker(self):
+        """Inicia el proceso de re-entrenamiento en background"""
+        if self.retrainer is None:
+            self.retrainer = BackgroundRetrainer()
+    
+    def stop_background_worker(self):
+        if self.retrainer is not None:
+            self.retrainer.close()
+            self.retrainer = None
+    
+    def submit_retraining(self, ppo_agent: PPOTradingAgent, env: MarketEnvironment,
+                          risk_events: List[Dict], penalize: bool = False,
+                          final_value: float = 0.0) -> bool:
+        """
+        Envía un snapshot (parámetros + rollout + velas del episodio) al worker
+        
+        No bloquea: el agente vivo sigue operando con sus parámetros actuales.
+        Retorna False si ya hay un re-entrenamiento en curso (el rollout se
+        descarta para no acumular trabajo atrasado).
+        """
+        
+        rollout = ppo_agent.export_rollout(final_value)
+        if self.retrainer is None or self.retrainer.busy:
+            return False
+        
+        self._retrain_jobs += 1
+        job = {
+            "job_id": self._retrain_jobs,
+            "seed": self._retrain_jobs,
+            "params": {name: np.array(value) for name, value in ppo_agent.network.params.items()},
+            "state_dim": ppo_agent.state_dim,
+            "action_dim": ppo_agent.action_dim,
+            "hidden_sizes": ppo_agent.network.hidden_sizes,
+            "rollout": rollout,
+            "candles": np.column_stack([env.price_history, env.volume_history]),
+            "regime": self.market_regime if penalize else None,
+            "risk_events": len(risk_events),
+            "min_improvement": self.min_validation_improvement,
+            "holdout": EVOLVER_CONFIG["validation_holdout"]
+        }
+        self.retrainer.submit(job)
+        return True
+    
+    def poll_retraining(self, ppo_agent: PPOTradingAgent) -> Optional[Dict]:
+        """
+        Llamar entre ticks: si hay un candidato validado, hot swap atómico
+        
+        Candidato rechazado (o error en el worker) → rollback: el modelo vivo
+        no se toca. Retorna el evento de evolución o None si no hay resultado.
+        """
+        
+        if self.retrainer is None:
+            return None
+        result = self.retrainer.poll()
+        if result is None:
+            return None
+        
+        if result.get("train_result", {}).get("status") == "success":
+            ppo_agent.training_history.append({
+                "timestamp": self.clock.now(),
+                "avg_reward": result["train_result"]["avg_reward"],
+                "num_transitions": result["train_result"]["num_transitions"]
+            })
+        
+        if result["accepted"]:
+            self.previous_network = ppo_agent.swap_params(result["params"])
+            self.last_training_date = self.clock.now()
+        
+        evolution = {
+            "timestamp": self.clock.now(),
+            "trigger": "background_retrain",
+            "job_id": result["job_id"],
+            "accepted": result["accepted"],
+            "reason": result["reason"],
+            "market_regime": result.get("regime") or self.market_regime,
+            "baseline_return": result.get("baseline", {}).get("avg_return"),
+            "candidate_return": result.get("candidate", {}).get("avg_return"),
+            "penalty_applied": EVOLVER_CONFIG["mdd_penalty_multiplier"] if result.get("regime") else 1.0,
+            "high_risk_events": result.get("risk_events", 0)
+        }
+        self.evolution_history.append(evolution)
+        
+        status = "HOT SWAP" if result["accepted"] else "ROLLBACK"
+        print(f"\n🔄 Auto-Evolver [{status}] job {result['job_id']}: {result['reason']}")
+        return evolution
+    
+    def rollback(self, ppo_agent: PPOTradingAgent) -> bool:
+        """Restaura la red anterior al último hot swap"""
+        
+        if self.previous_network is None:
+            return False
+        ppo_agent._set_network(self.previous_network)
+        self.previous_network = None
+        return True
+    
     def generate_evolution_report(self) -> str:
         """Genera reporte de evolución del sistema"""
         
@@ -2036,6 +5085,193 @@ class AutoEvolver:
         
         return report
 
+# ============================================================================
+# BACKGROUND RETRAINING (Worker de re-entrenamiento + hot swap)
+# ============================================================================
+
+def holdout_rollout(rollout: Dict, num_candles: int, holdout: int) -> Dict:
+    """
+    Recorta el rollout a las transiciones anteriores a la cola de validación
+    
+    Las T transiciones del episodio corresponden a las últimas T velas:
+    la transición t usa la vela num_candles - T + t. Se descartan las que
+    caen en las últimas `holdout` velas; el bootstrap pasa a ser el value
+    de la primera transición descartada.
+    """
+    
+    num_steps = len(rollout["rewards"])
+    keep = max(0, min(num_steps, num_steps - holdout))
+    if keep == num_steps:
+        return rollout
+    trimmed = {name: value[:keep] for name, value in rollout.items() if name != "last_values"}
+    trimmed["last_values"] = np.asarray(rollout["values"][keep], dtype=np.float32)
+    return trimmed
+
+
+def retrain_candidate(job: Dict) -> Dict:
+    """
+    Entrena un candidato sobre el snapshot y lo valida contra el modelo vivo
+    
+    Split temporal: la cola del episodio (job["holdout"], fracción de las
+    velas) no se usa para entrenar; el candidato solo se entrena con las
+    transiciones anteriores (holdout_rollout).
+    
+    Validación: CrossValidator.evaluate_performance offline (greedy, mismo
+    seed) sobre esa cola out-of-sample. Se acepta si el return medio del
+    candidato >= baseline + min_improvement y su MDD no supera
+    max(MDD del baseline, max_drawdown_threshold).
+    """
+    
+    started = time.time()
+    np.random.seed(job["seed"])
+    
+    def build_agent():
+        agent = PPOTradingAgent(job["state_dim"], job["action_dim"], job["hidden_sizes"])
+        agent.swap_params(job["params"])
+        return agent
+    
+    baseline, candidate = build_agent(), build_agent()
+    
+    candles = np.asarray(job["candles"], dtype=np.float64)
+    holdout = int(round(len(candles) * job.get("holdout", EVOLVER_CONFIG["validation_holdout"])))
+    rollout = holdout_rollout(job["rollout"], len(candles), holdout)
+    if len(rollout["rewards"]) >= PPO_CONFIG["batch_size"]:
+        train_result = candidate.train_rollout(rollout)
+    else:
+        train_result = {"status": "not_enough_data"}
+    if job.get("regime"):
+        AutoEvolver.apply_regime_penalty(candidate, job["regime"])
+    
+    result = {
+        "job_id": job["job_id"],
+        "regime": job.get("regime"),
+        "risk_events": job.get("risk_events", 0),
+        "train_result": train_result,
+        "train_samples": len(rollout["rewards"]),
+        "validation_samples": holdout,
+        "accepted": False
+    }
+    
+    validation_candles = candles[len(candles) - holdout:]
+    if len(validation_candles) < 20:
+        return {**result, "reason": "insufficient_validation_data", "elapsed": time.time() - started}
+    
+    validator = CrossValidator()
+    env = MarketEnvironment(exchange="paper")
+    env.bind_candles(validation_candles, seed=job["seed"])
+    episode_steps = min(100, len(validation_candles) - 1)
+    baseline_perf = validator.evaluate_performance(baseline, env, num_episodes=8, deterministic=True,
+                                                   episode_steps=episode_steps)
+    candidate_perf = validator.evaluate_performance(candidate, env, num_episodes=8, deterministic=True,
+                                                    episode_steps=episode_steps)
+    
+    mdd_limit = max(baseline_perf["max_drawdown"], RISK_CONFIG["max_drawdown_threshold"])
+    if candidate_perf["max_drawdown"] > mdd_limit:
+        reason = f"candidate_mdd {candidate_perf['max_drawdown']*100:.2f}% > {mdd_limit*100:.2f}%"
+    elif candidate_perf["avg_return"] < baseline_perf["avg_return"] + job.get("min_improvement", 0.0):
+        reason = (f"candidate {candidate_perf['avg_return']*100:+.3f}% < "
+                  f"baseline {baseline_perf['avg_return']*100:+.3f}%")
+    else:
+        result["accepted"] = True
+        result["params"] = candidate.network.params
+        reason = (f"candidate {candidate_perf['avg_return']*100:+.3f}% >= "
+                  f"baseline {baseline_perf['avg_return']*100:+.3f}%")
+    
+    return {**result, "reason": reason, "baseline": baseline_perf, "candidate": candidate_perf,
+            "elapsed": time.time() - started}
+
+
+def _retraining_worker(conn):
+    """Proceso worker: re-entrena snapshots hasta recibir ("stop",)"""
+    
+    while True:
+        message = conn.recv()
+        if message[0] == "stop":
+            break
+        
+        job = message[1]
+        try:
+            result = retrain_candidate(job)
+        except Exception as e:
+            result = {"job_id": job["job_id"], "accepted": False, "reason": f"error: {e}"}
+        conn.send(result)
+
+
+class BackgroundRetrainer:
+    """
+    Proceso dedicado de re-entrenamiento (un job a la vez)
+    
+    submit() y poll() no bloquean: el loop de trading sigue a la misma
+    latencia mientras el candidato se entrena y valida en el worker.
+    Si el worker muere (OOM, kill, segfault) el job se da por rechazado y
+    se lanza un worker nuevo: el trading nunca ve la excepción.
+    """
+    
+    def __init__(self):
+        self.busy = False
+        self.job_id = None
+        self.restarts = 0
+        self._start()
+    
+    def _start(self):
+        from multiprocessing import Pipe, Process
+        
+        self.connection, child_conn = Pipe()
+        self.process = Process(target=_retraining_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+    
+    def _restart(self):
+        """Descarta el worker caído (y su pipe) y lanza uno nuevo"""
+        
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.busy = False
+        self.restarts += 1
+        self._start()
+    
+    def submit(self, job: Dict):
+        if self.busy:
+            raise RuntimeError("Re-entrenamiento en curso")
+        if not self.process.is_alive():
+            self._restart()
+        self.connection.send(("retrain", job))
+        self.job_id = job["job_id"]
+        self.busy = True
+    
+    def poll(self, timeout: float = 0.0) -> Optional[Dict]:
+        """Resultado del job en curso (None si aún no terminó; rechazo si el worker murió)"""
+        
+        if not self.busy:
+            return None
+        try:
+            if self.connection.poll(timeout):
+                result = self.connection.recv()
+                self.busy = False
+                return result
+            if self.process.is_alive():
+                return None
+        except (EOFError, OSError):
+            pass
+        
+        print(f"[WARNING] Retraining worker died (exitcode {self.process.exitcode}); restarting")
+        self._restart()
+        return {"job_id": self.job_id, "accepted": False, "reason": "worker died"}
+    
+    def close(self):
+        """Detiene el worker"""
+        try:
+            self.connection.send(("stop",))
+            self.connection.close()
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+
 # ============================================================================
 # MULTI-ASSET PORTFOLIO MANAGER (INQUEBRANTABLE 3)
 # ============================================================================
@@ -2278,16 +5514,35 @@ class IntelligentInvestmentBot:
     - AI 4: Auto-Evolver
     """
     
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None, background_retraining: bool = False,
+                 async_sentiment: bool = False):
+        # Reloj compartido (SimulatedClock en backtests)
+        self.clock = clock or SYSTEM_CLOCK
+        
         self.env = MarketEnvironment(
             exchange=TRADING_CONFIG["exchange"],
-            symbol=TRADING_CONFIG["symbol"]
+            symbol=TRADING_CONFIG["symbol"],
+            clock=self.clock
         )
         
-        self.risk_manager = RiskManager()
-        self.sentiment_analyzer = SentimentAnalyzer()
+        self.sentiment_analyzer = SentimentAnalyzer(clock=self.clock)
         self.ppo_agent = PPOTradingAgent()
-        self.auto_evolver = AutoEvolver()
+        self.auto_evolver = AutoEvolver(clock=self.clock)
+        
+        # Detector de régimen compartido: Auto-Evolver (re-entrenamiento) + Risk Manager (sizing)
+        self.regime_detector = self.auto_evolver.regime_detector
+        self.risk_manager = RiskManager(clock=self.clock, regime_detector=self.regime_detector)
+        
+        # AI 4 en background: entrenar/validar fuera del loop + hot swap entre ticks
+        self.background_retraining = background_retraining
+        if background_retraining:
+            self.auto_evolver.start_background_worker()
+        
+        # AI 2 en background: el loop lee el último snapshot publicado (sin esperar noticias)
+        self.sentiment_refresher: Optional[SentimentRefresher] = None
+        if async_sentiment:
+            self.sentiment_refresher = SentimentRefresher(self.sentiment_analyzer, clock=self.clock)
+            self.sentiment_refresher.start()
         
         self.running = False
         self.episode_count = 0
@@ -2308,18 +5563,26 @@ class IntelligentInvestmentBot:
         while not done and step < max_steps:
             step += 1
             
+            # 0. AI 4: Hot swap si el worker terminó un candidato validado
+            if self.background_retraining:
+                self.auto_evolver.poll_retraining(self.ppo_agent)
+            
             # 1. Obtener datos del mercado
             market_data = self.env.get_market_data()
+            transition = self.regime_detector.update(market_data["price"],
+                                                     market_data.get("timestamp") or self.clock.now())
+            if transition and transition["from"] != "unknown":
+                print(f"   🔀 Régimen: {transition['from']} → {transition['to']}")
             
-            # 2. AI 2: Analizar sentimiento
-            sentiment_factor = self.sentiment_analyzer.analyze_market_sentiment()
+            # 2. AI 2: Analizar sentimiento (snapshot async o cálculo en el tick)
+            sentiment_matrix, sentiment_age = self._current_sentiment()
+            sentiment_factor = sentiment_matrix["signal_strength"]
             
             # 3. Construir estado
             state = self.env.get_state(market_data, sentiment_factor)
             
-            # 4. AI 3: Seleccionar acción
-            action, log_prob = self.ppo_agent.select_action(state, sentiment_factor)
-            value = self.ppo_agent.get_value(state)
+            # 4. AI 3: Seleccionar acción (acción, log-prob y valor en un solo pase)
+            action, log_prob, value = self.ppo_agent.act(state, sentiment_factor)
             
             # 5. AI 1: Verificar si el trade es permitido
             if not self.risk_manager.should_allow_trade(self.env, action):
@@ -2340,7 +5603,8 @@ class IntelligentInvestmentBot:
                 action_names = ["BUY", "SELL", "HOLD"]
                 print(f"\n[Step {step}]")
                 print(f"   Price: ${market_data['price']:.2f}")
-                print(f"   Sentiment: {sentiment_factor:+.2f}")
+                print(f"   Sentiment: {sentiment_factor:+.2f}" +
+                      (f" (age {sentiment_age:.0f}s)" if self.sentiment_refresher else ""))
                 print(f"   Action: {action_names[action]}")
                 print(f"   Reward: {reward:+.2f}")
                 print(f"   Portfolio: ${self.env.portfolio_value:.2f}")
@@ -2352,7 +5616,7 @@ class IntelligentInvestmentBot:
                 done = True
                 break
             
-            time.sleep(0.1)  # Simular delay
+            self.clock.sleep(0.1)  # Simular delay (instantáneo con SimulatedClock)
         
         # Fin del episodio
         print(f"\n{'='*70}")
@@ -2367,32 +5631,88 @@ class IntelligentInvestmentBot:
         # Calcular métricas
         sharpe = self.risk_manager.calculate_sharpe_ratio(self.env)
         print(f"Sharpe Ratio: {sharpe:.2f}")
+        print(f"Sortino Ratio: {self.env.performance.sortino_ratio():.2f}")
+        print(f"Max Drawdown: {self.env.performance.max_drawdown * 100:.2f}%")
         
-        # AI 3: Entrenar
-        print(f"\n🧠 Training PPO Agent...")
         final_value = self.ppo_agent.get_value(state)
-        train_result = self.ppo_agent.train(final_value)
-        
-        if train_result.get("status") == "success":
-            print(f"   ✅ Trained on {train_result['num_transitions']} transitions")
-            print(f"   Avg Reward: {train_result['avg_reward']:.2f}")
-        
-        # AI 4: Check si necesita re-entrenar
-        if self.auto_evolver.should_trigger_retraining(self.risk_manager, self.ppo_agent):
-            print(f"\n🔄 Auto-Evolver triggered!")
-            self.auto_evolver.retrain_with_penalty(
-                self.ppo_agent, 
-                self.risk_manager.risk_events
+        
+        if self.background_retraining:
+            # AI 3 + AI 4: Snapshot al worker (el swap ocurre entre ticks)
+            penalize = self.auto_evolver.should_trigger_retraining(self.risk_manager, self.ppo_agent)
+            submitted = self.auto_evolver.submit_retraining(
+                self.ppo_agent, self.env, self.risk_manager.risk_events,
+                penalize=penalize, final_value=final_value
             )
+            print(f"\n🧠 Background retraining: {'submitted' if submitted else 'busy (rollout skipped)'}")
+        else:
+            # AI 3: Entrenar
+            print(f"\n🧠 Training PPO Agent...")
+            train_result = self.ppo_agent.train(final_value)
+            
+            if train_result.get("status") == "success":
+                print(f"   ✅ Trained on {train_result['num_transitions']} transitions")
+                print(f"   Avg Reward: {train_result['avg_reward']:.2f}")
+            
+            # AI 4: Check si necesita re-entrenar
+            if self.auto_evolver.should_trigger_retraining(self.risk_manager, self.ppo_agent):
+                print(f"\n🔄 Auto-Evolver triggered!")
+                self.auto_evolver.retrain_with_penalty(
+                    self.ppo_agent, 
+                    self.risk_manager.risk_events
+                )
         
         self.episode_count += 1
         
-        # Guardar modelo
+        # Guardar modelo (checkpoint binario: cada episodio + snapshot cada 10)
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        self.ppo_agent.save_model(os.path.join(MODELS_DIR, "ppo_agent_latest.ckpt"))
         if self.episode_count % 10 == 0:
-            model_path = os.path.join(MODELS_DIR, f"ppo_agent_ep{self.episode_count}.json")
+            model_path = os.path.join(MODELS_DIR, f"ppo_agent_ep{self.episode_count}.ckpt")
             self.ppo_agent.save_model(model_path)
             print(f"\n💾 Model saved: {model_path}")
     
+    def _current_sentiment(self) -> Tuple[Dict, float]:
+        """Matriz de confianza + edad (s); snapshot demasiado viejo → neutral"""
+        
+        if self.sentiment_refresher is None:
+            return self.sentiment_analyzer.analyze_market_sentiment(), 0.0
+        
+        snapshot = self.sentiment_refresher.latest()
+        age = self.sentiment_refresher.age(snapshot)
+        if age > SENTIMENT_CONFIG["max_snapshot_age_seconds"]:
+            return SentimentAnalyzer._neutral_sentiment(), age
+        return snapshot["matrix"], age
+    
+    def train_offline(self, num_envs: int = 64, num_steps: int = 256, iterations: int = 10,
+                      candles: Optional[np.ndarray] = None, seed: Optional[int] = None) -> Dict:
+        """
+        Entrenamiento PPO offline con VectorizedMarketEnv
+        
+        Cada iteración recolecta num_envs × num_steps transiciones en lockstep
+        (sin red ni sleeps) y entrena el agente con ellas.
+        """
+        
+        vec_env = VectorizedMarketEnv(num_envs=num_envs, candles=candles, seed=seed)
+        
+        print(f"\n🧪 OFFLINE TRAINING: {num_envs} envs x {num_steps} steps x {iterations} iterations")
+        started = time.time()
+        
+        for iteration in range(iterations):
+            rollout = vec_env.collect_rollout(self.ppo_agent, num_steps)
+            result = self.ppo_agent.train_rollout(rollout)
+            print(f"   [{iteration + 1}/{iterations}] Avg Reward: {result['avg_reward']:+.4f} "
+                  f"| Episodes: {vec_env.episodes_completed}")
+        
+        elapsed = time.time() - started
+        print(f"   ✅ {vec_env.total_steps:,} transitions in {elapsed:.1f}s "
+              f"({vec_env.total_steps / max(elapsed, 1e-9):,.0f}/s)")
+        
+        return {
+            "transitions": vec_env.total_steps,
+            "episodes": vec_env.episodes_completed,
+            "elapsed": elapsed
+        }
+    
     def run_live_trading(self, num_episodes: int = 100):
         """Ejecuta trading en vivo"""
         
@@ -2427,6 +5747,9 @@ class IntelligentInvestmentBot:
                 time.sleep(5)
         
         print(f"\n✅ Trading completado - {self.episode_count} episodios")
+        self.auto_evolver.stop_background_worker()
+        if self.sentiment_refresher is not None:
+            self.sentiment_refresher.stop()
         
         # Generar reporte final
         self._generate_final_report()
@@ -2443,10 +5766,12 @@ class IntelligentInvestmentBot:
         print(f"   Max Drawdown: {max([d['drawdown'] for d in self.risk_manager.drawdown_history]) * 100:.2f}%" if self.risk_manager.drawdown_history else "N/A")
         
         print(f"\nAI 2 - Sentiment Analyzer:")
-        print(f"   Analyses Performed: {len(self.sentiment_analyzer.sentiment_history)}")
-        if self.sentiment_analyzer.sentiment_history:
-            avg_sentiment = np.mean([s['factor'] for s in self.sentiment_analyzer.sentiment_history])
-            print(f"   Avg Sentiment: {avg_sentiment:+.2f}")
+        history = self.sentiment_analyzer.sentiment_history
+        print(f"   Analyses Performed: {history.count}")
+        if history.count:
+            print(f"   Avg Sentiment: {history.mean_factor:+.2f}")
+            for window, summary in history.summaries().items():
+                print(f"   Sentiment {window}: {summary['factor']:+.2f} (P+ {summary['P+']:.2f} / P- {summary['P-']:.2f})")
         
         print(f"\nAI 3 - PPO Agent:")
         print(f"   Training Sessions: {len(self.ppo_agent.training_history)}")
@@ -2455,6 +5780,7 @@ class IntelligentInvestmentBot:
         print(f"   Evolutions: {len(self.auto_evolver.evolution_history)}")
         
         # Guardar reporte
+        os.makedirs(DATA_DIR, exist_ok=True)
         report_path = os.path.join(DATA_DIR, f"final_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
         with open(report_path, 'w') as f:
             f.write(f"Intelligent Investment Bot - Final Report\n")
@@ -2467,6 +5793,168 @@ class IntelligentInvestmentBot:
 # INQUEBRANTABLE 6: CROSS-VALIDATION ANTI-OVERFITTING
 # ============================================================================
 
+def backtest_candles(agent, candles: np.ndarray, num_episodes: int = 1,
+                     episode_steps: Optional[int] = None, deterministic: bool = True,
+                     random_start: bool = False, sentiment: float = 0.0,
+                     seed: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Backtest offline del agente sobre velas grabadas (sin red)
+    
+    Cada episodio es un env de VectorizedMarketEnv; todos avanzan en lockstep
+    hasta su primer done (MDD, capital agotado, fin de velas o episode_steps).
+    Mismo seed = mismos starts, acciones y métricas.
+    
+    Returns:
+        métricas por episodio (arrays (num_episodes,)) con la semántica de
+        PerformanceMetrics por step: returns, rewards, max_drawdown,
+        sharpe_ratio, sortino_ratio, calmar_ratio, wins, losses, steps
+    """
+    
+    candles = np.asarray(candles, dtype=np.float64)
+    episode_steps = episode_steps or len(candles)
+    rng = np.random.default_rng(seed)
+    env = VectorizedMarketEnv(num_envs=num_episodes, candles=candles, max_episode_steps=episode_steps,
+                              sentiment=sentiment, seed=seed, random_start=random_start)
+    
+    initial_capital = env.initial_capital
+    equity = np.full((episode_steps + 1, num_episodes), np.nan)
+    equity[0] = initial_capital
+    rewards = np.zeros(num_episodes)
+    wins = np.zeros(num_episodes, dtype=np.int64)
+    losses = np.zeros(num_episodes, dtype=np.int64)
+    steps = np.zeros(num_episodes, dtype=np.int64)
+    active = np.ones(num_episodes, dtype=bool)
+    
+    for t in range(1, episode_steps + 1):
+        actions, _, _ = agent.act(env.states, env.sentiment, deterministic=deterministic, rng=rng)
+        _, step_rewards, dones = env.step(actions)
+        
+        equity[t, active] = env.step_portfolio_value[active]
+        rewards[active] += step_rewards[active]
+        wins += active & (env.step_realized_pnl > 0)
+        losses += active & (env.step_realized_pnl < 0)
+        steps[active] += 1
+        active &= ~dones
+        if not active.any():
+            break
+    
+    # Equity terminada: forward-fill tras el done de cada episodio
+    equity = equity[:int(steps.max()) + 1]
+    for t in range(1, len(equity)):
+        equity[t] = np.where(np.isnan(equity[t]), equity[t - 1], equity[t])
+    
+    # Momentos de returns por step (= PerformanceMetrics.update por step)
+    periods = PerformanceMetrics().periods_per_year
+    excess_target = RISK_CONFIG["risk_free_rate"] / periods
+    step_returns = equity[1:] / equity[:-1] - 1
+    valid = np.arange(1, len(equity))[:, None] <= steps[None, :]
+    count = np.maximum(steps, 1)
+    mean = np.where(valid, step_returns, 0.0).sum(axis=0) / count
+    std = np.sqrt(np.where(valid, (step_returns - mean) ** 2, 0.0).sum(axis=0) / count)
+    downside = np.sqrt(np.where(valid, np.minimum(step_returns, 0.0) ** 2, 0.0).sum(axis=0) / count)
+    
+    annualize = np.sqrt(periods)
+    sharpe = np.divide(mean - excess_target, std, out=np.zeros(num_episodes), where=(std > 0) & (steps >= 2))
+    sortino = np.divide(mean - excess_target, downside, out=np.zeros(num_episodes), where=(downside > 0) & (steps >= 2))
+    
+    final = equity[-1]
+    peaks = np.maximum.accumulate(equity, axis=0)
+    max_drawdown = ((peaks - equity) / peaks).max(axis=0)
+    exponent = np.log(np.maximum(final, 1e-12) / initial_capital) * periods / count
+    annualized = np.where(final > 0, np.expm1(np.minimum(exponent, 700.0)), 0.0)
+    calmar = np.divide(annualized, max_drawdown, out=np.zeros(num_episodes), where=max_drawdown > 0)
+    
+    return {
+        "returns": final / initial_capital - 1,
+        "rewards": rewards,
+        "max_drawdown": max_drawdown,
+        "sharpe_ratio": sharpe * annualize,
+        "sortino_ratio": sortino * annualize,
+        "calmar_ratio": calmar,
+        "wins": wins,
+        "losses": losses,
+        "steps": steps
+    }
+
+
+def walk_forward_folds(num_candles: int, train_size: int, test_size: int,
+                       step: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """Ventanas rolling (train_start, test_start, test_end), avanzando `step` velas"""
+    
+    step = step or test_size
+    return [(start, start + train_size, start + train_size + test_size)
+            for start in range(0, num_candles - train_size - test_size + 1, step)]
+
+
+# Velas compartidas del worker (asignadas una vez por proceso en el initializer)
+_SHARED_CANDLES: Optional[np.ndarray] = None
+
+
+def create_shared_candles(candles: np.ndarray):
+    """Copia las velas a un segmento de shared memory (el caller hace close/unlink)"""
+    
+    from multiprocessing import shared_memory
+    
+    shm = shared_memory.SharedMemory(create=True, size=candles.nbytes)
+    np.ndarray(candles.shape, dtype=np.float64, buffer=shm.buf)[:] = candles
+    return shm
+
+
+def shared_candles() -> Optional[np.ndarray]:
+    """Velas del initializer en este proceso worker (None fuera de un pool)"""
+    return _SHARED_CANDLES
+
+
+def init_shared_candles(shm_name: str, shape: Tuple[int, ...]):
+    """Initializer del pool: conecta las velas en memoria compartida (solo lectura)"""
+    
+    global _SHARED_CANDLES
+    from multiprocessing import resource_tracker, shared_memory
+    
+    # Python < 3.13: el segmento es del proceso padre, no registrarlo aquí
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+    finally:
+        resource_tracker.register = register
+    
+    candles = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    candles.flags.writeable = False
+    _SHARED_CANDLES = candles
+    init_shared_candles.shm = shm  # Mantener el mapping vivo
+
+
+def _walk_forward_fold(task: Dict) -> Dict:
+    """Entrena una copia del agente en la ventana train y la evalúa in/out-of-sample"""
+    
+    candles = task.get("candles", _SHARED_CANDLES)
+    train_start, test_start, test_end = task["window"]
+    seed = task["seed"]
+    np.random.seed(seed)
+    
+    agent = PPOTradingAgent(task["state_dim"], task["action_dim"], task["hidden_sizes"])
+    agent._set_network(ActorCriticMLP.from_params({name: np.array(value) for name, value in task["params"].items()}))
+    
+    train_candles = candles[train_start:test_start]
+    vec_env = VectorizedMarketEnv(num_envs=task["num_envs"], candles=train_candles, seed=seed)
+    for _ in range(task["iterations"]):
+        agent.train_rollout(vec_env.collect_rollout(agent, task["num_steps"]))
+    
+    in_sample = backtest_candles(agent, train_candles, seed=seed)
+    out_of_sample = backtest_candles(agent, candles[test_start:test_end], seed=seed)
+    
+    return {
+        "fold": task["fold"],
+        "window": task["window"],
+        "train_samples": test_start - train_start,
+        "test_samples": test_end - test_start,
+        "train_transitions": vec_env.total_steps,
+        "in_sample": {name: float(value[0]) for name, value in in_sample.items()},
+        "out_of_sample": {name: float(value[0]) for name, value in out_of_sample.items()}
+    }
+
+
 class CrossValidator:
     """
     INQUEBRANTABLE 6: Walk-forward Analysis para prevenir overfitting
@@ -2480,7 +5968,8 @@ class CrossValidator:
     GARANTÍA: El bot NO desplegará una estrategia overfitted
     """
     
-    def __init__(self):
+    def __init__(self, clock: Optional[Clock] = None):
+        self.clock = clock or SYSTEM_CLOCK
         self.validation_history = []
         self.overfitting_alerts = []
     
@@ -2502,24 +5991,45 @@ class CrossValidator:
     
     def evaluate_performance(self, ppo_agent: PPOTradingAgent, 
                             env: MarketEnvironment, 
-                            num_episodes: int = 5) -> Dict:
+                            num_episodes: int = 5,
+                            candles: Optional[np.ndarray] = None,
+                            seed: Optional[int] = None,
+                            deterministic: bool = False,
+                            episode_steps: int = 100) -> Dict:
         """
         Evalúa performance del agente en un conjunto de datos
         
-        Returns: {avg_reward, avg_return, sharpe_ratio, max_drawdown}
+        MODOS:
+        - Offline (candles o env.bind_candles): episodios vectorizados sobre
+          velas grabadas, sin red; mismo seed = mismo resultado
+        - Live: env.get_market_data() paso a paso (APIs / random walk)
+        
+        Returns: {avg_reward, avg_return, sharpe_ratio, sortino_ratio,
+                  calmar_ratio, win_rate, max_drawdown}
         """
+        
+        if candles is None:
+            candles = env.candles
+        if candles is not None:
+            return self._evaluate_offline(ppo_agent, env, candles, num_episodes, seed,
+                                          deterministic, episode_steps)
+        
         rewards = []
-        returns = []
         max_drawdowns = []
+        sortinos = []
+        calmars = []
+        wins = 0
+        trades_closed = 0
+        
+        # Returns por episodio en el motor incremental (1 período = 1 episodio)
+        episode_metrics = PerformanceMetrics(periods_per_year=1, risk_free_rate=0.0)
         
         for ep in range(num_episodes):
             env.reset()
             episode_reward = 0
             initial_value = env.portfolio_value
-            peak = initial_value
-            max_dd = 0
             
-            for step in range(100):  # 100 pasos por episodio
+            for step in range(episode_steps):  # 100 pasos por episodio
                 # Obtener market data
                 market_data = env.get_market_data()
                 sentiment = 0.0  # Neutral por defecto
@@ -2530,46 +6040,78 @@ class CrossValidator:
                 # Elegir acción usando select_action (método correcto de PPO)
                 action, log_prob = ppo_agent.select_action(state, sentiment)
                 
-                # Ejecutar acción
+                # Ejecutar acción (actualiza env.performance: MDD, returns, trades)
                 reward, done = env.execute_action(action, market_data)
                 episode_reward += reward
                 
-                # Track MDD
-                if env.portfolio_value > peak:
-                    peak = env.portfolio_value
-                dd = (peak - env.portfolio_value) / peak
-                if dd > max_dd:
-                    max_dd = dd
-                
                 if done:
                     break
             
             final_return = (env.portfolio_value - initial_value) / initial_value
             rewards.append(episode_reward)
-            returns.append(final_return)
-            max_drawdowns.append(max_dd)
+            episode_metrics.update_return(final_return)
+            max_drawdowns.append(env.performance.max_drawdown)
+            sortinos.append(env.performance.sortino_ratio())
+            calmars.append(env.performance.calmar_ratio())
+            wins += env.performance.wins
+            trades_closed += env.performance.wins + env.performance.losses
         
         return {
             "avg_reward": np.mean(rewards),
-            "avg_return": np.mean(returns),
-            "std_return": np.std(returns),
-            "sharpe_ratio": np.mean(returns) / (np.std(returns) + 1e-8),
+            "avg_return": episode_metrics.mean_return,
+            "std_return": episode_metrics.std_return,
+            "sharpe_ratio": episode_metrics.mean_return / (episode_metrics.std_return + 1e-8),
+            "sortino_ratio": float(np.mean(sortinos)),
+            "calmar_ratio": float(np.mean(calmars)),
+            "win_rate": wins / trades_closed if trades_closed > 0 else 0.0,
             "max_drawdown": np.max(max_drawdowns)
         }
     
+    def _evaluate_offline(self, ppo_agent: PPOTradingAgent, env: MarketEnvironment,
+                          candles, num_episodes: int, seed: Optional[int],
+                          deterministic: bool, episode_steps: int) -> Dict:
+        """Episodios en lockstep sobre velas grabadas (métricas vectorizadas)"""
+        
+        candles = np.asarray(candles, dtype=np.float64)
+        if candles.ndim == 1:
+            candles = np.column_stack([candles, np.ones_like(candles)])
+        if seed is None:
+            seed = env.replay_seed
+        
+        episode_steps = min(episode_steps, len(candles))
+        episodes = backtest_candles(ppo_agent, candles, num_episodes=num_episodes,
+                                    episode_steps=episode_steps, deterministic=deterministic,
+                                    random_start=len(candles) > episode_steps, seed=seed)
+        
+        returns = episodes["returns"]
+        trades_closed = int(episodes["wins"].sum() + episodes["losses"].sum())
+        return {
+            "avg_reward": float(episodes["rewards"].mean()),
+            "avg_return": float(returns.mean()),
+            "std_return": float(returns.std()),
+            "sharpe_ratio": float(returns.mean() / (returns.std() + 1e-8)),
+            "sortino_ratio": float(episodes["sortino_ratio"].mean()),
+            "calmar_ratio": float(episodes["calmar_ratio"].mean()),
+            "win_rate": int(episodes["wins"].sum()) / trades_closed if trades_closed > 0 else 0.0,
+            "max_drawdown": float(episodes["max_drawdown"].max()),
+            "episode_returns": returns.tolist()
+        }
+    
     def detect_overfitting(self, train_perf: Dict, test_perf: Dict, 
-                          threshold: float = 0.8) -> bool:
+                          threshold: float = 0.8, metric: str = "avg_return") -> bool:
         """
         INQUEBRANTABLE 6: Detecta overfitting comparando train vs test
         
         CRITERIO: Si test_performance < 80% de train_performance → OVERFITTING
         
+        metric: clave comparada (default avg_return). Con ventanas de distinto
+        largo usar una métrica normalizada (p.ej. mean_step_return).
+        
         Returns: True si hay overfitting
         """
         
-        # Comparar avg_return (métrica principal)
-        train_return = train_perf["avg_return"]
-        test_return = test_perf["avg_return"]
+        train_return = train_perf[metric]
+        test_return = test_perf[metric]
         
         if train_return <= 0:
             # Si train es negativo, no podemos usar ratio
@@ -2580,8 +6122,8 @@ class CrossValidator:
         print("\n" + "="*70)
         print("INQUEBRANTABLE 6: Overfitting Detection")
         print("="*70)
-        print(f"Train performance: {train_return*100:+.2f}%")
-        print(f"Test performance:  {test_return*100:+.2f}%")
+        print(f"Train performance: {train_return*100:+.4f}% ({metric})")
+        print(f"Test performance:  {test_return*100:+.4f}% ({metric})")
         print(f"Performance ratio: {performance_ratio:.2f}x")
         print(f"Threshold: {threshold:.2f}x")
         
@@ -2592,7 +6134,8 @@ class CrossValidator:
             print("="*70 + "\n")
             
             alert = {
-                "timestamp": datetime.now(),
+                "timestamp": self.clock.now(),
+                "metric": metric,
                 "train_return": train_return,
                 "test_return": test_return,
                 "ratio": performance_ratio,
@@ -2607,46 +6150,129 @@ class CrossValidator:
             return False
     
     def walk_forward_analysis(self, ppo_agent: PPOTradingAgent,
-                             price_history: List[float],
-                             window_size: int = 30) -> Dict:
+                             price_history,
+                             window_size: int = 30,
+                             test_size: int = 7,
+                             step: Optional[int] = None,
+                             workers: Optional[int] = None,
+                             iterations: int = 5,
+                             num_envs: int = 16,
+                             num_steps: int = 32,
+                             seed: int = 0) -> Dict:
         """
         INQUEBRANTABLE 6: Walk-forward analysis con ventanas móviles
         
         ESTRATEGIA:
-        - Entrenar en últimos 30 días
-        - Validar en siguientes 7 días
-        - Re-entrenar semanalmente con datos frescos
-        
-        Returns: {validated: bool, performance: Dict}
+        - Folds rolling: entrenar en `window_size` velas, validar en las
+          `test_size` siguientes, avanzar `step` velas (default: test_size)
+        - Cada fold entrena una copia del agente (offline, vectorizado) en un
+          proceso worker; las velas se comparten en memoria (solo lectura)
+        - Métricas out-of-sample agregadas + detección de overfitting (OOS vs IS)
+          sobre el return medio por step: train y test tienen largos distintos
+        
+        Args:
+            price_history: closes (T,) o velas (T, 2) [close, volume]
+            workers: procesos (None = min(folds, CPUs); <= 1 = en proceso)
+        
+        Returns: {validated, overfitting, folds, out_of_sample, in_sample, ...}
         """
         
-        if len(price_history) < window_size + 7:
-            return {"validated": False, "reason": "insufficient_data"}
+        candles = np.asarray(price_history, dtype=np.float64)
+        if candles.ndim == 1:
+            candles = np.column_stack([candles, np.ones_like(candles)])
         
-        # Train window: últimos 30 días
-        train_window = price_history[-window_size:]
+        folds = walk_forward_folds(len(candles), window_size, test_size, step)
+        if not folds:
+            return {"validated": False, "reason": "insufficient_data"}
         
-        # Test window: próximos 7 días (simulado con los últimos 7)
-        test_window = price_history[-(window_size+7):-window_size]
+        if workers is None:
+            workers = min(len(folds), os.cpu_count() or 1)
         
         print("\n[INQUEBRANTABLE 6] Walk-forward Analysis")
-        print(f"  Train window: {len(train_window)} days")
-        print(f"  Test window: {len(test_window)} days")
+        print(f"  Folds: {len(folds)} | Train window: {window_size} | Test window: {test_size} | Workers: {workers}")
+        started = time.time()
+        
+        params = {name: np.asarray(value) for name, value in ppo_agent.network.params.items()}
+        tasks = [{
+            "fold": i,
+            "window": window,
+            "seed": seed + i,
+            "params": params,
+            "state_dim": ppo_agent.state_dim,
+            "action_dim": ppo_agent.action_dim,
+            "hidden_sizes": ppo_agent.network.hidden_sizes,
+            "iterations": iterations,
+            "num_envs": num_envs,
+            "num_steps": num_steps
+        } for i, window in enumerate(folds)]
+        
+        if workers <= 1:
+            results = [_walk_forward_fold({**task, "candles": candles}) for task in tasks]
+        else:
+            results = self._run_folds_parallel(tasks, candles, workers)
+        results.sort(key=lambda result: result["fold"])
+        
+        elapsed = time.time() - started
+        in_sample = self._aggregate_folds([r["in_sample"] for r in results])
+        out_of_sample = self._aggregate_folds([r["out_of_sample"] for r in results])
         
-        # Simular entrenamiento y validación
-        # En producción: realmente entrenar en train_window
+        print(f"  OOS return: {out_of_sample['avg_return']*100:+.2f}% avg | "
+              f"{out_of_sample['compounded_return']*100:+.2f}% compounded | "
+              f"{out_of_sample['positive_folds']}/{len(results)} folds positive ({elapsed:.1f}s)")
+        
+        overfitting = self.detect_overfitting(in_sample, out_of_sample, metric="mean_step_return")
         
         validation = {
-            "timestamp": datetime.now(),
+            "timestamp": self.clock.now(),
             "window_size": window_size,
-            "train_samples": len(train_window),
-            "test_samples": len(test_window),
+            "test_size": test_size,
+            "num_folds": len(results),
+            "train_samples": results[0]["train_samples"],
+            "test_samples": results[0]["test_samples"],
+            "in_sample": in_sample,
+            "out_of_sample": out_of_sample,
+            "overfitting": overfitting,
+            "folds": results,
+            "elapsed": elapsed,
             "validated": True
         }
         
         self.validation_history.append(validation)
         
         return validation
+    
+    @staticmethod
+    def _run_folds_parallel(tasks: List[Dict], candles: np.ndarray, workers: int) -> List[Dict]:
+        """Folds en un pool de procesos con las velas en shared memory"""
+        
+        from multiprocessing import Pool
+        
+        shm = create_shared_candles(candles)
+        try:
+            with Pool(workers, initializer=init_shared_candles, initargs=(shm.name, candles.shape)) as pool:
+                return list(pool.imap_unordered(_walk_forward_fold, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    @staticmethod
+    def _aggregate_folds(fold_metrics: List[Dict]) -> Dict:
+        """Agrega métricas de los folds (returns encadenados = equity OOS)"""
+        
+        returns = np.array([m["returns"] for m in fold_metrics])
+        steps = np.maximum([m["steps"] for m in fold_metrics], 1)
+        # Return geométrico por step: comparable entre ventanas de distinto largo
+        step_returns = np.power(np.maximum(1 + returns, 0.0), 1.0 / steps) - 1
+        return {
+            "avg_return": float(returns.mean()),
+            "mean_step_return": float(step_returns.mean()),
+            "std_return": float(returns.std()),
+            "compounded_return": float(np.prod(1 + returns) - 1),
+            "sharpe_ratio": float(returns.mean() / (returns.std() + 1e-8)),
+            "avg_sharpe_ratio": float(np.mean([m["sharpe_ratio"] for m in fold_metrics])),
+            "max_drawdown": float(max(m["max_drawdown"] for m in fold_metrics)),
+            "positive_folds": int((returns > 0).sum())
+        }
 
 # ============================================================================
 # CLI
@@ -2656,12 +6282,20 @@ def main():
     """Función principal"""
     
     import argparse
+    import warnings
+    
+    warnings.filterwarnings('ignore')
+    load_environment()
     
     parser = argparse.ArgumentParser(description="Intelligent Investment Bot (II)")
     parser.add_argument("--episodes", type=int, default=10, help="Number of trading episodes")
     parser.add_argument("--exchange", type=str, default="paper", choices=["binance", "kraken", "coinbase", "paper"])
     parser.add_argument("--symbol", type=str, default="BTCUSDT")
     parser.add_argument("--capital", type=float, default=1000.0)
+    parser.add_argument("--offline-envs", type=int, default=0, help="Entrenamiento offline con N envs vectorizados (0 = trading normal)")
+    parser.add_argument("--offline-steps", type=int, default=256, help="Steps por env e iteración en modo offline")
+    parser.add_argument("--background-retrain", action="store_true", help="Re-entrenar en un proceso aparte con hot swap entre ticks")
+    parser.add_argument("--async-sentiment", action="store_true", help="Refrescar sentimiento en un thread aparte (el loop lee el último snapshot)")
     
     args = parser.parse_args()
     
@@ -2676,7 +6310,11 @@ def main():
         print(f"⚠️  Auto-corrected symbol to BTC-USD for Coinbase")
     
     # Crear y ejecutar bot
-    bot = IntelligentInvestmentBot()
+    bot = IntelligentInvestmentBot(background_retraining=args.background_retrain,
+                                   async_sentiment=args.async_sentiment)
+    if args.offline_envs > 0:
+        bot.train_offline(num_envs=args.offline_envs, num_steps=args.offline_steps, iterations=args.episodes)
+        return
     bot.run_live_trading(num_episodes=args.episodes)
 
 if __name__ == "__main__":
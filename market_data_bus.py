@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BUS DE PRECIOS EN MEMORIA COMPARTIDA
+Un único proceso publica precios, todos los demás los leen sin copias
+
+PROBLEMA:
+multi_crypto_trading.py, paper_trading_realistic.py y el dashboard corren en
+paralelo y cada uno consulta los mismos exchanges por separado.
+
+SOLUCIÓN:
+- MarketDataPublisher: único proceso que consulta los exchanges y escribe
+  el último quote + velas rolling de todos los pares en un segmento
+  multiprocessing.shared_memory
+- SharedPriceBus.attach(): estrategias, risk y dashboard mapean el segmento
+  en modo solo-lectura (vistas numpy, cero copias)
+- Seqlock por par: el writer pone la secuencia en impar mientras escribe;
+  el lector reintenta si la secuencia cambió o es impar (lectura consistente
+  sin locks entre procesos)
+
+- PriceBusReader: lector de los consumidores; descarta quotes viejos
+  (publisher caído o reiniciado) y re-conecta al segmento nuevo
+
+Añadir otra estrategia NO añade tráfico a los exchanges.
+
+USO:
+    python market_data_bus.py            # Inicia el publisher
+    bus = SharedPriceBus.attach()        # En cualquier otro proceso
+    bus.read_quote("ETH-USD")
+    reader = PriceBusReader()            # Consumidores: None si no hay quote fresco
+    reader.price("ETH-USD") or fetch_coinbase_spot("ETH-USD")
+"""
+
+import os
+import sys
+import time
+import requests
+import numpy as np
+from datetime import datetime
+from multiprocessing import Event, Process, shared_memory
+from typing import Callable, Dict, List, Optional
+
+# Configuración
+BUS_NAME = "ii_market_bus"
+BUS_MAGIC = 0x494942  # "IIB"
+BUS_VERSION = 2
+PAIR_NAME_BYTES = 16
+CANDLE_CAPACITY = 100
+CANDLE_SECONDS = 60
+PUBLISH_INTERVAL = 10
+MAX_QUOTE_AGE = 3 * PUBLISH_INTERVAL  # Quote más viejo → publisher caído, usar HTTP
+
+QUOTE_FIELDS = ("price", "bid", "ask", "volume_24h", "timestamp")
+CANDLE_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+
+_HEADER_WORDS = 5  # magic, version, n_pairs, candle_capacity, owner_pid
+
+
+def _segment_size(n_pairs: int, capacity: int) -> int:
+    """Tamaño en bytes del segmento para n_pairs y capacity velas"""
+    return (
+        _HEADER_WORDS * 8
+        + n_pairs * PAIR_NAME_BYTES
+        + n_pairs * 8                              # seqlock
+        + n_pairs * 2 * 8                          # count, head
+        + n_pairs * len(QUOTE_FIELDS) * 8          # quote
+        + n_pairs * capacity * len(CANDLE_FIELDS) * 8  # velas
+    )
+
+
+class SharedPriceBus:
+    """
+    Segmento de memoria compartida con quotes y velas de todos los pares
+
+    LAYOUT (todo alineado a 8 bytes):
+    - header   uint64[5]          magic, version, n_pairs, candle_capacity, pid del publisher
+    - names    S16[n_pairs]       nombres de pares ("ETH-USD")
+    - seq      uint64[n_pairs]    seqlock por par (impar = escritura en curso)
+    - meta     uint64[n_pairs,2]  velas almacenadas, índice de la última vela
+    - quotes   float64[n_pairs,5] price, bid, ask, volume_24h, timestamp
+    - candles  float64[n_pairs,capacity,6] ring buffer de velas OHLCV
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        if owner:
+            n_pairs, capacity = int(header[2]), int(header[3])
+        else:
+            if int(header[0]) != BUS_MAGIC or int(header[1]) != BUS_VERSION:
+                raise ValueError(f"Segmento '{shm.name}' no es un bus de precios v{BUS_VERSION}")
+            n_pairs, capacity = int(header[2]), int(header[3])
+
+        self.n_pairs = n_pairs
+        self.capacity = capacity
+
+        offset = _HEADER_WORDS * 8
+        self._names = np.ndarray((n_pairs,), dtype=f"S{PAIR_NAME_BYTES}", buffer=shm.buf, offset=offset)
+        offset += n_pairs * PAIR_NAME_BYTES
+        self._seq = np.ndarray((n_pairs,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += n_pairs * 8
+        self._meta = np.ndarray((n_pairs, 2), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += n_pairs * 2 * 8
+        self._quotes = np.ndarray((n_pairs, len(QUOTE_FIELDS)), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += n_pairs * len(QUOTE_FIELDS) * 8
+        self._candles = np.ndarray((n_pairs, capacity, len(CANDLE_FIELDS)), dtype=np.float64,
+                                   buffer=shm.buf, offset=offset)
+
+        self._header = header
+        self.pairs = [name.decode("ascii") for name in self._names]
+        self._index = {pair: i for i, pair in enumerate(self.pairs)}
+
+        if not owner:
+            # Lectores: vistas solo-lectura
+            for arr in (self._header, self._names, self._seq, self._meta, self._quotes, self._candles):
+                arr.flags.writeable = False
+
+    # ------------------------------------------------------------------
+    # Creación / conexión
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def create(cls, pairs: List[str], candle_capacity: int = CANDLE_CAPACITY,
+               name: str = BUS_NAME, replace: bool = False,
+               probe_seconds: float = 0.2) -> "SharedPriceBus":
+        """
+        Crea el segmento (proceso publisher)
+
+        Si ya existe un segmento con ese nombre solo se reemplaza cuando es un
+        bus huérfano (publisher muerto y secuencias quietas durante
+        probe_seconds). Un bus vivo o un segmento ajeno → FileExistsError,
+        salvo replace=True explícito.
+        """
+
+        size = _segment_size(len(pairs), candle_capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            if not replace:
+                cls._check_orphan(name, probe_seconds)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = [0, BUS_VERSION, len(pairs), candle_capacity, os.getpid()]
+
+        bus = cls(shm, owner=True)
+        bus._names[:] = [pair.encode("ascii")[:PAIR_NAME_BYTES] for pair in pairs]
+        bus.pairs = list(pairs)
+        bus._index = {pair: i for i, pair in enumerate(pairs)}
+        bus._seq[:] = 0
+        bus._meta[:] = 0
+        bus._quotes[:] = 0.0
+
+        # Magic al final: los lectores solo aceptan el segmento ya inicializado
+        header[0] = BUS_MAGIC
+        return bus
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True  # Existe, pero de otro usuario
+        return True
+
+    @classmethod
+    def _check_orphan(cls, name: str, probe_seconds: float):
+        """Lanza FileExistsError salvo que el segmento existente sea un bus huérfano"""
+
+        try:
+            existing = cls.attach(name)
+        except (ValueError, TypeError):
+            raise FileExistsError(
+                f"Segmento '{name}' existe y no es un bus de precios v{BUS_VERSION} "
+                f"(usar replace=True para destruirlo)") from None
+
+        try:
+            owner_pid = int(existing._header[4])
+            before = existing._seq.copy()
+            if probe_seconds > 0:
+                time.sleep(probe_seconds)
+            writing = bool((existing._seq & 1).any()) or not np.array_equal(before, existing._seq)
+        finally:
+            existing.close()
+
+        if writing or cls._pid_alive(owner_pid):
+            raise FileExistsError(
+                f"Bus '{name}' en uso por el publisher pid {owner_pid} "
+                f"(detenerlo o usar replace=True)")
+        print(f"[WARNING] Reemplazando bus huérfano '{name}' (publisher pid {owner_pid} no está vivo)")
+
+    @classmethod
+    def attach(cls, name: str = BUS_NAME) -> "SharedPriceBus":
+        """Conecta a un segmento existente en modo solo-lectura"""
+
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: evitar que el resource_tracker registre el segmento
+            # (lo destruiría al terminar un proceso lector)
+            from multiprocessing import resource_tracker
+            register = resource_tracker.register
+            resource_tracker.register = lambda *args, **kwargs: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    def close(self):
+        """Libera las vistas y desmapea el segmento"""
+
+        self._header = self._names = self._seq = None
+        self._meta = self._quotes = self._candles = None
+        self.shm.close()
+
+    def unlink(self):
+        """Destruye el segmento (solo el publisher)"""
+
+        if self.owner:
+            self.shm.unlink()
+
+    # ------------------------------------------------------------------
+    # Escritura (publisher)
+    # ------------------------------------------------------------------
+
+    def publish_tick(self, pair: str, price: float, volume: float = 0.0,
+                     timestamp: Optional[float] = None, bid: float = 0.0, ask: float = 0.0,
+                     volume_24h: float = 0.0, candle_seconds: int = CANDLE_SECONDS):
+        """Publica un tick: actualiza quote y vela actual bajo el seqlock"""
+
+        i = self._index[pair]
+        ts = time.time() if timestamp is None else timestamp
+        bucket_start = ts - (ts % candle_seconds)
+
+        self._seq[i] += 1  # impar: escritura en curso
+        try:
+            self._quotes[i] = (price, bid or price, ask or price, volume_24h, ts)
+
+            count, head = int(self._meta[i, 0]), int(self._meta[i, 1])
+            current = self._candles[i, head]
+            if count > 0 and current[0] == bucket_start:
+                if price > current[2]:
+                    current[2] = price
+                if price < current[3]:
+                    current[3] = price
+                current[4] = price
+                current[5] += volume
+            else:
+                if count > 0:
+                    head = (head + 1) % self.capacity
+                self._candles[i, head] = (bucket_start, price, price, price, price, volume)
+                self._meta[i, 0] = min(count + 1, self.capacity)
+                self._meta[i, 1] = head
+        finally:
+            self._seq[i] += 1  # par: estable
+
+    # ------------------------------------------------------------------
+    # Lectura (consumidores)
+    # ------------------------------------------------------------------
+
+    def version(self, pair: str) -> int:
+        """Versión actual del par (cambia en cada publicación)"""
+        return int(self._seq[self._index[pair]])
+
+    def read_quote(self, pair: str, max_retries: int = 1000) -> Optional[Dict]:
+        """Lee el último quote de forma consistente (None si no hay datos)"""
+
+        i = self._index.get(pair)
+        if i is None:
+            return None
+
+        for _ in range(max_retries):
+            before = int(self._seq[i])
+            if before & 1:
+                continue
+            price, bid, ask, volume_24h, ts = self._quotes[i].tolist()
+            if int(self._seq[i]) == before:
+                if before == 0:
+                    return None
+                return {
+                    "pair": pair,
+                    "price": price,
+                    "bid": bid,
+                    "ask": ask,
+                    "volume_24h": volume_24h,
+                    "timestamp": ts,
+                    "version": before
+                }
+        return None
+
+    def read_candles(self, pair: str, out: Optional[np.ndarray] = None,
+                     max_retries: int = 1000) -> np.ndarray:
+        """
+        Copia consistente de las velas (más antigua → más reciente)
+
+        Si se pasa `out` (capacity × 6, preallocado) se reutiliza sin asignar memoria.
+        """
+
+        i = self._index[pair]
+        if out is None:
+            out = np.empty((self.capacity, len(CANDLE_FIELDS)), dtype=np.float64)
+
+        for _ in range(max_retries):
+            before = int(self._seq[i])
+            if before & 1:
+                continue
+            count, head = int(self._meta[i, 0]), int(self._meta[i, 1])
+            start = (head - count + 1) % self.capacity
+            if start + count <= self.capacity:
+                out[:count] = self._candles[i, start:start + count]
+            else:
+                first = self.capacity - start
+                out[:first] = self._candles[i, start:]
+                out[first:count] = self._candles[i, :count - first]
+            if int(self._seq[i]) == before:
+                return out[:count]
+        return out[:0]
+
+    def candles_view(self, pair: str) -> np.ndarray:
+        """
+        Vista cruda (cero copias) del ring buffer de velas del par
+
+        El orden es circular; combinar con version() antes/después para
+        validar la lectura.
+        """
+        return self._candles[self._index[pair]]
+
+    def closes(self, pair: str) -> List[float]:
+        """Precios de cierre de las velas (más antiguo → más reciente)"""
+        return self.read_candles(pair)[:, 4].tolist()
+
+    def latest_prices(self) -> Dict[str, float]:
+        """Último precio de todos los pares publicados"""
+
+        prices = {}
+        for pair in self.pairs:
+            quote = self.read_quote(pair)
+            if quote:
+                prices[pair] = quote["price"]
+        return prices
+
+
+def fetch_coinbase_spot(pair: str) -> Optional[float]:
+    """Obtiene precio spot de Coinbase (misma fuente que multi_crypto_trading)"""
+    try:
+        url = f"https://api.coinbase.com/v2/prices/{pair}/spot"
+        response = requests.get(url, timeout=5)
+        if response.status_code == 200:
+            data = response.json()
+            return float(data['data']['amount'])
+    except Exception as e:
+        print(f"[WARNING] Error getting {pair} price: {e}")
+    return None
+
+
+class MarketDataPublisher:
+    """Proceso único que consulta los exchanges y publica en el bus"""
+
+    def __init__(self, pairs: List[str], fetch_price: Callable[[str], Optional[float]] = fetch_coinbase_spot,
+                 candle_seconds: int = CANDLE_SECONDS, candle_capacity: int = CANDLE_CAPACITY,
+                 name: str = BUS_NAME, replace: bool = False):
+        self.pairs = list(pairs)
+        self.fetch_price = fetch_price
+        self.candle_seconds = candle_seconds
+        self.bus = SharedPriceBus.create(self.pairs, candle_capacity=candle_capacity, name=name, replace=replace)
+        self.polls = 0
+
+    def poll_once(self) -> int:
+        """Consulta todos los pares una vez; retorna cuántos se publicaron"""
+
+        published = 0
+        now = time.time()
+        for pair in self.pairs:
+            price = self.fetch_price(pair)
+            if price:
+                self.bus.publish_tick(pair, price, timestamp=now, candle_seconds=self.candle_seconds)
+                published += 1
+        self.polls += 1
+        return published
+
+    def run(self, interval: float = PUBLISH_INTERVAL, stop_event=None, ready_event=None):
+        """Loop de publicación hasta stop_event o CTRL+C"""
+
+        if ready_event is not None:
+            ready_event.set()
+        try:
+            while stop_event is None or not stop_event.is_set():
+                started = time.time()
+                published = self.poll_once()
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Bus: {published}/{len(self.pairs)} pares publicados")
+                remaining = interval - (time.time() - started)
+                if remaining > 0:
+                    if stop_event is not None:
+                        stop_event.wait(remaining)
+                    else:
+                        time.sleep(remaining)
+        except KeyboardInterrupt:
+            print("\n[INFO] Deteniendo publisher...")
+        finally:
+            self.bus.close()
+            self.bus.unlink()
+
+
+def _publisher_main(pairs, interval, candle_seconds, name, stop_event, ready_event):
+    publisher = MarketDataPublisher(pairs, candle_seconds=candle_seconds, name=name)
+    publisher.run(interval=interval, stop_event=stop_event, ready_event=ready_event)
+
+
+def start_publisher_process(pairs: List[str], interval: float = PUBLISH_INTERVAL,
+                            candle_seconds: int = CANDLE_SECONDS, name: str = BUS_NAME):
+    """Lanza el publisher en un proceso aparte; retorna (process, stop_event)"""
+
+    stop_event = Event()
+    ready_event = Event()
+    process = Process(target=_publisher_main,
+                      args=(pairs, interval, candle_seconds, name, stop_event, ready_event),
+                      daemon=True)
+    process.start()
+    ready_event.wait(timeout=30)
+    return process, stop_event
+
+
+def try_attach(name: str = BUS_NAME) -> Optional[SharedPriceBus]:
+    """Conecta al bus si hay un publisher corriendo (None si no existe)"""
+    try:
+        return SharedPriceBus.attach(name)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class PriceBusReader:
+    """
+    Lector del bus para los consumidores (trading, paper trading, dashboard)
+
+    - Quote con timestamp más viejo que max_age → None (el llamador usa su
+      fuente HTTP)
+    - Un quote viejo indica publisher caído o reiniciado: el lector suelta el
+      segmento (puede estar ya unlinkeado) y re-ejecuta try_attach(), como
+      mucho una vez cada retry_interval segundos
+    """
+
+    def __init__(self, name: str = BUS_NAME, max_age: float = MAX_QUOTE_AGE,
+                 retry_interval: float = PUBLISH_INTERVAL, bus: Optional[SharedPriceBus] = None,
+                 time_fn: Callable[[], float] = time.time):
+        self.name = name
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self.time_fn = time_fn
+        self.bus = bus
+        self.reattaches = 0
+        self._next_attach = 0.0
+        if bus is None:
+            self._attach()
+
+    @classmethod
+    def wrap(cls, bus) -> Optional["PriceBusReader"]:
+        """None / PriceBusReader / SharedPriceBus → lector (None si no hay bus)"""
+        if bus is None or isinstance(bus, cls):
+            return bus
+        return cls(bus.name, bus=bus)
+
+    @property
+    def connected(self) -> bool:
+        return self.bus is not None
+
+    def _attach(self):
+        now = self.time_fn()
+        if now < self._next_attach:
+            return
+        self._next_attach = now + self.retry_interval
+        self.bus = try_attach(self.name)
+
+    def _detach(self):
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+    def _fresh(self, quote: Optional[Dict]) -> bool:
+        return quote is not None and self.time_fn() - quote["timestamp"] <= self.max_age
+
+    def quote(self, pair: str) -> Optional[Dict]:
+        """Último quote del par si es fresco (None si viejo, sin datos o sin publisher)"""
+
+        if self.bus is None:
+            self._attach()
+            if self.bus is None:
+                return None
+
+        quote = self.bus.read_quote(pair)
+        if quote is None or self._fresh(quote):
+            return quote
+
+        # Quote viejo: re-conectar (el publisher pudo reiniciarse con un segmento nuevo)
+        self._detach()
+        self._attach()
+        if self.bus is None:
+            return None
+        self.reattaches += 1
+        quote = self.bus.read_quote(pair)
+        return quote if self._fresh(quote) else None
+
+    def price(self, pair: str) -> Optional[float]:
+        quote = self.quote(pair)
+        if quote and quote["price"] > 0:
+            return quote["price"]
+        return None
+
+    def latest_prices(self) -> Dict[str, float]:
+        """Último precio fresco de todos los pares publicados"""
+
+        if self.bus is None:
+            self._attach()
+            if self.bus is None:
+                return {}
+        prices = {}
+        for pair in list(self.bus.pairs):
+            price = self.price(pair)
+            if price is not None:
+                prices[pair] = price
+        return prices
+
+    def close(self):
+        self._detach()
+
+
+def main():
+    from multi_crypto_trading import CRYPTO_PAIRS
+
+    pairs = list(dict.fromkeys(["BTC-USD"] + CRYPTO_PAIRS))
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else PUBLISH_INTERVAL
+
+    print("\n" + "="*80)
+    print("📡 MARKET DATA BUS - PUBLISHER")
+    print("="*80)
+    print(f"Segmento: {BUS_NAME}")
+    print(f"Pares: {', '.join(pairs)}")
+    print(f"Intervalo: {interval}s | Velas: {CANDLE_SECONDS}s x {CANDLE_CAPACITY}")
+    print("="*80 + "\n")
+
+    MarketDataPublisher(pairs).run(interval=interval)
+
+
+if __name__ == "__main__":
+    main()
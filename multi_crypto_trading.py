@@ -17,11 +17,14 @@ CARACTERÍSTICAS:
 import os
 import time
 import json
+import heapq
 import requests
 import numpy as np
 from datetime import datetime, timedelta
 from collections import deque, defaultdict
+from multiprocessing import Pipe, Process
 from typing import Dict, List, Tuple, Optional
+from market_data_bus import PriceBusReader, fetch_coinbase_spot
 
 # Configuración
 CAPITAL_INICIAL = 40.0
@@ -31,6 +34,9 @@ TAKE_PROFIT_PERCENT = 0.03    # 3% (optimizado: cierra trades más rápido)
 MAX_POSITIONS = 3              # Máximo total (LONG + SHORT)
 ALLOW_SHORT_SELLING = True     # ✅ Activar Short Selling para ganar cuando baja el mercado
 CHECK_INTERVAL = 30
+SHARD_PROCESSES = int(os.getenv("MULTI_CRYPTO_SHARDS", "0"))  # 0 = todo en un proceso
+SENTIMENT_WEIGHT = 0.3         # Ajuste del score por sentimiento del activo (si hay servicio de sentimiento)
+NEWS_FEEDS = [url.strip() for url in os.getenv("MULTI_CRYPTO_NEWS_FEEDS", "").split(",") if url.strip()]  # Vacío = sin sentimiento
 
 # 🔴 AJUSTES CRÍTICOS PARA PRODUCCIÓN
 TRADING_FEE_PERCENT = 0.001    # 0.1% por operación (Coinbase Pro/Advanced Trade)
@@ -168,15 +174,334 @@ class TechnicalIndicators:
         return np.mean(recent_tr)
 
 
+def analyze_price_series(prices: List[float]) -> Dict:
+    """Analiza una serie de precios y genera señal de trading con filtros avanzados"""
+    if len(prices) < 15:
+        return {
+            "signal": "HOLD",
+            "confidence": 0.0,
+            "reasons": [f"Gathering data... ({len(prices)}/15)"],
+            "price": prices[-1] if prices else 0,
+            "volatility": 0,
+            "momentum": 0,
+            "rsi": 50,
+            "ema_200": 0,
+            "atr": 0,
+            "macd_line": 0,
+            "macd_signal": 0,
+            "trend": "NEUTRAL"
+        }
+    
+    current_price = prices[-1]
+    
+    # Calcular indicadores básicos
+    rsi = TechnicalIndicators.calculate_rsi(prices)
+    macd_line, signal_line, histogram = TechnicalIndicators.calculate_macd(prices)
+    upper_bb, middle_bb, lower_bb = TechnicalIndicators.calculate_bollinger_bands(prices)
+    volatility = TechnicalIndicators.calculate_volatility(prices)
+    
+    # 🎯 NUEVOS INDICADORES
+    ema_200 = TechnicalIndicators.calculate_ema_200(prices)
+    atr = TechnicalIndicators.calculate_atr(prices)
+    
+    # 🧭 FILTRO DE TENDENCIA
+    if current_price > ema_200 * 1.02:  # 2% arriba de EMA 200
+        trend = "BULLISH"
+    elif current_price < ema_200 * 0.98:  # 2% abajo de EMA 200
+        trend = "BEARISH"
+    else:
+        trend = "NEUTRAL"
+    
+    # Momentum
+    momentum = ((current_price - prices[-10]) / prices[-10]) * 100 if len(prices) >= 10 else 0
+    
+    # Análisis de señales CON FILTRO DE TENDENCIA
+    signals = []
+    reasons = []
+    
+    # RSI (con peso extra para señales extremas)
+    if rsi < 30:
+        # ✅ LONG SOLO si tendencia BULLISH clara
+        if trend == "BULLISH":
+            weight = 2 if rsi < 25 else 1
+            signals.extend([1] * weight)
+            reasons.append(f"RSI oversold ({rsi:.1f})")
+        # ⛔ No comprar en tendencia BEARISH o NEUTRAL (knife catching)
+    elif rsi > 70:
+        # ✅ SHORT SOLO si tendencia BEARISH clara
+        if trend == "BEARISH":
+            weight = 2 if rsi > 75 else 1
+            signals.extend([-1] * weight)
+            reasons.append(f"RSI overbought ({rsi:.1f})")
+        # ⛔ No vender en tendencia BULLISH o NEUTRAL
+    else:
+        signals.append(0)
+    
+    # MACD
+    if histogram > 0 and macd_line > signal_line and trend == "BULLISH":
+        signals.append(1)
+        reasons.append("MACD bullish")
+    elif histogram < 0 and macd_line < signal_line and trend == "BEARISH":
+        signals.append(-1)
+        reasons.append("MACD bearish")
+    else:
+        signals.append(0)
+    
+    # Bollinger Bands
+    if current_price < lower_bb and trend == "BULLISH":
+        signals.append(1)
+        reasons.append("Price below lower BB")
+    elif current_price > upper_bb and trend == "BEARISH":
+        signals.append(-1)
+        reasons.append("Price above upper BB")
+    else:
+        signals.append(0)
+    
+    # Momentum
+    if momentum > 2:
+        signals.append(1)
+        reasons.append(f"Strong momentum (+{momentum:.1f}%)")
+    elif momentum < -2:
+        signals.append(-1)
+        reasons.append(f"Negative momentum ({momentum:.1f}%)")
+    else:
+        signals.append(0)
+    
+    # Volatilidad
+    if volatility > 3:
+        reasons.append(f"High volatility ({volatility:.1f}%)")
+    
+    # Calcular señal final
+    avg_signal = np.mean(signals)
+    confidence = abs(avg_signal) * 100
+    
+    if avg_signal > 0.3:
+        signal = "BUY"
+    elif avg_signal < -0.3:
+        signal = "SELL"
+    else:
+        signal = "HOLD"
+    
+    return {
+        "signal": signal,
+        "confidence": confidence,
+        "reasons": reasons if reasons else ["Neutral market"],
+        "price": current_price,
+        "volatility": volatility,
+        "momentum": momentum,
+        "rsi": rsi,
+        "ema_200": ema_200,
+        "atr": atr,
+        "macd_line": macd_line,
+        "macd_signal": signal_line,
+        "trend": trend
+    }
+
+
+def opportunity_score(pair: str, analysis: Dict, sentiment: Optional[Dict] = None) -> Optional[float]:
+    """Score de una oportunidad (None si la confianza es insuficiente)"""
+    # Solo considerar señales con confianza baja-media-alta
+    if analysis["confidence"] < 25:
+        return None
+    
+    # Score = confianza * (1 + volatilidad/100)
+    # Mayor volatilidad = mayor potencial de ganancia
+    score = analysis["confidence"] * (1 + analysis.get("volatility", 0) / 100)
+    
+    # Bonus para DOGE (100% win rate histórico)
+    if pair == "DOGE-USD":
+        score *= 1.5  # 50% más prioridad
+    
+    # Sentimiento del activo a favor de la señal sube el score; en contra lo baja
+    if sentiment is not None:
+        direction = {"BUY": 1, "SELL": -1}.get(analysis["signal"], 0)
+        score *= 1 + SENTIMENT_WEIGHT * direction * sentiment["signal_strength"]
+    
+    return score
+
+
+# ============================================================================
+# SHARDING MULTI-PROCESO (análisis de pares repartido entre workers)
+# ============================================================================
+
+def _shard_step(shard_pairs: List[Tuple[int, str]], price_history: Dict[str, deque],
+                prices: Optional[Dict[str, float]], price_bus) -> Tuple[Dict, List]:
+    """
+    Un tick de un shard: precio → historial → señal → oportunidades ordenadas
+    
+    Un error en un par (fetch o análisis) deja ese par en HOLD sin tumbar el shard.
+    """
+    results = {}
+    opportunities = []
+    for index, pair in shard_pairs:
+        price = None
+        try:
+            if prices is not None:
+                price = prices.get(pair)
+            else:
+                price = price_bus.price(pair) if price_bus is not None else None
+                if price is None:
+                    price = fetch_coinbase_spot(pair)
+            if price:
+                price_history[pair].append(price)
+            analysis = analyze_price_series(list(price_history[pair]))
+        except Exception as e:
+            print(f"[WARNING] Shard: error analizando {pair}: {e}")
+            analysis = {**analyze_price_series([]), "reasons": [f"Error: {e}"]}
+        results[pair] = (price, analysis)
+        
+        score = opportunity_score(pair, analysis)
+        if score is not None:
+            opportunities.append((-score, index, pair))
+    
+    opportunities.sort()
+    return results, opportunities
+
+
+def _shard_worker(conn, shard_pairs: List[Tuple[int, str]], bus_name: Optional[str],
+                  history: Optional[Dict[str, List[float]]] = None):
+    """
+    Worker de un shard: mantiene el historial de precios de sus pares,
+    calcula indicadores y señales, y devuelve sus oportunidades ya ordenadas.
+    
+    Posiciones, MAX_POSITIONS y kill switch quedan en el coordinador.
+    history: historial inicial por par (worker relanzado tras una caída)
+    """
+    price_bus = PriceBusReader(bus_name) if bus_name else None
+    history = history or {}
+    price_history = {pair: deque(history.get(pair, ()), maxlen=100) for _, pair in shard_pairs}
+    
+    while True:
+        message = conn.recv()
+        if message[0] == "stop":
+            break
+        
+        # ("tick", prices) - prices=None: el worker obtiene sus precios
+        conn.send(_shard_step(shard_pairs, price_history, message[1], price_bus))
+    
+    if price_bus is not None:
+        price_bus.close()
+    conn.close()
+
+
+class ShardPool:
+    """
+    Reparte los pares entre procesos worker (round-robin) y fusiona sus resultados
+    
+    Worker caído (excepción fatal, OOM kill): su tick se calcula en el
+    proceso coordinador y el shard se relanza con el historial de sus pares
+    (copia que mantiene el pool), sin cortar el loop de trading.
+    """
+    
+    def __init__(self, pairs: List[str], n_shards: int, bus_name: Optional[str] = None):
+        self.pairs = list(pairs)
+        self.n_shards = max(1, min(n_shards, len(self.pairs)))
+        self.bus_name = bus_name
+        self.connections = []
+        self.processes = []
+        self.restarts = 0
+        self.history = {pair: deque(maxlen=100) for pair in self.pairs}
+        self._price_bus = None
+        
+        indexed = list(enumerate(self.pairs))
+        self.shard_pairs = [indexed[shard::self.n_shards] for shard in range(self.n_shards)]
+        for shard in range(self.n_shards):
+            conn, process = self._spawn(shard)
+            self.connections.append(conn)
+            self.processes.append(process)
+    
+    def _spawn(self, shard: int):
+        history = {pair: list(self.history[pair]) for _, pair in self.shard_pairs[shard]}
+        parent_conn, child_conn = Pipe()
+        process = Process(target=_shard_worker,
+                          args=(child_conn, self.shard_pairs[shard], self.bus_name, history),
+                          daemon=True)
+        process.start()
+        child_conn.close()
+        return parent_conn, process
+    
+    def _recover(self, shard: int, prices: Optional[Dict[str, float]]):
+        """Tick del shard caído en este proceso + relanzar el worker"""
+        
+        print(f"[WARNING] Shard {shard} caído (exitcode {self.processes[shard].exitcode}) - relanzando")
+        if prices is None and self.bus_name and self._price_bus is None:
+            self._price_bus = PriceBusReader(self.bus_name)
+        reply = _shard_step(self.shard_pairs[shard], self.history, prices, self._price_bus)
+        
+        self.connections[shard].close()
+        self.processes[shard].join(timeout=1)
+        self.connections[shard], self.processes[shard] = self._spawn(shard)
+        self.restarts += 1
+        return reply
+    
+    def tick(self, prices: Optional[Dict[str, float]] = None):
+        """
+        Ejecuta un tick en todos los shards en paralelo
+        
+        Returns:
+            (results, ranking): {pair: (price, analysis)} y oportunidades
+            [(pair, analysis)] fusionadas por score descendente
+        """
+        sent = []
+        for conn in self.connections:
+            try:
+                conn.send(("tick", prices))
+                sent.append(True)
+            except OSError:
+                sent.append(False)
+        
+        results = {}
+        shard_rankings = []
+        for shard, conn in enumerate(self.connections):
+            reply = None
+            if sent[shard]:
+                try:
+                    reply = conn.recv()
+                except (EOFError, OSError):
+                    reply = None
+            if reply is None:
+                shard_results, shard_opportunities = self._recover(shard, prices)
+            else:
+                shard_results, shard_opportunities = reply
+                for pair, (price, _) in shard_results.items():
+                    if price:
+                        self.history[pair].append(price)
+            results.update(shard_results)
+            shard_rankings.append(shard_opportunities)
+        
+        # Cada shard ya viene ordenado: merge O(n); el orden coincide con el modo single-process
+        ranking = [(pair, results[pair][1]) for _, _, pair in heapq.merge(*shard_rankings)]
+        return results, ranking
+    
+    def close(self):
+        """Detiene los workers"""
+        for conn in self.connections:
+            try:
+                conn.send(("stop",))
+                conn.close()
+            except (OSError, BrokenPipeError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        self.connections = []
+        self.processes = []
+        if self._price_bus is not None:
+            self._price_bus.close()
+            self._price_bus = None
+
+
 class MultiCryptoTradingSystem:
     """Sistema de trading multi-cryptocurrency"""
     
-    def __init__(self, capital: float = CAPITAL_INICIAL, mode: str = "paper"):
+    def __init__(self, capital: float = CAPITAL_INICIAL, mode: str = "paper", price_bus=None,
+                 pairs: Optional[List[str]] = None, shards: int = SHARD_PROCESSES,
+                 sentiment_service=None):
         self.initial_capital = capital
         self.cash = capital
         self.mode = mode
+        self.pairs = list(pairs) if pairs else list(CRYPTO_PAIRS)
         self.positions: Dict[str, Dict] = {}
-        self.price_history: Dict[str, deque] = {pair: deque(maxlen=100) for pair in CRYPTO_PAIRS}
+        self.price_history: Dict[str, deque] = {pair: deque(maxlen=100) for pair in self.pairs}
         self.trades_history = []
         self.peak_value = capital
         self.kill_switch_active = False
@@ -186,21 +511,47 @@ class MultiCryptoTradingSystem:
         # Oportunidades
         self.opportunities: Dict[str, Dict] = {}
         
+        # Bus de precios compartido (market_data_bus.py); None = HTTP directo.
+        # Quotes viejos (publisher caído) → HTTP + re-conexión (PriceBusReader)
+        price_bus = PriceBusReader.wrap(price_bus)
+        self.price_bus = price_bus
+        
+        # Sharding: workers calculan indicadores/señales; este proceso es el coordinador
+        # (posiciones, MAX_POSITIONS, ranking global y kill switch)
+        self.shard_pool = ShardPool(self.pairs, shards, bus_name=price_bus.name if price_bus else None) if shards > 0 else None
+        self.shard_analyses: Dict[str, Dict] = {}
+        self.shard_opportunities: List[Tuple[str, Dict]] = []
+        
+        # Sentimiento por activo (AssetSentimentService de intelligent_investment_bot): sentiment(pair) O(1);
+        # run_autonomous() lo refresca en su propio thread (start/stop), no en el tick
+        self.sentiment_service = sentiment_service
+        
         print("\n" + "="*80)
         print("🚀 SISTEMA MULTI-CRYPTO - TRADING AUTÓNOMO")
         print("="*80)
         print(f"Modo: {'PAPER TRADING' if mode == 'paper' else 'LIVE TRADING'}")
         print(f"Capital inicial: ${capital:.2f}")
-        print(f"Cryptos monitoreadas: {len(CRYPTO_PAIRS)}")
-        for pair in CRYPTO_PAIRS:
+        print(f"Cryptos monitoreadas: {len(self.pairs)}")
+        for pair in self.pairs:
             print(f"  • {pair}")
         print(f"Position size: {POSITION_SIZE_PERCENT*100}%")
         print(f"Stop Loss: {STOP_LOSS_PERCENT*100}% | Take Profit: {TAKE_PROFIT_PERCENT*100}%")
         print(f"Max positions: {MAX_POSITIONS}")
+        if price_bus is not None:
+            status = "connected" if price_bus.connected else "waiting for publisher"
+            print(f"Price source: shared bus ({price_bus.name}, {status}) + Coinbase HTTP fallback")
+        else:
+            print("Price source: Coinbase HTTP")
+        print(f"Shards: {self.shard_pool.n_shards if self.shard_pool else 'OFF (single process)'}")
+        print(f"Sentiment: {'per-asset news' if sentiment_service is not None else 'OFF'}")
         print("="*80 + "\n")
     
     def get_price(self, pair: str) -> Optional[float]:
-        """Obtiene precio actual de Coinbase"""
+        """Obtiene precio actual (bus compartido si tiene un quote fresco, si no Coinbase)"""
+        if self.price_bus is not None:
+            price = self.price_bus.price(pair)
+            if price is not None:
+                return price
         try:
             url = f"https://api.coinbase.com/v2/prices/{pair}/spot"
             response = requests.get(url, timeout=5)
@@ -211,18 +562,50 @@ class MultiCryptoTradingSystem:
             print(f"[WARNING] Error getting {pair} price: {e}")
         return None
     
+    def update_market_data(self, prices: Optional[Dict[str, float]] = None):
+        """
+        Actualiza precios de todos los pares
+        
+        Con sharding, cada worker obtiene los precios de sus pares y calcula sus
+        señales en paralelo; el coordinador solo fusiona resultados.
+        prices: precios explícitos (replay/tests) en lugar de consultar el mercado
+        """
+        if self.shard_pool is not None:
+            results, self.shard_opportunities = self.shard_pool.tick(prices)
+            self.shard_analyses = {}
+            for pair, (price, analysis) in results.items():
+                if price:
+                    self.price_history[pair].append(price)
+                self.shard_analyses[pair] = analysis
+            return
+        
+        for pair in self.pairs:
+            price = prices.get(pair) if prices is not None else self.get_price(pair)
+            if price:
+                self.price_history[pair].append(price)
+    
+    def close(self):
+        """Detiene los workers de sharding"""
+        if self.shard_pool is not None:
+            self.shard_pool.close()
+            self.shard_pool = None
+            self.shard_analyses = {}
+            self.shard_opportunities = []
+        if self.sentiment_service is not None and hasattr(self.sentiment_service, "stop"):
+            self.sentiment_service.stop()
+    
     def calculate_correlation(self) -> Dict[str, Dict[str, float]]:
         """Calcula correlación entre cryptos para evitar sobre-exposición"""
         correlation_matrix = {}
         
         # Solo calcular si hay suficientes datos
-        min_data_points = min(len(self.price_history[pair]) for pair in CRYPTO_PAIRS)
+        min_data_points = min(len(self.price_history[pair]) for pair in self.pairs)
         if min_data_points < 10:
             return {}
         
-        for pair1 in CRYPTO_PAIRS:
+        for pair1 in self.pairs:
             correlation_matrix[pair1] = {}
-            for pair2 in CRYPTO_PAIRS:
+            for pair2 in self.pairs:
                 if pair1 == pair2:
                     correlation_matrix[pair1][pair2] = 1.0
                 else:
@@ -239,152 +622,29 @@ class MultiCryptoTradingSystem:
     
     def analyze_crypto(self, pair: str) -> Dict:
         """Analiza una crypto y genera señal de trading con filtros avanzados"""
-        prices = list(self.price_history[pair])
-        
-        if len(prices) < 15:
-            return {
-                "signal": "HOLD",
-                "confidence": 0.0,
-                "reasons": [f"Gathering data... ({len(prices)}/15)"],
-                "price": prices[-1] if prices else 0,
-                "volatility": 0,
-                "momentum": 0,
-                "rsi": 50,
-                "ema_200": 0,
-                "atr": 0,
-                "macd_line": 0,
-                "macd_signal": 0,
-                "trend": "NEUTRAL"
-            }
-        
-        current_price = prices[-1]
-        
-        # Calcular indicadores básicos
-        rsi = TechnicalIndicators.calculate_rsi(prices)
-        macd_line, signal_line, histogram = TechnicalIndicators.calculate_macd(prices)
-        upper_bb, middle_bb, lower_bb = TechnicalIndicators.calculate_bollinger_bands(prices)
-        volatility = TechnicalIndicators.calculate_volatility(prices)
-        
-        # 🎯 NUEVOS INDICADORES
-        ema_200 = TechnicalIndicators.calculate_ema_200(prices)
-        atr = TechnicalIndicators.calculate_atr(prices)
-        
-        # 🧭 FILTRO DE TENDENCIA
-        if current_price > ema_200 * 1.02:  # 2% arriba de EMA 200
-            trend = "BULLISH"
-        elif current_price < ema_200 * 0.98:  # 2% abajo de EMA 200
-            trend = "BEARISH"
-        else:
-            trend = "NEUTRAL"
-        
-        # Momentum
-        momentum = ((current_price - prices[-10]) / prices[-10]) * 100 if len(prices) >= 10 else 0
-        
-        # Análisis de señales CON FILTRO DE TENDENCIA
-        signals = []
-        reasons = []
-        
-        # RSI (con peso extra para señales extremas)
-        if rsi < 30:
-            # ✅ LONG SOLO si tendencia BULLISH clara
-            if trend == "BULLISH":
-                weight = 2 if rsi < 25 else 1
-                signals.extend([1] * weight)
-                reasons.append(f"RSI oversold ({rsi:.1f})")
-            # ⛔ No comprar en tendencia BEARISH o NEUTRAL (knife catching)
-        elif rsi > 70:
-            # ✅ SHORT SOLO si tendencia BEARISH clara
-            if trend == "BEARISH":
-                weight = 2 if rsi > 75 else 1
-                signals.extend([-1] * weight)
-                reasons.append(f"RSI overbought ({rsi:.1f})")
-            # ⛔ No vender en tendencia BULLISH o NEUTRAL
-        else:
-            signals.append(0)
-        
-        # MACD
-        if histogram > 0 and macd_line > signal_line and trend == "BULLISH":
-            signals.append(1)
-            reasons.append("MACD bullish")
-        elif histogram < 0 and macd_line < signal_line and trend == "BEARISH":
-            signals.append(-1)
-            reasons.append("MACD bearish")
-        else:
-            signals.append(0)
-        
-        # Bollinger Bands
-        if current_price < lower_bb and trend == "BULLISH":
-            signals.append(1)
-            reasons.append("Price below lower BB")
-        elif current_price > upper_bb and trend == "BEARISH":
-            signals.append(-1)
-            reasons.append("Price above upper BB")
-        else:
-            signals.append(0)
-        
-        # Momentum
-        if momentum > 2:
-            signals.append(1)
-            reasons.append(f"Strong momentum (+{momentum:.1f}%)")
-        elif momentum < -2:
-            signals.append(-1)
-            reasons.append(f"Negative momentum ({momentum:.1f}%)")
-        else:
-            signals.append(0)
-        
-        # Volatilidad
-        if volatility > 3:
-            reasons.append(f"High volatility ({volatility:.1f}%)")
-        
-        # Calcular señal final
-        avg_signal = np.mean(signals)
-        confidence = abs(avg_signal) * 100
-        
-        if avg_signal > 0.3:
-            signal = "BUY"
-        elif avg_signal < -0.3:
-            signal = "SELL"
-        else:
-            signal = "HOLD"
-        
-        return {
-            "signal": signal,
-            "confidence": confidence,
-            "reasons": reasons if reasons else ["Neutral market"],
-            "price": current_price,
-            "volatility": volatility,
-            "momentum": momentum,
-            "rsi": rsi,
-            "ema_200": ema_200,
-            "atr": atr,
-            "macd_line": macd_line,
-            "macd_signal": signal_line,
-            "trend": trend
-        }
+        if pair in self.shard_analyses:
+            return self.shard_analyses[pair]
+        return analyze_price_series(list(self.price_history[pair]))
     
     def rank_opportunities(self) -> List[Tuple[str, Dict]]:
         """Rankea oportunidades de trading por mejor señal"""
+        if self.shard_pool is not None and self.sentiment_service is None:
+            return self.shard_opportunities
+        
         opportunities = []
         
-        for pair in CRYPTO_PAIRS:
+        # Con sentimiento se re-puntúa aquí (análisis de los shards + matriz publicada, sin re-scoring)
+        for index, pair in enumerate(self.pairs):
             analysis = self.analyze_crypto(pair)
-            
-            # Solo considerar señales con confianza baja-media-alta
-            if analysis["confidence"] >= 25:
-                # Score = confianza * (1 + volatilidad/100)
-                # Mayor volatilidad = mayor potencial de ganancia
-                score = analysis["confidence"] * (1 + analysis.get("volatility", 0) / 100)
-                
-                # Bonus para DOGE (100% win rate histórico)
-                if pair == "DOGE-USD":
-                    score *= 1.5  # 50% más prioridad
-                
-                opportunities.append((pair, analysis, score))
+            sentiment = self.sentiment_service.sentiment(pair) if self.sentiment_service is not None else None
+            score = opportunity_score(pair, analysis, sentiment)
+            if score is not None:
+                opportunities.append((-score, index, pair, analysis))
         
         # Ordenar por score descendente
-        opportunities.sort(key=lambda x: x[2], reverse=True)
+        opportunities.sort(key=lambda x: x[:2])
         
-        return [(pair, analysis) for pair, analysis, score in opportunities]
+        return [(pair, analysis) for _, _, pair, analysis in opportunities]
     
     def execute_trade(self, pair: str, signal: str, price: float):
         """Ejecuta una operación de trading (LONG o SHORT)"""
@@ -778,7 +1038,7 @@ class MultiCryptoTradingSystem:
         
         # Mostrar todas las cryptos
         print(f"\n📊 CRYPTOS MONITORED:")
-        for pair in CRYPTO_PAIRS:
+        for pair in self.pairs:
             if self.price_history[pair]:
                 price = self.price_history[pair][-1]
                 analysis = self.analyze_crypto(pair)
@@ -820,15 +1080,16 @@ class MultiCryptoTradingSystem:
         
         end_time = datetime.now() + timedelta(hours=duration_hours) if duration_hours > 0 else None
         
+        # Noticias → matriz de sentimiento por activo, en background (el tick solo lee el snapshot)
+        if self.sentiment_service is not None and hasattr(self.sentiment_service, "start"):
+            self.sentiment_service.start()
+        
         try:
             while True:
                 self.iteration += 1
                 
-                # Actualizar precios de todas las cryptos
-                for pair in CRYPTO_PAIRS:
-                    price = self.get_price(pair)
-                    if price:
-                        self.price_history[pair].append(price)
+                # Actualizar precios (y señales, en modo sharding) de todas las cryptos
+                self.update_market_data()
                 
                 # Mostrar estado
                 self.print_status()
@@ -874,6 +1135,8 @@ class MultiCryptoTradingSystem:
                 
         except KeyboardInterrupt:
             print("\n\n[INFO] Stopping autonomous system...")
+        finally:
+            self.close()
         
         self.save_session()
         self.print_final_report()
@@ -927,6 +1190,19 @@ class MultiCryptoTradingSystem:
         print("="*80)
 
 
+def build_sentiment_service(feeds: List[str]):
+    """
+    AssetSentimentService sobre feeds RSS/JSON (MULTI_CRYPTO_NEWS_FEEDS);
+    None si no hay feeds. intelligent_investment_bot se importa solo aquí.
+    """
+    if not feeds:
+        return None
+    
+    from intelligent_investment_bot import AssetSentimentService, HttpNewsSource, NewsIngestor
+    
+    return AssetSentimentService(NewsIngestor([HttpNewsSource(url) for url in feeds]))
+
+
 def main():
     print("\n" + "="*80)
     print("🚀 SISTEMA DE TRADING MULTI-CRYPTOCURRENCY")
@@ -943,8 +1219,10 @@ def main():
     # Duración
     duration = float(input("\nDuration in hours (0 for infinite): ").strip() or "0")
     
-    # Crear sistema
-    system = MultiCryptoTradingSystem(capital=CAPITAL_INICIAL, mode=mode)
+    # Crear sistema (usa el bus de precios si hay un publisher corriendo)
+    # y el sentimiento por activo si MULTI_CRYPTO_NEWS_FEEDS lista feeds
+    system = MultiCryptoTradingSystem(capital=CAPITAL_INICIAL, mode=mode, price_bus=PriceBusReader(),
+                                      sentiment_service=build_sentiment_service(NEWS_FEEDS))
     
     # Ejecutar
     system.run_autonomous(duration_hours=duration)
@@ -17,18 +17,20 @@ import time
 import json
 import numpy as np
 from datetime import datetime, timedelta
+from market_data_bus import PriceBusReader
 from intelligent_investment_bot import (
     IntelligentInvestmentBot,
     MarketEnvironment,
     RiskManager,
     PortfolioManager,
-    TRADING_CONFIG
+    TRADING_CONFIG,
+    load_environment
 )
 
 class PaperTradingSession:
     """Sesion de paper trading con datos reales"""
     
-    def __init__(self, initial_capital=50.0):
+    def __init__(self, initial_capital=50.0, price_bus=None):
         self.initial_capital = initial_capital
         self.cash = initial_capital
         self.btc_holdings = 0.0
@@ -42,6 +44,9 @@ class PaperTradingSession:
         # Multi-asset portfolio (INQUEBRANTABLE 3)
         self.portfolio_mgr = PortfolioManager(initial_capital=initial_capital)
         
+        # Bus de precios compartido (market_data_bus.py); quotes viejos → APIs
+        self.price_bus = PriceBusReader.wrap(price_bus)
+        
         # Session data
         self.trades = []
         self.performance_log = []
@@ -58,6 +63,10 @@ class PaperTradingSession:
     
     def get_real_price(self):
         """Obtiene precio real del mercado con redundancia (INQUEBRANTABLE 4)"""
+        if self.price_bus is not None:
+            price = self.price_bus.price(self.env.symbol)
+            if price is not None:
+                return price
         try:
             data = self.env._get_market_data_with_redundancy()
             return data["price"]
@@ -370,6 +379,8 @@ class PaperTradingSession:
 def main():
     """Punto de entrada"""
     
+    load_environment()
+    
     print("\n" + "="*70)
     print("PAPER TRADING - MODO REALISTA")
     print("="*70)
@@ -398,7 +409,7 @@ def main():
         return
     
     # Create and run session
-    session = PaperTradingSession(initial_capital=capital)
+    session = PaperTradingSession(initial_capital=capital, price_bus=PriceBusReader())
     session.run_session(duration_minutes=duration, interval_seconds=30)
 
 if __name__ == "__main__":
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POPULATION-BASED TRAINING (PBT) del agente PPO
+
+ARQUITECTURA:
+- Población de K agentes: pesos + hiperparámetros propios (overrides de PPO_CONFIG)
+- Generación: los K miembros entrenan en paralelo (Pool de procesos) sobre las
+  mismas velas históricas en shared memory y se puntúan en el tramo de validación
+- Exploit: el cuantil inferior copia pesos + estado de Adam de un miembro del superior
+- Explore: los hiperparámetros copiados se perturban (x0.8 / x1.2) dentro de HYPERPARAM_SPACE
+- Checkpoint por generación: un checkpoint binario por miembro + pbt_state.json
+  (escrito al final: commit atómico). run() retoma desde la última generación completa
+
+Mismo seed = mismas seeds por miembro y generación: una corrida interrumpida y
+retomada produce la misma población que una corrida continua.
+
+USO:
+    python population_training.py --candles velas.npy --population 8 --generations 20
+    python population_training.py --checkpoint-dir trading_models/pbt --generations 40   # retoma
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from intelligent_investment_bot import (
+    ActorCriticMLP,
+    MODELS_DIR,
+    PPO_CONFIG,
+    PPOTradingAgent,
+    VectorizedMarketEnv,
+    backtest_candles,
+    create_shared_candles,
+    init_shared_candles,
+    load_checkpoint,
+    load_environment,
+    save_checkpoint,
+    shared_candles
+)
+
+PBT_CONFIG = {
+    "population_size": 8,
+    "iterations_per_generation": 5,   # rollouts + updates PPO entre exploit/explore
+    "num_envs": 16,
+    "num_steps": 64,
+    "validation_fraction": 0.2,       # Tramo final de las velas para puntuar
+    "eval_episodes": 8,
+    "eval_steps": 200,
+    "eval_deterministic": False,      # Política estocástica seeded (greedy inicial = solo HOLD)
+    "score_metric": "sharpe_ratio",   # Métrica de backtest_candles (media de episodios)
+    "exploit_fraction": 0.25,         # Cuantil inferior reemplazado / superior copiado
+    "perturb_factors": (0.8, 1.2),
+}
+
+# Rango de búsqueda: (mínimo, máximo, escala del muestreo inicial)
+HYPERPARAM_SPACE = {
+    "learning_rate": (1e-5, 1e-2, "log"),
+    "clip_epsilon": (0.05, 0.4, "linear"),
+    "entropy_coef": (0.0, 0.1, "linear"),
+    "gae_lambda": (0.8, 0.999, "linear"),
+}
+
+STATE_FILE = "pbt_state.json"
+
+
+def sample_hyperparams(rng: np.random.Generator) -> Dict[str, float]:
+    """Hiperparámetros iniciales aleatorios dentro de HYPERPARAM_SPACE"""
+
+    hyperparams = {}
+    for name, (low, high, scale) in HYPERPARAM_SPACE.items():
+        if scale == "log":
+            hyperparams[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            hyperparams[name] = float(rng.uniform(low, high))
+    return hyperparams
+
+
+def perturb_hyperparams(hyperparams: Dict[str, float], rng: np.random.Generator,
+                        factors=None) -> Dict[str, float]:
+    """Explore: multiplica cada hiperparámetro por un factor al azar, acotado al rango"""
+
+    factors = factors or PBT_CONFIG["perturb_factors"]
+    perturbed = dict(hyperparams)
+    for name, (low, high, _) in HYPERPARAM_SPACE.items():
+        if name in perturbed:
+            perturbed[name] = float(np.clip(perturbed[name] * rng.choice(factors), low, high))
+    return perturbed
+
+
+def _train_member(task: Dict) -> Dict:
+    """Worker: entrena un miembro una generación y lo puntúa en validación"""
+
+    candles = task.get("candles", shared_candles())
+    split = task["split"]
+    np.random.seed(task["seed"])
+
+    agent = PPOTradingAgent(task["state_dim"], task["action_dim"], hyperparams=task["hyperparams"])
+    agent.swap_params(task["params"])
+    if task["optimizer"] is not None:
+        agent.optimizer.load_state_dict(task["optimizer"])
+
+    vec_env = VectorizedMarketEnv(num_envs=task["num_envs"], candles=candles[:split], seed=task["seed"])
+    for _ in range(task["iterations"]):
+        agent.train_rollout(vec_env.collect_rollout(agent, task["num_steps"]))
+
+    validation = candles[split:]
+    episode_steps = min(task["eval_steps"], len(validation) - 1)
+    metrics = backtest_candles(agent, validation, num_episodes=task["eval_episodes"],
+                               episode_steps=episode_steps, deterministic=task["eval_deterministic"],
+                               random_start=len(validation) > episode_steps, seed=task["eval_seed"])
+    metrics = {name: float(np.mean(value)) for name, value in metrics.items()}
+
+    return {
+        "member_id": task["member_id"],
+        "params": agent.network.params,
+        "optimizer": agent.optimizer.state_dict(),
+        "score": metrics[task["score_metric"]],
+        "metrics": metrics
+    }
+
+
+class PopulationTrainer:
+    """
+    Búsqueda de hiperparámetros PPO por population-based training
+
+    Cada miembro es un dict: member_id, hyperparams, params, optimizer
+    (estado de Adam), score y metrics de su última evaluación.
+    """
+
+    def __init__(self, candles: np.ndarray, population_size: Optional[int] = None,
+                 checkpoint_dir: Optional[str] = None, workers: Optional[int] = None,
+                 seed: int = 0, config: Optional[Dict] = None, hidden_sizes=None):
+        self.candles = np.ascontiguousarray(candles, dtype=np.float64)
+        self.config = {**PBT_CONFIG, **(config or {})}
+        self.population_size = population_size or self.config["population_size"]
+        self.checkpoint_dir = checkpoint_dir
+        self.workers = workers if workers is not None else min(self.population_size, os.cpu_count() or 1)
+        self.seed = seed
+        self.hidden_sizes = PPO_CONFIG["hidden_sizes"] if hidden_sizes is None else hidden_sizes
+        self.split = int(len(self.candles) * (1 - self.config["validation_fraction"]))
+
+        if self.split < 2 or len(self.candles) - self.split < 2:
+            raise ValueError(f"Velas insuficientes para train/validación: {len(self.candles)}")
+
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+        self.members: List[Dict] = []
+        self.history: List[Dict] = []
+
+    def initialize(self):
+        """Población inicial: redes y hiperparámetros aleatorios (seeded)"""
+
+        self.members = []
+        for member_id in range(self.population_size):
+            network = ActorCriticMLP(PPO_CONFIG["state_dim"], PPO_CONFIG["action_dim"],
+                                     self.hidden_sizes, seed=self.seed * 1000 + member_id)
+            self.members.append({
+                "member_id": member_id,
+                "hyperparams": sample_hyperparams(self.rng),
+                "params": network.params,
+                "optimizer": None,
+                "score": None,
+                "metrics": {}
+            })
+
+    def run(self, generations: int, verbose: bool = True) -> Dict:
+        """
+        Ejecuta hasta completar `generations` generaciones (total, no adicionales)
+
+        Con checkpoint_dir existente retoma desde la última generación guardada.
+        """
+
+        if not self.members and not self.load():
+            self.initialize()
+
+        while self.generation < generations:
+            start_time = time.time()
+            self.train_generation()
+            record = self.exploit_and_explore()
+            record["elapsed"] = time.time() - start_time
+            self.history.append(record)
+            self.generation += 1
+            self.save()
+
+            if verbose:
+                print(f"[PBT] Generación {record['generation']}: best={record['best_score']:.4f} "
+                      f"(miembro {record['best_member']}), mean={np.mean(record['scores']):.4f}, "
+                      f"{record['elapsed']:.1f}s")
+
+        return self.summary()
+
+    def _tasks(self) -> List[Dict]:
+        tasks = []
+        for member in self.members:
+            tasks.append({
+                "member_id": member["member_id"],
+                "hyperparams": member["hyperparams"],
+                "params": member["params"],
+                "optimizer": member["optimizer"],
+                "state_dim": PPO_CONFIG["state_dim"],
+                "action_dim": PPO_CONFIG["action_dim"],
+                "split": self.split,
+                "seed": self.seed + 7919 * self.generation + member["member_id"],
+                "eval_seed": self.seed + 7919 * self.generation,  # Mismos episodios para toda la población
+                "iterations": self.config["iterations_per_generation"],
+                "num_envs": self.config["num_envs"],
+                "num_steps": self.config["num_steps"],
+                "eval_episodes": self.config["eval_episodes"],
+                "eval_steps": self.config["eval_steps"],
+                "eval_deterministic": self.config["eval_deterministic"],
+                "score_metric": self.config["score_metric"]
+            })
+        return tasks
+
+    def train_generation(self):
+        """Entrena y puntúa todos los miembros (en paralelo si workers > 1)"""
+
+        tasks = self._tasks()
+
+        if self.workers <= 1:
+            results = [_train_member({**task, "candles": self.candles}) for task in tasks]
+        else:
+            from multiprocessing import Pool
+
+            shm = create_shared_candles(self.candles)
+            try:
+                with Pool(self.workers, initializer=init_shared_candles,
+                          initargs=(shm.name, self.candles.shape)) as pool:
+                    results = pool.map(_train_member, tasks)
+            finally:
+                shm.close()
+                shm.unlink()
+
+        for member, result in zip(self.members, results):
+            member.update(params=result["params"], optimizer=result["optimizer"],
+                          score=result["score"], metrics=result["metrics"])
+
+    def exploit_and_explore(self) -> Dict:
+        """
+        Cuantil inferior ← copia de un miembro del cuantil superior (pesos + Adam),
+        con hiperparámetros perturbados. Retorna el registro de la generación.
+        """
+
+        ranked = sorted(self.members, key=lambda m: (-m["score"], m["member_id"]))
+        cutoff = max(1, int(round(len(ranked) * self.config["exploit_fraction"])))
+        cutoff = min(cutoff, len(ranked) // 2)
+        top, bottom = ranked[:cutoff], ranked[len(ranked) - cutoff:]
+
+        record = {
+            "generation": self.generation,
+            "scores": [m["score"] for m in self.members],
+            "best_member": ranked[0]["member_id"],
+            "best_score": ranked[0]["score"],
+            "best_hyperparams": dict(ranked[0]["hyperparams"]),
+            "exploited": []
+        }
+
+        for loser in bottom:
+            winner = top[int(self.rng.integers(len(top)))]
+            loser["params"] = {name: np.array(value) for name, value in winner["params"].items()}
+            loser["optimizer"] = None if winner["optimizer"] is None else {
+                "t": winner["optimizer"]["t"],
+                "m": {name: np.array(value) for name, value in winner["optimizer"]["m"].items()},
+                "v": {name: np.array(value) for name, value in winner["optimizer"]["v"].items()}
+            }
+            loser["hyperparams"] = perturb_hyperparams(winner["hyperparams"], self.rng,
+                                                       self.config["perturb_factors"])
+            record["exploited"].append((loser["member_id"], winner["member_id"]))
+
+        return record
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def _member_path(self, generation: int, member_id: int) -> str:
+        return os.path.join(self.checkpoint_dir, f"gen{generation:04d}_member{member_id:03d}.ckpt")
+
+    def save(self):
+        """Checkpoint de la población; pbt_state.json se escribe al final (commit)"""
+
+        if not self.checkpoint_dir:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        members = []
+        for member in self.members:
+            arrays = dict(member["params"])
+            if member["optimizer"] is not None:
+                arrays.update({f"adam_m/{name}": value for name, value in member["optimizer"]["m"].items()})
+                arrays.update({f"adam_v/{name}": value for name, value in member["optimizer"]["v"].items()})
+            path = self._member_path(self.generation, member["member_id"])
+            save_checkpoint(path, arrays, metadata={"member_id": member["member_id"],
+                                                    "hyperparams": member["hyperparams"]})
+            members.append({
+                "member_id": member["member_id"],
+                "checkpoint": os.path.basename(path),
+                "hyperparams": member["hyperparams"],
+                "adam_t": None if member["optimizer"] is None else member["optimizer"]["t"],
+                "score": member["score"],
+                "metrics": member["metrics"]
+            })
+
+        state = {
+            "generation": self.generation,
+            "seed": self.seed,
+            "split": self.split,
+            "rng_state": self.rng.bit_generator.state,
+            "members": members,
+            "history": self.history
+        }
+        state_path = os.path.join(self.checkpoint_dir, STATE_FILE)
+        tmp_path = f"{state_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2, default=float)
+        os.replace(tmp_path, state_path)
+
+        # Checkpoints de generaciones anteriores ya no son referenciados
+        current = {member["checkpoint"] for member in members}
+        for path in glob.glob(os.path.join(self.checkpoint_dir, "gen*_member*.ckpt")):
+            if os.path.basename(path) not in current:
+                os.remove(path)
+
+    def load(self) -> bool:
+        """Restaura la última generación guardada; False si no hay checkpoint"""
+
+        state_path = os.path.join(self.checkpoint_dir or "", STATE_FILE)
+        if not self.checkpoint_dir or not os.path.exists(state_path):
+            return False
+
+        with open(state_path, "r") as f:
+            state = json.load(f)
+
+        if state["seed"] != self.seed or state["split"] != self.split:
+            raise ValueError(f"Checkpoint PBT de otra corrida (seed={state['seed']}, split={state['split']})")
+
+        self.members = []
+        for info in state["members"]:
+            _, arrays = load_checkpoint(os.path.join(self.checkpoint_dir, info["checkpoint"]), mmap=False)
+            params = {name: value for name, value in arrays.items() if "/" not in name}
+            optimizer = None
+            if info["adam_t"] is not None:
+                optimizer = {
+                    "t": info["adam_t"],
+                    "m": {name: arrays[f"adam_m/{name}"] for name in params},
+                    "v": {name: arrays[f"adam_v/{name}"] for name in params}
+                }
+            self.members.append({
+                "member_id": info["member_id"],
+                "hyperparams": info["hyperparams"],
+                "params": params,
+                "optimizer": optimizer,
+                "score": info["score"],
+                "metrics": info["metrics"]
+            })
+
+        self.generation = state["generation"]
+        self.rng.bit_generator.state = state["rng_state"]
+        self.history = [
+            {**record, "exploited": [tuple(pair) for pair in record["exploited"]]}
+            for record in state["history"]
+        ]
+        return True
+
+    # ------------------------------------------------------------------
+    # Resultados
+    # ------------------------------------------------------------------
+
+    def best_member(self) -> Dict:
+        """Miembro con mejor score de la última generación evaluada"""
+
+        if not self.history:
+            raise ValueError("La población aún no fue evaluada")
+        best_id = self.history[-1]["best_member"]
+        return next(member for member in self.members if member["member_id"] == best_id)
+
+    def best_agent(self) -> PPOTradingAgent:
+        """PPOTradingAgent con pesos e hiperparámetros del mejor miembro"""
+
+        member = self.best_member()
+        agent = PPOTradingAgent(PPO_CONFIG["state_dim"], PPO_CONFIG["action_dim"],
+                                hyperparams=member["hyperparams"])
+        agent.swap_params(member["params"])
+        return agent
+
+    def summary(self) -> Dict:
+        best = self.best_member()
+        return {
+            "generations": self.generation,
+            "population_size": len(self.members),
+            "best_member": best["member_id"],
+            "best_score": best["score"],
+            "best_hyperparams": best["hyperparams"],
+            "best_metrics": best["metrics"],
+            "history": self.history
+        }
+
+
+def load_candles(filepath: str) -> np.ndarray:
+    """Velas (close, volume) desde .npy o CSV numérico (sin header)"""
+
+    if filepath.endswith(".npy"):
+        candles = np.load(filepath)
+    else:
+        candles = np.loadtxt(filepath, delimiter=",", ndmin=2)
+    if candles.ndim == 1:
+        candles = np.column_stack([candles, np.ones_like(candles)])
+    return np.ascontiguousarray(candles[:, :2], dtype=np.float64)
+
+
+def synthetic_candles(num_candles: int, seed: int = 0) -> np.ndarray:
+    """Random walk ±2% (como _get_simulated_data) para demo sin datos"""
+
+    rng = np.random.default_rng(seed)
+    closes = 50000.0 * np.cumprod(1 + rng.normal(0, 0.02, num_candles))
+    return np.column_stack([closes, rng.uniform(1000, 5000, num_candles)])
+
+
+def main():
+    load_environment()
+    parser = argparse.ArgumentParser(description="Population-based training del agente PPO")
+    parser.add_argument("--candles", type=str, default=None, help="Velas .npy/.csv (close, volume)")
+    parser.add_argument("--synthetic", type=int, default=5000, help="Velas sintéticas si no hay --candles")
+    parser.add_argument("--population", type=int, default=PBT_CONFIG["population_size"])
+    parser.add_argument("--generations", type=int, default=10, help="Total de generaciones (retoma)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: min(K, CPUs))")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint-dir", type=str, default=os.path.join(MODELS_DIR, "pbt"))
+    parser.add_argument("--output", type=str, default=os.path.join(MODELS_DIR, "ppo_agent_pbt.ckpt"),
+                        help="Checkpoint del mejor agente")
+    args = parser.parse_args()
+
+    candles = load_candles(args.candles) if args.candles else synthetic_candles(args.synthetic, args.seed)
+    trainer = PopulationTrainer(candles, population_size=args.population, checkpoint_dir=args.checkpoint_dir,
+                                workers=args.workers, seed=args.seed)
+    summary = trainer.run(args.generations)
+    trainer.best_agent().save_model(args.output)
+
+    print("\n" + "="*70)
+    print(f"PBT: {summary['generations']} generaciones, población {summary['population_size']}")
+    print(f"Mejor miembro: {summary['best_member']} ({PBT_CONFIG['score_metric']}={summary['best_score']:.4f})")
+    for name, value in summary["best_hyperparams"].items():
+        print(f"  {name}: {value:.6g}")
+    print(f"Agente guardado en {args.output}")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,33 @@ Lee todos los JSONs de sesiones pasadas y genera estadísticas
 
 import json
 import os
+import sys
 from datetime import datetime
 from typing import List, Dict
 import glob
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intelligent_investment_bot import PerformanceMetrics
+
 class TradingHistoryAnalyzer:
     """Analiza el historial completo de trading"""
     
     def __init__(self):
         self.sessions = []
         self.all_trades = []
+    
+    def build_metrics(self, closed_trades: List[Dict]) -> PerformanceMetrics:
+        """Alimenta el motor incremental con la curva de equity trade a trade"""
+        initial = self.sessions[0].get('initial_capital', 0) if self.sessions else 0
+        metrics = PerformanceMetrics(initial or None, periods_per_year=1, risk_free_rate=0.0)
+        equity = initial
+        
+        for trade in sorted(closed_trades, key=lambda x: x.get('time', '')):
+            equity += trade['profit']
+            metrics.update(equity)
+            metrics.record_trade(trade['profit'])
+        
+        return metrics
         
     def load_all_sessions(self):
         """Carga todos los archivos de sesión"""
@@ -111,7 +128,8 @@ class TradingHistoryAnalyzer:
             total_profit = sum(t['profit'] for t in closed_trades)
             avg_profit = total_profit / len(closed_trades)
             
-            win_rate = (len(winning) / len(closed_trades) * 100) if closed_trades else 0
+            metrics = self.build_metrics(closed_trades)
+            win_rate = metrics.win_rate() * 100
             
             print(f"\n💰 CLOSED TRADES PERFORMANCE:")
             print(f"  Total Closed: {len(closed_trades)}")
@@ -119,6 +137,9 @@ class TradingHistoryAnalyzer:
             print(f"  Losers: {len(losing)}")
             print(f"  Total Profit: ${total_profit:+.4f}")
             print(f"  Avg Profit per Trade: ${avg_profit:+.4f}")
+            print(f"  Sharpe (per trade): {metrics.sharpe_ratio():.2f}")
+            print(f"  Sortino (per trade): {metrics.sortino_ratio():.2f}")
+            print(f"  Max Drawdown: {metrics.max_drawdown * 100:.2f}%")
             
             if winning:
                 avg_win = sum(t['profit'] for t in winning) / len(winning)
@@ -249,7 +270,7 @@ class TradingHistoryAnalyzer:
             print("   Recommendation: Run bot for 5-10 more hours")
             return
         
-        win_rate = len([t for t in closed if t['profit'] > 0]) / len(closed) * 100
+        win_rate = self.build_metrics(closed).win_rate() * 100
         avg_profit_pct = sum(t['profit_pct'] for t in closed) / len(closed)
         
         print(f"\n📊 Current Stats:")
@@ -8,10 +8,26 @@ Visualización en tiempo real de múltiples cryptos
 from flask import Flask, render_template_string
 import json
 import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from market_data_bus import PriceBusReader
+
 app = Flask(__name__)
 
+# Bus de precios compartido (solo-lectura); se crea en la primera petición y
+# re-conecta solo si el publisher se reinicia
+_price_bus = None
+
+
+def get_live_prices():
+    """Precios frescos del bus compartido ({} si no hay publisher vivo)"""
+    global _price_bus
+    if _price_bus is None:
+        _price_bus = PriceBusReader()
+    return _price_bus.latest_prices()
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
@@ -297,15 +313,36 @@ def get_status():
         with open(latest_session, 'r') as f:
             data = json.load(f)
         
-        # Calcular P&L de posiciones
+        live_prices = get_live_prices()
+        
+        # Calcular P&L de posiciones (precio actual del bus si está disponible)
         positions_with_pnl = {}
         for pair, pos in data.get('positions', {}).items():
-            # Aquí necesitaríamos el precio actual, por ahora usamos entry_price
+            current_price = live_prices.get(pair, pos["entry_price"])
             positions_with_pnl[pair] = {
                 "quantity": pos["quantity"],
                 "entry_price": pos["entry_price"],
-                "pnl_pct": 0.0  # Sería calculado con precio actual
+                "pnl_pct": (current_price - pos["entry_price"]) / pos["entry_price"] * 100 if pos["entry_price"] else 0.0
+            }
+        
+        cryptos = [
+            {
+                "pair": pair,
+                "price": price,
+                "signal": "HOLD",
+                "confidence": 0,
+                "reasons": ["Live price (shared bus)"]
+            }
+            for pair, price in live_prices.items()
+        ] or [
+            {
+                "pair": "BTC-USD",
+                "price": 93000,
+                "signal": "HOLD",
+                "confidence": 0,
+                "reasons": ["Gathering data..."]
             }
+        ]
         
         return {
             "timestamp": data.get("timestamp", datetime.now().isoformat()),
@@ -315,15 +352,7 @@ def get_status():
             "positions": positions_with_pnl,
             "pnl": data.get("portfolio_value", 40.0) - data.get("initial_capital", 40.0),
             "pnl_pct": ((data.get("portfolio_value", 40.0) - data.get("initial_capital", 40.0)) / data.get("initial_capital", 40.0)) * 100,
-            "cryptos": [
-                {
-                    "pair": "BTC-USD",
-                    "price": 93000,
-                    "signal": "HOLD",
-                    "confidence": 0,
-                    "reasons": ["Gathering data..."]
-                }
-            ],
+            "cryptos": cryptos,
             "opportunities": []
         }
     
@@ -6,6 +6,7 @@ Valida:
 - Re-entrenamiento automático cada 7 días
 - Detección correcta de régimen de mercado (trending_up/down, lateral, volatile)
 - Ajuste de estrategia según régimen detectado
+- Detector de régimen incremental (horizontes temporales, transiciones, cache)
 """
 
 import pytest
@@ -15,11 +16,18 @@ from datetime import datetime, timedelta
 import numpy as np
 from intelligent_investment_bot import (
     AutoEvolver,
+    MarketEnvironment,
     PPOTradingAgent,
     RiskManager,
-    EVOLVER_CONFIG
+    RegimeDetector,
+    RollingHorizon,
+    SimulatedClock,
+    EVOLVER_CONFIG,
+    TRADING_CONFIG
 )
 
+DAY = 86400.0
+
 class TestInquebrantable2:
     """Suite de tests para Auto-retraining semanal"""
     
@@ -45,6 +53,18 @@ class TestInquebrantable2:
         assert should_retrain == False
         print("[OK] NO se activa re-entrenamiento antes de 7 días")
     
+    def test_weekly_retraining_with_simulated_clock(self):
+        """Verifica el scheduler semanal avanzando un reloj simulado"""
+        clock = SimulatedClock(datetime(2025, 1, 1))
+        evolver = AutoEvolver(clock=clock)
+        
+        clock.advance(days=6, hours=23)
+        assert evolver.should_trigger_weekly_retraining() == False
+        
+        clock.advance(hours=1)
+        assert evolver.should_trigger_weekly_retraining() == True
+        print("[OK] Scheduler semanal correcto con reloj simulado")
+    
     def test_regime_detection_trending_up(self):
         """Detecta régimen trending_up correctamente (+2% en 7 días)"""
         evolver = AutoEvolver()
@@ -161,6 +181,127 @@ class TestInquebrantable2:
         assert "market_regime" in last_evolution
         assert "regime_adjustment" in last_evolution
         print("[OK] Eventos de evolución registrados correctamente")
+    
+    def test_streaming_regime_matches_batch(self):
+        """El detector incremental con muestras diarias coincide con detect_market_regime"""
+        evolver = AutoEvolver()
+        rng = np.random.default_rng(2)
+        series = [
+            [90000 * (1.04 ** (i / 6)) for i in range(7)],
+            [90000 * (0.96 ** (i / 6)) for i in range(7)],
+            [90000 * (1 + 0.005 * np.sin(i)) for i in range(7)],
+            [90000 * (1 + 0.15 * (1 if i % 2 == 0 else -1)) for i in range(7)],
+            list(90000 * np.cumprod(1 + rng.normal(0, 0.02, 40))),
+        ]
+        
+        for prices in series:
+            detector = RegimeDetector()
+            for day, price in enumerate(prices):
+                detector.update(price, day * DAY)
+            
+            recent = np.array(prices[-7:])
+            stats = detector.stats("7d")
+            assert stats["count"] == 7
+            assert np.isclose(stats["trend"], recent[-1] / recent[0] - 1)
+            assert np.isclose(stats["volatility"], np.std(recent[1:] / recent[:-1] - 1))
+            assert np.isclose(stats["range"], (recent.max() - recent.min()) / recent.min())
+            assert detector.regime == evolver.detect_market_regime(prices)
+        print("[OK] Detector incremental = detección batch con datos diarios")
+    
+    def test_streaming_regime_independent_of_sampling_rate(self):
+        """Horizontes en tiempo real: ticks horarios dan el mismo régimen que diarios"""
+        daily = RegimeDetector()
+        hourly = RegimeDetector()
+        
+        # Crash hace 10 días (fuera de la ventana de 7d), luego subida suave de +4%
+        for hour in range(0, 17 * 24 + 1):
+            t = hour * 3600.0
+            price = 60000.0 if hour < 24 else 90000 * 1.04 ** (max(hour - 10 * 24, 0) / (7 * 24))
+            hourly.update(price, t)
+            if hour % 24 == 0:
+                daily.update(price, t)
+        
+        assert daily.regime == hourly.regime == "trending_up"
+        assert hourly.stats("7d")["count"] == 7 * 24
+        assert 0.03 < daily.stats("7d")["trend"] < hourly.stats("7d")["trend"] < 0.04
+        assert hourly.stats("1d")["count"] == 24
+        print(f"[OK] Régimen {hourly.regime} independiente de la frecuencia de muestreo")
+    
+    def test_streaming_regime_transitions_and_cache(self):
+        """Transiciones emitidas al cambiar de régimen; probabilidades y snapshot cacheado"""
+        detector = RegimeDetector()
+        assert detector.update(90000, 0.0) is None
+        assert sum(detector.probabilities().values()) == pytest.approx(1.0)
+        
+        events = []
+        for day in range(1, 20):
+            price = 90000 if day < 10 else 90000 * 1.05 ** (day - 9)
+            event = detector.update(price, day * DAY)
+            if event:
+                events.append(event)
+        
+        assert [(e["from"], e["to"]) for e in events] == [("unknown", "lateral"), ("lateral", "trending_up")]
+        assert list(detector.transitions) == events
+        
+        probabilities = detector.probabilities()
+        assert sum(probabilities.values()) == pytest.approx(1.0)
+        assert max(probabilities, key=probabilities.get) == "trending_up"
+        
+        snapshot = detector.snapshot()
+        assert detector.snapshot() is snapshot
+        assert snapshot["regime"] == "trending_up"
+        assert set(snapshot["horizons"]) == {"1d", "7d"}
+        
+        # Tick fuera de orden: ignorado, cache intacto
+        assert detector.update(1.0, 0.0) is None
+        assert detector.snapshot() is snapshot
+        detector.update(price, 20 * DAY)
+        assert detector.snapshot() is not snapshot
+        print("[OK] Transiciones unknown→lateral→trending_up, snapshot cacheado por tick")
+    
+    def test_rolling_horizon_sub_resolution_tick_overwrites_last_sample(self):
+        """Tick dentro de la resolución reemplaza la última muestra en vez de descartarse"""
+        horizon = RollingHorizon(3600, max_points=60)  # Resolución 60s
+        reference = RollingHorizon(3600, max_points=60)
+        
+        for timestamp, price in [(0, 100.0), (60, 110.0), (90, 121.0), (100, 115.5)]:
+            horizon.update(timestamp, price)
+        for timestamp, price in [(0, 100.0), (60, 115.5)]:
+            reference.update(timestamp, price)
+        
+        stats, expected = horizon.stats(), reference.stats()
+        assert stats["count"] == 2
+        assert stats["trend"] == pytest.approx(0.155)  # Último precio, sin atraso
+        assert horizon.ret_sum == pytest.approx(reference.ret_sum)
+        assert horizon.ret_sq_sum == pytest.approx(reference.ret_sq_sum)
+        assert stats["range"] == pytest.approx(0.21)  # Máximo intra-muestra (121) conservado
+        
+        horizon.update(120, 100.0)
+        assert horizon.stats()["count"] == 3
+        assert horizon.ret_sum == pytest.approx(0.155 + (100.0 / 115.5 - 1))
+        print("[OK] Tick sub-resolución actualiza la última muestra")
+    
+    def test_regime_only_tightens_position_cap(self):
+        """El régimen puede reducir el cap de posición pero nunca aflojarlo"""
+        detector = RegimeDetector()
+        risk_mgr = RiskManager(regime_detector=detector)
+        cap = TRADING_CONFIG["position_size_percent"]
+        
+        env = MarketEnvironment()
+        env.price_history = [100.0]
+        env.portfolio_value = 1000.0
+        
+        def allowed(regime, exposure):
+            detector.regime = regime
+            env.current_position = exposure * env.portfolio_value / 100.0
+            return risk_mgr.should_allow_trade(env, 0)
+        
+        assert allowed("unknown", cap * 0.9)
+        assert not allowed("unknown", cap * 1.1)
+        assert not allowed("trending_up", cap * 1.1)  # 1.2x no afloja el cap
+        assert allowed("volatile", cap * 0.5)
+        assert not allowed("volatile", cap * 0.7)  # 0.6x sí lo ajusta
+        print("[OK] Cap por régimen: solo ajusta hacia abajo")
 
 def run_all_tests():
     """Ejecuta todos los tests y muestra resultados"""
@@ -172,6 +313,7 @@ def run_all_tests():
     tests = [
         ("Re-entrenamiento después de 7 días", suite.test_weekly_retraining_trigger),
         ("NO re-entrenar antes de 7 días", suite.test_no_premature_retraining),
+        ("Scheduler con reloj simulado", suite.test_weekly_retraining_with_simulated_clock),
         ("Detección trending_up", suite.test_regime_detection_trending_up),
         ("Detección trending_down", suite.test_regime_detection_trending_down),
         ("Detección lateral", suite.test_regime_detection_lateral),
@@ -180,6 +322,11 @@ def run_all_tests():
         ("Ajuste para volatile", suite.test_regime_adjustment_volatile),
         ("Actualización de fecha", suite.test_training_date_update),
         ("Logging de evoluciones", suite.test_evolution_history_logging),
+        ("Régimen streaming = batch", suite.test_streaming_regime_matches_batch),
+        ("Régimen independiente del muestreo", suite.test_streaming_regime_independent_of_sampling_rate),
+        ("Transiciones y cache del régimen", suite.test_streaming_regime_transitions_and_cache),
+        ("Tick sub-resolución reemplaza la muestra", suite.test_rolling_horizon_sub_resolution_tick_overwrites_last_sample),
+        ("Cap por régimen solo ajusta hacia abajo", suite.test_regime_only_tightens_position_cap),
     ]
     
     passed = 0
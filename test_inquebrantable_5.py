@@ -11,11 +11,13 @@ Valida:
 
 import pytest
 import sys
+import time
 import numpy as np
 from datetime import datetime, timedelta
 from intelligent_investment_bot import (
     RiskManager,
     MarketEnvironment,
+    SimulatedClock,
     TRADING_CONFIG
 )
 
@@ -231,6 +233,35 @@ class TestInquebrantable5:
         black_swan_events = [e for e in risk_mgr.risk_events if "BLACK_SWAN" in e["trigger"] or "FLASH_CRASH" in e["trigger"]]
         assert len(black_swan_events) >= 1
         print(f"[OK] Múltiples eventos Black Swan registrados: {len(black_swan_events)}")
+    
+    def test_freeze_expires_with_simulated_clock(self):
+        """Verifica que el FREEZE expire en un replay de meses sin esperar"""
+        clock = SimulatedClock(datetime(2025, 1, 1))
+        env = MarketEnvironment(clock=clock)
+        risk_mgr = RiskManager(clock=clock)
+        
+        start = time.perf_counter()
+        releases = 0
+        
+        # 90 días de ticks horarios con un FREEZE de 24h cada 30 días
+        for hour in range(90 * 24):
+            if hour % (30 * 24) == 0:
+                risk_mgr.black_swan_freeze_until = clock.now() + timedelta(hours=24)
+                risk_mgr.kill_switch_active = True
+            
+            was_frozen = risk_mgr.black_swan_freeze_until is not None
+            risk_mgr.analyze_risk(env)
+            if was_frozen and risk_mgr.black_swan_freeze_until is None:
+                releases += 1
+            
+            clock.advance(hours=1)
+        
+        elapsed = time.perf_counter() - start
+        
+        assert releases == 3, f"Freezes liberados: {releases}"
+        assert risk_mgr.kill_switch_active == False
+        assert elapsed < 10, f"Replay demasiado lento: {elapsed:.2f}s"
+        print(f"[OK] Replay de 90 días con 3 FREEZE en {elapsed:.2f}s")
 
 def run_all_tests():
     """Ejecuta todos los tests y muestra resultados"""
@@ -249,6 +280,7 @@ def run_all_tests():
         ("FREEZE auto-release", suite.test_freeze_auto_release),
         ("Tracking de volatilidad", suite.test_volatility_history_tracking),
         ("Múltiples eventos", suite.test_multiple_black_swan_events),
+        ("FREEZE con reloj simulado", suite.test_freeze_expires_with_simulated_clock),
     ]
     
     passed = 0
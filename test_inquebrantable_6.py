@@ -15,8 +15,11 @@ import numpy as np
 from datetime import datetime
 from intelligent_investment_bot import (
     CrossValidator,
+    backtest_candles,
+    walk_forward_folds,
     PPOTradingAgent,
-    MarketEnvironment
+    MarketEnvironment,
+    SimulatedClock
 )
 
 class TestInquebrantable6:
@@ -131,6 +134,20 @@ class TestInquebrantable6:
         assert alert["action"] == "re-training_required"
         print("[OK] Estructura de alerta correcta")
     
+    def test_validation_uses_injected_clock(self):
+        """Verifica timestamps de alertas y validaciones desde el clock inyectado"""
+        clock = SimulatedClock(datetime(2030, 1, 1))
+        validator = CrossValidator(clock=clock)
+        
+        validator.detect_overfitting({"avg_return": 0.10}, {"avg_return": 0.02})
+        assert validator.overfitting_alerts[-1]["timestamp"] == datetime(2030, 1, 1)
+        
+        clock.advance(days=1)
+        price_history = [90000 * (1 + 0.001 * i) for i in range(40)]
+        validation = validator.walk_forward_analysis(PPOTradingAgent(), price_history, window_size=30, iterations=1)
+        assert validation["timestamp"] == datetime(2030, 1, 2)
+        print("[OK] Timestamps deterministas con SimulatedClock")
+    
     def test_walk_forward_window_size(self):
         """Verifica tamaño de ventanas en walk-forward analysis"""
         validator = CrossValidator()
@@ -146,6 +163,50 @@ class TestInquebrantable6:
         assert validation["test_samples"] == 7
         print(f"[OK] Ventanas walk-forward: Train={validation['train_samples']}, Test={validation['test_samples']}")
     
+    def test_walk_forward_rolling_folds(self):
+        """Verifica folds rolling sin fuga: cada test empieza donde termina su train"""
+        folds = walk_forward_folds(200, train_size=60, test_size=20)
+        
+        assert len(folds) == 7
+        assert folds[0] == (0, 60, 80)
+        assert folds[-1] == (120, 180, 200)
+        for (_, test_start, test_end), (_, next_start, _) in zip(folds, folds[1:]):
+            assert next_start == test_end  # Ventanas OOS contiguas, sin overlap
+        print(f"[OK] {len(folds)} folds rolling sin overlap OOS")
+    
+    def test_walk_forward_overfitting_normalizes_window_length(self):
+        """Verifica que IS vs OOS se compare por step y no por return total de ventanas distintas"""
+        validator = CrossValidator()
+        fold = {"sharpe_ratio": 0.0, "max_drawdown": 0.0}
+        
+        # Mismo ritmo (~0.1%/step): 60 steps train vs 20 steps test
+        in_sample = validator._aggregate_folds([{**fold, "returns": 1.001 ** 60 - 1, "steps": 60}])
+        out_of_sample = validator._aggregate_folds([{**fold, "returns": 1.001 ** 20 - 1, "steps": 20}])
+        
+        assert abs(in_sample["mean_step_return"] - 0.001) < 1e-9
+        assert abs(out_of_sample["mean_step_return"] - 0.001) < 1e-9
+        assert validator.detect_overfitting(in_sample, out_of_sample) == True  # Return total: falso positivo
+        assert validator.detect_overfitting(in_sample, out_of_sample, metric="mean_step_return") == False
+        print("[OK] Overfitting comparado por return medio por step")
+    
+    def test_walk_forward_parallel_matches_serial(self):
+        """Verifica métricas OOS idénticas con workers en paralelo y en proceso"""
+        rng = np.random.default_rng(4)
+        closes = 90000 * np.cumprod(1 + rng.normal(0, 0.01, 160))
+        ppo_agent = PPOTradingAgent()
+        
+        serial = CrossValidator().walk_forward_analysis(ppo_agent, closes, window_size=60, test_size=25,
+                                                        workers=1, iterations=2)
+        parallel = CrossValidator().walk_forward_analysis(ppo_agent, closes, window_size=60, test_size=25,
+                                                          workers=2, iterations=2)
+        
+        assert serial["num_folds"] == parallel["num_folds"] == 4
+        assert serial["out_of_sample"] == parallel["out_of_sample"]
+        assert [f["window"] for f in parallel["folds"]] == [(0, 60, 85), (25, 85, 110), (50, 110, 135), (75, 135, 160)]
+        assert isinstance(parallel["overfitting"], bool)
+        assert -1.0 < parallel["out_of_sample"]["compounded_return"] < 1.0
+        print(f"[OK] OOS agregado: {parallel['out_of_sample']['avg_return']*100:+.2f}% avg en {parallel['num_folds']} folds")
+    
     def test_walk_forward_insufficient_data(self):
         """Verifica rechazo con datos insuficientes"""
         validator = CrossValidator()
@@ -194,6 +255,62 @@ class TestInquebrantable6:
         assert "max_drawdown" in performance
         print("[OK] Estructura de performance correcta")
     
+    def test_offline_evaluation_reproducible(self):
+        """Verifica evaluación offline: sin red, mismo seed = mismas métricas"""
+        from unittest.mock import patch
+        
+        rng = np.random.default_rng(8)
+        candles = np.column_stack([90000 * np.cumprod(1 + rng.normal(0, 0.01, 500)),
+                                   rng.uniform(1000, 5000, 500)])
+        ppo_agent = PPOTradingAgent()
+        env = MarketEnvironment()
+        env.bind_candles(candles, seed=3)
+        
+        with patch("requests.get", side_effect=AssertionError("network call")):
+            first = CrossValidator().evaluate_performance(ppo_agent, env, num_episodes=16)
+            second = CrossValidator().evaluate_performance(ppo_agent, env, num_episodes=16)
+            greedy = CrossValidator().evaluate_performance(ppo_agent, env, num_episodes=16,
+                                                           seed=5, deterministic=True)
+        
+        assert first == second
+        assert len(first["episode_returns"]) == 16
+        assert 0.0 <= first["max_drawdown"] <= 1.0
+        assert set(first) >= {"avg_reward", "avg_return", "std_return", "sharpe_ratio",
+                              "sortino_ratio", "calmar_ratio", "win_rate", "max_drawdown"}
+        assert greedy != first
+        print(f"[OK] Evaluación offline reproducible: {first['avg_return']*100:+.3f}% avg")
+    
+    def test_replay_env_matches_vectorized_backtest(self):
+        """Verifica que MarketEnvironment en replay = backtest vectorizado (greedy)"""
+        rng = np.random.default_rng(9)
+        candles = np.column_stack([90000 * np.cumprod(1 + rng.normal(0, 0.004, 150)),
+                                   rng.uniform(1000, 5000, 150)])
+        # Política lineal: compra sin posición, vende con posición (muchos trades)
+        ppo_agent = PPOTradingAgent(hidden_sizes=[])
+        ppo_agent.actor_params = np.zeros((10, 3), dtype=np.float32)
+        ppo_agent.actor_params[9] = [-2.0, 2.0, 0.0]
+        ppo_agent.network.params["actor_bias"][:] = [1.0, -1.0, 0.0]
+        
+        env = MarketEnvironment()
+        env.bind_candles(candles)
+        env.reset()
+        for _ in range(len(candles)):
+            market_data = env.get_market_data()
+            action, _, _ = ppo_agent.act(env.get_state(market_data, 0.0), 0.0, deterministic=True)
+            _, done = env.execute_action(action, market_data)
+            if done:
+                break
+        
+        episode = backtest_candles(ppo_agent, candles, deterministic=True)
+        
+        assert np.isclose(episode["returns"][0], env.portfolio_value / 1000.0 - 1)
+        assert len(env.trades_history) > 0
+        assert episode["wins"][0] == env.performance.wins
+        assert episode["losses"][0] == env.performance.losses
+        assert np.isclose(episode["max_drawdown"][0], env.performance.max_drawdown)
+        assert np.isclose(episode["sortino_ratio"][0], env.performance.sortino_ratio())
+        print(f"[OK] Replay = vectorizado: return {episode['returns'][0]*100:+.3f}%")
+    
     def test_multiple_overfitting_alerts(self):
         """Verifica registro de múltiples alertas"""
         validator = CrossValidator()
@@ -238,10 +355,16 @@ def run_all_tests():
         ("NO falsos positivos", suite.test_no_overfitting_detection),
         ("Manejo returns negativos", suite.test_overfitting_with_negative_returns),
         ("Estructura de alertas", suite.test_overfitting_alert_structure),
+        ("Clock inyectable", suite.test_validation_uses_injected_clock),
         ("Walk-forward window size", suite.test_walk_forward_window_size),
+        ("Walk-forward folds rolling", suite.test_walk_forward_rolling_folds),
+        ("Walk-forward normalizado por step", suite.test_walk_forward_overfitting_normalizes_window_length),
+        ("Walk-forward paralelo = serial", suite.test_walk_forward_parallel_matches_serial),
         ("Rechazo datos insuficientes", suite.test_walk_forward_insufficient_data),
         ("Logging de validaciones", suite.test_validation_history_logging),
         ("Estructura de performance", suite.test_performance_evaluation_structure),
+        ("Evaluación offline reproducible", suite.test_offline_evaluation_reproducible),
+        ("Replay = backtest vectorizado", suite.test_replay_env_matches_vectorized_backtest),
         ("Múltiples alertas", suite.test_multiple_overfitting_alerts),
         ("Threshold personalizable", suite.test_threshold_customization),
     ]
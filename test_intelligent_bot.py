@@ -11,19 +11,76 @@ Tests las 4 AIs:
 """
 
 import sys
+import time
+import tempfile
 import unittest
+from unittest import mock
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 from intelligent_investment_bot import (
+    compute_gae,
+    ActorCriticMLP,
+    AdamOptimizer,
+    AssetSentimentService,
+    DailyPnLLedger,
+    FeaturePipeline,
+    DEFAULT_STATE_FEATURES,
     MarketEnvironment,
+    ModelSentimentScorer,
+    PerformanceMetrics,
     RiskManager,
     SentimentAnalyzer,
+    SentimentHistory,
     PPOTradingAgent,
     AutoEvolver,
     IntelligentInvestmentBot,
+    FileNewsSource,
+    HttpNewsSource,
+    KeywordMatcher,
+    NewsIngestor,
+    RolloutBuffer,
+    SentimentRefresher,
+    SENTIMENT_INFLECTIONS,
+    SENTIMENT_LEXICON,
+    VectorizedMarketEnv,
+    holdout_rollout,
+    retrain_candidate,
+    SimulatedClock,
     TRADING_CONFIG
 )
 
+
+def setUpModule():
+    """Checkpoints por episodio (ppo_agent_latest.ckpt) en un directorio temporal"""
+    global _models_dir, _models_patch
+    _models_dir = tempfile.TemporaryDirectory()
+    _models_patch = mock.patch("intelligent_investment_bot.MODELS_DIR", _models_dir.name)
+    _models_patch.start()
+
+
+def tearDownModule():
+    _models_patch.stop()
+    _models_dir.cleanup()
+
+
+class CountingTextModel:
+    """Clasificador de texto falso (interfaz scikit-learn): cuenta llamadas y tamaños de batch"""
+    
+    classes_ = ["negative", "neutral", "positive"]
+    
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+    
+    def predict_proba(self, texts):
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        self.batches.append(len(texts))
+        positive = np.array([0.8 if "good" in text.lower() else 0.1 for text in texts])
+        return np.column_stack([0.9 - positive, np.full(len(texts), 0.1), positive])
+
+
+
 class TestMarketEnvironment(unittest.TestCase):
     """Tests para el entorno de mercado"""
     
@@ -103,6 +160,343 @@ class TestMarketEnvironment(unittest.TestCase):
         self.assertEqual(len(self.env.trades_history), 0)
 
 
+class TestFeaturePipeline(unittest.TestCase):
+    """Tests para el pipeline incremental de get_state"""
+    
+    @staticmethod
+    def legacy_state(env, market_data, sentiment):
+        """Estado calculado desde cero (implementación original de get_state)"""
+        indicators = env.calculate_technical_indicators(market_data)
+        max_price = max(env.price_history) if env.price_history else market_data["price"]
+        max_volume = max(env.volume_history) if env.volume_history else market_data["volume_24h"]
+        return np.array([
+            market_data["price"] / max_price,
+            market_data["volume_24h"] / max_volume,
+            indicators["rsi"] / 100.0,
+            indicators["macd"] / 1000.0,
+            indicators["signal"] / 1000.0,
+            indicators["sma_20"] / max_price,
+            indicators["sma_50"] / max_price,
+            (sentiment + 1) / 2.0,
+            env.portfolio_value / 1000.0,
+            1.0 if env.current_position > 0 else 0.0
+        ], dtype=np.float32)
+    
+    def test_incremental_state_matches_full_recompute(self):
+        """Test: Indicadores incrementales = recálculo completo (incluye ventana llena y reset)"""
+        np.random.seed(11)
+        env = MarketEnvironment(exchange="paper")
+        for step in range(450):
+            if step == 300:
+                env.reset()
+            market_data = env.get_market_data()
+            self.assertTrue(market_data["closes_from_history"])
+            state = env.get_state(market_data, 0.3)
+            np.testing.assert_allclose(state, self.legacy_state(env, market_data, 0.3), rtol=1e-5, atol=1e-6)
+            # Hold: el historial crece sin que el MDD termine el episodio
+            env.execute_action(2, market_data)
+    
+    def test_external_closes_and_replaced_history(self):
+        """Test: closes de API usan ventana explícita; reasignar price_history resincroniza el max"""
+        env = MarketEnvironment(exchange="paper")
+        closes = list(50000 + np.cumsum(np.random.default_rng(2).normal(0, 200, 80)))
+        market_data = {"price": closes[-1], "volume_24h": 2000.0, "closes": closes}
+        
+        env.price_history = [60000.0, 55000.0]
+        env.volume_history = [4000.0, 1000.0]
+        np.testing.assert_allclose(env.get_state(market_data, 0.0),
+                                   self.legacy_state(env, market_data, 0.0), rtol=1e-5, atol=1e-6)
+        
+        env.price_history = [40000.0]
+        env.volume_history = [500.0]
+        state = env.get_state(market_data, 0.0)
+        self.assertAlmostEqual(state[0], closes[-1] / 40000.0, places=5)
+        self.assertAlmostEqual(state[1], 4.0)
+    
+    def test_preallocated_buffer_and_extended_features(self):
+        """Test: Estado escrito en buffer float32 reutilizado; features extensibles"""
+        pipeline = FeaturePipeline(DEFAULT_STATE_FEATURES + [
+            ("mfi", lambda ctx: ctx.full_indicators["mfi"] / 100.0)
+        ])
+        pipeline.add_feature("spread", lambda ctx: 0.25, index=0)
+        env = MarketEnvironment(exchange="paper", feature_pipeline=pipeline)
+        
+        market_data = env.get_market_data()
+        first = env.get_state(market_data, 0.0)
+        second = env.get_state(market_data, 1.0)
+        
+        self.assertIs(first, second)
+        self.assertEqual(first.dtype, np.float32)
+        self.assertEqual(pipeline.state_dim, 12)
+        self.assertEqual(pipeline.feature_names[:2], ["spread", "price_norm"])
+        self.assertEqual(second[0], 0.25)
+        self.assertEqual(second[8], 1.0)  # sentiment +1 -> 1.0
+        self.assertEqual(second[-1], 0.5)  # MFI neutral sin historial
+        with self.assertRaises(ValueError):
+            pipeline.add_feature("rsi", lambda ctx: 0.0)
+
+
+class TestDailyPnLLedger(unittest.TestCase):
+    """Tests para el ledger de P&L diario incremental"""
+    
+    def setUp(self):
+        self.ledger = DailyPnLLedger(1000.0)
+        self.t0 = datetime(2025, 12, 1, 9, 0)  # Lunes
+    
+    def test_daily_pnl_uses_start_of_day_equity(self):
+        """Test: P&L diario se mide contra el equity al inicio del día"""
+        self.ledger.mark(self.t0, 1100.0)
+        self.ledger.mark(self.t0 + timedelta(hours=20), 1200.0)  # Día siguiente
+        self.ledger.mark(self.t0 + timedelta(hours=22), 1150.0)
+        
+        self.assertAlmostEqual(self.ledger.day_start_equity, 1100.0)
+        self.assertAlmostEqual(self.ledger.daily_pnl(), 50.0)
+        self.assertAlmostEqual(self.ledger.daily_buckets[self.t0.date()]["pnl"], 100.0)
+    
+    def test_daily_loss_fraction(self):
+        """Test: Fracción de pérdida diaria"""
+        self.ledger.mark(self.t0, 1000.0)
+        self.ledger.record_fill(self.t0, fee=1.0)
+        self.ledger.mark(self.t0 + timedelta(hours=1), 900.0)
+        
+        self.assertAlmostEqual(self.ledger.daily_loss_fraction(), 0.10)
+        self.assertEqual(self.ledger.day_fills, 1)
+        self.assertEqual(self.ledger.daily_loss_fraction(1050.0), 0.0)
+    
+    def test_weekly_pnl(self):
+        """Test: P&L semanal contra el inicio de la semana ISO"""
+        for day in range(5):
+            self.ledger.mark(self.t0 + timedelta(days=day), 1000.0 + 10 * day)
+        
+        self.assertAlmostEqual(self.ledger.weekly_pnl(), 40.0)
+        
+        # Lunes siguiente: nueva semana
+        self.ledger.mark(self.t0 + timedelta(days=7), 1030.0)
+        self.assertAlmostEqual(self.ledger.weekly_pnl(), -10.0)
+    
+    def test_rolling_24h_pnl(self):
+        """Test: Ventana móvil de 24h"""
+        for hour in range(48):
+            self.ledger.mark(self.t0 + timedelta(hours=hour), 1000.0 + hour)
+        
+        # Equity hace 24h = 1000 + 23
+        self.assertAlmostEqual(self.ledger.rolling_pnl(), 24.0)
+        self.assertLessEqual(len(self.ledger._window_marks), 24)
+    
+    def test_env_execute_action_marks_ledger(self):
+        """Test: execute_action actualiza el ledger"""
+        env = MarketEnvironment(exchange="paper", symbol="BTCUSDT")
+        market_data = env.get_market_data()
+        env.execute_action(0, market_data)  # BUY
+        
+        self.assertEqual(env.pnl_ledger.day_fills, 1)
+        self.assertAlmostEqual(env.pnl_ledger.last_equity, env.portfolio_value)
+        self.assertAlmostEqual(env.get_daily_pnl(), env.portfolio_value - 1000.0)
+
+
+class TestPerformanceMetrics(unittest.TestCase):
+    """Tests para el motor incremental de métricas"""
+    
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.equity = 1000.0 * np.cumprod(1 + rng.normal(0.001, 0.01, 500))
+        self.metrics = PerformanceMetrics(1000.0, periods_per_year=252, risk_free_rate=0.0)
+        for value in self.equity:
+            self.metrics.update(value)
+    
+    def test_moments_match_full_arrays(self):
+        """Test: Media/std/Sharpe coinciden con el cálculo sobre arrays"""
+        curve = np.concatenate([[1000.0], self.equity])
+        returns = np.diff(curve) / curve[:-1]
+        
+        self.assertAlmostEqual(self.metrics.mean_return, np.mean(returns), places=12)
+        self.assertAlmostEqual(self.metrics.std_return, np.std(returns), places=12)
+        expected_sharpe = np.mean(returns) / np.std(returns) * np.sqrt(252)
+        self.assertAlmostEqual(self.metrics.sharpe_ratio(), expected_sharpe, places=8)
+        
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        self.assertAlmostEqual(self.metrics.downside_deviation, downside, places=12)
+    
+    def test_max_drawdown_matches_full_arrays(self):
+        """Test: MDD incremental = MDD sobre la curva completa"""
+        curve = np.concatenate([[1000.0], self.equity])
+        peaks = np.maximum.accumulate(curve)
+        expected = np.max((peaks - curve) / peaks)
+        
+        self.assertAlmostEqual(self.metrics.max_drawdown, expected, places=12)
+        self.assertAlmostEqual(self.metrics.calmar_ratio(),
+                               self.metrics.annualized_return() / expected, places=8)
+    
+    def test_win_rate(self):
+        """Test: Win rate sobre trades cerrados"""
+        metrics = PerformanceMetrics()
+        for pnl in [5.0, -2.0, 3.0, 1.0]:
+            metrics.record_trade(pnl)
+        
+        self.assertAlmostEqual(metrics.win_rate(), 0.75)
+        self.assertEqual(metrics.summary()["trades_closed"], 4)
+    
+    def test_env_tracks_realized_pnl(self):
+        """Test: El entorno alimenta el motor en cada step y en cada venta"""
+        env = MarketEnvironment(exchange="paper", symbol="BTCUSDT")
+        market_data = env.get_market_data()
+        env.execute_action(0, market_data)  # BUY
+        market_data = dict(market_data, price=market_data["price"] * 1.5)
+        env.execute_action(1, market_data)  # SELL con ganancia
+        
+        self.assertEqual(env.performance.count, 2)
+        self.assertEqual(env.performance.wins, 1)
+        self.assertGreater(env.trades_history[-1]["profit"], 0)
+
+
+class TestVectorizedMarketEnv(unittest.TestCase):
+    """Tests para el entorno vectorizado (N envs en lockstep)"""
+    
+    def test_matches_single_environment(self):
+        """Test: Estados y rewards idénticos a MarketEnvironment con las mismas velas"""
+        rng = np.random.default_rng(1)
+        closes = 50000 * np.cumprod(1 + rng.normal(0, 0.001, 140))
+        volumes = rng.uniform(1000, 5000, 140)
+        actions = rng.integers(0, 3, 140)
+        
+        vec_env = VectorizedMarketEnv(num_envs=1, candles=np.column_stack([closes, volumes]),
+                                      random_start=False, sentiment=-0.7)
+        env = MarketEnvironment(exchange="paper", symbol="BTCUSDT")
+        
+        for t in range(120):
+            market_data = {
+                "price": closes[t],
+                "volume_24h": volumes[t],
+                "closes": env.price_history[-100:] + [closes[t]],
+                "volumes": env.volume_history[-100:] + [volumes[t]]
+            }
+            np.testing.assert_array_equal(vec_env.states[0], env.get_state(market_data, -0.7))
+            
+            reward, done = env.execute_action(int(actions[t]), market_data)
+            _, rewards, dones = vec_env.step(actions[t:t + 1])
+            self.assertAlmostEqual(rewards[0], reward, places=6)
+            self.assertEqual(dones[0], done)
+            if done:
+                break
+        
+        self.assertGreater(t, 100)  # Ventana de 100 precios completa
+    
+    def test_collect_rollout_shapes_and_auto_reset(self):
+        """Test: Rollout (T, N) con auto-reset de envs terminados"""
+        agent = PPOTradingAgent()
+        vec_env = VectorizedMarketEnv(num_envs=8, max_episode_steps=20, seed=0)
+        
+        rollout = vec_env.collect_rollout(agent, 50)
+        
+        self.assertEqual(rollout["states"].shape, (50, 8, 10))
+        self.assertEqual(rollout["actions"].shape, (50, 8))
+        self.assertEqual(rollout["last_values"].shape, (8,))
+        self.assertTrue(rollout["dones"][19].all())  # max_episode_steps
+        self.assertTrue(np.all(vec_env.episode_steps < 20))
+        self.assertEqual(vec_env.total_steps, 400)
+        
+        result = agent.train_rollout(rollout)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["num_transitions"], 400)
+        self.assertEqual(agent.training_history[-1]["num_transitions"], 400)
+    
+    def test_batched_select_action(self):
+        """Test: select_action/get_value aceptan un batch de estados"""
+        agent = PPOTradingAgent()
+        states = np.random.randn(32, 10).astype(np.float32)
+        
+        actions, log_probs = agent.select_action(states, np.linspace(-1, 1, 32))
+        values = agent.get_value(states)
+        
+        self.assertEqual(actions.shape, (32,))
+        self.assertTrue(np.all((actions >= 0) & (actions < 3)))
+        self.assertTrue(np.all(log_probs <= 0))
+        np.testing.assert_allclose(values, [agent.get_value(s) for s in states], rtol=1e-5, atol=1e-6)
+
+    def test_act_fused_inference(self):
+        """Test: act() = acciones + log-probs + valores en un pase; sampler respeta π"""
+        agent = PPOTradingAgent()
+        agent.actor_params = np.random.randn(64, 3).astype(np.float32)
+        state = np.random.randn(10).astype(np.float32)
+        states = np.repeat(state[None, :], 20000, axis=0)
+        
+        logits = agent.network.forward(state[None, :])[0][0].astype(np.float64)
+        probs = np.exp(logits - logits.max()) / np.exp(logits - logits.max()).sum()
+        
+        actions, log_probs, values = agent.act(states, 0.0, rng=np.random.default_rng(5))
+        frequencies = np.bincount(actions, minlength=3) / len(actions)
+        np.testing.assert_allclose(frequencies, probs, atol=0.02)
+        np.testing.assert_allclose(log_probs, np.log(probs[actions] + 1e-10), rtol=1e-5)
+        np.testing.assert_allclose(values, agent.get_value(state), rtol=1e-5, atol=1e-6)
+        
+        # Mismo seed = mismas acciones; deterministic = argmax
+        again, _, _ = agent.act(states, 0.0, rng=np.random.default_rng(5))
+        np.testing.assert_array_equal(actions, again)
+        greedy, _, _ = agent.act(states[:4], 0.0, deterministic=True)
+        self.assertTrue(np.all(greedy == np.argmax(probs)))
+        
+        # Estado individual: escalares
+        action, log_prob, value = agent.act(state, 0.9)
+        self.assertIsInstance(action, int)
+        self.assertIsInstance(value, float)
+
+
+class TestRolloutBuffer(unittest.TestCase):
+    """Tests para el buffer de transiciones preasignado"""
+    
+    def fill(self, buffer, steps):
+        for t in range(steps):
+            buffer.add(np.full((buffer.num_envs, 4), t), t % 3, float(t), -0.5, 0.1, t == steps - 1)
+    
+    def test_views_without_copy(self):
+        """Test: Lectura por vistas float32 sobre los arrays preasignados"""
+        buffer = RolloutBuffer(capacity=8, state_dim=4, num_envs=2)
+        self.fill(buffer, 5)
+        
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.states.shape, (5, 2, 4))
+        self.assertEqual(buffer.rewards.dtype, np.float32)
+        self.assertTrue(np.shares_memory(buffer.states, buffer._states))
+        self.assertEqual(buffer.dones[:, 0].tolist(), [0, 0, 0, 0, 1])
+    
+    def test_overflow_grow(self):
+        """Test: Política grow duplica capacidad conservando datos"""
+        buffer = RolloutBuffer(capacity=4, state_dim=4, overflow="grow")
+        self.fill(buffer, 10)
+        
+        self.assertEqual(buffer.capacity, 16)
+        self.assertEqual(buffer.rewards[:, 0].tolist(), list(range(10)))
+    
+    def test_overflow_drop_oldest(self):
+        """Test: Política drop_oldest conserva los últimos steps en orden"""
+        buffer = RolloutBuffer(capacity=4, state_dim=4, overflow="drop_oldest")
+        self.fill(buffer, 10)
+        
+        self.assertEqual(buffer.steps, 4)
+        self.assertEqual(buffer.dropped, 6)
+        self.assertEqual(buffer.rewards[:, 0].tolist(), [6, 7, 8, 9])
+        self.assertEqual(buffer.states[:, 0, 0].tolist(), [6, 7, 8, 9])
+    
+    def test_overflow_error(self):
+        """Test: Política error lanza OverflowError"""
+        buffer = RolloutBuffer(capacity=2, state_dim=4, overflow="error")
+        self.fill(buffer, 2)
+        with self.assertRaises(OverflowError):
+            buffer.add(np.zeros(4), 0, 0.0, 0.0, 0.0)
+    
+    def test_agent_train_clears_buffer(self):
+        """Test: El agente escribe en el buffer y train() lo vacía sin reasignar"""
+        agent = PPOTradingAgent()
+        storage = agent.buffer._states
+        for _ in range(100):
+            agent.store_transition(np.random.randn(10), 0, 1.0, -0.5, 0.5)
+        
+        self.assertEqual(len(agent.states_buffer), 100)
+        self.assertEqual(agent.train()["num_transitions"], 100)
+        self.assertEqual(len(agent.buffer), 0)
+        self.assertIs(agent.buffer._states, storage)
+
+
 class TestRiskManager(unittest.TestCase):
     """Tests para el gestor de riesgo"""
     
@@ -207,7 +601,9 @@ class TestPPOTradingAgent(unittest.TestCase):
         """Test: Inicialización de redes"""
         self.assertEqual(self.agent.state_dim, 10)
         self.assertEqual(self.agent.action_dim, 3)
-        self.assertEqual(self.agent.actor_params.shape, (10, 3))
+        self.assertEqual(self.agent.network.params["trunk_W0"].shape, (10, 64))
+        self.assertEqual(self.agent.actor_params.shape, (64, 3))
+        self.assertEqual(self.agent.critic_params.shape, (64, 1))
     
     def test_select_action(self):
         """Test: Selección de acción"""
@@ -334,6 +730,24 @@ class TestIntelligentInvestmentBot(unittest.TestCase):
         # (verificamos que el método reset existe)
         self.bot.risk_manager.reset()
         self.assertFalse(self.bot.risk_manager.kill_switch_active)
+    
+    def test_run_episode_feeds_regime_detector_data_time(self):
+        """Test: En paper/replay el detector de régimen recibe el tiempo de las velas, no el del loop"""
+        np.random.seed(3)
+        self.bot.run_episode(max_steps=200)
+        
+        steps = len(self.bot.env.price_history)
+        horizon = self.bot.regime_detector.horizons["7d"]
+        self.assertGreater(steps, 20)
+        self.assertGreater(horizon.stats()["count"], steps // 3)  # 60s por vela vs resolución 7d/4096
+        self.assertEqual(horizon.points[-1][1], self.bot.env.price_history[-1])
+        self.assertNotEqual(self.bot.regime_detector.regime, "unknown")
+        self.assertIs(self.bot.risk_manager.regime_detector, self.bot.regime_detector)
+        
+        # Segundo episodio: el tiempo de datos sigue avanzando (sin ticks fuera de orden)
+        last_timestamp = self.bot.regime_detector.last_timestamp
+        self.bot.run_episode(max_steps=5)
+        self.assertGreater(self.bot.regime_detector.last_timestamp, last_timestamp)
 
 
 class TestEdgeCases(unittest.TestCase):
@@ -594,6 +1008,24 @@ class TestRiskManagerAdvanced(unittest.TestCase):
         self.assertEqual(len(risk_manager.risk_events), 1)
         self.assertEqual(risk_manager.risk_events[0]["trigger"], "MAX_DRAWDOWN")
     
+    def test_kill_switch_liquidation_updates_ledger(self):
+        """Test: Liquidación del Kill Switch actualiza portfolio_value y ledger como un SELL"""
+        clock = SimulatedClock(datetime(2030, 1, 1, 12))
+        env = MarketEnvironment(clock=clock)
+        env.execute_action(0, {"price": 100.0, "volume_24h": 1.0, "timestamp": clock.now()})
+        env.execute_action(2, {"price": 90.0, "volume_24h": 1.0, "timestamp": clock.now()})
+        value_before = env.portfolio_value
+        
+        RiskManager(clock=clock).activate_kill_switch(env, 0.06)
+        
+        self.assertEqual(env.current_position, 0.0)
+        self.assertEqual(env.trades_history[-1]["action"], "SELL")
+        self.assertEqual(env.portfolio_value, env.cash)
+        self.assertAlmostEqual(env.portfolio_value, value_before - env.trades_history[-1]["fee"])
+        self.assertEqual(env.pnl_ledger.last_equity, env.portfolio_value)
+        self.assertEqual(env.pnl_ledger.day_fills, 2)
+        self.assertAlmostEqual(env.get_daily_pnl(), env.cash - TRADING_CONFIG["initial_capital"])
+    
     def test_should_not_allow_oversized_position(self):
         """Test: No permitir posiciones sobredimensionadas"""
         env = MarketEnvironment()
@@ -629,6 +1061,28 @@ class TestPPOAdvanced(unittest.TestCase):
         
         self.assertEqual(len(returns), len(rewards))
         self.assertEqual(len(advantages), len(rewards))
+
+    def test_gae_batched_with_done_masks(self):
+        """Test: GAE vectorizado (N rollouts + dones) = loop backward de referencia"""
+        rng = np.random.default_rng(11)
+        n_envs, horizon, gamma, lam = 3, 37, 0.99, 0.95
+        rewards = rng.normal(size=(n_envs, horizon))
+        values = rng.normal(size=(n_envs, horizon))
+        last_values = rng.normal(size=n_envs)
+        dones = (rng.random((n_envs, horizon)) < 0.15).astype(float)
+
+        returns, advantages = compute_gae(rewards, values, last_values, dones, gamma, lam)
+
+        for env in range(n_envs):
+            expected = np.zeros(horizon)
+            last_advantage = 0.0
+            for t in reversed(range(horizon)):
+                next_value = last_values[env] if t == horizon - 1 else values[env, t + 1]
+                not_done = 1.0 - dones[env, t]
+                delta = rewards[env, t] + gamma * next_value * not_done - values[env, t]
+                expected[t] = last_advantage = delta + gamma * lam * not_done * last_advantage
+            np.testing.assert_allclose(advantages[env], expected, atol=1e-10)
+            np.testing.assert_allclose(returns[env], expected + values[env], atol=1e-10)
     
     def test_save_and_load_model(self):
         """Test: Guardar y cargar modelo"""
@@ -660,7 +1114,131 @@ class TestPPOAdvanced(unittest.TestCase):
         
         # Cleanup
         os.remove(temp_path)
-    
+
+    def test_binary_checkpoint_roundtrip(self):
+        """Test: Checkpoint binario + mmap lazy + historial append-only"""
+        import tempfile
+        import os
+        import json
+        from intelligent_investment_bot import load_checkpoint
+        
+        agent = PPOTradingAgent()
+        for _ in range(2):
+            for _ in range(64):
+                agent.store_transition(np.random.randn(10), 0, 1.0, -0.5, 0.5)
+            agent.train()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "agent.ckpt")
+            agent.save_model(path)
+            agent.save_model(path)  # Sin sesiones nuevas: no duplica historial
+            
+            self.assertEqual(sorted(os.listdir(tmp)), ["agent.ckpt", "agent.history.jsonl"])
+            with open(os.path.join(tmp, "agent.history.jsonl")) as f:
+                history = [json.loads(line) for line in f]
+            self.assertEqual(len(history), 2)
+            
+            # Otro checkpoint en el mismo directorio: historial propio
+            other = PPOTradingAgent()
+            other.save_model(os.path.join(tmp, "other.ckpt"))
+            self.assertNotEqual(other.history_path(os.path.join(tmp, "other.ckpt")), agent.history_path(path))
+            with open(os.path.join(tmp, "agent.history.jsonl")) as f:
+                self.assertEqual(len(f.readlines()), 2)
+            
+            header, arrays = load_checkpoint(path)
+            self.assertEqual(header["metadata"]["state_dim"], 10)
+            self.assertEqual(header["metadata"]["hidden_sizes"], [64, 64])
+            self.assertEqual(header["arrays"]["actor_params"]["shape"], [64, 3])
+            self.assertIsInstance(arrays["actor_params"], np.memmap)
+            
+            new_agent = PPOTradingAgent()
+            new_agent.load_model(path)
+            self.assertNotIsInstance(new_agent.actor_params, np.memmap)
+            np.testing.assert_array_equal(agent.actor_params, new_agent.actor_params)
+            np.testing.assert_array_equal(agent.critic_params, new_agent.critic_params)
+            for name, value in agent.network.params.items():
+                np.testing.assert_array_equal(value, new_agent.network.params[name])
+            
+            # Sin memmap vivo: re-guardar sobre el mismo checkpoint (os.replace)
+            new_agent.save_model(path)
+            
+            # Copy-on-write: entrenar el modelo cargado no modifica el archivo
+            mapped_agent = PPOTradingAgent()
+            mapped_agent.load_model(path, mmap=True)
+            self.assertIsInstance(mapped_agent.actor_params, np.memmap)
+            mapped_agent.actor_params -= 1.0
+            reloaded = PPOTradingAgent()
+            reloaded.load_model(path, mmap=False)
+            np.testing.assert_array_equal(agent.actor_params, reloaded.actor_params)
+            
+            with open(os.path.join(tmp, "bad.ckpt"), "wb") as f:
+                f.write(b"not a checkpoint")
+            with self.assertRaises(ValueError):
+                load_checkpoint(os.path.join(tmp, "bad.ckpt"))
+
+    def test_mlp_gradient_matches_finite_differences(self):
+        """Test: Gradiente analítico de la loss PPO (clip + value + entropía) = diferencias finitas"""
+        rng = np.random.default_rng(3)
+        n = 32
+        network = ActorCriticMLP(10, 3, hidden_sizes=[16, 8], seed=1, dtype=np.float64)
+        for value in network.params.values():
+            value += rng.normal(0, 0.3, size=value.shape)
+        states = rng.normal(size=(n, 10))
+        actions = rng.integers(0, 3, size=n)
+        old_log_probs = np.log(np.full(n, 1 / 3)) + rng.normal(0, 0.3, size=n)
+        advantages = rng.normal(size=n)
+        returns = rng.normal(size=n)
+        
+        def loss():
+            stats, grads = network.ppo_loss(states, actions, old_log_probs, advantages, returns,
+                                            clip_epsilon=0.2, value_coef=0.5, entropy_coef=0.05)
+            total = stats["policy_loss"] + 0.5 * stats["value_loss"] - 0.05 * stats["entropy"]
+            return total, grads
+        
+        _, grads = loss()
+        self.assertEqual(set(grads), set(network.params))
+        for name, param in network.params.items():
+            for index in list(np.ndindex(param.shape))[:6]:
+                original = param[index]
+                param[index] = original + 1e-6
+                plus, _ = loss()
+                param[index] = original - 1e-6
+                minus, _ = loss()
+                param[index] = original
+                self.assertAlmostEqual(grads[name][index], (plus - minus) / 2e-6, places=5, msg=name)
+
+    def test_grad_norm_clipping_and_adam(self):
+        """Test: Clipping a norma global y paso de Adam acotado por learning rate"""
+        grads = {"a": np.full(4, 3.0), "b": np.full(2, 4.0)}
+        norm = ActorCriticMLP.clip_grad_norm(grads, 0.5)
+        self.assertAlmostEqual(norm, np.sqrt(4 * 9 + 2 * 16))
+        self.assertAlmostEqual(np.sqrt(sum(np.sum(g ** 2) for g in grads.values())), 0.5, places=5)
+        
+        params = {"a": np.zeros(4), "b": np.zeros(2)}
+        optimizer = AdamOptimizer(params, learning_rate=0.01)
+        optimizer.step({"a": np.full(4, 100.0), "b": np.full(2, -1e-3)})
+        # Primer paso de Adam: |Δθ| ≈ lr sin importar la escala del gradiente
+        np.testing.assert_allclose(params["a"], -0.01, rtol=1e-4)
+        np.testing.assert_allclose(params["b"], 0.01, rtol=1e-3)
+
+    def test_mlp_training_reduces_loss(self):
+        """Test: train() con la MLP aprende una política que prefiere la acción con reward"""
+        np.random.seed(0)
+        agent = PPOTradingAgent()
+        rng = np.random.default_rng(0)
+        for _ in range(6):
+            states = rng.normal(size=(256, 10)).astype(np.float32)
+            actions, log_probs, values = agent.act(states, 0.0, rng=rng)
+            for i in range(256):
+                reward = 1.0 if actions[i] == (0 if states[i, 0] > 0 else 1) else -1.0
+                agent.store_transition(states[i], actions[i], reward, log_probs[i], values[i], done=True)
+            agent.train()
+        
+        states = rng.normal(size=(512, 10)).astype(np.float32)
+        greedy, _, _ = agent.act(states, 0.0, deterministic=True)
+        accuracy = np.mean(greedy == np.where(states[:, 0] > 0, 0, 1))
+        self.assertGreater(accuracy, 0.8)
+
     def test_sentiment_influence_on_action(self):
         """Test: Sentimiento influye en selección de acción"""
         agent = PPOTradingAgent()
@@ -732,6 +1310,140 @@ class TestAutoEvolverAdvanced(unittest.TestCase):
         self.assertIn("Auto-Evolution Report", report)
         self.assertIn("Evolution 1", report)
 
+    def _wait_for_retraining(self, evolver, agent, timeout=60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            evolution = evolver.poll_retraining(agent)
+            if evolution is not None:
+                return evolution
+            time.sleep(0.05)
+        self.fail("El worker no respondió a tiempo")
+    
+    def test_background_retrain_hot_swap_and_rollback(self):
+        """Test: Re-entrenamiento en otro proceso, hot swap entre ticks, rollback y rechazo"""
+        np.random.seed(21)
+        evolver = AutoEvolver()
+        agent = PPOTradingAgent()
+        env = MarketEnvironment(exchange="paper")
+        env.bind_candles(50000 * np.cumprod(1 + np.random.normal(0, 0.001, 200)))
+        for _ in range(200):
+            market_data = env.get_market_data()
+            action, log_prob, value = agent.act(env.get_state(market_data, 0.0), 0.0)
+            reward, done = env.execute_action(action, market_data)
+            agent.store_transition(env.get_state(market_data, 0.0), action, reward, log_prob, value, done)
+        
+        evolver.start_background_worker()
+        try:
+            # Candidato aceptado: swap atómico de la red completa
+            evolver.min_validation_improvement = -np.inf
+            live_network = agent.network
+            started = time.time()
+            self.assertTrue(evolver.submit_retraining(agent, env, []))
+            self.assertLess(time.time() - started, 1.0)  # No bloquea el loop
+            self.assertEqual(len(agent.buffer), 0)
+            self.assertFalse(evolver.submit_retraining(agent, env, []))  # Un job a la vez
+            
+            evolution = self._wait_for_retraining(evolver, agent)
+            self.assertTrue(evolution["accepted"])
+            self.assertIsNot(agent.network, live_network)
+            self.assertEqual(len(agent.training_history), 1)
+            self.assertTrue(evolver.rollback(agent))
+            self.assertIs(agent.network, live_network)
+            
+            # Candidato rechazado: el modelo vivo no cambia
+            evolver.min_validation_improvement = np.inf
+            for _ in range(100):
+                agent.store_transition(np.random.randn(10), 2, 0.0, -1.0, 0.0)
+            self.assertTrue(evolver.submit_retraining(agent, env, [], penalize=True))
+            evolution = self._wait_for_retraining(evolver, agent)
+            self.assertFalse(evolution["accepted"])
+            self.assertIs(agent.network, live_network)
+            self.assertEqual(len(evolver.evolution_history), 2)
+        finally:
+            evolver.stop_background_worker()
+    
+    def test_background_worker_death_is_contained(self):
+        """Test: Worker muerto a mitad de job → rechazo 'worker died', worker nuevo, trading intacto"""
+        evolver = AutoEvolver()
+        agent = PPOTradingAgent()
+        env = MarketEnvironment(exchange="paper")
+        env.bind_candles(50000 * np.cumprod(1 + np.random.normal(0, 0.001, 100)))
+        
+        evolver.start_background_worker()
+        try:
+            retrainer = evolver.retrainer
+            dead = retrainer.process
+            dead.kill()
+            dead.join(timeout=5)
+            
+            # Worker caído con el job en curso: poll no lanza
+            retrainer.busy, retrainer.job_id = True, 7
+            live_network = agent.network
+            evolution = evolver.poll_retraining(agent)
+            self.assertFalse(evolution["accepted"])
+            self.assertEqual(evolution["reason"], "worker died")
+            self.assertEqual(evolution["job_id"], 7)
+            self.assertIs(agent.network, live_network)
+            self.assertFalse(retrainer.busy)
+            self.assertEqual(retrainer.restarts, 1)
+            self.assertIsNot(retrainer.process, dead)
+            self.assertTrue(retrainer.process.is_alive())
+            
+            # Caído estando libre: submit relanza el worker y el job termina
+            retrainer.process.kill()
+            retrainer.process.join(timeout=5)
+            for _ in range(70):
+                agent.store_transition(np.random.randn(10), 0, 1.0, -1.0, 0.5)
+            self.assertTrue(evolver.submit_retraining(agent, env, []))
+            self.assertEqual(retrainer.restarts, 2)
+            evolution = self._wait_for_retraining(evolver, agent)
+            self.assertNotEqual(evolution["reason"], "worker died")
+        finally:
+            evolver.stop_background_worker()
+    
+    def test_retrain_candidate_requires_validation_data(self):
+        """Test: Sin velas suficientes para validar, el candidato se rechaza"""
+        agent = PPOTradingAgent()
+        for _ in range(80):
+            agent.store_transition(np.random.randn(10), 0, 1.0, -1.0, 0.5)
+        result = retrain_candidate({
+            "job_id": 1, "seed": 1,
+            "params": agent.network.params,
+            "state_dim": 10, "action_dim": 3, "hidden_sizes": agent.network.hidden_sizes,
+            "rollout": agent.export_rollout(),
+            "candles": np.ones((5, 2)),
+        })
+        self.assertFalse(result["accepted"])
+        self.assertEqual(result["reason"], "insufficient_validation_data")
+        self.assertEqual(result["train_result"]["status"], "success")
+    
+    def test_retrain_candidate_validates_out_of_sample(self):
+        """Test: El candidato no se entrena con la cola de velas que valida"""
+        agent = PPOTradingAgent()
+        for i in range(100):
+            agent.store_transition(np.random.randn(10), 0, 1.0, -1.0, float(i))
+        rollout = agent.export_rollout(final_value=-1.0)
+        
+        # Transiciones = últimas 100 de 120 velas; holdout 30 → entrenar con 70
+        trimmed = holdout_rollout(rollout, num_candles=120, holdout=30)
+        self.assertEqual(len(trimmed["rewards"]), 70)
+        self.assertEqual(trimmed["states"].shape, (70, 1, 10))
+        self.assertEqual(trimmed["last_values"].tolist(), [70.0])  # Bootstrap = V de la 1a transición OOS
+        self.assertIs(holdout_rollout(rollout, num_candles=120, holdout=0), rollout)
+        
+        result = retrain_candidate({
+            "job_id": 1, "seed": 1,
+            "params": agent.network.params,
+            "state_dim": 10, "action_dim": 3, "hidden_sizes": agent.network.hidden_sizes,
+            "rollout": rollout,
+            "candles": np.column_stack([50000 * np.cumprod(np.full(120, 1.001)), np.ones(120)]),
+            "holdout": 0.25,
+        })
+        self.assertEqual(result["train_samples"], 70)
+        self.assertEqual(result["validation_samples"], 30)
+        self.assertEqual(result["train_result"]["status"], "success")
+        self.assertIn("candidate", result)
+
 
 class TestIntegrationAdvanced(unittest.TestCase):
     """Tests de integración avanzados"""
@@ -831,6 +1543,606 @@ class TestSentimentAnalyzerAdvanced(unittest.TestCase):
         
         volatility = analyzer.get_volatility_prediction()
         self.assertEqual(volatility, "MEDIUM")
+    
+    def test_keyword_matcher_word_boundaries(self):
+        """Test: Palabras completas + inflexiones listadas, sin falsos positivos por substring ni sufijos"""
+        matcher = KeywordMatcher(SENTIMENT_LEXICON, SENTIMENT_INFLECTIONS)
+        
+        hits = matcher.match("HIGH highs highlight; Bitcoin surges, drops and drop-off after a hack. Fearless?")
+        
+        self.assertEqual(hits, {"high": 2, "surge": 1, "drop": 2, "hack": 1})
+        self.assertEqual(matcher.match("nothing relevant here"), {})
+        
+        # Sufijos ciegos generaban palabras nuevas; inflexiones irregulares sí coinciden
+        self.assertEqual(matcher.match("Rock band plays; bandwidth, highness, alerted"), {})
+        self.assertEqual(matcher.match("Exchange banned after prices dropped"), {"ban": 1, "drop": 1})
+        self.assertEqual(KeywordMatcher(SENTIMENT_LEXICON).match("bans banned highs"), {})  # Opt-in
+        
+        with self.assertRaises(ValueError):
+            KeywordMatcher(SENTIMENT_LEXICON, {"moon": ["mooning"]})
+        with self.assertRaises(ValueError):
+            KeywordMatcher(SENTIMENT_LEXICON, {"drop": ["crash"]})
+    
+    def test_keyword_matcher_batch_scores(self):
+        """Test: Score por categoría = pesos una vez por keyword y texto, hits = todas las ocurrencias"""
+        matcher = KeywordMatcher(SENTIMENT_LEXICON)
+        texts = [
+            "Bullish rally, bullish adoption",      # bullish (1.0) + rally (0.9) + adoption (0.7)
+            "Quiet day",
+            "Panic and fear: crash! crash!",       # panic (1.0) + fear (0.7) + crash (1.0)
+            "Breaking: volatile swing",            # breaking (0.9) + volatile (1.0) + swing (0.8)
+        ]
+        
+        result = matcher.score(texts)
+        
+        self.assertAlmostEqual(result["scores"]["positive"], 2.6)
+        self.assertAlmostEqual(result["scores"]["negative"], 2.7)
+        self.assertAlmostEqual(result["scores"]["volatility"], 2.7)
+        self.assertEqual(result["hits"]["bullish"], 2)
+        self.assertEqual(result["hits"]["crash"], 2)
+        self.assertEqual(result["texts_matched"], 3)
+        
+        # Mismo resultado texto por texto
+        for category in matcher.categories:
+            per_text = sum(matcher.score([text])["scores"][category] for text in texts)
+            self.assertAlmostEqual(result["scores"][category], per_text)
+    
+    def test_keyword_matcher_lexicon_file(self):
+        """Test: Lexicon pesado desde JSON usado por el SentimentAnalyzer"""
+        import json
+        import os
+        import tempfile
+        
+        lexicon = {"positive": {"moon": 1.0}, "negative": {"rug": 1.0}, "volatility": {"whale": 0.5},
+                   "_inflections": {"whale": ["whales"]}}
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(lexicon, f)
+        try:
+            matcher = KeywordMatcher.from_file(f.name)
+        finally:
+            os.remove(f.name)
+        
+        analyzer = SentimentAnalyzer(keyword_matcher=matcher)
+        analyzer._fetch_recent_news = lambda: [{"title": "To the moon", "description": "whales buying"}] * 4
+        sentiment = analyzer.analyze_market_sentiment()
+        
+        self.assertEqual(sentiment["P+"], 1.0)
+        self.assertEqual(sentiment["P-"], 0.0)
+        self.assertEqual(analyzer.sentiment_history[-1]["keyword_hits"], {"moon": 4, "whale": 4})
+        
+        with self.assertRaises(ValueError):
+            KeywordMatcher({"positive": {"all time high": 1.0}})
+
+
+class TestNewsIngestion(unittest.TestCase):
+    """Tests del pipeline de noticias (fuentes, dedup, cache de scores, decaimiento)"""
+    
+    RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <item><title>Bitcoin rally extends</title><description>Bullish momentum</description>
+        <link>https://example.com/a</link><pubDate>Wed, 01 Jan 2025 00:00:00 GMT</pubDate></item>
+  <item><title>Exchange hack</title><description>Panic selling</description>
+        <link>https://example.com/b</link></item>
+</channel></rss>"""
+    
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = SimulatedClock()
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def _write(self, name, content):
+        import os
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+    
+    def _json_feed(self, name, articles):
+        import json
+        return self._write(name, json.dumps({"articles": articles}).encode("utf-8"))
+    
+    def test_dedup_and_only_new_articles_scored(self):
+        """Test: La misma nota en dos fuentes cuenta una vez; re-polls no vuelven a puntuar"""
+        now = self.clock.now().timestamp()
+        json_path = self._json_feed("feed.json", [
+            {"title": "Exchange  HACK", "description": "panic selling", "publishedAt": now - 60},
+            {"title": "Adoption grows", "description": "profit taking", "publishedAt": now - 60},
+        ])
+        rss_path = self._write("feed.xml", self.RSS)
+        ingestor = NewsIngestor([FileNewsSource(json_path), FileNewsSource(rss_path)], clock=self.clock)
+        
+        new = ingestor.poll()
+        
+        self.assertEqual([a["title"] for a in new], ["Exchange  HACK", "Adoption grows", "Bitcoin rally extends"])
+        self.assertEqual(ingestor.stats["duplicates"], 1)
+        self.assertEqual(ingestor.stats["scored"], 3)
+        self.assertEqual(new[0]["scores"]["negative"], 1.9)
+        
+        # Archivos sin cambios: nada que leer; archivo cambiado: solo el artículo nuevo
+        self.assertEqual(ingestor.poll(), [])
+        self._json_feed("feed.json", [
+            {"title": "Exchange hack", "description": "Panic selling", "publishedAt": now - 60},
+            {"title": "Market crash", "description": "", "publishedAt": now - 30},
+        ])
+        self.assertEqual([a["title"] for a in ingestor.poll()], ["Market crash"])
+        self.assertEqual(ingestor.stats["scored"], 4)
+    
+    def test_conditional_get(self):
+        """Test: ETag / Last-Modified reenviados; 304 no parsea ni puntúa"""
+        rss = self.RSS
+        
+        class FakeResponse:
+            def __init__(self, status, content=b"", headers=None):
+                self.status_code = status
+                self.content = content
+                self.headers = headers or {}
+            
+            def raise_for_status(self):
+                pass
+        
+        class FakeSession:
+            def __init__(self):
+                self.sent = []
+            
+            def get(self, url, headers=None, timeout=None):
+                self.sent.append(headers)
+                if headers.get("If-None-Match") == '"v1"':
+                    return FakeResponse(304)
+                return FakeResponse(200, rss, {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT",
+                                               "Content-Type": "application/rss+xml"})
+        
+        session = FakeSession()
+        source = HttpNewsSource("https://example.com/feed", session=session)
+        
+        self.assertEqual(len(source.fetch()), 2)
+        self.assertEqual(source.fetch(), [])
+        self.assertEqual(session.sent[0], {})
+        self.assertEqual(session.sent[1], {"If-None-Match": '"v1"',
+                                           "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"})
+        self.assertEqual(source.not_modified, 1)
+    
+    def test_time_decayed_sentiment(self):
+        """Test: Agregado con half-life; noticias viejas se ignoran; sin noticias → neutral"""
+        now = self.clock.now().timestamp()
+        path = self._json_feed("feed.json", [
+            {"title": "Bullish breakthrough", "description": "", "publishedAt": now},
+            {"title": "Crash", "description": "", "publishedAt": now - 48 * 3600},  # Fuera del lookback
+        ])
+        ingestor = NewsIngestor([FileNewsSource(path)], clock=self.clock, half_life_hours=6, lookback_hours=24)
+        analyzer = SentimentAnalyzer(news_ingestor=ingestor)
+        
+        sentiment = analyzer.analyze_market_sentiment()
+        self.assertEqual(ingestor.stats["stale"], 1)
+        self.assertEqual(sentiment["P+"], 1.0)
+        self.assertEqual(sentiment["P-"], 0.0)
+        
+        # 6h después llega una noticia negativa: el positivo pesa la mitad
+        self.clock.advance(hours=6)
+        self._json_feed("feed.json", [{"title": "Panic", "description": "", "publishedAt": now + 6 * 3600}])
+        sentiment = analyzer.analyze_market_sentiment()
+        aggregate = ingestor.aggregate()
+        
+        self.assertAlmostEqual(aggregate["weight"], 1.5)
+        self.assertAlmostEqual(aggregate["scores"]["positive"], 2.0 * 0.5 / 1.5)
+        self.assertAlmostEqual(aggregate["scores"]["negative"], 1.0 / 1.5)
+        self.assertAlmostEqual(sentiment["P-"], 1.0 / 1.5)
+        self.assertEqual(analyzer.sentiment_history[-1]["new_articles"], 1)
+        self.assertIs(analyzer.news_cache, ingestor.recent)
+        self.assertEqual(len(analyzer.news_cache), 2)
+        
+        # Sin noticias durante más que el lookback: sentimiento neutral
+        self.clock.advance(hours=40)
+        self.assertEqual(analyzer.analyze_market_sentiment()["P+"], 0.5)
+
+
+class TestSentimentRefresher(unittest.TestCase):
+    """Tests del refresco de sentimiento en background (snapshot publicado + edad)"""
+    
+    def setUp(self):
+        import json
+        import os
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = SimulatedClock()
+        self.path = os.path.join(self.tmpdir.name, "feed.json")
+        with open(self.path, "w") as f:
+            json.dump({"articles": [{"title": "Bullish rally", "description": "",
+                                     "publishedAt": self.clock.now().timestamp()}]}, f)
+        ingestor = NewsIngestor([FileNewsSource(self.path)], clock=self.clock)
+        self.analyzer = SentimentAnalyzer(news_ingestor=ingestor)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_refresh_publishes_snapshot_with_age(self):
+        """Test: Antes del primer refresco → neutral con edad infinita; después, snapshot nuevo y edad por reloj"""
+        refresher = SentimentRefresher(self.analyzer, clock=self.clock)
+        initial = refresher.latest()
+        
+        self.assertEqual(initial["matrix"]["P+"], 0.5)
+        self.assertEqual(refresher.age(), float("inf"))
+        
+        snapshot = refresher.refresh()
+        self.assertIs(refresher.latest(), snapshot)
+        self.assertIsNot(snapshot, initial)
+        self.assertEqual(snapshot["sequence"], 1)
+        self.assertEqual(snapshot["matrix"]["P+"], 1.0)
+        self.assertEqual(initial["matrix"]["P+"], 0.5)  # Snapshots viejos no se mutan
+        
+        self.clock.advance(seconds=90)
+        self.assertEqual(refresher.age(), 90.0)
+    
+    def test_thread_refreshes_and_survives_errors(self):
+        """Test: El thread refresca a su cadencia; un fallo conserva el último snapshot"""
+        refresher = SentimentRefresher(self.analyzer, interval=0.01, clock=self.clock)
+        refresher.start()
+        try:
+            deadline = time.time() + 5
+            while refresher.latest()["sequence"] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertGreaterEqual(refresher.latest()["sequence"], 3)
+            
+            def failing():
+                raise RuntimeError("feed down")
+            self.analyzer.analyze_market_sentiment = failing
+            last = refresher.latest()
+            while refresher.errors < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertGreaterEqual(refresher.errors, 2)
+            self.assertIs(refresher.latest(), last)
+        finally:
+            refresher.stop()
+        
+        self.assertFalse(refresher.running)
+    
+    def test_bot_uses_snapshot_and_ignores_stale(self):
+        """Test: El bot lee el snapshot publicado; demasiado viejo → sentimiento neutral"""
+        from intelligent_investment_bot import SENTIMENT_CONFIG
+        bot = IntelligentInvestmentBot(clock=self.clock)
+        bot.sentiment_refresher = SentimentRefresher(self.analyzer, clock=self.clock)
+        bot.sentiment_refresher.refresh()
+        
+        matrix, age = bot._current_sentiment()
+        self.assertEqual(matrix["P+"], 1.0)
+        self.assertEqual(age, 0.0)
+        
+        self.clock.advance(seconds=SENTIMENT_CONFIG["max_snapshot_age_seconds"] + 1)
+        matrix, age = bot._current_sentiment()
+        self.assertEqual(matrix["P+"], 0.5)
+        self.assertGreater(age, SENTIMENT_CONFIG["max_snapshot_age_seconds"])
+
+
+class TestSentimentHistory(unittest.TestCase):
+    """Tests del historial acotado de sentimiento (ring buffer + agregados decaídos)"""
+    
+    def setUp(self):
+        self.start = datetime(2025, 1, 1)
+    
+    def test_bounded_buffer_keeps_lifetime_totals(self):
+        """Test: Memoria constante; count y media de toda la corrida sin recorrer el buffer"""
+        history = SentimentHistory(maxlen=10, half_lives={"1h": 3600})
+        for i in range(100):
+            history.append({"timestamp": self.start + timedelta(minutes=i), "factor": i / 100})
+        
+        self.assertEqual(len(history), 10)
+        self.assertEqual(history.count, 100)
+        self.assertEqual(history[-1]["factor"], 0.99)
+        self.assertEqual([e["factor"] for e in history][0], 0.90)
+        self.assertAlmostEqual(history.mean_factor, np.mean(np.arange(100) / 100))
+    
+    def test_time_decayed_aggregates(self):
+        """Test: Cada ventana pondera por half-life; conteos de volatilidad decaen igual"""
+        history = SentimentHistory(half_lives={"1h": 3600, "24h": 86400})
+        self.assertEqual(history.summary()["P+"], 0.5)
+        
+        history.append({"timestamp": self.start, "factor": 1.0, "P+": 1.0, "P-": 0.0, "volatility": "HIGH"})
+        history.append({"timestamp": self.start + timedelta(hours=1), "factor": -0.5,
+                        "P+": 0.0, "P-": 0.5, "volatility": "LOW"})
+        
+        short = history.summary("1h")
+        self.assertAlmostEqual(short["weight"], 1.5)
+        self.assertAlmostEqual(short["factor"], (0.5 * 1.0 - 0.5) / 1.5)
+        self.assertAlmostEqual(short["intensity"], (0.5 * 1.0 + 0.5) / 1.5)
+        self.assertAlmostEqual(short["P+"], 0.5 / 1.5)
+        self.assertEqual(short["volatility_counts"], {"LOW": 1.0, "MEDIUM": 0.0, "HIGH": 0.5})
+        
+        decay = 0.5 ** (1 / 24)
+        self.assertAlmostEqual(history.summaries()["24h"]["factor"], (decay - 0.5) / (decay + 1))
+        self.assertEqual(history.summary(), short)  # Default: ventana más corta
+    
+    def test_analyzer_volatility_reads_decayed_intensity(self):
+        """Test: get_volatility_prediction usa la intensidad decaída (no solo el último punto)"""
+        clock = SimulatedClock(self.start)
+        analyzer = SentimentAnalyzer(clock=clock)
+        analyzer.analyze_market_sentiment()
+        entry = analyzer.sentiment_history[-1]
+        self.assertEqual(entry["timestamp"], clock.now())
+        self.assertIn(entry["volatility"], SentimentHistory.VOLATILITY_CLASSES)
+        
+        analyzer = SentimentAnalyzer(clock=clock)
+        analyzer.sentiment_history.append({"timestamp": clock.now(), "factor": 0.9})
+        self.assertEqual(analyzer.get_volatility_prediction(), "HIGH")
+        
+        # Un análisis neutral inmediato promedia: intensidad 0.45 → MEDIUM
+        analyzer.sentiment_history.append({"timestamp": clock.now(), "factor": 0.0})
+        self.assertEqual(analyzer.get_volatility_prediction(), "MEDIUM")
+        
+        # Horas de sentimiento neutral: el extremo viejo se desvanece
+        for _ in range(6):
+            clock.advance(hours=1)
+            analyzer.sentiment_history.append({"timestamp": clock.now(), "factor": 0.0})
+        self.assertEqual(analyzer.get_volatility_prediction(), "LOW")
+
+
+class TestAssetSentiment(unittest.TestCase):
+    """Tests del sentimiento por activo (entidades + matriz por activo)"""
+    
+    def setUp(self):
+        import json
+        import os
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = SimulatedClock()
+        self.path = os.path.join(self.tmpdir.name, "feed.json")
+        self.now = self.clock.now().timestamp()
+        self._json = json
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def _feed(self, articles):
+        with open(self.path, "w") as f:
+            self._json.dump({"articles": articles}, f)
+    
+    def test_tags_assets_and_scores_once(self):
+        """Test: Un artículo puntuado una vez alimenta a todos los activos que menciona"""
+        self._feed([
+            {"title": "Dogecoin rally", "description": "Bullish on DOGE and Ethereum", "publishedAt": self.now},
+            {"title": "Solana outage", "description": "Panic selling", "publishedAt": self.now},
+            {"title": "Macro update", "description": "Fed holds rates, ripples across markets", "publishedAt": self.now},
+        ])
+        ingestor = NewsIngestor([FileNewsSource(self.path)], clock=self.clock)
+        service = AssetSentimentService(ingestor)
+        
+        new = service.refresh()
+        
+        self.assertEqual([a["assets"] for a in new], [["ETH", "DOGE"], ["SOL"], []])  # "ripples" ≠ XRP
+        self.assertEqual(ingestor.stats["scored"], 3)
+        self.assertEqual(service.mentions["DOGE"], 1)
+        
+        doge = service.sentiment("DOGE-USD")
+        self.assertEqual(doge, service.sentiment("ETH/USDT"))
+        self.assertEqual(doge["P+"], 1.0)
+        self.assertGreater(doge["signal_strength"], 0)
+        self.assertLess(service.sentiment("SOL-USD")["signal_strength"], 0)
+        self.assertEqual(service.sentiment("XRP-USD")["signal_strength"], 0.0)  # Sin noticias: neutral
+        self.assertEqual(service.sentiment("UNKNOWN-USD")["P+"], 0.5)
+        
+        # Sin noticias nuevas no se re-puntúa; el snapshot se reemplaza, no se muta
+        snapshot = service.matrices()
+        self.assertEqual(service.refresh(), [])
+        self.assertEqual(ingestor.stats["scored"], 3)
+        self.assertIsNot(service.matrices(), snapshot)
+    
+    def test_per_asset_decay_matches_ingestor(self):
+        """Test: Decaimiento por activo = agregado global cuando todas las noticias son del mismo activo"""
+        self._feed([{"title": "Bitcoin surge", "description": "", "publishedAt": self.now}])
+        ingestor = NewsIngestor([FileNewsSource(self.path)], clock=self.clock, half_life_hours=6)
+        service = AssetSentimentService(ingestor)
+        service.refresh()
+        
+        self.clock.advance(hours=6)
+        self._feed([{"title": "BTC crash", "description": "", "publishedAt": self.now + 6 * 3600}])
+        service.refresh()
+        
+        btc = service.sentiment("BTC-USD")
+        aggregate = ingestor.aggregate()
+        self.assertAlmostEqual(btc["news_weight"], aggregate["weight"])
+        self.assertAlmostEqual(btc["P+"], aggregate["scores"]["positive"])
+        self.assertAlmostEqual(btc["P-"], aggregate["scores"]["negative"])
+        
+        # Más allá del lookback sin noticias: neutral
+        self.clock.advance(hours=200)
+        service.refresh()
+        self.assertEqual(service.sentiment("BTC-USD")["signal_strength"], 0.0)
+    
+    def test_background_refresh_publishes_matrices(self):
+        """Test: start() refresca en un thread; sentiment() lee el snapshot publicado"""
+        self._feed([{"title": "Solana rally", "description": "", "publishedAt": self.now}])
+        ingestor = NewsIngestor([FileNewsSource(self.path)], clock=self.clock)
+        service = AssetSentimentService(ingestor, interval=0.01)
+        
+        service.start()
+        try:
+            deadline = time.time() + 5
+            while "SOL" not in service.matrices() and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(service.running)
+            self.assertGreater(service.sentiment("SOL-USD")["signal_strength"], 0)
+        finally:
+            service.stop()
+        
+        self.assertFalse(service.running)
+        self.assertEqual(ingestor.stats["scored"], 1)
+        self.assertEqual(service.errors, 0)
+
+
+class TestModelSentimentScorer(unittest.TestCase):
+    """Tests del scorer con modelo local (batches + cache por hash + fallback a keywords)"""
+    
+    def setUp(self):
+        self.model = CountingTextModel()
+        self.scorer = ModelSentimentScorer(self.model, batch_size=2)
+    
+    def test_batched_inference_and_hash_cache(self):
+        """Test: Solo textos no vistos van al modelo, en batches; volatility sale de keywords"""
+        texts = ["Good news", "Bad news", "Good  NEWS", "Volatile swings", "Other", "Good day"]
+        
+        matrix = self.scorer.score_matrix(texts)
+        
+        self.assertEqual(self.model.batches, [2, 2, 1])  # 5 textos únicos ("Good  NEWS" = "Good news")
+        positive = self.scorer.categories.index("positive")
+        negative = self.scorer.categories.index("negative")
+        volatility = self.scorer.categories.index("volatility")
+        self.assertAlmostEqual(matrix[0, positive], 0.8)
+        self.assertAlmostEqual(matrix[1, negative], 0.8)
+        np.testing.assert_array_equal(matrix[0], matrix[2])
+        self.assertGreater(matrix[3, volatility], 0)
+        
+        again = self.scorer.score_matrix(["good news", "Other"])
+        self.assertEqual(self.model.batches, [2, 2, 1])
+        self.assertEqual(self.scorer.stats["cache_hits"], 2)
+        np.testing.assert_array_equal(again[0], matrix[0])
+    
+    def test_model_failure_falls_back_to_keywords(self):
+        """Test: Si el modelo falla se usan keywords y no se cachea (reintento en el próximo batch)"""
+        self.model.fail = True
+        matrix = self.scorer.score_matrix(["Bitcoin rally"])
+        
+        np.testing.assert_array_equal(matrix, self.scorer.fallback.score_matrix(["Bitcoin rally"]))
+        self.assertEqual(self.scorer.stats["fallbacks"], 1)
+        self.assertEqual(len(self.scorer.cache), 0)
+        
+        self.model.fail = False
+        self.scorer.score_matrix(["Bitcoin rally"])
+        self.assertEqual(self.scorer.stats["inferred"], 1)
+        self.assertEqual(len(self.scorer.cache), 1)
+    
+    def test_failed_batch_keeps_other_batches(self):
+        """Test: Un batch fallido usa keywords sin descartar los batches que el modelo ya puntuó"""
+        predict_proba = self.model.predict_proba
+        calls = []
+        
+        def flaky(texts):
+            calls.append(len(texts))
+            if len(calls) == 2:
+                raise RuntimeError("model unavailable")
+            return predict_proba(texts)
+        
+        self.model.predict_proba = flaky
+        texts = ["Good news", "Bad news", "Good day", "Bitcoin crash", "Other"]
+        matrix, fallback = self.scorer.score_rows(texts)
+        
+        self.assertEqual(fallback.tolist(), [False, False, True, True, False])
+        self.assertEqual(self.scorer.stats["fallbacks"], 1)
+        self.assertEqual(self.scorer.stats["inferred"], 3)
+        self.assertEqual(len(self.scorer.cache), 3)
+        np.testing.assert_array_equal(matrix[2:4], self.scorer.fallback.score_matrix(texts[2:4]))
+        self.assertAlmostEqual(matrix[0, self.scorer.categories.index("positive")], 0.8)
+    
+    def test_ingestor_rescores_fallback_rows(self):
+        """Test: Artículos puntuados con keywords (modelo caído) se re-puntúan cuando el modelo vuelve"""
+        import json
+        import os
+        import tempfile
+        
+        clock = SimulatedClock()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            feed = os.path.join(tmpdir, "feed.json")
+            with open(feed, "w") as f:
+                json.dump({"articles": [{"title": "Good Bitcoin quarter", "description": "",
+                                         "publishedAt": clock.now().timestamp()}]}, f)
+            ingestor = NewsIngestor([FileNewsSource(feed)], clock=clock, scorer=self.scorer)
+            service = AssetSentimentService(ingestor)
+            
+            self.model.fail = True
+            service.refresh()
+            self.assertEqual(len(ingestor.pending), 1)
+            self.assertNotAlmostEqual(ingestor.aggregate()["scores"]["positive"], 0.8)
+            
+            self.model.fail = False
+            clock.advance(hours=1)
+            self.assertEqual(service.refresh(), [])
+        
+        self.assertEqual(ingestor.stats["rescored"], 1)
+        self.assertEqual(len(ingestor.pending), 0)
+        self.assertEqual(ingestor.stats["scored"], 1)
+        self.assertAlmostEqual(ingestor.aggregate()["scores"]["positive"], 0.8)
+        self.assertAlmostEqual(service.sentiment("BTC-USD")["P+"], 0.8)
+        self.assertAlmostEqual(ingestor.recent[-1]["scores"]["positive"], 0.8)
+    
+    def test_pipeline_uses_model_scorer(self):
+        """Test: Modelo cargado de archivo; ingestor y analizador puntúan con él sin re-inferir"""
+        import os
+        import pickle
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model_path = os.path.join(tmpdir, "model.pkl")
+            with open(model_path, "wb") as f:
+                pickle.dump(CountingTextModel(), f)
+            scorer = ModelSentimentScorer.from_file(model_path)
+            
+            feed = os.path.join(tmpdir, "feed.json")
+            clock = SimulatedClock()
+            with open(feed, "w") as f:
+                import json
+                json.dump({"articles": [{"title": "Good quarter", "description": "",
+                                         "publishedAt": clock.now().timestamp()}]}, f)
+            ingestor = NewsIngestor([FileNewsSource(feed)], clock=clock, scorer=scorer)
+            sentiment = SentimentAnalyzer(news_ingestor=ingestor, clock=clock).analyze_market_sentiment()
+        
+        self.assertAlmostEqual(sentiment["P+"], 0.8)
+        self.assertEqual(scorer.model.batches, [1])
+        
+        # Noticias simuladas: 6 plantillas → a lo sumo 6 inferencias en muchos ticks
+        analyzer = SentimentAnalyzer(scorer=self.scorer)
+        for _ in range(5):
+            analyzer.analyze_market_sentiment()
+        self.assertLessEqual(self.scorer.stats["inferred"], 6)
+        self.assertEqual(len(self.scorer.cache), self.scorer.stats["inferred"])
+        self.assertGreater(self.scorer.stats["cache_hits"], 0)
+
+
+class TestStartup(unittest.TestCase):
+    """Tests de arranque: importar el módulo no tiene efectos ni carga dependencias lazy"""
+    
+    def test_import_has_no_side_effects(self):
+        """Test: Import en un directorio limpio no crea directorios ni carga pandas/requests/dotenv"""
+        import os
+        import subprocess
+        import tempfile
+        
+        repo_dir = os.path.dirname(os.path.abspath(__file__))
+        code = ("import sys, warnings, numpy; filters = list(warnings.filters); "
+                "import intelligent_investment_bot; "
+                "print([m for m in ('pandas', 'requests', 'dotenv') if m in sys.modules], "
+                "warnings.filters == filters)")
+        with tempfile.TemporaryDirectory() as cwd:
+            env = dict(os.environ, PYTHONPATH=repo_dir)
+            output = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            self.assertEqual(os.listdir(cwd), [])
+        
+        self.assertEqual(output.strip(), "[] True")
+    
+    def test_load_environment_refreshes_config(self):
+        """Test: load_environment() lee .env y recompila el lexicon configurado"""
+        import json
+        import os
+        import tempfile
+        from intelligent_investment_bot import SENTIMENT_CONFIG, default_keyword_matcher, load_environment
+        
+        previous = SENTIMENT_CONFIG["lexicon_path"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            lexicon_path = os.path.join(tmpdir, "lexicon.json")
+            with open(lexicon_path, "w") as f:
+                json.dump({"positive": {"moon": 1.0}, "negative": {"rug": 1.0}}, f)
+            dotenv_path = os.path.join(tmpdir, ".env")
+            with open(dotenv_path, "w") as f:
+                f.write(f"SENTIMENT_LEXICON_PATH={lexicon_path}\n")
+            
+            try:
+                load_environment(dotenv_path)
+                self.assertEqual(SENTIMENT_CONFIG["lexicon_path"], lexicon_path)
+                self.assertEqual(default_keyword_matcher().keywords, ["moon", "rug"])
+            finally:
+                os.environ.pop("SENTIMENT_LEXICON_PATH", None)
+                SENTIMENT_CONFIG["lexicon_path"] = previous
+                default_keyword_matcher.cache_clear()
 
 
 class TestBotReporting(unittest.TestCase):
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Suite for Market Data Bus
+
+Tests del bus de precios en memoria compartida:
+- Publicación / lectura de quotes (seqlock)
+- Ring buffer de velas
+- Conexión solo-lectura desde otro proceso
+- Lector de consumidores: quotes viejos descartados y re-conexión
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+from multiprocessing import Process, Queue
+from market_data_bus import (
+    MAX_QUOTE_AGE,
+    MarketDataPublisher,
+    PriceBusReader,
+    SharedPriceBus,
+    try_attach
+)
+
+PAIRS = ["BTC-USD", "ETH-USD", "SOL-USD"]
+
+
+def _bus_name(tag):
+    return f"ii_test_{tag}_{os.getpid()}"
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _reader_process(name, queue):
+    bus = SharedPriceBus.attach(name)
+    queue.put((bus.pairs, bus.latest_prices(), bus.closes("ETH-USD")))
+    bus.close()
+
+
+class TestSharedPriceBus(unittest.TestCase):
+    """Tests para el segmento compartido"""
+
+    def setUp(self):
+        self.name = _bus_name("bus")
+        self.bus = SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name)
+
+    def tearDown(self):
+        self.bus.close()
+        self.bus.unlink()
+
+    def test_quote_roundtrip(self):
+        """Test: Quote publicado se lee igual desde un lector conectado"""
+        self.assertIsNone(self.bus.read_quote("BTC-USD"))
+
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=120.0, bid=92990.0, ask=93010.0)
+        reader = SharedPriceBus.attach(self.name)
+        quote = reader.read_quote("BTC-USD")
+
+        self.assertEqual(reader.pairs, PAIRS)
+        self.assertEqual(quote["price"], 93000.0)
+        self.assertEqual(quote["bid"], 92990.0)
+        self.assertEqual(quote["ask"], 93010.0)
+        self.assertEqual(quote["timestamp"], 120.0)
+        self.assertEqual(quote["version"] % 2, 0)
+        self.assertIsNone(reader.read_quote("DOGE-USD"))
+        reader.close()
+
+    def test_reader_is_read_only(self):
+        """Test: Las vistas del lector no se pueden escribir"""
+        self.bus.publish_tick("ETH-USD", 3000.0, timestamp=0.0)
+        reader = SharedPriceBus.attach(self.name)
+        with self.assertRaises(ValueError):
+            reader.candles_view("ETH-USD")[0, 4] = 1.0
+        reader.close()
+
+    def test_odd_sequence_blocks_read(self):
+        """Test: Con escritura en curso (seq impar) el lector no devuelve datos a medias"""
+        self.bus.publish_tick("ETH-USD", 3000.0, timestamp=0.0)
+        self.bus._seq[1] += 1
+        self.assertIsNone(self.bus.read_quote("ETH-USD", max_retries=10))
+        self.bus._seq[1] += 1
+        self.assertEqual(self.bus.read_quote("ETH-USD")["price"], 3000.0)
+
+    def test_candle_rollup_and_wrap(self):
+        """Test: Ticks del mismo bucket se agregan; el ring conserva las últimas N velas"""
+        self.bus.publish_tick("SOL-USD", 100.0, volume=1.0, timestamp=0.0, candle_seconds=60)
+        self.bus.publish_tick("SOL-USD", 105.0, volume=2.0, timestamp=30.0, candle_seconds=60)
+        self.bus.publish_tick("SOL-USD", 95.0, volume=1.0, timestamp=59.0, candle_seconds=60)
+
+        candles = self.bus.read_candles("SOL-USD")
+        self.assertEqual(candles.shape, (1, 6))
+        np.testing.assert_array_equal(candles[0], [0.0, 100.0, 105.0, 95.0, 95.0, 4.0])
+
+        for minute in range(1, 7):
+            self.bus.publish_tick("SOL-USD", 100.0 + minute, timestamp=minute * 60.0, candle_seconds=60)
+
+        out = np.empty((4, 6))
+        candles = self.bus.read_candles("SOL-USD", out=out)
+        self.assertEqual(candles.shape, (4, 6))
+        self.assertTrue(np.shares_memory(candles, out))
+        self.assertEqual(candles[:, 0].tolist(), [180.0, 240.0, 300.0, 360.0])
+        self.assertEqual(self.bus.closes("SOL-USD"), [103.0, 104.0, 105.0, 106.0])
+
+    def test_attach_from_other_process(self):
+        """Test: Otro proceso conecta por nombre y lee los mismos precios"""
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=0.0)
+        self.bus.publish_tick("ETH-USD", 3000.0, timestamp=0.0)
+        self.bus.publish_tick("ETH-USD", 3010.0, timestamp=60.0)
+
+        queue = Queue()
+        process = Process(target=_reader_process, args=(self.name, queue))
+        process.start()
+        pairs, prices, closes = queue.get(timeout=30)
+        process.join(timeout=30)
+
+        self.assertEqual(pairs, PAIRS)
+        self.assertEqual(prices, {"BTC-USD": 93000.0, "ETH-USD": 3010.0})
+        self.assertEqual(closes, [3000.0, 3010.0])
+        # El segmento sigue existiendo tras terminar el lector
+        reader = try_attach(self.name)
+        self.assertIsNotNone(reader)
+        reader.close()
+
+    def test_create_refuses_live_bus(self):
+        """Test: Crear sobre un bus con publisher vivo falla sin destruirlo"""
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=0.0)
+
+        with self.assertRaises(FileExistsError):
+            SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name, probe_seconds=0)
+
+        reader = SharedPriceBus.attach(self.name)
+        self.assertEqual(reader.latest_prices(), {"BTC-USD": 93000.0})
+        reader.close()
+
+    def test_create_replaces_orphan_bus(self):
+        """Test: Un bus cuyo publisher murió se reemplaza; replace=True fuerza el reemplazo"""
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=0.0)
+        self.bus._header[4] = _dead_pid()
+
+        replacement = SharedPriceBus.create(PAIRS[:2], candle_capacity=4, name=self.name, probe_seconds=0)
+        self.assertEqual(replacement.pairs, PAIRS[:2])
+        self.assertEqual(replacement.latest_prices(), {})
+
+        forced = SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name, replace=True)
+        self.assertEqual(forced.pairs, PAIRS)
+        replacement.close()
+        forced.close()
+
+
+class TestPriceBusReader(unittest.TestCase):
+    """Tests para el lector de los consumidores"""
+
+    def setUp(self):
+        self.name = _bus_name("reader")
+        self.now = 1000.0
+        self.bus = SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name)
+
+    def tearDown(self):
+        self.bus.close()
+        self.bus.unlink()
+
+    def test_stale_quote_rejected(self):
+        """Test: Quote más viejo que max_age → None (el consumidor usa HTTP)"""
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=self.now)
+        reader = PriceBusReader(self.name, time_fn=lambda: self.now)
+
+        self.assertEqual(reader.price("BTC-USD"), 93000.0)
+        self.assertIsNone(reader.price("ETH-USD"))  # Par sin datos
+
+        self.now += MAX_QUOTE_AGE + 1
+        self.assertIsNone(reader.price("BTC-USD"))
+        self.assertEqual(reader.latest_prices(), {})
+        self.assertEqual(reader.reattaches, 1)
+        reader.close()
+
+    def test_reattaches_after_publisher_restart(self):
+        """Test: Publisher reiniciado (segmento nuevo) → el lector re-conecta y lee precios frescos"""
+        self.bus.publish_tick("BTC-USD", 93000.0, timestamp=self.now)
+        reader = PriceBusReader(self.name, time_fn=lambda: self.now)
+        self.assertEqual(reader.price("BTC-USD"), 93000.0)
+
+        # Publisher muere: el lector conserva el mapeo del segmento viejo
+        self.bus.close()
+        self.bus.unlink()
+        self.bus = SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name)
+        self.now += MAX_QUOTE_AGE + 1
+        self.bus.publish_tick("BTC-USD", 94000.0, timestamp=self.now)
+
+        self.assertEqual(reader.price("BTC-USD"), 94000.0)
+        self.assertEqual(reader.latest_prices(), {"BTC-USD": 94000.0})
+        reader.close()
+
+    def test_waits_for_publisher(self):
+        """Test: Sin publisher al arrancar, el lector se conecta cuando aparece (con throttle)"""
+        name = _bus_name("late")
+        reader = PriceBusReader(name, retry_interval=10, time_fn=lambda: self.now)
+        self.assertFalse(reader.connected)
+
+        bus = SharedPriceBus.create(PAIRS, candle_capacity=4, name=name)
+        try:
+            bus.publish_tick("SOL-USD", 150.0, timestamp=self.now)
+            self.assertIsNone(reader.price("SOL-USD"))  # Dentro del retry_interval
+            self.now += 10
+            self.assertEqual(reader.price("SOL-USD"), 150.0)
+            reader.close()
+        finally:
+            bus.close()
+            bus.unlink()
+
+
+class TestMarketDataPublisher(unittest.TestCase):
+    """Tests para el publisher único"""
+
+    def test_poll_once_single_fetch_per_pair(self):
+        """Test: Cada poll consulta cada par una sola vez, sin importar los lectores"""
+        calls = []
+
+        def fake_fetch(pair):
+            calls.append(pair)
+            return None if pair == "SOL-USD" else 10.0
+
+        publisher = MarketDataPublisher(PAIRS, fetch_price=fake_fetch, name=_bus_name("pub"))
+        readers = [SharedPriceBus.attach(publisher.bus.name) for _ in range(3)]
+        try:
+            self.assertEqual(publisher.poll_once(), 2)
+            self.assertEqual(calls, PAIRS)
+            for reader in readers:
+                self.assertEqual(reader.latest_prices(), {"BTC-USD": 10.0, "ETH-USD": 10.0})
+        finally:
+            for reader in readers:
+                reader.close()
+            publisher.bus.close()
+            publisher.bus.unlink()
+
+    def test_try_attach_without_publisher(self):
+        """Test: Sin publisher corriendo, try_attach retorna None"""
+        self.assertIsNone(try_attach(_bus_name("missing")))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
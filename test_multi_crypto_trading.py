@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Suite for Multi-Crypto Trading (sharding)
+
+Tests del modo multi-proceso:
+- Mismo análisis y ranking que el modo single-process
+- Worker caído: el shard se calcula en el coordinador y se relanza
+- Coordinador mantiene MAX_POSITIONS con señales de todos los shards
+- Sentimiento por activo reordena el ranking (también con shards)
+- Sentimiento desde MULTI_CRYPTO_NEWS_FEEDS, refrescado en background
+- Precios del bus: quote viejo → fallback HTTP
+"""
+
+import os
+import unittest
+from collections import deque
+from unittest import mock
+import numpy as np
+from market_data_bus import MAX_QUOTE_AGE, PriceBusReader, SharedPriceBus
+from multi_crypto_trading import (
+    MultiCryptoTradingSystem,
+    _shard_step,
+    build_sentiment_service,
+    analyze_price_series,
+    opportunity_score,
+    MAX_POSITIONS
+)
+
+PAIRS = [f"T{i}-USD" for i in range(12)] + ["DOGE-USD"]
+
+
+def random_walk_prices(steps, seed=7):
+    rng = np.random.default_rng(seed)
+    prices = {pair: 100.0 + i for i, pair in enumerate(PAIRS)}
+    for _ in range(steps):
+        prices = {pair: price * (1 + rng.normal(0, 0.015)) for pair, price in prices.items()}
+        yield prices
+
+
+class TestShardedMultiCrypto(unittest.TestCase):
+    """Tests para el coordinador + workers"""
+
+    def setUp(self):
+        self.serial = MultiCryptoTradingSystem(pairs=PAIRS, shards=0)
+        self.sharded = MultiCryptoTradingSystem(pairs=PAIRS, shards=3)
+
+    def tearDown(self):
+        self.sharded.close()
+
+    def test_shards_partition_pairs(self):
+        """Test: Todos los pares quedan repartidos entre los workers"""
+        self.assertEqual(self.sharded.shard_pool.n_shards, 3)
+        self.assertEqual(len(self.sharded.shard_pool.processes), 3)
+
+    def test_same_ranking_as_single_process(self):
+        """Test: Señales y ranking fusionado idénticos al modo single-process"""
+        for prices in random_walk_prices(50):
+            self.serial.update_market_data(prices)
+            self.sharded.update_market_data(prices)
+
+            self.assertEqual(
+                [pair for pair, _ in self.serial.rank_opportunities()],
+                [pair for pair, _ in self.sharded.rank_opportunities()]
+            )
+
+        for pair in PAIRS:
+            self.assertEqual(self.sharded.analyze_crypto(pair),
+                             analyze_price_series(list(self.serial.price_history[pair])))
+            self.assertEqual(list(self.sharded.price_history[pair]),
+                             list(self.serial.price_history[pair]))
+
+    def test_dead_worker_is_respawned(self):
+        """Test: Un worker caído no corta el loop; su shard se calcula aquí y se relanza"""
+        walk = list(random_walk_prices(50))
+        for prices in walk[:30]:
+            self.serial.update_market_data(prices)
+            self.sharded.update_market_data(prices)
+
+        pool = self.sharded.shard_pool
+        dead = pool.processes[1]
+        dead.kill()
+        dead.join()
+
+        for prices in walk[30:]:
+            self.serial.update_market_data(prices)
+            self.sharded.update_market_data(prices)
+            self.assertEqual(
+                [pair for pair, _ in self.serial.rank_opportunities()],
+                [pair for pair, _ in self.sharded.rank_opportunities()]
+            )
+
+        self.assertEqual(pool.restarts, 1)
+        self.assertIsNot(pool.processes[1], dead)
+        self.assertTrue(pool.processes[1].is_alive())
+        for pair in PAIRS:
+            self.assertEqual(list(self.sharded.price_history[pair]),
+                             list(self.serial.price_history[pair]))
+
+    def test_pair_error_contained_in_shard(self):
+        """Test: Un error en un par lo deja en HOLD sin afectar al resto del shard"""
+        history = {pair: deque(maxlen=100) for pair in PAIRS}
+        shard_pairs = list(enumerate(PAIRS))
+        with mock.patch("multi_crypto_trading.fetch_coinbase_spot",
+                        side_effect=lambda pair: 1 / 0 if pair == PAIRS[0] else 100.0):
+            results, _ = _shard_step(shard_pairs, history, None, None)
+
+        price, analysis = results[PAIRS[0]]
+        self.assertIsNone(price)
+        self.assertEqual(analysis["signal"], "HOLD")
+        self.assertEqual(results[PAIRS[1]][0], 100.0)
+
+    def test_coordinator_enforces_max_positions(self):
+        """Test: El coordinador abre como máximo MAX_POSITIONS aunque haya señales en varios shards"""
+        for prices in random_walk_prices(40):
+            self.sharded.update_market_data(prices)
+
+        for pair, analysis in self.sharded.rank_opportunities() + [(pair, None) for pair in PAIRS]:
+            self.sharded.execute_trade(pair, "BUY", self.sharded.price_history[pair][-1])
+
+        self.assertEqual(len(self.sharded.positions), MAX_POSITIONS)
+
+    def test_sentiment_reorders_ranking(self):
+        """Test: El sentimiento publicado por activo ajusta el score sin re-puntuar noticias"""
+        class FixedSentiment:
+            def __init__(self):
+                self.calls = 0
+                self.strength = {}
+
+            def sentiment(self, pair):
+                self.calls += 1
+                return {"signal_strength": self.strength.get(pair, 0.0)}
+
+        service = FixedSentiment()
+        self.sharded.sentiment_service = service
+        for prices in random_walk_prices(50):
+            self.serial.update_market_data(prices)
+            self.sharded.update_market_data(prices)
+
+        ranking = self.serial.rank_opportunities()
+        self.assertEqual([pair for pair, _ in ranking], [pair for pair, _ in self.sharded.rank_opportunities()])
+        self.assertEqual(service.calls, len(PAIRS))
+
+        # Sentimiento en contra de la mejor señal, a favor de la última → se invierten
+        direction = {"BUY": 1, "SELL": -1}
+        directional = [(pair, analysis) for pair, analysis in ranking if analysis["signal"] in direction]
+        self.assertGreaterEqual(len(directional), 2)
+        first, last = directional[0], directional[-1]
+        service.strength = {first[0]: -direction[first[1]["signal"]], last[0]: direction[last[1]["signal"]]}
+        reranked = [pair for pair, _ in self.sharded.rank_opportunities()]
+        boosted = opportunity_score(last[0], last[1], {"signal_strength": direction[last[1]["signal"]]})
+        penalized = opportunity_score(first[0], first[1], {"signal_strength": -direction[first[1]["signal"]]})
+        self.assertEqual(reranked.index(last[0]) < reranked.index(first[0]), boosted > penalized)
+        self.assertAlmostEqual(penalized, opportunity_score(*first) * 0.7)
+
+    def test_close_stops_workers(self):
+        """Test: close() detiene los workers y vuelve al modo single-process"""
+        processes = list(self.sharded.shard_pool.processes)
+        self.sharded.close()
+
+        self.assertIsNone(self.sharded.shard_pool)
+        for process in processes:
+            self.assertFalse(process.is_alive())
+
+
+class TestPriceSource(unittest.TestCase):
+    """Tests del precio desde el bus compartido"""
+
+    def setUp(self):
+        self.name = f"ii_test_mc_{os.getpid()}"
+        self.now = 1000.0
+        self.bus = SharedPriceBus.create(PAIRS, candle_capacity=4, name=self.name)
+        reader = PriceBusReader(self.name, time_fn=lambda: self.now)
+        self.system = MultiCryptoTradingSystem(pairs=PAIRS, shards=0, price_bus=reader)
+
+    def tearDown(self):
+        self.system.price_bus.close()
+        self.bus.close()
+        self.bus.unlink()
+
+    def test_stale_bus_quote_falls_back_to_http(self):
+        """Test: Publisher caído (quote viejo) → get_price usa Coinbase HTTP"""
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"data": {"amount": "42.5"}}
+        self.bus.publish_tick("DOGE-USD", 0.4, timestamp=self.now)
+
+        with mock.patch("multi_crypto_trading.requests.get", return_value=response) as http_get:
+            self.assertEqual(self.system.get_price("DOGE-USD"), 0.4)
+            http_get.assert_not_called()
+
+            self.now += MAX_QUOTE_AGE + 1
+            self.assertEqual(self.system.get_price("DOGE-USD"), 42.5)
+            http_get.assert_called_once()
+
+
+
+class TestSentimentService(unittest.TestCase):
+    """Tests del sentimiento por activo en el sistema (MULTI_CRYPTO_NEWS_FEEDS)"""
+
+    def test_build_from_feeds(self):
+        """Test: Sin feeds no hay servicio; con feeds, un AssetSentimentService sobre ellos"""
+        self.assertIsNone(build_sentiment_service([]))
+
+        service = build_sentiment_service(["https://example.com/a.rss", "https://example.com/b.json"])
+        self.assertEqual([source.url for source in service.news_ingestor.sources],
+                         ["https://example.com/a.rss", "https://example.com/b.json"])
+
+    def test_run_autonomous_refreshes_in_background(self):
+        """Test: run_autonomous() arranca el refresco en su thread (no en el tick) y close() lo detiene"""
+        service = build_sentiment_service(["https://example.com/a.rss"])
+        service.refresh = mock.Mock()
+        system = MultiCryptoTradingSystem(pairs=PAIRS, shards=0, sentiment_service=service)
+        running = []
+
+        def tick():
+            running.append(service.running)
+            raise KeyboardInterrupt
+
+        with mock.patch.object(system, "update_market_data", side_effect=tick), \
+                mock.patch.object(system, "save_session"):
+            system.run_autonomous(duration_hours=0)
+
+        self.assertEqual(running, [True])
+        self.assertFalse(service.running)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
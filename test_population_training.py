@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test Suite for Population-Based Training
+
+Tests de la búsqueda PBT de hiperparámetros PPO:
+- Explore: perturbación acotada a HYPERPARAM_SPACE
+- Exploit: el cuantil inferior copia pesos del superior
+- Checkpoint + resume equivalente a una corrida continua (workers en paralelo)
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from population_training import (
+    PopulationTrainer,
+    HYPERPARAM_SPACE,
+    perturb_hyperparams,
+    sample_hyperparams,
+    synthetic_candles
+)
+
+SMALL_CONFIG = {
+    "iterations_per_generation": 1,
+    "num_envs": 4,
+    "num_steps": 16,
+    "eval_episodes": 2,
+    "eval_steps": 40,
+}
+
+
+class TestPopulationTraining(unittest.TestCase):
+    """Tests para PopulationTrainer"""
+
+    def setUp(self):
+        self.candles = synthetic_candles(300, seed=3)
+
+    def test_perturb_within_bounds(self):
+        """Test: Explore multiplica por 0.8/1.2 y nunca sale del rango"""
+        rng = np.random.default_rng(0)
+        hyperparams = sample_hyperparams(rng)
+
+        for _ in range(50):
+            perturbed = perturb_hyperparams(hyperparams, rng)
+            for name, (low, high, _) in HYPERPARAM_SPACE.items():
+                self.assertGreaterEqual(perturbed[name], low)
+                self.assertLessEqual(perturbed[name], high)
+                ratio = perturbed[name] / hyperparams[name] if hyperparams[name] else 1.0
+                if low < perturbed[name] < high:
+                    self.assertTrue(np.isclose(ratio, 0.8) or np.isclose(ratio, 1.2))
+            hyperparams = perturbed
+
+    def test_exploit_copies_top_weights(self):
+        """Test: El cuantil inferior copia pesos del superior con hiperparámetros perturbados"""
+        trainer = PopulationTrainer(self.candles, population_size=4, workers=1, config=SMALL_CONFIG)
+        trainer.initialize()
+        for member, score in zip(trainer.members, [0.5, -1.0, 2.0, 0.1]):
+            member["score"] = score
+        winner_params = {name: value.copy() for name, value in trainer.members[2]["params"].items()}
+
+        record = trainer.exploit_and_explore()
+
+        self.assertEqual(record["best_member"], 2)
+        self.assertEqual(record["exploited"], [(1, 2)])
+        for name, value in winner_params.items():
+            np.testing.assert_array_equal(trainer.members[1]["params"][name], value)
+            self.assertFalse(np.shares_memory(trainer.members[1]["params"][name], trainer.members[2]["params"][name]))
+        self.assertNotEqual(trainer.members[1]["hyperparams"], trainer.members[2]["hyperparams"])
+        self.assertFalse(np.array_equal(trainer.members[0]["params"]["actor_params"],
+                                        trainer.members[2]["params"]["actor_params"]))
+
+    def test_resume_matches_continuous_run(self):
+        """Test: Checkpoint + resume (y workers en paralelo) = corrida continua"""
+        continuous = PopulationTrainer(self.candles, population_size=4, workers=1, config=SMALL_CONFIG)
+        continuous.run(2, verbose=False)
+
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            first = PopulationTrainer(self.candles, population_size=4, workers=2,
+                                      checkpoint_dir=checkpoint_dir, config=SMALL_CONFIG)
+            first.run(1, verbose=False)
+            self.assertEqual(len([f for f in os.listdir(checkpoint_dir) if f.endswith(".ckpt")]), 4)
+
+            resumed = PopulationTrainer(self.candles, population_size=4, workers=1,
+                                        checkpoint_dir=checkpoint_dir, config=SMALL_CONFIG)
+            summary = resumed.run(2, verbose=False)
+
+            self.assertEqual(summary["generations"], 2)
+            self.assertEqual(len([f for f in os.listdir(checkpoint_dir) if f.endswith(".ckpt")]), 4)
+
+        self.assertEqual([r["scores"] for r in resumed.history], [r["scores"] for r in continuous.history])
+        for expected, actual in zip(continuous.members, resumed.members):
+            self.assertEqual(expected["hyperparams"], actual["hyperparams"])
+            for name, value in expected["params"].items():
+                np.testing.assert_array_equal(actual["params"][name], value)
+
+        agent = resumed.best_agent()
+        self.assertEqual(agent.hyperparams, resumed.best_member()["hyperparams"])
+        self.assertEqual(agent.hp("learning_rate"), agent.optimizer.learning_rate)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)